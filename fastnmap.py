@@ -0,0 +1,21 @@
+"""
+FastNmap命令行入口（无图形界面）
+
+用法:
+    python fastnmap.py scan 192.168.1.0/24 -t 服务识别 -p 80,443
+    python fastnmap.py parse logs/scans/<扫描ID>/默认扫描_ScanCacheLog.xml --json
+    python fastnmap.py monitor list
+    python fastnmap.py report <监控名称>
+"""
+
+import sys
+import os
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from src.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
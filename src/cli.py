@@ -0,0 +1,629 @@
+"""
+FastNmap命令行入口，不依赖Qt，可在没有图形界面的扫描服务器上运行
+
+子命令:
+    scan     执行扫描或继续中断的扫描
+    parse    解析nmap XML结果
+    history  查看、导出和对比历史扫描
+    info     显示nmap版本、支持的选项和已安装的NSE脚本
+    monitor  管理和执行资产监控
+    report   生成资产监控HTML报告
+    serve    启动HTTP/JSON接口服务
+    coordinator  启动分布式扫描协调节点
+    worker   启动分布式扫描工作节点
+
+各子命令只在执行时导入所需的核心模块，以减少启动时间。
+"""
+
+import os
+import sys
+import json
+import argparse
+
+
+# 扫描类型列表（与src.utils.constants.SCAN_TYPES一致，避免启动时导入常量模块）
+SCAN_TYPE_CHOICES = ['默认扫描', '存活扫描', '服务识别', '系统识别', '端口识别', '暴力破解', '漏洞扫描']
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    构建命令行参数解析器
+
+    返回:
+        参数解析器
+    """
+    parser = argparse.ArgumentParser(prog='fastnmap', description='FastNmap 命令行扫描工具')
+    subparsers = parser.add_subparsers(dest='command')
+
+    # scan
+    scan_parser = subparsers.add_parser('scan', help='执行扫描')
+    scan_parser.add_argument('target', nargs='?', help='扫描目标，支持CIDR、IP范围、域名，多个目标用逗号分隔')
+    scan_parser.add_argument('-iL', '--target-file', default='',
+                             help='目标列表文件，每行一个或多个目标，去重后分块扫描，适用于大量目标')
+    scan_parser.add_argument('--chunk-size', type=int, default=0, help='目标列表每个分块的最大主机数')
+    scan_parser.add_argument('-t', '--type', default='默认扫描', choices=SCAN_TYPE_CHOICES, help='扫描类型')
+    scan_parser.add_argument('-p', '--ports', default='', help='端口，如 80,443 或 1-1000')
+    scan_parser.add_argument('-g', '--port-group', default='', help='预定义端口组，如 高危端口、Top100')
+    scan_parser.add_argument('--params', default='', help='附加的nmap参数')
+    scan_parser.add_argument('--threads', default=None, help='最小并行数（默认50，指定后不被自适应时序调整）')
+    scan_parser.add_argument('--timeout', default='', help='单个主机超时时间（秒）')
+    scan_parser.add_argument('--fast', action='store_true', help='快速模式')
+    scan_parser.add_argument('--no-adaptive-timing', action='store_true', help='不使用历史RTT和丢包数据调整时序参数')
+    scan_parser.add_argument('--pipeline', action='store_true',
+                             help='两阶段扫描：先探测存活主机和开放端口，再只对开放端口做服务识别或脚本扫描')
+    scan_parser.add_argument('--discovery-file', default='',
+                             help='以masscan -oL/-oJ/-oD 输出或 IP:端口 列表作为第一阶段，只对其中的开放端口执行扫描')
+    scan_parser.add_argument('--shard', type=int, default=0, help='分片并行扫描的分片数量')
+    scan_parser.add_argument('--priority', choices=['interactive', 'scheduled', 'backfill'], default='interactive',
+                             help='任务队列中的优先级，interactive可暂停正在运行的低优先级扫描')
+    scan_parser.add_argument('--max-runtime', type=int, default=0, help='最长运行时间（秒），0为不限制')
+    scan_parser.add_argument('--stall-timeout', type=int, default=None, help='无输出多久判定为停滞（秒）')
+    scan_parser.add_argument('--nice', type=int, default=0, help='降低nmap进程的CPU优先级（nice值），0为不调整')
+    scan_parser.add_argument('--output-dir', default=os.path.join('logs', 'scans'), help='扫描输出根目录')
+    scan_parser.add_argument('--resume', metavar='SCAN_ID', help='继续中断的扫描')
+    scan_parser.add_argument('--estimate', action='store_true', help='只预估探测数量、耗时和流量，不执行扫描')
+    scan_parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    scan_parser.add_argument('-q', '--quiet', action='store_true', help='不显示nmap实时输出')
+    add_rate_argument(scan_parser)
+
+    # parse
+    parse_parser = subparsers.add_parser('parse', help='解析nmap XML结果')
+    parse_parser.add_argument('xml_file', help='nmap -oX 输出文件')
+    parse_parser.add_argument('-t', '--type', default='默认扫描', choices=SCAN_TYPE_CHOICES, help='按扫描类型展示结果')
+    parse_parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+
+    # history
+    history_parser = subparsers.add_parser('history', help='查看、导出和对比历史扫描')
+    history_parser.add_argument('--output-dir', default=os.path.join('logs', 'scans'), help='扫描输出根目录')
+    history_subparsers = history_parser.add_subparsers(dest='history_command')
+    list_parser = history_subparsers.add_parser('list', help='列出历史扫描')
+    list_parser.add_argument('-n', '--limit', type=int, default=20, help='显示的数量，0为全部')
+    list_parser.add_argument('-t', '--type', default='', help='只显示该扫描类型')
+    list_parser.add_argument('--target', default='', help='只显示目标中包含该字符串的扫描')
+    show_parser = history_subparsers.add_parser('show', help='显示历史扫描的结果')
+    show_parser.add_argument('scan_id', help='扫描ID')
+    show_parser.add_argument('--log', action='store_true', help='显示nmap原始输出')
+    show_parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    diff_parser = history_subparsers.add_parser('diff', help='对比两次扫描')
+    diff_parser.add_argument('previous', help='较早的扫描ID')
+    diff_parser.add_argument('current', help='较新的扫描ID')
+    export_parser = history_subparsers.add_parser('export', help='将历史扫描结果导出为CSV')
+    export_parser.add_argument('scan_id', help='扫描ID')
+    export_parser.add_argument('-o', '--output', default='', help='CSV文件路径')
+    history_subparsers.add_parser('rebuild', help='根据扫描目录重建索引')
+
+    # info
+    info_parser = subparsers.add_parser('info', help='显示nmap版本、支持的选项和已安装的NSE脚本')
+    info_parser.add_argument('--refresh', action='store_true', help='忽略缓存重新探测')
+    info_parser.add_argument('--scripts', default='', help='列出匹配该类别或通配符的脚本，如 vuln、http-*')
+    info_parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+
+    # monitor
+    monitor_parser = subparsers.add_parser('monitor', help='资产监控')
+    add_rate_argument(monitor_parser)
+    monitor_subparsers = monitor_parser.add_subparsers(dest='monitor_command')
+    monitor_subparsers.add_parser('list', help='列出监控目标')
+    run_parser = monitor_subparsers.add_parser('run', help='立即扫描一次监控目标')
+    run_parser.add_argument('name', help='监控目标名称')
+    watch_parser = monitor_subparsers.add_parser('watch', help='按间隔持续监控，Ctrl+C退出')
+    watch_parser.add_argument('names', nargs='*', help='监控目标名称，默认全部启用的目标')
+    import_parser = monitor_subparsers.add_parser('import', help='导入masscan等工具的发现结果作为一次扫描记录')
+    import_parser.add_argument('name', help='监控目标名称')
+    import_parser.add_argument('file', help='masscan -oL/-oJ/-oD 输出或 IP:端口 列表')
+
+    # report
+    report_parser = subparsers.add_parser('report', help='生成资产监控HTML报告')
+    report_parser.add_argument('name', help='监控目标名称')
+    report_parser.add_argument('-o', '--output', default='', help='报告文件路径')
+
+    # serve
+    serve_parser = subparsers.add_parser('serve', help='启动HTTP/JSON接口服务')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    serve_parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    serve_parser.add_argument('--token', default=os.environ.get('FASTNMAP_API_TOKEN', ''),
+                              help='访问令牌，也可通过环境变量 FASTNMAP_API_TOKEN 设置')
+    serve_parser.add_argument('--max-concurrent', type=int, default=2, help='同时运行的扫描数量上限')
+    serve_parser.add_argument('--output-dir', default=os.path.join('logs', 'scans'), help='扫描输出根目录')
+    serve_parser.add_argument('-q', '--quiet', action='store_true', help='不输出访问日志')
+    add_rate_argument(serve_parser)
+
+    # coordinator
+    coordinator_parser = subparsers.add_parser('coordinator', help='启动分布式扫描协调节点')
+    coordinator_parser.add_argument('--host', default='127.0.0.1', help='监听地址，工作节点在其他主机时设为0.0.0.0（此时必须设置 --token）')
+    coordinator_parser.add_argument('--port', type=int, default=8766, help='监听端口')
+    coordinator_parser.add_argument('--token', default=os.environ.get('FASTNMAP_API_TOKEN', ''),
+                                    help='访问令牌，也可通过环境变量 FASTNMAP_API_TOKEN 设置')
+    coordinator_parser.add_argument('--lease-timeout', type=int, default=60, help='租约有效期（秒）')
+    coordinator_parser.add_argument('--max-attempts', type=int, default=3, help='单个分片最多执行次数')
+    coordinator_parser.add_argument('--output-dir', default=os.path.join('logs', 'distributed'), help='任务输出根目录')
+    coordinator_parser.add_argument('-q', '--quiet', action='store_true', help='不输出访问日志')
+
+    # worker
+    worker_parser = subparsers.add_parser('worker', help='启动分布式扫描工作节点')
+    worker_parser.add_argument('coordinator', help='协调节点地址，如 http://127.0.0.1:8766')
+    worker_parser.add_argument('--name', default='', help='工作节点名称，默认为主机名')
+    worker_parser.add_argument('--token', default=os.environ.get('FASTNMAP_API_TOKEN', ''), help='协调节点的访问令牌')
+    worker_parser.add_argument('--output-dir', default=os.path.join('logs', 'worker'), help='分片输出根目录')
+    add_rate_argument(worker_parser)
+
+    return parser
+
+
+def add_rate_argument(parser: argparse.ArgumentParser):
+    """
+    添加全局发包速率预算和任务队列参数
+
+    参数:
+        parser: 子命令参数解析器
+    """
+    parser.add_argument('--rate-budget', type=int, default=None,
+                        help='本进程所有nmap共享的发包速率预算（包/秒），默认读取环境变量 FASTNMAP_RATE_BUDGET')
+    parser.add_argument('--rate-slots', type=int, default=None, help='速率预算预留的并发扫描份数')
+    parser.add_argument('--max-jobs', type=int, default=None,
+                        help='本进程同时运行的扫描数量上限，默认读取环境变量 FASTNMAP_MAX_JOBS')
+
+
+def configure_rate(args):
+    """按命令行参数设置全局发包速率预算和任务队列上限"""
+    if getattr(args, 'max_jobs', None) is not None:
+        from src.core.job_queue import get_job_queue
+
+        get_job_queue().configure(args.max_jobs)
+    if getattr(args, 'rate_budget', None) is None and getattr(args, 'rate_slots', None) is None:
+        return
+    from src.core.rate_governor import get_rate_governor
+
+    governor = get_rate_governor()
+    budget = args.rate_budget if args.rate_budget is not None else governor.budget
+    governor.configure(budget, args.rate_slots)
+
+
+def cmd_scan(args) -> int:
+    """执行scan子命令"""
+    import threading
+    from src.core.scan_manager import ScanManager, STATE_COMPLETED, STATE_CANCELLED
+    from src.core.scan_events import EVENT_HOST_RESULT
+
+    if not args.target and not args.target_file and not args.resume and not args.discovery_file:
+        print('错误：请指定扫描目标、--target-file、--discovery-file 或 --resume', file=sys.stderr)
+        return 2
+    if args.target_file and not os.path.isfile(args.target_file):
+        print(f'错误：目标文件不存在: {args.target_file}', file=sys.stderr)
+        return 2
+
+    finished = threading.Event()
+    # JSON模式下实时输出写到标准错误，保证标准输出是完整的JSON
+    stream = sys.stderr if args.json else sys.stdout
+
+    def on_events(scan_id, events):
+        if args.quiet:
+            return
+        for event in events:
+            if event.type != EVENT_HOST_RESULT:
+                print(event.line, file=stream, flush=True)
+
+    def on_state(job):
+        if job.is_finished:
+            finished.set()
+
+    manager = ScanManager(base_dir=args.output_dir)
+    if args.resume:
+        scan_id = manager.resume(args.resume, on_events, on_state)
+        if not scan_id:
+            print(f'错误：没有可以继续的扫描: {args.resume}', file=sys.stderr)
+            return 1
+    else:
+        port_input = args.ports
+        if args.port_group:
+            from src.utils.constants import PORT_GROUPS
+            if args.port_group not in PORT_GROUPS:
+                print(f"错误：未知的端口组，可选: {', '.join(PORT_GROUPS)}", file=sys.stderr)
+                return 2
+            port_input = ','.join(map(str, PORT_GROUPS[args.port_group]))
+
+        config = {
+            'target': args.target or '',
+            'target_file': os.path.abspath(args.target_file) if args.target_file else '',
+            'chunk_hosts': args.chunk_size,
+            'timeout': args.timeout,
+            'threads_min': args.threads,
+            'threads_max': args.threads,
+            'params': args.params,
+            'result_file': '',
+            'scan_type': args.type,
+            'fast_mode': args.fast,
+            'pipeline_mode': args.pipeline,
+            'discovery_file': args.discovery_file,
+            'shard_mode': args.shard > 0,
+            'shard_count': args.shard,
+            'port_input': port_input,
+            'port_checkboxes': [],
+            'max_runtime': args.max_runtime,
+            'nice': args.nice,
+            'priority': args.priority,
+            'adaptive_timing': not args.no_adaptive_timing
+        }
+        if args.stall_timeout is not None:
+            config['stall_timeout'] = args.stall_timeout
+
+        # 启动前预估开销，超过阈值时在标准错误输出警告和分片建议
+        from src.core.cost_estimator import CostEstimator
+        estimate = CostEstimator.estimate_config(config) if not args.discovery_file else None
+        if args.estimate:
+            if not estimate:
+                print('错误：构建扫描命令失败', file=sys.stderr)
+                return 1
+            print(json.dumps(estimate, ensure_ascii=False, indent=2) if args.json
+                  else CostEstimator.format_estimate(estimate))
+            return 0
+        if estimate and estimate['warnings']:
+            print(CostEstimator.format_estimate(estimate), file=sys.stderr)
+            if estimate['proposed_shards']:
+                print(f"可使用 --shard {estimate['proposed_shards']} 分片扫描", file=sys.stderr)
+
+        scan_id = manager.submit(config, on_events, on_state)
+        if not scan_id:
+            print('错误：构建扫描命令失败', file=sys.stderr)
+            return 1
+
+    try:
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        manager.cancel(scan_id)
+        finished.wait(10)
+        print(f'扫描已取消，可使用 --resume {scan_id} 继续', file=sys.stderr)
+
+    job = manager.get_job(scan_id)
+    manager.shutdown()
+
+    if job.state != STATE_COMPLETED:
+        if job.error:
+            print(job.error, file=sys.stderr)
+        if job.problems:
+            return 1  # 构建命令时已发现无法执行，继续扫描同样会失败
+        if job.partial:
+            # 中断前已完成的主机仍然输出，结果不完整
+            print_result(job.xml_file, job.scan_type, args.json, scan_id)
+        print(f'扫描未完成 ({job.state})，可使用 --resume {scan_id} 继续', file=sys.stderr)
+        return 130 if job.state == STATE_CANCELLED else 1
+
+    print_result(job.xml_file, job.scan_type, args.json, scan_id)
+    return 0
+
+
+def cmd_parse(args) -> int:
+    """执行parse子命令"""
+    if not os.path.exists(args.xml_file):
+        print(f'错误：文件不存在: {args.xml_file}', file=sys.stderr)
+        return 1
+    return print_result(args.xml_file, args.type, args.json)
+
+
+def print_result(xml_file: str, scan_type: str, as_json: bool, scan_id: str = '') -> int:
+    """
+    输出扫描结果
+
+    参数:
+        xml_file: XML结果文件
+        scan_type: 扫描类型
+        as_json: 是否以JSON格式输出
+        scan_id: 扫描ID
+
+    返回:
+        退出码
+    """
+    if as_json:
+        from src.core.xml_tailer import load_hosts
+
+        hosts = load_hosts(xml_file)
+        if hosts is None:
+            print(f'错误：无法解析文件: {xml_file}', file=sys.stderr)
+            return 1
+        result = {'xml_file': xml_file, 'hosts': hosts}
+        if scan_id:
+            result['scan_id'] = scan_id
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+
+    from src.core.nmap_parser import NmapOutputParser
+
+    result_text, error = NmapOutputParser.parse_file(xml_file, scan_type, html_format=False)
+    if error:
+        print(f'错误：{error}', file=sys.stderr)
+        return 1
+    print(result_text)
+    print(f'\n结果文件: {xml_file}')
+    return 0
+
+
+def cmd_history(args) -> int:
+    """执行history子命令"""
+    from src.core.scan_catalog import ScanCatalog
+
+    catalog = ScanCatalog(args.output_dir)
+    if args.history_command == 'rebuild':
+        print(f'索引已重建: {catalog.rebuild()} 次扫描')
+        return 0
+
+    if args.history_command == 'list':
+        for entry in catalog.list(args.limit, args.type, args.target):
+            counts = f"{entry['hosts_up']} 台主机 {entry['open_ports']} 个开放端口" if 'hosts_up' in entry else ''
+            print(f"{entry['scan_id']}\t{entry.get('scan_type', '')}\t{entry.get('target', '')}\t"
+                  f"{entry.get('state', '')}\t{counts}")
+        return 0
+
+    if args.history_command == 'diff':
+        differences = catalog.diff(args.previous, args.current)
+        if differences is None:
+            print(f'错误：扫描不存在或没有结果: {args.previous} / {args.current}', file=sys.stderr)
+            return 1
+        print(json.dumps(differences, ensure_ascii=False, indent=2))
+        return 0
+
+    if args.history_command in ('show', 'export'):
+        entry = catalog.get(args.scan_id)
+        if not entry:
+            print(f'错误：扫描不存在: {args.scan_id}，索引丢失时可运行 history rebuild', file=sys.stderr)
+            return 1
+        if args.history_command == 'export':
+            output_file = args.output or f'{args.scan_id}.csv'
+            rows = catalog.export_csv(args.scan_id, output_file)
+            if rows < 0:
+                print(f"错误：扫描结果文件不存在或无法解析: {entry['xml_file']}", file=sys.stderr)
+                return 1
+            print(f'已导出 {rows} 行: {output_file}')
+            return 0
+        if args.log:
+            # 逐个文件输出，日志较大时不必整体读入内存
+            import shutil
+            from src.core.log_spool import LogSpool
+            for log_file in LogSpool.log_files(catalog.log_path(args.scan_id)):
+                with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
+                    shutil.copyfileobj(f, sys.stdout)
+            return 0
+        if args.json:
+            hosts = catalog.load_hosts(args.scan_id)
+            if hosts is None:
+                print(f"错误：扫描结果文件不存在或无法解析: {entry['xml_file']}", file=sys.stderr)
+                return 1
+            print(json.dumps({'scan_id': args.scan_id, 'xml_file': entry['xml_file'], 'hosts': hosts},
+                             ensure_ascii=False, indent=2))
+            return 0
+        return print_result(entry['xml_file'], entry.get('scan_type') or '默认扫描', False, args.scan_id)
+
+    print('用法: fastnmap history {list,show,diff,export,rebuild}', file=sys.stderr)
+    return 2
+
+
+def cmd_info(args) -> int:
+    """执行info子命令"""
+    import fnmatch
+    from src.core.command_builder import find_nmap_path, nmap_not_found_message
+    from src.core.nmap_capabilities import NmapCapabilities
+
+    capabilities = NmapCapabilities.probe(find_nmap_path(), refresh=args.refresh)
+    if not capabilities['found']:
+        print(nmap_not_found_message(), file=sys.stderr)
+        return 1
+
+    scripts = capabilities['scripts']
+    if args.scripts:
+        names = sorted(name for name, categories in scripts.items()
+                       if args.scripts in categories or fnmatch.fnmatch(name, args.scripts))
+        if args.json:
+            print(json.dumps({name: scripts[name] for name in names}, ensure_ascii=False, indent=2))
+        else:
+            for name in names:
+                print(f"{name}\t{','.join(scripts[name])}")
+        return 0
+
+    if args.json:
+        print(json.dumps(capabilities, ensure_ascii=False, indent=2))
+        return 0
+    print(f"nmap: {capabilities['path']}")
+    print(f"版本: {capabilities['version'] or '未知'}")
+    print(f"编译库: {' '.join(capabilities['compiled_with'])}")
+    print(f"支持的选项: {' '.join(option for option, supported in capabilities['features'].items() if supported)}")
+    print(f"不支持的选项: {' '.join(option for option, supported in capabilities['features'].items() if not supported)}")
+    if capabilities['script_db']:
+        counts = {}
+        for categories in scripts.values():
+            for category in categories:
+                counts[category] = counts.get(category, 0) + 1
+        print(f"NSE脚本: {len(scripts)} 个 ({capabilities['script_db']})")
+        print('类别: ' + ', '.join(f"{category}({counts[category]})" for category in sorted(counts)))
+    else:
+        print('NSE脚本: 未找到script.db')
+    return 0
+
+
+def cmd_monitor(args) -> int:
+    """执行monitor子命令"""
+    import time
+    from src.core.asset_monitor import AssetMonitor
+
+    monitor = AssetMonitor()
+    monitor.scan_progress.connect(lambda message: print(message, flush=True))
+    monitor.scan_error.connect(lambda message: print(f'错误: {message}', file=sys.stderr, flush=True))
+    monitor.host_differences.connect(
+        lambda name, differences: print(f'{name} 发现变化: {json.dumps(differences, ensure_ascii=False)}', flush=True))
+    monitor.scan_completed.connect(
+        lambda data: print(f"{data['target_name']} 本次变化: {json.dumps(data['differences'], ensure_ascii=False)}",
+                           flush=True))
+
+    targets = monitor.get_monitor_targets()
+    if args.monitor_command == 'list':
+        for name, config in targets.items():
+            status = '启用' if config.get('enabled', True) else '禁用'
+            interval = f"每 {config.get('interval_minutes', '')} 分钟"
+            if config.get('time_budget_minutes'):
+                interval += f"（限时 {config['time_budget_minutes']} 分钟）"
+            print(f"{name}\t{config.get('target', '')}\t{config.get('scan_type', '')}\t"
+                  f"{interval}\t{status}\t上次扫描: {config.get('last_scan_time', '无')}")
+        return 0
+
+    if args.monitor_command == 'run':
+        if args.name not in targets:
+            print(f'错误：监控目标不存在: {args.name}', file=sys.stderr)
+            return 1
+        monitor.run_scan(args.name)
+        return 0
+
+    if args.monitor_command == 'import':
+        if args.name not in targets:
+            print(f'错误：监控目标不存在: {args.name}', file=sys.stderr)
+            return 1
+        return 0 if monitor.import_results(args.name, args.file) else 1
+
+    if args.monitor_command == 'watch':
+        names = args.names or [name for name, config in targets.items() if config.get('enabled', True)]
+        started = [name for name in names if monitor.start_monitoring(name)]
+        if not started:
+            print('错误：没有可监控的目标', file=sys.stderr)
+            return 1
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            for name in started:
+                monitor.stop_monitoring(name, cancel_running=True)
+        return 0
+
+    print('用法: fastnmap monitor {list,run,watch,import}', file=sys.stderr)
+    return 2
+
+
+def cmd_report(args) -> int:
+    """执行report子命令"""
+    from src.core.asset_monitor import AssetMonitor
+    from src.core.html_report import HTMLReportGenerator
+
+    monitor = AssetMonitor()
+    history = monitor.get_target_history(args.name, 50)
+    if not history:
+        print(f'错误：该监控目标暂无历史数据: {args.name}', file=sys.stderr)
+        return 1
+
+    differences = {}
+    if len(history) >= 2:
+        differences = monitor._compare_with_previous(args.name, history[-1])
+
+    output_file = args.output or f'{args.name}_monitor_report.html'
+    if not HTMLReportGenerator().generate_monitor_report(args.name, history, differences, output_file):
+        return 1
+    print(f'监控报告已生成: {output_file}')
+    return 0
+
+
+def cmd_serve(args) -> int:
+    """执行serve子命令"""
+    from src.core.scan_manager import ScanManager
+    from src.core.api_server import ScanApiService
+
+    manager = ScanManager(base_dir=args.output_dir, max_concurrent=args.max_concurrent or None)
+    manager.start()
+    return run_server(ScanApiService(manager), args, 'FastNmap接口服务')
+
+
+def cmd_coordinator(args) -> int:
+    """执行coordinator子命令"""
+    from src.core.distributed import ShardCoordinator
+
+    coordinator = ShardCoordinator(args.output_dir, lease_timeout=args.lease_timeout, max_attempts=args.max_attempts)
+    return run_server(coordinator, args, 'FastNmap分布式协调节点')
+
+
+def run_server(service, args, title: str) -> int:
+    """
+    在前台运行HTTP服务直到Ctrl+C或SIGTERM
+
+    参数:
+        service: 接口服务（ScanApiService或ShardCoordinator）
+        args: 命令行参数，包含 host/port/token/quiet
+        title: 启动提示中的服务名称
+
+    返回:
+        退出码
+    """
+    import signal
+    import threading
+    from src.core.api_server import ScanApiServer
+
+    try:
+        server = ScanApiServer(service, args.host, args.port, args.token, args.quiet)
+    except OSError as e:
+        service.close()
+        print(f'错误：无法监听 {args.host}:{args.port}: {e}', file=sys.stderr)
+        return 1
+    except ValueError as e:
+        service.close()
+        print(f'错误：{e}', file=sys.stderr)
+        return 1
+
+    # 作为后台服务运行时通过SIGTERM停止；shutdown需要在serve_forever以外的线程调用
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+
+    host, port = server.server_address[:2]
+    print(f'{title}已启动: http://{host}:{port}/api/health', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def cmd_worker(args) -> int:
+    """执行worker子命令"""
+    import signal
+    from datetime import datetime
+    from src.core.scan_manager import ScanManager
+    from src.core.distributed import ShardWorker
+
+    worker = ShardWorker(args.coordinator, args.name, ScanManager(base_dir=args.output_dir), args.token)
+    worker.log_message.connect(lambda message: print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", flush=True))
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+        worker.manager.shutdown()
+    return 0
+
+
+COMMANDS = {
+    'scan': cmd_scan,
+    'parse': cmd_parse,
+    'history': cmd_history,
+    'info': cmd_info,
+    'monitor': cmd_monitor,
+    'report': cmd_report,
+    'serve': cmd_serve,
+    'coordinator': cmd_coordinator,
+    'worker': cmd_worker
+}
+
+
+def main(argv=None) -> int:
+    """
+    命令行主函数
+
+    参数:
+        argv: 命令行参数，默认为sys.argv[1:]
+
+    返回:
+        退出码
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return 2
+    configure_rate(args)
+    return COMMANDS[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,567 @@
+"""
+HTTP/JSON接口模块，以常驻服务的方式对外提供扫描提交、任务查询、事件获取和监控历史查询
+
+只使用标准库 http.server，默认仅监听本机地址。需要时可通过 token 要求客户端携带
+"Authorization: Bearer <token>" 请求头。未设置 token 时只接受 Host 为本机地址的请求；
+带请求体的请求必须是 application/json，Origin 与 Host 不一致的请求被拒绝，
+网页无法通过浏览器跨域提交扫描。扫描配置中的 params 不能包含读写服务器文件的选项。
+
+接口列表:
+    GET    /api/health                         服务状态
+    GET    /api/scans                          扫描任务列表
+    POST   /api/scans                          提交扫描，请求体为扫描配置，可含 priority
+    POST   /api/estimate                       预估扫描开销，请求体为扫描配置
+    GET    /api/scans/<scan_id>                扫描任务详情
+    DELETE /api/scans/<scan_id>                取消扫描
+    POST   /api/scans/<scan_id>/resume         继续中断的扫描
+    GET    /api/scans/<scan_id>/events         获取事件，参数 since=序号 & wait=最长等待秒数
+    GET    /api/scans/<scan_id>/result         获取解析后的扫描结果
+    GET    /api/resumable                      可以继续的扫描列表
+    GET    /api/queue                          任务队列的运行、暂停和等待情况
+    GET    /api/history                        历史扫描列表，参数 limit、scan_type、target
+    GET    /api/history/diff                   对比两次历史扫描，参数 previous、current
+    GET    /api/history/<scan_id>              历史扫描的结果
+    GET    /api/monitor/targets                监控目标列表
+    GET    /api/monitor/targets/<name>/history 监控历史，参数 limit=记录数
+"""
+
+import re
+import json
+import threading
+import ipaddress
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+
+from src.core.scan_manager import ScanManager, ScanJob
+from src.core.scan_events import ScanEvent
+from src.core.xml_tailer import load_hosts
+from src.core.rate_governor import get_rate_governor
+from src.core.cost_estimator import CostEstimator
+from src.core.job_queue import get_job_queue, PRIORITY_CLASSES
+from src.core.target_source import TargetSource
+
+
+DEFAULT_API_HOST = '127.0.0.1'
+DEFAULT_API_PORT = 8765
+
+# 每个任务在内存中保留的事件数量，超出后丢弃最早的事件
+MAX_BUFFERED_EVENTS = 10000
+
+# 获取事件时最长的等待时间（秒）
+MAX_EVENT_WAIT = 30.0
+
+# 请求体大小上限（字节）
+MAX_REQUEST_BODY = 1024 * 1024
+
+# 未设置访问令牌时允许的Host请求头（不含端口），防止DNS重绑定
+LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+# params 中不允许的选项：读取目标文件、继续扫描文件、自定义数据目录等会读写服务器上的任意文件
+FORBIDDEN_PARAM_OPTIONS = ('-iL', '--resume', '--excludefile', '--append-output', '--datadir', '--servicedb',
+                           '--versiondb', '--stylesheet', '--script-args-file')
+
+# params 中不允许的选项前缀，-oN/-oX/-oG/-oA/-oS/-oM 等输出选项会写入服务器上的任意文件
+FORBIDDEN_PARAM_PREFIXES = ('-o',)
+
+
+class ApiError(Exception):
+    """接口错误，携带HTTP状态码"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def dispatch_route(routes: List[Tuple], method: str, path: str, query: Dict,
+                   body: Optional[Dict]) -> Tuple[int, Dict]:
+    """
+    根据请求方法和路径调用路由表中对应的处理函数
+
+    参数:
+        routes: 路由表，元素为 (方法, 路径正则, 处理函数)，路径中的分组作为位置参数传入
+        method: HTTP方法
+        path: 请求路径
+        query: 查询参数字典
+        body: 请求体JSON
+
+    返回:
+        (HTTP状态码, 响应字典)
+    """
+    path_matched = False
+    for route_method, pattern, handler in routes:
+        match = re.fullmatch(pattern, path)
+        if not match:
+            continue
+        path_matched = True
+        if route_method == method:
+            args = [unquote(group) for group in match.groups()]
+            return handler(*args, query=query, body=body)
+    if path_matched:
+        raise ApiError(405, f'不支持的请求方法: {method}')
+    raise ApiError(404, f'接口不存在: {path}')
+
+
+class JobEventLog:
+    """
+    单个扫描任务的事件缓存
+
+    每个事件分配递增的序号，客户端用上次收到的最大序号继续获取，
+    没有新事件时可以等待，实现长轮询。
+    """
+
+    def __init__(self, max_events: int = MAX_BUFFERED_EVENTS):
+        """
+        初始化事件缓存
+
+        参数:
+            max_events: 最多保留的事件数量
+        """
+        self._events = deque(maxlen=max_events)
+        self._next_seq = 1
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def append(self, items: List[Dict]):
+        """
+        追加事件
+
+        参数:
+            items: 事件字典列表
+        """
+        with self._condition:
+            for item in items:
+                item['seq'] = self._next_seq
+                self._next_seq += 1
+                self._events.append(item)
+            self._condition.notify_all()
+
+    def close(self):
+        """任务结束后不再有新事件，唤醒所有等待的客户端"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def read(self, since: int = 0, wait: float = 0) -> Tuple[List[Dict], int, bool]:
+        """
+        读取序号大于since的事件
+
+        参数:
+            since: 客户端已收到的最大序号
+            wait: 没有新事件时最长等待的秒数
+
+        返回:
+            (事件列表, 当前最大序号, 是否已结束)
+        """
+        with self._condition:
+            if wait > 0 and not self._closed and self._next_seq - 1 <= since:
+                self._condition.wait_for(lambda: self._closed or self._next_seq - 1 > since, timeout=wait)
+            events = [event for event in self._events if event['seq'] > since]
+            return events, self._next_seq - 1, self._closed
+
+
+class ScanApiService:
+    """
+    接口处理逻辑，与HTTP传输分离
+
+    所有扫描通过同一个ScanManager执行，max_concurrent 限制同时运行的扫描数量，
+    多个客户端提交的扫描超出限制时排队等待。
+    """
+
+    def __init__(self, manager: Optional[ScanManager] = None, monitor=None):
+        """
+        初始化接口服务
+
+        参数:
+            manager: 扫描管理器
+            monitor: AssetMonitor资产监控对象，为None时首次查询监控数据时创建
+        """
+        self.manager = manager or ScanManager()
+        self._monitor = monitor
+        self._logs = {}  # scan_id -> JobEventLog
+        self._lock = threading.Lock()
+        self._routes = [
+            ('GET', r'/api/health', self.health),
+            ('GET', r'/api/scans', self.list_scans),
+            ('POST', r'/api/scans', self.submit_scan),
+            ('POST', r'/api/estimate', self.estimate_scan),
+            ('GET', r'/api/scans/([^/]+)', self.get_scan),
+            ('DELETE', r'/api/scans/([^/]+)', self.cancel_scan),
+            ('POST', r'/api/scans/([^/]+)/resume', self.resume_scan),
+            ('GET', r'/api/scans/([^/]+)/events', self.get_events),
+            ('GET', r'/api/scans/([^/]+)/result', self.get_result),
+            ('GET', r'/api/resumable', self.list_resumable),
+            ('GET', r'/api/queue', self.get_queue),
+            ('GET', r'/api/history', self.list_history),
+            ('GET', r'/api/history/diff', self.diff_history),
+            ('GET', r'/api/history/([^/]+)', self.get_history_result),
+            ('GET', r'/api/monitor/targets', self.list_monitor_targets),
+            ('GET', r'/api/monitor/targets/([^/]+)/history', self.get_monitor_history),
+        ]
+
+    @property
+    def monitor(self):
+        """资产监控对象，只用于查询，不会启动定时监控"""
+        if self._monitor is None:
+            from src.core.asset_monitor import AssetMonitor
+            self._monitor = AssetMonitor()
+        return self._monitor
+
+    def dispatch(self, method: str, path: str, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """根据请求方法和路径调用对应的处理函数"""
+        return dispatch_route(self._routes, method, path, query, body)
+
+    def health(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """服务状态"""
+        jobs = self.manager.list_jobs()
+        return 200, {
+            'status': 'ok',
+            'jobs': len(jobs),
+            'running': len(self.manager.running_jobs()),
+            'max_concurrent': self.manager.max_concurrent,
+            'rate': get_rate_governor().snapshot()
+        }
+
+    def list_scans(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """扫描任务列表，可用 state 参数过滤"""
+        state = query.get('state')
+        jobs = [job.to_dict() for job in self.manager.list_jobs() if not state or job.state == state]
+        return 200, {'scans': jobs}
+
+    def submit_scan(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """提交扫描"""
+        config = self._validate_config(body)
+        scan_id = self.manager.submit(config, self._on_events, self._on_state)
+        if not scan_id:
+            raise ApiError(400, '构建扫描命令失败，请检查扫描目标和参数')
+        return 201, self.manager.get_job(scan_id).to_dict()
+
+    def estimate_scan(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """预估扫描的探测数量、耗时和流量，不启动扫描"""
+        estimate = CostEstimator.estimate_config(self._validate_config(body))
+        if not estimate:
+            raise ApiError(400, '构建扫描命令失败，请检查扫描目标和参数')
+        return 200, estimate
+
+    def get_scan(self, scan_id: str, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """扫描任务详情"""
+        return 200, self._get_job(scan_id).to_dict()
+
+    def cancel_scan(self, scan_id: str, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """取消扫描"""
+        job = self._get_job(scan_id)
+        if not self.manager.cancel(scan_id):
+            raise ApiError(409, f'扫描已结束，无法取消: {job.state}')
+        return 202, {'scan_id': scan_id, 'cancelling': True}
+
+    def resume_scan(self, scan_id: str, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """继续中断的扫描"""
+        job = self.manager.get_job(scan_id)
+        if job and not job.is_finished:
+            raise ApiError(409, f'扫描正在运行: {scan_id}')
+        with self._lock:
+            self._logs.pop(scan_id, None)  # 继续扫描时重新开始事件序号
+        if not self.manager.resume(scan_id, self._on_events, self._on_state):
+            raise ApiError(409, f'没有可以继续的扫描: {scan_id}')
+        return 202, self.manager.get_job(scan_id).to_dict()
+
+    def get_events(self, scan_id: str, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """获取扫描事件"""
+        self._get_job(scan_id)
+        since = self._int_param(query, 'since', 0)
+        wait = min(float(self._int_param(query, 'wait', 0)), MAX_EVENT_WAIT)
+        events, last_seq, finished = self._event_log(scan_id).read(since, wait)
+        return 200, {'scan_id': scan_id, 'events': events, 'last_seq': last_seq, 'finished': finished}
+
+    def get_result(self, scan_id: str, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """获取解析后的扫描结果，扫描进行中返回已完成的主机"""
+        job = self._get_job(scan_id)
+        xml_files = [job.xml_file] if job.is_finished else [part['xml_file'] for part in job.parts]
+        hosts = []
+        for xml_file in xml_files:
+            hosts.extend(load_hosts(xml_file) or [])
+        return 200, {'scan_id': scan_id, 'state': job.state, 'xml_file': job.xml_file,
+                     'complete': job.is_finished, 'hosts': hosts}
+
+    def list_resumable(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """可以继续的扫描列表"""
+        checkpoints = self.manager.list_resumable()
+        return 200, {'scans': [{'scan_id': checkpoint['scan_id'],
+                                'state': checkpoint['state'],
+                                'target': checkpoint['config'].get('target', ''),
+                                'scan_type': checkpoint['config'].get('scan_type', ''),
+                                'created_time': checkpoint.get('created_time')}
+                               for checkpoint in checkpoints]}
+
+    def get_queue(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """任务队列的运行、暂停和等待情况"""
+        return 200, get_job_queue().snapshot()
+
+    def list_history(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """历史扫描列表，包括之前运行的服务和命令行的扫描，可用 scan_type、target、limit 参数过滤"""
+        limit = self._int_param(query, 'limit', 50)
+        return 200, {'scans': self.manager.catalog.list(limit, query.get('scan_type', ''), query.get('target', ''))}
+
+    def get_history_result(self, scan_id: str, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """历史扫描的结果，读取结果缓存，无需重新扫描"""
+        entry = self.manager.catalog.get(scan_id)
+        if not entry:
+            raise ApiError(404, f'扫描不存在: {scan_id}')
+        hosts = self.manager.catalog.load_hosts(scan_id)
+        if hosts is None:
+            raise ApiError(404, f'扫描没有结果: {scan_id}')
+        return 200, dict(entry, hosts=hosts)
+
+    def diff_history(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """对比两次历史扫描，参数 previous 和 current 为扫描ID"""
+        previous, current = query.get('previous', ''), query.get('current', '')
+        if not previous or not current:
+            raise ApiError(400, '缺少参数 previous 或 current')
+        differences = self.manager.catalog.diff(previous, current)
+        if differences is None:
+            raise ApiError(404, f'扫描不存在或没有结果: {previous} / {current}')
+        return 200, {'previous': previous, 'current': current, 'differences': differences}
+
+    def list_monitor_targets(self, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """监控目标列表"""
+        targets = []
+        for name, config in self.monitor.get_monitor_targets().items():
+            item = dict(config)
+            item['name'] = name
+            item['progress'] = self.monitor.get_scan_progress(name)
+            targets.append(item)
+        return 200, {'targets': targets}
+
+    def get_monitor_history(self, name: str, query: Dict, body: Optional[Dict]) -> Tuple[int, Dict]:
+        """监控历史"""
+        if name not in self.monitor.get_monitor_targets():
+            raise ApiError(404, f'监控目标不存在: {name}')
+        limit = self._int_param(query, 'limit', 10)
+        return 200, {'name': name, 'history': self.monitor.get_target_history(name, limit)}
+
+    def close(self):
+        """服务停止时取消所有扫描"""
+        self.manager.shutdown()
+
+    def _validate_config(self, body: Optional[Dict]) -> Dict:
+        """
+        检查并整理客户端提交的扫描配置
+
+        参数:
+            body: 请求体
+
+        返回:
+            扫描配置字典
+        """
+        if not isinstance(body, dict):
+            raise ApiError(400, '请求体必须是JSON对象')
+        if not isinstance(body.get('target'), str) or not body['target'].strip():
+            raise ApiError(400, '缺少扫描目标 target')
+        options = TargetSource.option_tokens(body['target'])
+        if options:
+            raise ApiError(400, f"target 中不允许使用选项: {', '.join(options)}")
+
+        # 客户端无法提交界面复选框，只接受可序列化的配置项
+        config = {key: value for key, value in body.items()
+                  if isinstance(value, (str, int, float, bool)) and key != 'port_checkboxes'}
+        config['port_checkboxes'] = []
+        config.setdefault('scan_type', '默认扫描')
+        config.pop('output_dir', None)  # 输出目录由管理器分配
+        config.pop('discovery_file', None)  # 不允许客户端指定服务器上的文件
+        config.pop('target_file', None)  # 大量目标直接放在target中，超过长度后自动分块扫描
+        config.pop('result_file', None)  # 结果通过接口获取，不允许写入服务器上的任意路径
+        if not isinstance(config.get('params', ''), str):
+            raise ApiError(400, '参数 params 必须是字符串')
+        forbidden = self.forbidden_params(config.get('params', ''))
+        if forbidden:
+            raise ApiError(400, f"params 中不允许使用: {', '.join(forbidden)}")
+        if config.setdefault('priority', PRIORITY_CLASSES[0]) not in PRIORITY_CLASSES:
+            raise ApiError(400, f"未知的优先级，可选: {', '.join(PRIORITY_CLASSES)}")
+
+        port_group = config.pop('port_group', '')
+        if port_group:
+            from src.utils.constants import PORT_GROUPS
+            if port_group not in PORT_GROUPS:
+                raise ApiError(400, f'未知的端口组: {port_group}')
+            config['port_input'] = ','.join(map(str, PORT_GROUPS[port_group]))
+        return config
+
+    @staticmethod
+    def forbidden_params(params: str) -> List[str]:
+        """
+        找出附加参数中会读写服务器文件的选项
+
+        参数:
+            params: 附加参数文本
+
+        返回:
+            不允许的选项列表
+        """
+        forbidden = []
+        tokens = params.split()
+        for index, param in enumerate(tokens):
+            option, _, value = param.partition('=')
+            if option in FORBIDDEN_PARAM_OPTIONS or option.startswith('-iL') \
+                    or (option.startswith(FORBIDDEN_PARAM_PREFIXES) and not option.startswith('--')):
+                forbidden.append(param)
+            elif option == '--script':
+                # 脚本名和类别可以使用，脚本文件路径会执行服务器上的任意文件
+                value = value or (tokens[index + 1] if index + 1 < len(tokens) else '')
+                if any(mark in value for mark in ('/', '\\', '.nse')):
+                    forbidden.append(f"--script {value}")
+        return forbidden
+
+    def _get_job(self, scan_id: str) -> ScanJob:
+        """获取扫描任务，不存在时返回404"""
+        job = self.manager.get_job(scan_id)
+        if not job:
+            raise ApiError(404, f'扫描不存在: {scan_id}')
+        return job
+
+    def _event_log(self, scan_id: str) -> JobEventLog:
+        """获取或创建任务的事件缓存"""
+        with self._lock:
+            if scan_id not in self._logs:
+                self._logs[scan_id] = JobEventLog()
+            return self._logs[scan_id]
+
+    def _on_events(self, scan_id: str, events: List[ScanEvent]):
+        """扫描事件回调，在扫描管理器的事件循环线程中调用"""
+        self._event_log(scan_id).append([{'type': event.type, 'data': event.data, 'line': event.line}
+                                         for event in events])
+
+    def _on_state(self, job: ScanJob):
+        """扫描状态回调，状态变化也作为事件发送"""
+        event_log = self._event_log(job.scan_id)
+        event_log.append([{'type': 'state', 'data': job.to_dict(), 'line': f'扫描状态: {job.state}'}])
+        if job.is_finished:
+            event_log.close()
+
+    @staticmethod
+    def _int_param(query: Dict, name: str, default: int) -> int:
+        """读取整数查询参数"""
+        value = query.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ApiError(400, f'参数 {name} 必须是整数')
+
+
+class ScanApiHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理，将请求转交给ScanApiService"""
+
+    server_version = 'FastNmapAPI/1.0'
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method: str):
+        """解析请求并发送JSON响应"""
+        try:
+            self._check_token()
+            self._check_origin()
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            status, payload = self.server.service.dispatch(method, url.path.rstrip('/') or '/', query,
+                                                           self._read_body())
+        except ApiError as e:
+            status, payload = e.status, {'error': e.message}
+        except Exception as e:
+            status, payload = 500, {'error': f'服务器内部错误: {str(e)}'}
+
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _check_token(self):
+        """校验访问令牌"""
+        token = self.server.token
+        if token and self.headers.get('Authorization', '') != f'Bearer {token}':
+            raise ApiError(401, '访问令牌无效')
+
+    def _check_origin(self):
+        """
+        拒绝来自网页的跨域请求：Origin 必须与 Host 一致；未设置令牌时 Host 必须是本机地址，
+        防止DNS重绑定后网页以本机身份访问接口
+        """
+        host = self.headers.get('Host', '')
+        if not self.server.token and urlparse(f'//{host}').hostname not in LOOPBACK_HOSTS:
+            raise ApiError(403, f'不接受的Host: {host}')
+        origin = self.headers.get('Origin')
+        if origin is not None and urlparse(origin).netloc != host:
+            raise ApiError(403, f'不接受跨域请求: {origin}')
+
+    def _read_body(self) -> Optional[Dict]:
+        """读取JSON请求体"""
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        if length > getattr(self.server.service, 'max_request_body', MAX_REQUEST_BODY):
+            raise ApiError(413, '请求体过大')
+        # 只接受JSON，浏览器发送JSON跨域请求前必须预检，本服务不响应预检，网页无法直接提交
+        content_type = self.headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if content_type != 'application/json':
+            raise ApiError(415, '请求体必须是 application/json')
+        try:
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            raise ApiError(400, '请求体不是有效的JSON')
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class ScanApiServer(ThreadingHTTPServer):
+    """
+    扫描接口HTTP服务，每个请求在独立线程中处理，长轮询不会阻塞其他客户端
+    """
+
+    daemon_threads = True
+
+    def __init__(self, service, host: str = DEFAULT_API_HOST, port: int = DEFAULT_API_PORT,
+                 token: str = '', quiet: bool = False):
+        """
+        初始化HTTP服务
+
+        参数:
+            service: 接口服务，提供 dispatch 和 close 方法（ScanApiService或ShardCoordinator）
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            token: 访问令牌，为空时不校验；监听非本机地址时必须设置
+            quiet: 是否不输出访问日志
+        """
+        if not token and not self.is_loopback(host):
+            raise ValueError(f'监听非本机地址 {host} 时必须设置访问令牌 --token')
+        super().__init__((host, port), ScanApiHandler)
+        self.service = service
+        self.token = token
+        self.quiet = quiet
+
+    @staticmethod
+    def is_loopback(host: str) -> bool:
+        """监听地址是否只有本机可以访问"""
+        if host in LOOPBACK_HOSTS:
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+
+    def server_close(self):
+        """关闭监听端口并停止接口服务"""
+        super().server_close()
+        self.service.close()
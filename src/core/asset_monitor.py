@@ -6,34 +6,63 @@ import os
 import json
 import time
 import threading
+import subprocess
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from PyQt5.QtCore import QObject, pyqtSignal, QTimer
+from src.core.callbacks import Signal
 from src.core.command_builder import NmapCommandBuilder
-from src.core.nmap_executor import NmapThread
+from src.core.scan_events import NmapEventParser, EventBatcher
+from src.core.scan_progress import ScanProgress
+from src.core.shard_executor import TargetSharder, NmapXmlMerger
+from src.core.xml_tailer import NmapXmlTailer, parse_host_element, host_result_event
+from src.core.process_supervisor import ProcessSupervisor, get_limits, DEFAULT_LIMITS
+from src.core.rate_governor import RateGovernor, get_rate_governor
+from src.core.timing_tuner import TimingObserver, TimingTuner
+from src.core.connect_scanner import ConnectScanner
+from src.core.discovery_import import DiscoveryImporter
+from src.core.scan_catalog import compare_hosts, compare_host_ports
+from src.core.scan_coalescer import ScanCoalescer
+from src.core.log_spool import LogSpool
+from src.core.pipe_reader import iter_line_batches
+from src.core.job_queue import get_job_queue, PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED
+from src.core.time_box import TimeBoxPlanner, MAX_TIME_BOX_HOSTS
 
 
-class AssetMonitor(QObject):
+class AssetMonitor:
     """
     资产监控类，负责定时扫描和结果比较
+    
+    不依赖Qt，信号回调在扫描线程中执行；图形界面通过QtAssetMonitor适配。
     """
-    # 信号定义
-    scan_completed = pyqtSignal(dict)  # 扫描完成信号
-    scan_progress = pyqtSignal(str)    # 扫描进度信号
-    scan_error = pyqtSignal(str)       # 扫描错误信号
     
     def __init__(self):
-        super().__init__()
+        # 信号定义
+        self.scan_completed = Signal()    # 扫描完成信号 (结果字典)
+        self.scan_progress = Signal()     # 扫描进度信号 (消息)
+        self.scan_error = Signal()        # 扫描错误信号 (消息)
+        self.scan_events = Signal()       # 扫描事件批次信号 (目标名称, 事件列表)
+        self.host_differences = Signal()  # 扫描过程中单个主机的差异信号 (目标名称, 差异字典)
+        
         self.monitor_configs = {}  # 监控配置存储
         self.monitor_results = {}  # 监控结果存储
         self.active_timers = {}    # 活动定时器存储
+        self.scan_progresses = {}  # 正在执行的扫描进度
+        self.active_processes = {} # 正在执行的nmap进程
+        self.cancelled_scans = set()  # 已请求取消的扫描
+        self.paused_scans = set()     # 被更高优先级的扫描暂停的扫描
+        self.expired_scans = set()    # 时间预算用完而停止的限时扫描
+        self.supervisor = ProcessSupervisor()
+        self.coalescer = ScanCoalescer()  # 同类扫描的目标和端口重叠时共享结果
         self.data_dir = "monitor_data"  # 数据存储目录
         
         # 确保数据目录存在
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
             
+        # 清理上次异常退出残留的nmap进程
+        self.supervisor.reap_orphans()
+            
         # 加载已保存的配置和结果
         self.load_configurations()
         
@@ -95,12 +124,7 @@ class AssetMonitor(QObject):
         self.stop_monitoring(target_name)
         
         # 创建新的定时器
-        timer = QTimer()
-        interval_ms = config['interval_minutes'] * 60 * 1000  # 转换为毫秒
-        timer.timeout.connect(lambda: self._perform_scan(target_name))
-        timer.start(interval_ms)
-        
-        self.active_timers[target_name] = timer
+        self._schedule_next(target_name, config['interval_minutes'] * 60)
         
         # 立即执行一次扫描
         self._perform_scan(target_name)
@@ -108,17 +132,74 @@ class AssetMonitor(QObject):
         self.scan_progress.emit(f"开始监控 {target_name}，间隔 {config['interval_minutes']} 分钟")
         return True
     
-    def stop_monitoring(self, target_name: str):
+    def stop_monitoring(self, target_name: str, cancel_running: bool = False):
         """
         停止监控指定目标
         
         参数:
             target_name: 监控目标名称
+            cancel_running: 是否同时终止正在执行的扫描
         """
         if target_name in self.active_timers:
-            self.active_timers[target_name].stop()
-            del self.active_timers[target_name]
+            self.active_timers.pop(target_name).cancel()
             self.scan_progress.emit(f"停止监控 {target_name}")
+        if cancel_running:
+            self.cancel_scan(target_name)
+    
+    def cancel_scan(self, target_name: str) -> bool:
+        """
+        取消目标正在执行的扫描
+        
+        参数:
+            target_name: 监控目标名称
+            
+        返回:
+            是否有扫描被取消
+        """
+        if target_name not in self.active_processes:
+            return False
+        process = self.active_processes[target_name]
+        if process is None:
+            # 仍在等待发包速率配额，等待循环检查到取消标记后退出
+            self.cancelled_scans.add(target_name)
+            return True
+        if process.poll() is not None:
+            return False
+        self.cancelled_scans.add(target_name)
+        self.supervisor.kill_group(process.pid)
+        return True
+    
+    def _schedule_next(self, target_name: str, interval: float):
+        """
+        安排下一次定时扫描
+        
+        参数:
+            target_name: 监控目标名称
+            interval: 扫描间隔（秒）
+        """
+        timer = threading.Timer(interval, self._on_timer, args=(target_name, interval))
+        timer.daemon = True
+        self.active_timers[target_name] = timer
+        timer.start()
+    
+    def _on_timer(self, target_name: str, interval: float):
+        """定时器触发时执行扫描并安排下一次"""
+        # 监控已停止或已被新的定时器替换
+        if self.active_timers.get(target_name) is not threading.current_thread():
+            return
+        self._schedule_next(target_name, interval)
+        self._perform_scan(target_name)
+    
+    def run_scan(self, target_name: str):
+        """
+        在当前线程中立即执行一次扫描，扫描结束后返回
+        
+        参数:
+            target_name: 监控目标名称
+        """
+        scan_config = self._build_scan_config(target_name, PRIORITY_INTERACTIVE)
+        if scan_config:
+            self._execute_scan_thread(target_name, scan_config)
     
     def _perform_scan(self, target_name: str):
         """
@@ -127,8 +208,33 @@ class AssetMonitor(QObject):
         参数:
             target_name: 监控目标名称
         """
-        if target_name not in self.monitor_configs:
+        scan_config = self._build_scan_config(target_name)
+        if not scan_config:
             return
+        
+        # 创建线程执行扫描
+        thread = threading.Thread(target=self._execute_scan_thread, args=(target_name, scan_config))
+        thread.daemon = True
+        thread.start()
+    
+    def _build_scan_config(self, target_name: str, priority: str = PRIORITY_SCHEDULED) -> Optional[Dict]:
+        """
+        根据监控配置生成扫描配置
+        
+        参数:
+            target_name: 监控目标名称
+            priority: 任务队列中的优先级类别，定时扫描为scheduled，手动执行为interactive
+            
+        返回:
+            扫描配置字典，目标不存在或上次扫描未结束时返回None
+        """
+        if target_name not in self.monitor_configs:
+            return None
+        
+        # 上次扫描未结束时跳过，避免同一目标的nmap进程堆积
+        if target_name in self.active_processes:
+            self.scan_progress.emit(f"{target_name} 上次扫描尚未结束，跳过本次扫描")
+            return None
             
         config = self.monitor_configs[target_name]
         
@@ -143,24 +249,36 @@ class AssetMonitor(QObject):
             'scan_type': config['scan_type'],
             'fast_mode': config.get('fast_mode', False),
             'port_input': config.get('ports', '80,443,22,21,25,53,110,993,995,143,993'),
-            'port_checkboxes': []
+            'port_checkboxes': [],
+            # 连接扫描只能通过端口应答判断存活，所有端口被过滤的主机会被误报为消失，因此需要在监控配置中开启
+            'connect_scan': config.get('connect_scan', False),
+            'priority': priority
         }
-        
-        # 创建线程执行扫描
-        thread = threading.Thread(target=self._execute_scan_thread, args=(target_name, scan_config))
-        thread.daemon = True
-        thread.start()
+        # 资源限制（最长运行时间、nice值、内存上限、停滞时间）
+        for key in DEFAULT_LIMITS:
+            if key in config:
+                scan_config[key] = config[key]
+        # 限时扫描：每次扫描最多运行的时间（秒），未完成的主机下次继续
+        if float(config.get('time_budget_minutes') or 0) > 0:
+            scan_config['time_budget'] = float(config['time_budget_minutes']) * 60
+        return scan_config
     
     def _execute_scan_thread(self, target_name: str, scan_config: Dict):
         """
         在线程中执行扫描
         
+        与其他监控目标正在执行或刚完成的同类扫描重叠时共享其结果，只扫描未覆盖的端口。
+        
         参数:
             target_name: 监控目标名称
             scan_config: 扫描配置
         """
+        plan = None
         try:
             self.scan_progress.emit(f"开始扫描 {target_name}...")
+            if scan_config.get('time_budget'):
+                # 从开始扫描时计时，排队和等待速率配额的时间同样计入预算
+                scan_config['deadline'] = time.time() + scan_config['time_budget']
             
             # 构建命令
             command = NmapCommandBuilder.build_command(scan_config)
@@ -178,50 +296,454 @@ class AssetMonitor(QObject):
                 if index + 1 < len(command):
                     command[index + 1] = output_file
             
-            # 执行扫描
-            import subprocess
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-            output = ""
-            
-            while True:
-                line = process.stdout.readline()
-                if line == '' and process.poll() is not None:
-                    break
-                if line:
-                    output += line
-            
-            return_code = process.wait()
-            
-            if return_code == 0 and os.path.exists(output_file):
-                # 解析结果
-                scan_result = self._parse_scan_result(output_file, target_name)
-                if scan_result:
-                    # 保存结果
-                    self._save_scan_result(target_name, scan_result)
-                    
-                    # 比较差异
-                    differences = self._compare_with_previous(target_name, scan_result)
-                    
-                    # 更新最后扫描时间
-                    self.monitor_configs[target_name]['last_scan_time'] = datetime.now().isoformat()
-                    self.save_configurations()
-                    
-                    # 发送完成信号
-                    self.scan_completed.emit({
-                        'target_name': target_name,
-                        'scan_result': scan_result,
-                        'differences': differences,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                    self.scan_progress.emit(f"扫描完成 {target_name}")
+            self.active_processes[target_name] = None  # 等待配额或共享的扫描期间同样视为正在扫描
+            if scan_config.get('time_budget'):
+                # 每次只扫描本轮剩余的部分主机，不与其他监控目标共享扫描
+                self._run_time_boxed(target_name, scan_config, command, output_file)
+                return
+            plan = self.coalescer.claim(target_name, command)
+            scan_file = output_file
+            if plan['shared']:
+                owners = ', '.join(sorted({entry['owner'] for entry in plan['shared']}))
+                if plan['ports'] is None:
+                    self.scan_progress.emit(f"{target_name} 与 {owners} 的扫描重叠，共享其结果")
                 else:
-                    self.scan_error.emit(f"解析扫描结果失败: {target_name}")
-            else:
-                self.scan_error.emit(f"扫描执行失败: {target_name}, 返回码: {return_code}")
+                    # 只扫描剩余端口，结果写入单独的文件，结束后与共享的结果合并
+                    self.scan_progress.emit(f"{target_name} 与 {owners} 的扫描重叠，只扫描剩余端口 {plan['ports']}")
+                    base, extension = os.path.splitext(output_file)
+                    scan_file = f"{base}.own{extension}"
+                    command[command.index('-p') + 1] = plan['ports']
+                    command[command.index('-oX') + 1] = scan_file
+                    scan_config = dict(scan_config, port_input=plan['ports'])
+            
+            if plan['entry']:
+                completed = self._run_scan(target_name, scan_config, command, scan_file)
+                self.coalescer.finish(plan['entry'], scan_file if completed else None)
+                if not completed:
+                    # 被取消、超时或失败时保留已完成的主机；部分结果不与其他监控目标共享
+                    if not plan['shared'] and self._salvage_partial(target_name, output_file):
+                        self._complete_scan(target_name, output_file, partial=True)
+                    return
+            
+            if plan['shared']:
+                stats = self.coalescer.collect(plan, scan_file if plan['entry'] else None, output_file,
+                                               cancelled=lambda: target_name in self.cancelled_scans)
+                if stats is None:
+                    if target_name in self.cancelled_scans:
+                        self.scan_progress.emit(f"已取消扫描 {target_name}")
+                    else:
+                        self.scan_error.emit(f"共享的扫描失败: {target_name}，下次扫描时重新执行")
+                    return
+            self._complete_scan(target_name, output_file)
                 
         except Exception as e:
             self.scan_error.emit(f"扫描异常: {target_name}, 错误: {str(e)}")
+        finally:
+            if plan and plan['entry'] and not plan['entry']['done'].is_set():
+                self.coalescer.finish(plan['entry'], None)
+            get_rate_governor().release(f"monitor:{target_name}")
+            get_job_queue().release(f"monitor:{target_name}")
+            self.paused_scans.discard(target_name)
+            self.expired_scans.discard(target_name)
+            self.scan_progresses.pop(target_name, None)
+            self.cancelled_scans.discard(target_name)
+            process = self.active_processes.pop(target_name, None)
+            if process is not None:
+                self.supervisor.unregister(process.pid)
+    
+    def _run_time_boxed(self, target_name: str, scan_config: Dict, command: List[str], output_file: str):
+        """
+        执行一次限时扫描：按历史价值排列本轮剩余的主机和端口，时间预算用完时停止，
+        已完成的主机作为结果保存，其余主机留到下一次扫描
+        
+        参数:
+            target_name: 监控目标名称
+            scan_config: 扫描配置，包含 time_budget 和 deadline
+            command: nmap命令，输出文件已指定为 output_file
+            output_file: XML结果文件路径
+        """
+        planner = TimeBoxPlanner(os.path.join(self.data_dir, f"{target_name}_timebox.json"))
+        plan = planner.plan(scan_config['target'], scan_config.get('port_input', ''),
+                            self.monitor_results.get(target_name, []))
+        budget_text = f"{scan_config['time_budget'] / 60:g} 分钟"
+        if plan is None:
+            self.scan_progress.emit(f"{target_name} 超过 {MAX_TIME_BOX_HOSTS} 台主机，不分批扫描，"
+                                    f"只在 {budget_text} 后停止")
+            if self._run_scan(target_name, scan_config, command, output_file):
+                self._complete_scan(target_name, output_file)
+            elif self._salvage_partial(target_name, output_file):
+                self._complete_scan(target_name, output_file, partial=True)
+            return
+        
+        # 本次扫描的主机按顺序写入目标文件，nmap通过 -iL 按文件中的顺序扫描
+        target_file = os.path.splitext(output_file)[0] + '.targets.txt'
+        with open(target_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(plan['hosts']) + '\n')
+        command[-3:-2] = ['-iL', target_file]
+        scan_config = dict(scan_config, target=' '.join(plan['hosts']), port_order=plan['port_order'])
+        if '-p' in command[:-3]:
+            command[command.index('-p') + 1] = plan['ports']
+            scan_config['port_input'] = plan['ports']
+        
+        cycle = "开始新的一轮" if plan['new_cycle'] else "继续本轮"
+        self.scan_progress.emit(f"{target_name} 限时扫描 {budget_text}，{cycle}，"
+                                f"剩余 {len(plan['hosts'])}/{plan['total']} 台主机")
+        
+        completed = self._run_scan(target_name, scan_config, command, output_file)
+        scan_result = None
+        if completed or self._salvage_partial(target_name, output_file):
+            scan_result = self._parse_scan_result(output_file, target_name)
+        if target_name not in self.monitor_configs:
+            return  # 监控目标已删除
+        
+        scanned = [host['ip'] for host in scan_result['hosts']] if scan_result else []
+        covered = planner.advance(plan, scanned, completed and scan_result is not None)
+        if scan_result:
+            # 一次扫描完成整轮时是完整结果，否则只包含本轮的一部分主机
+            partial = not (completed and plan['new_cycle'])
+            self._record_scan(target_name, scan_result, partial, covered)
+        remaining = len(plan['hosts']) - len(covered)
+        if remaining:
+            self.scan_progress.emit(f"{target_name} 本轮还剩 {remaining}/{plan['total']} 台主机，下次扫描继续")
+        else:
+            self.scan_progress.emit(f"{target_name} 本轮已扫描全部 {plan['total']} 台主机")
+    
+    def _run_scan(self, target_name: str, scan_config: Dict, command: List[str], output_file: str) -> bool:
+        """
+        申请发包速率后用TCP连接扫描或nmap执行扫描
+        
+        参数:
+            target_name: 监控目标名称
+            scan_config: 扫描配置
+            command: nmap命令，输出文件已指定为 output_file
+            output_file: XML结果文件路径
+            
+        返回:
+            扫描是否成功完成（取消、失败时为False）
+        """
+        # 从全局任务队列申请运行名额，界面发起的扫描等待时可暂停本扫描
+        queue = get_job_queue()
+        if not queue.acquire(
+                f"monitor:{target_name}", scan_config.get('priority', PRIORITY_SCHEDULED),
+                pause=lambda: self._pause_scan(target_name), resume=lambda: self._resume_scan(target_name),
+                cancelled=lambda: target_name in self.cancelled_scans,
+                on_wait=lambda: self.scan_progress.emit(f"{target_name} 任务队列已满，排队等待")):
+            self.scan_progress.emit(f"已取消扫描 {target_name}")
+            return False
+        
+        # 从全局发包速率预算中申请速率，多个监控目标同时触发时不会超出预算
+        governor = get_rate_governor()
+        rate = governor.acquire(
+            f"monitor:{target_name}", cancelled=lambda: target_name in self.cancelled_scans,
+            on_wait=lambda: self.scan_progress.emit(f"{target_name} 等待发包速率配额"))
+        if rate is None:
+            self.scan_progress.emit(f"已取消扫描 {target_name}")
+            return False
+        command = RateGovernor.apply_rate(command, rate)
+        
+        deadline = scan_config.get('deadline', 0)
+        if deadline and time.time() >= deadline:
+            self.scan_progress.emit(f"{target_name} 排队期间时间预算已用完，本次不扫描")
+            return False
+        
+        # 监控配置开启 connect_scan 时，少量主机和端口的默认扫描直接用TCP连接探测，不启动nmap
+        if ConnectScanner.is_suitable(scan_config):
+            return self._run_connect_scan(target_name, scan_config, output_file, rate)
+        
+        # 构建命令时已发现无法执行（缺少nmap、选项或脚本），不启动nmap
+        if scan_config.get('command_problems'):
+            self.scan_error.emit(f"{target_name}: {'; '.join(scan_config['command_problems'])}")
+            return False
+        
+        # 执行扫描，nmap在独立进程组中运行以便取消时一并终止
+        limits = get_limits(scan_config)
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   **self.supervisor.popen_kwargs(limits))
+        self.supervisor.apply_limits(process.pid, limits)
+        self.supervisor.register(process.pid, target_name, command)
+        self.active_processes[target_name] = process
+        # 原始输出写入与结果文件同名的日志文件，内存中只保留最近的若干行
+        log = LogSpool(os.path.splitext(output_file)[0] + '.log')
+        
+        # 将输出解析为结构化事件，按批次发送给订阅者
+        parser = NmapEventParser()
+        timing = TimingObserver()
+        started = time.time()
+        batcher = EventBatcher(lambda events: self.scan_events.emit(target_name, events))
+        progress = ScanProgress(TargetSharder.count_hosts(scan_config.get('target', '')), limits['stall_timeout'])
+        self.scan_progresses[target_name] = progress
+        watchdog = threading.Thread(target=self._watch_process,
+                                    args=(target_name, process, progress, limits, deadline))
+        watchdog.daemon = True
+        watchdog.start()
+        reported_percent = 0
+        
+        # 扫描过程中增量读取XML，已完成的主机立即与上次结果比较
+        tailer = NmapXmlTailer(output_file)
+        last_poll = time.time()
+        
+        # 按块读取二进制管道，每次读取得到的所有行作为一批解析，管道关闭即进程输出结束
+        for lines in iter_line_batches(process.stdout):
+            events = []
+            for line in lines:
+                log.write(line)
+                line = line.strip()
+                if not line:
+                    continue
+                event = parser.parse_line(line)
+                events.append(event)
+                timing.observe(line)
+                # 进度每增加10%发送一次进度消息
+                if progress.update(event) and not progress.finished:
+                    percent = int(progress.overall_percent())
+                    if percent >= reported_percent + 10:
+                        reported_percent = percent - percent % 10
+                        message = f"扫描 {target_name} 进度 {percent}%"
+                        if progress.remaining:
+                            message += f"，预计剩余 {progress.remaining}"
+                        self.scan_progress.emit(message)
+            batcher.extend(events)
+            
+            if time.time() - last_poll >= 1:
+                last_poll = time.time()
+                self._emit_host_results(target_name, tailer, batcher)
+        
+        return_code = process.wait()
+        log.close()
+        self._emit_host_results(target_name, tailer, batcher)
+        batcher.flush()
+        
+        if target_name in self.cancelled_scans:
+            self.scan_progress.emit(f"已取消扫描 {target_name}")
+        elif target_name in self.expired_scans:
+            pass  # 时间预算用完，停止时已发送消息
+        elif return_code == 0 and os.path.exists(output_file):
+            TimingTuner.record(output_file, timing, time.time() - started, scan_config.get('timing_tuned', False),
+                               TimingTuner.profile(command, scan_config.get('scan_type', '')))
+            return True
+        else:
+            message = f"扫描执行失败: {target_name}, 返回码: {return_code}"
+            if log.tail():
+                message += f", 最后输出: {log.tail()[-1]}"
+            self.scan_error.emit(message)
+        return False
+    
+    def import_results(self, target_name: str, discovery_file: str) -> bool:
+        """
+        导入masscan等外部工具的发现结果，作为监控目标的一次扫描记录并与上次结果比较
+        
+        参数:
+            target_name: 监控目标名称
+            discovery_file: 发现结果文件路径
+            
+        返回:
+            是否导入成功
+        """
+        if target_name not in self.monitor_configs:
+            self.scan_error.emit(f"监控目标不存在: {target_name}")
+            return False
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(self.data_dir, f"{target_name}_{timestamp}.xml")
+        try:
+            stats = DiscoveryImporter.write_xml(discovery_file, output_file)
+        except OSError as e:
+            self.scan_error.emit(f"读取发现结果失败: {str(e)}")
+            return False
+        self.scan_progress.emit(f"{target_name} 导入 {stats['hosts']} 台主机的 {stats['ports']} 个开放端口")
+        self._complete_scan(target_name, output_file)
+        return True
+    
+    def _run_connect_scan(self, target_name: str, scan_config: Dict, output_file: str, rate: int) -> bool:
+        """
+        用TCP连接扫描代替nmap，结果写入相同格式的XML文件
+        
+        参数:
+            target_name: 监控目标名称
+            scan_config: 扫描配置
+            output_file: XML输出文件路径
+            rate: 分配的发包速率，0表示不限制
+            
+        返回:
+            扫描是否完成（被取消时为False）
+        """
+        batcher = EventBatcher(lambda events: self.scan_events.emit(target_name, events))
+        progress = ScanProgress(TargetSharder.count_hosts(scan_config.get('target', '')))
+        self.scan_progresses[target_name] = progress
+        
+        def on_host(host_info):
+            batcher.add(host_result_event(host_info))
+            differences = self._compare_host_with_previous(target_name, host_info)
+            if any(differences.values()):
+                self.host_differences.emit(target_name, differences)
+        
+        # 限时扫描按历史上开放的次数排列端口，否则按端口号顺序
+        ports = scan_config.get('port_order') or ConnectScanner.parse_ports(scan_config.get('port_input', ''))
+        self.scan_progress.emit(f"{target_name} 使用TCP连接扫描 {len(ports)} 个端口")
+        deadline = scan_config.get('deadline', 0)
+        scanner = ConnectScanner(rate=rate)
+        hosts = scanner.run(scan_config['target'], ports, output_file, on_host,
+                            cancelled=lambda: target_name in self.cancelled_scans
+                            or bool(deadline and time.time() >= deadline))
+        batcher.flush()
+        progress.finished = True
+        if hosts is None:
+            if target_name in self.cancelled_scans:
+                self.scan_progress.emit(f"已取消扫描 {target_name}")
+            else:
+                self.scan_progress.emit(f"{target_name} 时间预算已用完，停止扫描")
+            return False
+        return True
+    
+    def _complete_scan(self, target_name: str, output_file: str, partial: bool = False):
+        """
+        解析扫描结果，保存并与上次结果比较后发送完成信号
+        
+        参数:
+            target_name: 监控目标名称
+            output_file: XML结果文件路径
+            partial: 扫描是否被中断，结果只包含已完成的主机
+        """
+        # 解析结果
+        scan_result = self._parse_scan_result(output_file, target_name)
+        if not scan_result:
+            self.scan_error.emit(f"解析扫描结果失败: {target_name}")
+            return
+        self._record_scan(target_name, scan_result, partial)
+    
+    def _record_scan(self, target_name: str, scan_result: Dict, partial: bool = False,
+                     covered: Optional[List[str]] = None):
+        """
+        保存扫描结果并与上次结果比较后发送完成信号
+        
+        参数:
+            target_name: 监控目标名称
+            scan_result: 解析后的扫描结果
+            partial: 结果是否只包含部分主机
+            covered: 部分结果实际扫描过的主机（包括未存活的主机），为None时按结果中的主机计算
+        """
+        if partial:
+            scan_result['partial'] = True
+        
+        # 保存结果
+        self._save_scan_result(target_name, scan_result)
+        
+        # 比较差异
+        differences = self._compare_with_previous(target_name, scan_result, covered)
+        
+        # 更新最后扫描时间
+        self.monitor_configs[target_name]['last_scan_time'] = datetime.now().isoformat()
+        self.save_configurations()
+        
+        # 发送完成信号
+        self.scan_completed.emit({
+            'target_name': target_name,
+            'scan_result': scan_result,
+            'differences': differences,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+        self.scan_progress.emit(f"扫描完成 {target_name}（部分结果）" if partial else f"扫描完成 {target_name}")
+    
+    def _salvage_partial(self, target_name: str, output_file: str) -> bool:
+        """
+        修复被中断的nmap XML结果，只保留已完整写入的主机
+        
+        参数:
+            target_name: 监控目标名称
+            output_file: XML结果文件路径，修复后原地覆盖
+            
+        返回:
+            是否有可以保存的主机
+        """
+        if target_name not in self.monitor_configs:
+            return False  # 监控目标已删除
+        try:
+            summary = NmapXmlMerger.merge([output_file], output_file, partial=True)
+        except OSError:
+            return False
+        if not summary or not summary['total']:
+            return False
+        self.scan_progress.emit(f"{target_name} 扫描未完成，保存已完成的 {summary['total']} 台主机作为部分结果")
+        return True
+    
+    def _pause_scan(self, target_name: str) -> bool:
+        """
+        暂停目标正在执行的nmap进程，为更高优先级的扫描让出名额
+        
+        参数:
+            target_name: 监控目标名称
+            
+        返回:
+            是否已暂停，nmap尚未启动或使用TCP连接扫描时返回False
+        """
+        process = self.active_processes.get(target_name)
+        if process is None or process.poll() is not None or not self.supervisor.suspend_group(process.pid):
+            return False
+        self.paused_scans.add(target_name)
+        self.scan_progress.emit(f"{target_name} 因高优先级扫描暂停")
+        return True
+    
+    def _resume_scan(self, target_name: str):
+        """
+        恢复被暂停的扫描
+        
+        参数:
+            target_name: 监控目标名称
+        """
+        self.paused_scans.discard(target_name)
+        process = self.active_processes.get(target_name)
+        if process is not None and process.poll() is None:
+            self.supervisor.resume_group(process.pid)
+            self.scan_progress.emit(f"{target_name} 已恢复扫描")
+    
+    def _watch_process(self, target_name: str, process: subprocess.Popen, progress: ScanProgress, limits: Dict,
+                       deadline: float = 0):
+        """
+        监控扫描进程的运行时间和输出，超限、停滞或时间预算用完时终止进程
+        
+        参数:
+            target_name: 监控目标名称
+            process: nmap进程
+            progress: 扫描进度模型
+            limits: 资源限制字典
+            deadline: 限时扫描的截止时间戳，0表示不限时
+        """
+        started = time.time()
+        while process.poll() is None:
+            time.sleep(1)
+            if process.poll() is not None:
+                return
+            if deadline and time.time() >= deadline:
+                # 截止时间按实际时间计算，暂停期间同样计入，保证每次扫描不超过预算
+                self.expired_scans.add(target_name)
+                self.scan_progress.emit(f"{target_name} 时间预算已用完，停止扫描")
+                self.supervisor.kill_group(process.pid)
+                return
+            if target_name in self.paused_scans:
+                # 暂停的时间不计入运行时间和停滞检测
+                started += 1
+                progress.last_activity = time.time()
+                continue
+            reason = self.supervisor.check_limits(started, progress, limits)
+            if reason:
+                self.scan_error.emit(f"{target_name} {reason}")
+                self.supervisor.kill_group(process.pid)
+                return
+    
+    def _emit_host_results(self, target_name: str, tailer: NmapXmlTailer, batcher: EventBatcher):
+        """
+        发送新完成的主机结果及其与上次扫描的差异
+        
+        参数:
+            target_name: 目标名称
+            tailer: XML增量解析器
+            batcher: 事件批处理器
+        """
+        for host_info in tailer.poll():
+            batcher.add(host_result_event(host_info))
+            differences = self._compare_host_with_previous(target_name, host_info)
+            if any(differences.values()):
+                self.host_differences.emit(target_name, differences)
     
     def _parse_scan_result(self, xml_file: str, target_name: str) -> Optional[Dict]:
         """
@@ -245,44 +767,7 @@ class AssetMonitor(QObject):
             }
             
             for host in root.findall('.//host'):
-                host_info = {'ip': '', 'ports': [], 'status': 'unknown'}
-                
-                # 获取IP地址
-                address = host.find('address')
-                if address is not None:
-                    host_info['ip'] = address.get('addr', '')
-                
-                # 获取主机状态
-                status = host.find('status')
-                if status is not None:
-                    host_info['status'] = status.get('state', 'unknown')
-                
-                # 获取端口信息
-                for port in host.findall('.//port'):
-                    port_info = {
-                        'port': port.get('portid', ''),
-                        'protocol': port.get('protocol', 'tcp'),
-                        'state': 'unknown',
-                        'service': 'unknown',
-                        'version': ''
-                    }
-                    
-                    # 端口状态
-                    port_state = port.find('state')
-                    if port_state is not None:
-                        port_info['state'] = port_state.get('state', 'unknown')
-                    
-                    # 服务信息
-                    service = port.find('service')
-                    if service is not None:
-                        port_info['service'] = service.attrib.get('name', 'unknown')
-                        port_info['version'] = service.attrib.get('version', '')
-                    else:
-                        port_info['service'] = 'unknown'
-                        port_info['version'] = ''
-                    
-                    host_info['ports'].append(port_info)
-                
+                host_info = parse_host_element(host)
                 result['hosts'].append(host_info)
             
             return result
@@ -316,13 +801,15 @@ class AssetMonitor(QObject):
         except Exception as e:
             self.scan_error.emit(f"保存结果文件失败: {str(e)}")
     
-    def _compare_with_previous(self, target_name: str, current_result: Dict) -> Dict:
+    def _compare_with_previous(self, target_name: str, current_result: Dict,
+                               covered: Optional[List[str]] = None) -> Dict:
         """
         与上次扫描结果比较
         
         参数:
             target_name: 目标名称
             current_result: 当前扫描结果
+            covered: 部分结果实际扫描过的主机，其中上次存在、本次没有的主机计为消失
             
         返回:
             差异字典
@@ -347,7 +834,7 @@ class AssetMonitor(QObject):
         
         # 获取上一次扫描结果（比较时要排除当前结果）
         if len(self.monitor_results[target_name]) >= 2:
-            previous_result = self.monitor_results[target_name][-2]  # 上一次的结果
+            previous_hosts = self._baseline_hosts(self.monitor_results[target_name][:-1])
         else:
             # 如果只有一次扫描，视为第一次扫描
             for host in current_result['hosts']:
@@ -358,52 +845,68 @@ class AssetMonitor(QObject):
                         differences['new_ports'].append(f"{host['ip']}:{port['port']}")
             return differences
         
-        # 构建主机和端口集合
-        current_hosts = {host['ip']: host for host in current_result['hosts']}
-        previous_hosts = {host['ip']: host for host in previous_result['hosts']}
-        
-        # 比较主机
-        current_host_ips = set(current_hosts.keys())
-        previous_host_ips = set(previous_hosts.keys())
-        
-        differences['new_hosts'] = list(current_host_ips - previous_host_ips)
-        differences['disappeared_hosts'] = list(previous_host_ips - current_host_ips)
+        if current_result.get('partial'):
+            # 部分结果中没有的主机尚未扫描，不能视为消失
+            scanned = {host['ip'] for host in current_result['hosts']}
+            scanned.update(covered or [])
+            previous_hosts = [host for host in previous_hosts if host['ip'] in scanned]
+        return compare_hosts(previous_hosts, current_result['hosts'])
+    
+    @staticmethod
+    def _baseline_hosts(results: List[Dict]) -> List[Dict]:
+        """
+        对比用的上次结果：最近一次完整扫描的主机，加上其后各次部分结果中已完成的主机
         
-        # 比较端口
-        for ip in current_host_ips & previous_host_ips:
-            current_host = current_hosts[ip]
-            previous_host = previous_hosts[ip]
-            
-            # 构建端口集合
-            current_ports = {f"{port['port']}/{port['protocol']}": port 
-                           for port in current_host['ports'] if port['state'] == 'open'}
-            previous_ports = {f"{port['port']}/{port['protocol']}": port 
-                            for port in previous_host['ports'] if port['state'] == 'open'}
-            
-            current_port_keys = set(current_ports.keys())
-            previous_port_keys = set(previous_ports.keys())
-            
-            # 新增端口
-            for port_key in current_port_keys - previous_port_keys:
-                differences['new_ports'].append(f"{ip}:{port_key}")
+        参数:
+            results: 历史扫描结果列表，从旧到新
             
-            # 消失端口
-            for port_key in previous_port_keys - current_port_keys:
-                differences['disappeared_ports'].append(f"{ip}:{port_key}")
+        返回:
+            主机信息列表
+        """
+        start = 0
+        for index in range(len(results) - 1, -1, -1):
+            if not results[index].get('partial'):
+                start = index
+                break
+        hosts = {}
+        for result in results[start:]:
+            for host in result['hosts']:
+                hosts[host['ip']] = host
+        return list(hosts.values())
+    
+    def _compare_host_with_previous(self, target_name: str, host_info: Dict) -> Dict:
+        """
+        将扫描过程中完成的单个主机与上次扫描结果比较
+        
+        参数:
+            target_name: 目标名称
+            host_info: 主机信息
             
-            # 服务变化
-            for port_key in current_port_keys & previous_port_keys:
-                current_port = current_ports[port_key]
-                previous_port = previous_ports[port_key]
-                
-                if current_port['service'] != previous_port['service'] or \
-                   current_port['version'] != previous_port['version']:
-                    differences['changed_services'].append({
-                        'host': ip,
-                        'port': port_key,
-                        'old_service': f"{previous_port['service']} {previous_port['version']}".strip(),
-                        'new_service': f"{current_port['service']} {current_port['version']}".strip()
-                    })
+        返回:
+            差异字典（不包含消失的主机，需等待扫描结束后判断）
+        """
+        differences = {
+            'new_hosts': [],
+            'new_ports': [],
+            'disappeared_ports': [],
+            'changed_services': []
+        }
+        
+        history = self.monitor_results.get(target_name)
+        if not history:
+            # 第一次扫描不产生实时差异，结束后统一报告
+            return differences
+        
+        ip = host_info['ip']
+        previous_host = next((host for host in self._baseline_hosts(history) if host['ip'] == ip), None)
+        if previous_host is None:
+            if host_info['status'] == 'up':
+                differences['new_hosts'].append(ip)
+            for port in host_info['ports']:
+                if port['state'] == 'open':
+                    differences['new_ports'].append(f"{ip}:{port['port']}/{port['protocol']}")
+        else:
+            compare_host_ports(ip, host_info, previous_host, differences)
         
         return differences
     
@@ -416,6 +919,19 @@ class AssetMonitor(QObject):
         """
         return self.monitor_configs
     
+    def get_scan_progress(self, target_name: str) -> Optional[Dict]:
+        """
+        获取目标当前扫描的进度
+        
+        参数:
+            target_name: 监控目标名称
+            
+        返回:
+            进度信息字典，目标未在扫描时返回None
+        """
+        progress = self.scan_progresses.get(target_name)
+        return progress.to_dict() if progress else None
+    
     def get_target_history(self, target_name: str, limit: int = 10) -> List[Dict]:
         """
         获取目标的历史扫描结果
@@ -445,7 +961,7 @@ class AssetMonitor(QObject):
         """
         try:
             # 停止监控
-            self.stop_monitoring(target_name)
+            self.stop_monitoring(target_name, cancel_running=True)
             
             # 删除配置和结果
             if target_name in self.monitor_configs:
@@ -453,10 +969,11 @@ class AssetMonitor(QObject):
             if target_name in self.monitor_results:
                 del self.monitor_results[target_name]
             
-            # 删除历史文件
-            result_file = os.path.join(self.data_dir, f"{target_name}_history.json")
-            if os.path.exists(result_file):
-                os.remove(result_file)
+            # 删除历史文件和限时扫描的进度
+            for file_name in (f"{target_name}_history.json", f"{target_name}_timebox.json"):
+                result_file = os.path.join(self.data_dir, file_name)
+                if os.path.exists(result_file):
+                    os.remove(result_file)
             
             # 保存配置
             self.save_configurations()
@@ -0,0 +1,56 @@
+"""
+回调模块，为核心功能提供不依赖Qt的信号机制
+"""
+
+import threading
+import traceback
+from typing import Callable
+
+
+class Signal:
+    """
+    简单的回调信号，接口与pyqtSignal的connect/emit一致
+
+    回调在emit所在的线程中同步执行；界面需要在主线程处理时，
+    由界面适配层把回调转发为Qt信号。
+    """
+
+    def __init__(self):
+        self._handlers = []
+        self._lock = threading.Lock()
+
+    def connect(self, handler: Callable):
+        """
+        连接回调函数
+
+        参数:
+            handler: 回调函数
+        """
+        with self._lock:
+            self._handlers.append(handler)
+
+    def disconnect(self, handler: Callable):
+        """
+        断开回调函数
+
+        参数:
+            handler: 回调函数
+        """
+        with self._lock:
+            if handler in self._handlers:
+                self._handlers.remove(handler)
+
+    def emit(self, *args):
+        """
+        调用所有回调函数，单个回调出错不影响其他回调
+
+        参数:
+            args: 传递给回调的参数
+        """
+        with self._lock:
+            handlers = list(self._handlers)
+        for handler in handlers:
+            try:
+                handler(*args)
+            except Exception:
+                traceback.print_exc()
@@ -6,6 +6,119 @@ import os
 import sys
 import shutil
 from src.utils.constants import PORT_GROUPS, OUTPUT_FORMAT_MAP
+from src.core.shard_executor import TargetSharder, get_default_shard_count
+from src.core.scan_progress import DEFAULT_STATS_INTERVAL
+from src.core.timing_tuner import TimingTuner
+from src.core.nmap_capabilities import NmapCapabilities
+from src.core.target_source import TargetSource, DEFAULT_CHUNK_HOSTS
+
+
+# 支持两阶段扫描的扫描类型：先用SYN扫描找出存活主机和开放端口，再只对这些端口执行耗时的识别和脚本
+PIPELINE_SCAN_TYPES = ('服务识别', '端口识别', '漏洞扫描', '暴力破解')
+
+# 第一阶段去掉的耗时参数
+PIPELINE_EXPENSIVE_OPTIONS = ('-sV', '-sC', '-A', '-O', '--version-all', '--version-light', '--osscan-guess')
+
+# 第一阶段去掉的带参数值的耗时选项（--script=xxx 形式按前缀去掉）
+PIPELINE_EXPENSIVE_VALUE_OPTIONS = ('--script', '--script-args', '--script-timeout', '--version-intensity')
+
+# 已找到的nmap路径，文件仍存在时不再重复查找
+_resolved_nmap_path = None
+
+def nmap_not_found_message():
+    """
+    获取未找到nmap可执行文件时的提示信息
+    
+    返回:
+        按操作系统区分的错误提示
+    """
+    if sys.platform == 'win32':
+        return "错误：系统中未找到nmap可执行文件，请确保nmap存在于nmap目录下（./nmap/nmap.exe）。"
+    elif sys.platform == 'darwin':
+        return "错误：系统中未找到nmap可执行文件。\n\n请使用以下方式安装nmap：\n1. 访问 https://nmap.org/download 下载 macOS 版本安装包\n2. 或使用Homebrew安装: brew install nmap\n"
+    return "错误：系统中未找到nmap可执行文件，请确保nmap已安装或存在于/usr/bin/nmap或/usr/local/bin/nmap位置。"
+
+
+def find_nmap_path():
+    """
+    查找nmap可执行文件路径，找到后缓存，之后只检查文件是否仍存在
+
+    返回:
+        nmap路径，找不到时返回各平台的默认位置（执行时会报错）
+    """
+    global _resolved_nmap_path
+    if _resolved_nmap_path and os.path.isfile(_resolved_nmap_path):
+        return _resolved_nmap_path
+
+    nmap_path = _locate_nmap_path()
+    resolved_path = shutil.which(nmap_path) if not os.path.dirname(nmap_path) else nmap_path
+    if resolved_path and os.path.isfile(resolved_path):
+        _resolved_nmap_path = nmap_path
+    return nmap_path
+
+
+def _locate_nmap_path():
+    """
+    按操作系统查找nmap可执行文件
+
+    返回:
+        nmap路径，找不到时返回各平台的默认位置
+    """
+    # 根据操作系统选择正确的nmap路径
+    if sys.platform == 'win32':
+        # 先检查相对路径是否存在
+        relative_nmap_path = '.\\nmap\\nmap.exe'
+        if os.path.isfile(relative_nmap_path) and os.access(relative_nmap_path, os.X_OK):
+            nmap_path = relative_nmap_path
+        else:
+            # 检查是否已在系统中安装
+            system_nmap = shutil.which('nmap')
+            if system_nmap:
+                nmap_path = system_nmap
+            else:
+                # 尝试常见安装位置
+                common_win_paths = [
+                    'C:\\Program Files (x86)\\Nmap\\nmap.exe',
+                    'C:\\Program Files\\Nmap\\nmap.exe'
+                ]
+                for path in common_win_paths:
+                    if os.path.isfile(path) and os.access(path, os.X_OK):
+                        nmap_path = path
+                        break
+                else:
+                    # 如果都找不到，还是用相对路径，后续可能会报错
+                    nmap_path = relative_nmap_path
+    elif sys.platform == 'darwin':
+        # macOS上的非常规处理
+        # 直接检查常见的nmap二进制路径
+        possible_paths = [
+            '/Applications/nmap.app/Contents/Resources/bin/nmap',  # 标准安装位置
+            '/usr/local/bin/nmap',  # homebrew安装位置
+            '/opt/homebrew/bin/nmap',  # M1/M2 Mac homebrew安装位置
+            '/usr/bin/nmap',  # 其他可能的系统位置
+        ]
+        
+        # 首先查找shutil.which找到的路径
+        system_nmap = shutil.which('nmap')
+        if system_nmap:
+            nmap_path = system_nmap
+        else:
+            # 如果找不到，逐个检查可能的路径
+            for path in possible_paths:
+                if os.path.isfile(path) and os.access(path, os.X_OK):
+                    nmap_path = path
+                    break
+            else:
+                # 如果所有路径都无效，默认使用系统命令
+                nmap_path = 'nmap'
+    else:  # Linux和其他系统
+        system_nmap = shutil.which('nmap')
+        if system_nmap:
+            nmap_path = system_nmap
+        else:
+            nmap_path = '/usr/bin/nmap'  # 大多数Linux系统的默认位置
+    return nmap_path
+
 
 class NmapCommandBuilder:
     """
@@ -25,7 +138,7 @@ class NmapCommandBuilder:
         """
         target = config.get('target', '')
         timeout = config.get('timeout', '')
-        threads_min = config.get('threads_min', '')
+        threads_min = str(config.get('threads_min') or 50)  # 接口或命令行未指定时与界面默认值一致
         threads_max = config.get('threads_max', '')
         params = config.get('params', '')
         result_file = config.get('result_file', '')
@@ -33,9 +146,10 @@ class NmapCommandBuilder:
         fast_mode = config.get('fast_mode', False)
         port_input = config.get('port_input', '')
         port_checkboxes = config.get('port_checkboxes', [])
+        stats_interval = config.get('stats_interval', DEFAULT_STATS_INTERVAL)
         
-        # 创建日志目录
-        logs_dir = 'logs'
+        # 创建日志目录（由ScanManager为每次扫描指定独立目录）
+        logs_dir = config.get('output_dir') or 'logs'
         if not os.path.exists(logs_dir):
             os.makedirs(logs_dir)
 
@@ -43,65 +157,17 @@ class NmapCommandBuilder:
         output_filename = f"{scan_type}_ScanCacheLog.xml"
         output_file_path = os.path.join(logs_dir, output_filename)
 
-        # 根据操作系统选择正确的nmap路径
-        if sys.platform == 'win32':
-            # 先检查相对路径是否存在
-            relative_nmap_path = '.\\nmap\\nmap.exe'
-            if os.path.isfile(relative_nmap_path) and os.access(relative_nmap_path, os.X_OK):
-                nmap_path = relative_nmap_path
-            else:
-                # 检查是否已在系统中安装
-                system_nmap = shutil.which('nmap')
-                if system_nmap:
-                    nmap_path = system_nmap
-                else:
-                    # 尝试常见安装位置
-                    common_win_paths = [
-                        'C:\\Program Files (x86)\\Nmap\\nmap.exe',
-                        'C:\\Program Files\\Nmap\\nmap.exe'
-                    ]
-                    for path in common_win_paths:
-                        if os.path.isfile(path) and os.access(path, os.X_OK):
-                            nmap_path = path
-                            break
-                    else:
-                        # 如果都找不到，还是用相对路径，后续可能会报错
-                        nmap_path = relative_nmap_path
-        elif sys.platform == 'darwin':
-            # macOS上的非常规处理
-            # 直接检查常见的nmap二进制路径
-            possible_paths = [
-                '/Applications/nmap.app/Contents/Resources/bin/nmap',  # 标准安装位置
-                '/usr/local/bin/nmap',  # homebrew安装位置
-                '/opt/homebrew/bin/nmap',  # M1/M2 Mac homebrew安装位置
-                '/usr/bin/nmap',  # 其他可能的系统位置
-            ]
-            
-            # 首先查找shutil.which找到的路径
-            system_nmap = shutil.which('nmap')
-            if system_nmap:
-                nmap_path = system_nmap
-            else:
-                # 如果找不到，逐个检查可能的路径
-                for path in possible_paths:
-                    if os.path.isfile(path) and os.access(path, os.X_OK):
-                        nmap_path = path
-                        break
-                else:
-                    # 如果所有路径都无效，默认使用系统命令
-                    nmap_path = 'nmap'
-        else:  # Linux和其他系统
-            system_nmap = shutil.which('nmap')
-            if system_nmap:
-                nmap_path = system_nmap
-            else:
-                nmap_path = '/usr/bin/nmap'  # 大多数Linux系统的默认位置
-                
+        nmap_path = find_nmap_path()
+
         cmd = [nmap_path, '--min-parallelism', threads_min]
         
         # 添加超时参数
         if timeout:
             cmd.extend(['--host-timeout', f'{timeout}s'])
+
+        # 定期输出统计信息用于计算真实进度（用户参数中已指定时不重复添加）
+        if stats_interval and '--stats-every' not in params.split():
+            cmd.extend(['--stats-every', str(stats_interval)])
             
         # 添加结果文件参数
         if result_file:
@@ -243,12 +309,214 @@ class NmapCommandBuilder:
                     if param not in cmd:
                         cmd.append(param)
 
+        # 按该子网的历史RTT和丢包统计调整时序参数（config中 adaptive_timing 为False时关闭），
+        # 用户指定的最小并行度和附加参数中的选项保持不变
+        if config.get('adaptive_timing', True):
+            timing_options = TimingTuner.recommend(target)
+            if timing_options:
+                protected = TimingTuner.user_options(params)
+                if config.get('threads_min'):
+                    protected.add('--min-parallelism')
+                cmd = TimingTuner.apply(cmd, timing_options, protected)
+                config['timing_tuned'] = True  # 扫描结束记录统计时用于评估调优效果
+
+        # 按已安装nmap的能力去掉不支持的自动参数，缺少的可执行文件、选项和脚本在启动前报告
+        capabilities = NmapCapabilities.probe(nmap_path)
+        cmd, problems = NmapCapabilities.adapt(cmd, params, capabilities)
+        if not capabilities['found']:
+            problems = [nmap_not_found_message()]
+        if problems:
+            config['command_problems'] = problems
+
         # 添加目标和输出文件参数
         cmd.append(target)
         cmd.extend(['-oX', output_file_path])
         
         return cmd
-    
+
+    @staticmethod
+    def build_shard_commands(config, shard_count=None):
+        """
+        根据配置构建分片扫描命令
+
+        参数:
+            config: 包含扫描配置的字典
+            shard_count: 分片数量，默认为CPU核心数
+
+        返回:
+            (分片命令列表, 分片XML文件列表, 合并后的XML文件路径)，目标无法拆分时返回None
+        """
+        base_cmd = NmapCommandBuilder.build_command(config)
+        if not base_cmd:
+            return None
+
+        # build_command 固定以 [目标, '-oX', 输出文件] 结尾
+        target = base_cmd[-3]
+        merged_file = base_cmd[-1]
+        options = base_cmd[:-3]
+
+        shards = TargetSharder.split_targets(target, shard_count or get_default_shard_count())
+        if not shards:
+            return None
+
+        merged_base, _ = os.path.splitext(merged_file)
+        commands = []
+        shard_files = []
+        for index, shard_targets in enumerate(shards):
+            shard_file = f"{merged_base}.shard{index + 1}.xml"
+            shard_options = NmapCommandBuilder._suffix_result_files(options, f"shard{index + 1}")
+            commands.append(shard_options + shard_targets + ['-oX', shard_file])
+            shard_files.append(shard_file)
+
+        return commands, shard_files, merged_file
+
+    @staticmethod
+    def build_chunk_commands(config, chunk_hosts=None):
+        """
+        根据配置构建按分块目标文件扫描的命令
+
+        目标文本和目标文件（config中的 target_file）流式读取并去重后写入扫描目录下的分块文件，
+        每个分块由一个nmap进程通过 -iL 读取，目标列表不需要放入内存和命令行。
+
+        参数:
+            config: 包含扫描配置的字典
+            chunk_hosts: 每个分块的最大主机数，默认为 DEFAULT_CHUNK_HOSTS
+
+        返回:
+            (分块命令列表, 分块XML文件列表, 分块目标文件列表, 合并后的XML文件路径, 目标统计字典)，
+            没有可扫描的目标时返回None
+        """
+        base_cmd = NmapCommandBuilder.build_command(config)
+        if not base_cmd:
+            return None
+
+        # build_command 固定以 [目标, '-oX', 输出文件] 结尾
+        target = base_cmd[-3]
+        merged_file = base_cmd[-1]
+        options = base_cmd[:-3]
+
+        target_file = config.get('target_file', '')
+        source = TargetSource(target, [target_file] if target_file else [])
+        stats = source.write_chunks(os.path.dirname(merged_file), chunk_hosts or DEFAULT_CHUNK_HOSTS)
+        if not stats['files']:
+            return None
+
+        merged_base, _ = os.path.splitext(merged_file)
+        commands = []
+        chunk_xml_files = []
+        for index, chunk_file in enumerate(stats['files']):
+            chunk_xml = f"{merged_base}.chunk{index + 1}.xml"
+            chunk_options = NmapCommandBuilder._suffix_result_files(options, f"chunk{index + 1}")
+            commands.append(chunk_options + ['-iL', chunk_file, '-oX', chunk_xml])
+            chunk_xml_files.append(chunk_xml)
+
+        return commands, chunk_xml_files, stats['files'], merged_file, stats
+
+    @staticmethod
+    def build_pipeline_commands(config):
+        """
+        根据配置构建两阶段扫描的第一阶段命令和第二阶段的公共参数
+
+        第一阶段去掉版本识别、系统识别和脚本，只用SYN扫描找出存活主机和开放端口；
+        第二阶段保留原扫描类型的全部参数，由 build_deep_command 按主机的开放端口生成。
+
+        参数:
+            config: 包含扫描配置的字典
+
+        返回:
+            (第一阶段命令, 第二阶段公共参数, 最终XML文件路径)，构建失败时返回None
+        """
+        base_cmd = NmapCommandBuilder.build_command(config)
+        if not base_cmd:
+            return None
+
+        # build_command 固定以 [目标, '-oX', 输出文件] 结尾
+        target = base_cmd[-3]
+        merged_file = base_cmd[-1]
+        options = base_cmd[:-3]
+
+        sweep_options = [options[0]]
+        deep_options = [options[0]]
+        index = 1
+        while index < len(options):
+            option = options[index]
+            has_value = index + 1 < len(options)
+            if option == '-p' and has_value:
+                # 第二阶段只扫描第一阶段发现的开放端口
+                sweep_options.extend(options[index:index + 2])
+                index += 2
+                continue
+            if option in OUTPUT_FORMAT_MAP.values() and has_value:
+                # 用户指定的结果文件只由第二阶段写入
+                deep_options.extend(options[index:index + 2])
+                index += 2
+                continue
+            deep_options.append(option)
+            if option in PIPELINE_EXPENSIVE_VALUE_OPTIONS and has_value:
+                deep_options.append(options[index + 1])
+                index += 2
+                continue
+            if option not in PIPELINE_EXPENSIVE_OPTIONS and not option.startswith('--script'):
+                sweep_options.append(option)
+            index += 1
+
+        # 用户参数中已指定其他TCP扫描方式时不再添加 -sS，两种TCP扫描方式不能同时使用
+        if not any(option in ('-sS', '-sT', '-sA', '-sW', '-sM', '-sN', '-sF', '-sX') for option in sweep_options):
+            sweep_options.append('-sS')
+        if '--open' not in sweep_options:
+            sweep_options.append('--open')
+        if not any(option.startswith('-T') for option in sweep_options):
+            sweep_options.append('-T4')
+        # 第二阶段的主机已确认存活，跳过主机发现
+        if '-Pn' not in deep_options:
+            deep_options.append('-Pn')
+
+        merged_base, _ = os.path.splitext(merged_file)
+        sweep_command = sweep_options + [target, '-oX', f"{merged_base}.sweep.xml"]
+        return sweep_command, deep_options, merged_file
+
+    @staticmethod
+    def build_deep_command(deep_options, hosts, ports, xml_file, index):
+        """
+        构建两阶段扫描的第二阶段命令
+
+        参数:
+            deep_options: build_pipeline_commands 返回的第二阶段公共参数
+            hosts: 开放端口相同的主机地址列表
+            ports: 这些主机的开放端口列表，元素为 (协议, 端口号)
+            xml_file: 本批次的XML输出文件路径
+            index: 批次序号，用于区分用户指定的结果文件
+
+        返回:
+            命令列表
+        """
+        options = NmapCommandBuilder._suffix_result_files(deep_options, f"deep{index}")
+        if any(protocol != 'tcp' for protocol, _ in ports):
+            prefixes = {'tcp': 'T:', 'udp': 'U:', 'sctp': 'S:'}
+            port_spec = ','.join(prefixes.get(protocol, 'T:') + port for protocol, port in ports)
+        else:
+            port_spec = ','.join(port for _, port in ports)
+        return options + ['-p', port_spec] + list(hosts) + ['-oX', xml_file]
+
+    @staticmethod
+    def _suffix_result_files(options, suffix):
+        """
+        为用户指定的结果文件添加后缀，避免多个进程写同一文件
+
+        参数:
+            options: nmap参数列表
+            suffix: 文件名后缀
+
+        返回:
+            新的参数列表
+        """
+        options = list(options)
+        for i, option in enumerate(options[:-1]):
+            if option in OUTPUT_FORMAT_MAP.values():
+                result_base, result_ext = os.path.splitext(options[i + 1])
+                options[i + 1] = f"{result_base}.{suffix}{result_ext}"
+        return options
+
     @staticmethod
     def _get_selected_ports(port_checkboxes):
         """
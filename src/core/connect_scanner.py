@@ -0,0 +1,286 @@
+"""
+TCP连接扫描模块，用asyncio直接探测少量主机的少量端口，省去启动nmap和解析XML的开销
+"""
+
+import socket
+import asyncio
+import ipaddress
+from typing import Callable, Dict, List, Optional
+
+from src.core.shard_executor import TargetSharder
+from src.core.xml_tailer import NmapXmlWriter
+
+
+# 同时进行的TCP连接数上限
+DEFAULT_CONNECT_CONCURRENCY = 256
+
+# 单次连接的超时时间（秒），超时的端口视为filtered
+DEFAULT_CONNECT_TIMEOUT = 1.5
+
+# 主机数×端口数不超过该值时才使用连接扫描，更大的范围仍交给nmap
+MAX_CONNECT_PROBES = 2048
+
+# 检查取消标记的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
+# 连接扫描可以等价实现的附加参数，出现其他参数时仍使用nmap
+CONNECT_COMPATIBLE_PARAMS = ('-v', '-vv', '-vvv', '-n', '-Pn', '--open', '-sS', '-sT',
+                             '-T0', '-T1', '-T2', '-T3', '-T4', '-T5')
+
+
+class ConnectScanner:
+    """
+    基于asyncio的TCP连接扫描器
+
+    每个端口发起一次TCP连接：连接成功为open，被拒绝为closed，超时或不可达为filtered。
+    每完成一台主机就写入与nmap格式相同的 -oX 文件，因此可以直接使用NmapXmlTailer、
+    NmapXmlMerger和资产监控的结果解析；返回的主机字典与 parse_host_element 相同。
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONNECT_CONCURRENCY, timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 rate: int = 0):
+        """
+        初始化连接扫描器
+
+        参数:
+            concurrency: 同时进行的连接数上限
+            timeout: 单次连接的超时时间（秒）
+            rate: 每秒发起的连接数上限，0表示不限制
+        """
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.rate = max(0, int(rate or 0))
+        self._semaphore = None
+        self._next_send = 0.0
+
+    @staticmethod
+    def is_suitable(config: Dict) -> bool:
+        """
+        判断扫描配置能否用连接扫描代替nmap
+
+        只适用于默认扫描（SYN扫描开放端口），端口和目标都明确且探测次数较少，
+        附加参数中没有连接扫描无法实现的选项；config中 connect_scan 为False时关闭。
+
+        参数:
+            config: 扫描配置字典（与NmapCommandBuilder.build_command相同）
+
+        返回:
+            是否可以使用连接扫描
+        """
+        if not config.get('connect_scan', True) or config.get('scan_type') != '默认扫描':
+            return False
+        if any(param not in CONNECT_COMPATIBLE_PARAMS for param in config.get('params', '').split()):
+            return False
+        ports = ConnectScanner.parse_ports(config.get('port_input', ''))
+        if not ports:
+            return False
+        return TargetSharder.count_hosts(config.get('target', '')) * len(ports) <= MAX_CONNECT_PROBES
+
+    @staticmethod
+    def parse_ports(port_spec: str) -> Optional[List[int]]:
+        """
+        解析nmap格式的端口参数
+
+        参数:
+            port_spec: 端口参数，如 80,443,8000-8100 或 T:80,U:53（UDP端口忽略）
+
+        返回:
+            去重排序后的TCP端口列表，格式无法识别时返回None
+        """
+        ports = set()
+        protocol = 'T'
+        for token in port_spec.replace(' ', '').split(','):
+            if not token:
+                continue
+            if len(token) > 2 and token[1] == ':':
+                protocol, token = token[0].upper(), token[2:]
+            if protocol != 'T':
+                continue
+            try:
+                if '-' in token:
+                    start, end = token.split('-', 1)
+                    ports.update(range(int(start), int(end) + 1))
+                else:
+                    ports.add(int(token))
+            except ValueError:
+                return None
+        if any(port < 1 or port > 65535 for port in ports):
+            return None
+        return sorted(ports)
+
+    @staticmethod
+    def expand_targets(target: str) -> List[str]:
+        """
+        将目标表达式展开为主机列表
+
+        参数:
+            target: 目标表达式，支持CIDR、单个IP、末段范围和域名
+
+        返回:
+            主机地址或域名列表
+        """
+        hosts = []
+        for block in TargetSharder._parse_blocks(target):
+            if isinstance(block, str):
+                hosts.append(block)
+            elif block.num_addresses == 1:
+                hosts.append(str(block.network_address))
+            else:
+                hosts.extend(str(address) for address in block)
+        return hosts
+
+    def run(self, target: str, ports: List[int], xml_file: str = '',
+            on_host: Optional[Callable[[Dict], None]] = None,
+            cancelled: Optional[Callable[[], bool]] = None) -> Optional[List[Dict]]:
+        """
+        在当前线程中执行扫描，扫描结束后返回
+
+        参数:
+            target: 目标表达式
+            ports: TCP端口列表
+            xml_file: nmap格式的XML输出文件，为空时不写文件
+            on_host: 每完成一台主机调用一次，参数为主机信息字典
+            cancelled: 返回True时停止扫描
+
+        返回:
+            主机信息字典列表，被取消时返回None
+        """
+        async def main():
+            task = asyncio.ensure_future(self.scan(target, ports, xml_file, on_host))
+            while not task.done():
+                await asyncio.wait([task], timeout=CANCEL_POLL_INTERVAL)
+                if cancelled and cancelled() and not task.done():
+                    task.cancel()
+            return task.result()
+
+        try:
+            return asyncio.run(main())
+        except asyncio.CancelledError:
+            return None
+
+    async def scan(self, target: str, ports: List[int], xml_file: str = '',
+                   on_host: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """
+        扫描目标的TCP端口，可直接在已有的事件循环中使用
+
+        参数:
+            target: 目标表达式
+            ports: TCP端口列表
+            xml_file: nmap格式的XML输出文件，为空时不写文件
+            on_host: 每完成一台主机调用一次，参数为主机信息字典
+
+        返回:
+            按完成顺序排列的主机信息字典列表，只包含存活主机
+        """
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._next_send = 0.0
+        hosts = self.expand_targets(target)
+        port_list = ','.join(str(port) for port in ports)
+        output = NmapXmlWriter(xml_file, f"connect -p {port_list} {target}", 'connect', port_list) if xml_file else None
+        results = []
+        down = 0
+
+        tasks = [asyncio.ensure_future(self._scan_host(host, ports)) for host in hosts]
+        try:
+            for future in asyncio.as_completed(tasks):
+                host_info = await future
+                if host_info['status'] != 'up':
+                    down += 1
+                    continue
+                results.append(host_info)
+                if output:
+                    output.write_host(host_info)
+                if on_host:
+                    on_host(host_info)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            if output:
+                output.close()  # 与被终止的nmap一样保留未写完的文件
+            raise
+
+        if output:
+            output.finish(len(results), down)
+        return results
+
+    async def _scan_host(self, host: str, ports: List[int]) -> Dict:
+        """
+        探测单台主机的所有端口
+
+        参数:
+            host: 主机地址或域名
+            ports: TCP端口列表
+
+        返回:
+            主机信息字典，有端口open或closed时为up
+        """
+        address = host
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            try:
+                infos = await asyncio.get_event_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+                address = infos[0][4][0]
+            except (OSError, IndexError):
+                return {'ip': host, 'ports': [], 'status': 'down'}
+
+        states = await asyncio.gather(*(self._probe(address, port) for port in ports))
+        host_info = {'ip': address, 'ports': [], 'status': 'down'}
+        for port, state in zip(ports, states):
+            if state != 'filtered':
+                host_info['status'] = 'up'  # 收到RST同样说明主机存活
+            if state == 'open':
+                host_info['ports'].append({
+                    'port': str(port),
+                    'protocol': 'tcp',
+                    'state': 'open',
+                    'service': self._service_name(port),
+                    'version': ''
+                })
+        return host_info
+
+    async def _probe(self, address: str, port: int) -> str:
+        """
+        对单个端口发起TCP连接
+
+        参数:
+            address: IP地址
+            port: 端口
+
+        返回:
+            端口状态: open、closed 或 filtered
+        """
+        async with self._semaphore:
+            await self._throttle()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+            except asyncio.TimeoutError:
+                return 'filtered'
+            except ConnectionRefusedError:
+                return 'closed'
+            except OSError:
+                return 'filtered'  # 网络或主机不可达
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return 'open'
+
+    async def _throttle(self):
+        """按速率上限均匀地发起连接"""
+        if not self.rate:
+            return
+        now = asyncio.get_event_loop().time()
+        send_at = max(now, self._next_send)
+        self._next_send = send_at + 1.0 / self.rate
+        if send_at > now:
+            await asyncio.sleep(send_at - now)
+
+    @staticmethod
+    def _service_name(port: int) -> str:
+        """按端口号查询服务名称，与nmap未做版本识别时的结果一致"""
+        try:
+            return socket.getservbyport(port, 'tcp')
+        except OSError:
+            return 'unknown'
@@ -0,0 +1,357 @@
+"""
+扫描开销预估模块，在启动扫描前估算探测包数量、耗时和带宽，并按历次扫描的吞吐量校准
+"""
+
+import os
+import json
+import math
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.core.command_builder import NmapCommandBuilder
+from src.core.shard_executor import TargetSharder, get_default_shard_count
+from src.core.rate_governor import get_rate_governor
+from src.core.target_source import TargetSource, DEFAULT_CHUNK_HOSTS
+
+
+# 吞吐量统计文件，按扫描配置记录每秒完成的探测数
+DEFAULT_THROUGHPUT_STATS_FILE = os.path.join('logs', 'throughput_stats.json')
+
+# 新样本在滑动平均中的权重
+THROUGHPUT_EWMA_WEIGHT = 0.3
+
+# 耗时少于该值（秒）的扫描不参与校准，启动开销占比过大
+MIN_CALIBRATION_SECONDS = 5
+
+# 预计耗时超过该值（秒）时给出警告和分片建议
+DURATION_WARNING_SECONDS = 3600
+
+# 探测数量超过该值时给出警告
+PROBE_WARNING_COUNT = 10000000
+
+# 建议的分片数量上限
+MAX_PROPOSED_SHARDS = 16
+
+# 未指定端口时nmap默认扫描的端口数量（-F 为100个）
+NMAP_DEFAULT_PORTS = 1000
+NMAP_FAST_PORTS = 100
+
+# 主机发现阶段每台主机的探测数（默认为ICMP echo、TCP 443 SYN、TCP 80 ACK、ICMP时间戳）
+DISCOVERY_PROBES_PER_HOST = 4
+
+# 单个探测的平均字节数（以太网帧，包含回应），用于估算带宽
+BYTES_PER_PROBE = 120
+
+# 没有历史统计时各时序模板每秒的探测数（粗略值，T0/T1按nmap的探测间隔计算）
+DEFAULT_PROBES_PER_SECOND = {0: 0.003, 1: 0.067, 2: 2.5, 3: 300, 4: 1000, 5: 3000}
+
+# 没有历史统计时各扫描类型相对于SYN扫描的速度系数（版本识别和脚本在开放端口上耗时较多）
+SCAN_TYPE_SPEED_FACTORS = {
+    '默认扫描': 1.0,
+    '存活扫描': 1.0,
+    '服务识别': 0.1,
+    '端口识别': 0.1,
+    '系统识别': 0.5,
+    '暴力破解': 0.01,
+    '漏洞扫描': 0.02
+}
+
+# 同一进程内多个扫描共享统计文件
+_throughput_lock = threading.Lock()
+
+
+class CostEstimator:
+    """
+    扫描开销预估器
+
+    展开目标和端口参数得到探测数量（主机数×端口数，加上主机发现的探测），
+    按时序模板、--min-rate/--max-rate 和全局发包速率预算确定速率，
+    有同类扫描的历史吞吐量时优先使用历史值。预计耗时过长时建议分片数量，
+    开放端口上的耗时较多的扫描类型同时建议使用两阶段扫描。
+    """
+
+    @staticmethod
+    def estimate(command: List[str], scan_type: str, target: str = '', shards: int = 1,
+                 stats_file: str = DEFAULT_THROUGHPUT_STATS_FILE, hosts: int = 0) -> Dict:
+        """
+        估算扫描开销
+
+        参数:
+            command: nmap命令（build_command 的结果，以 [目标, '-oX', 输出文件] 结尾）
+            scan_type: 扫描类型
+            target: 扫描目标表达式，为空时取命令中的目标
+            shards: 并行的nmap进程数（分片扫描）
+            stats_file: 吞吐量统计文件
+            hosts: 主机数，为0时按目标表达式统计（目标文件已统计过主机数时使用）
+
+        返回:
+            预估字典: hosts, ports, probes, probes_per_second, seconds, bytes, bits_per_second,
+            calibrated（是否来自历史统计）, warnings, proposed_shards
+        """
+        if not hosts:
+            target = target or (command[-3] if len(command) >= 3 else '')
+            hosts = TargetSharder.count_hosts(target)
+        ports = CostEstimator.count_ports(command)
+        probes = hosts * ports
+        if '-Pn' not in command:
+            probes += hosts * DISCOVERY_PROBES_PER_HOST
+
+        key = CostEstimator.profile_key(command, scan_type)
+        record = CostEstimator._load(stats_file).get(key)
+        calibrated = bool(record and record.get('probes_per_second'))
+        if calibrated:
+            rate = record['probes_per_second']
+        else:
+            rate = DEFAULT_PROBES_PER_SECOND[CostEstimator._timing_level(command)] \
+                * SCAN_TYPE_SPEED_FACTORS.get(scan_type, 1.0)
+
+        # 单个进程的速率受 --min-rate/--max-rate 限制，所有进程的总速率受全局发包预算限制
+        min_rate = CostEstimator._option_number(command, '--min-rate')
+        max_rate = CostEstimator._option_number(command, '--max-rate')
+        if min_rate and rate < min_rate and scan_type in ('默认扫描', '存活扫描'):
+            rate = min_rate  # --min-rate 只约束端口扫描的发包，不影响版本识别和脚本
+        if max_rate:
+            rate = min(rate, max_rate)
+        process_rate = rate
+        shards = max(1, int(shards or 1))
+        governor = get_rate_governor()
+        rate = process_rate * shards
+        if governor.enabled:
+            rate = min(rate, governor.budget)
+
+        seconds = probes / rate if rate > 0 else 0
+        total_bytes = probes * BYTES_PER_PROBE
+        estimate = {
+            'hosts': hosts,
+            'ports': ports,
+            'probes': probes,
+            'probes_per_second': round(rate, 3),
+            'shards': shards,
+            'seconds': round(seconds, 1),
+            'bytes': total_bytes,
+            'bits_per_second': int(rate * BYTES_PER_PROBE * 8),
+            'calibrated': calibrated,
+            'samples': record.get('samples', 0) if record else 0,
+            'warnings': [],
+            'proposed_shards': 0
+        }
+
+        if seconds > DURATION_WARNING_SECONDS:
+            estimate['warnings'].append(f"预计耗时 {CostEstimator.format_duration(seconds)}")
+            # 总速率已达到全局预算时分片不能缩短耗时
+            proposed = min(math.ceil(seconds / DURATION_WARNING_SECONDS) * shards, MAX_PROPOSED_SHARDS, max(hosts, 1))
+            if governor.enabled and process_rate > 0:
+                proposed = min(proposed, max(int(governor.budget / process_rate), 1))
+            if proposed > shards:
+                estimate['proposed_shards'] = proposed
+        if probes > PROBE_WARNING_COUNT:
+            estimate['warnings'].append(f"探测数量约 {probes:,} 个")
+        if estimate['warnings'] and scan_type in ('服务识别', '端口识别', '漏洞扫描', '暴力破解') and ports > 100:
+            estimate['warnings'].append("建议使用两阶段扫描，只对开放端口执行识别和脚本")
+        return estimate
+
+    @staticmethod
+    def estimate_config(config: Dict, stats_file: str = DEFAULT_THROUGHPUT_STATS_FILE) -> Optional[Dict]:
+        """
+        按扫描配置估算开销，不创建扫描目录也不启动扫描
+
+        参数:
+            config: 扫描配置字典（与NmapCommandBuilder.build_command相同）
+            stats_file: 吞吐量统计文件
+
+        返回:
+            预估字典，构建命令失败时返回None
+        """
+        command = NmapCommandBuilder.build_command(dict(config, output_dir=''))
+        if not command:
+            return None
+        shards = int(config.get('shard_count') or get_default_shard_count()) if config.get('shard_mode') else 1
+        hosts = 0
+        if config.get('target_file') or TargetSource.is_large(config.get('target', '')):
+            # 目标列表按分块扫描，最多同时运行的分块数与分片扫描相同
+            target_file = config.get('target_file', '')
+            hosts = TargetSource(command[-3], [target_file] if target_file else []).count()['hosts']
+            chunks = math.ceil(hosts / int(config.get('chunk_hosts') or DEFAULT_CHUNK_HOSTS))
+            shards = max(1, min(chunks, get_default_shard_count()))
+        estimate = CostEstimator.estimate(command, config.get('scan_type', ''), shards=shards,
+                                          stats_file=stats_file, hosts=hosts)
+        if hosts:
+            estimate['proposed_shards'] = 0  # 分块扫描不使用分片设置
+        return estimate
+
+    @staticmethod
+    def record(command: List[str], scan_type: str, target: str, elapsed: float,
+               stats_file: str = DEFAULT_THROUGHPUT_STATS_FILE, hosts: int = 0) -> bool:
+        """
+        将一次完成的扫描计入吞吐量统计
+
+        参数:
+            command: 扫描的nmap命令（分片扫描时任意一个分片的命令）
+            scan_type: 扫描类型
+            target: 整个扫描的目标表达式
+            elapsed: 扫描耗时（秒）
+            stats_file: 吞吐量统计文件
+            hosts: 主机数，为0时按目标表达式统计
+
+        返回:
+            是否已记录（耗时过短的扫描不记录）
+        """
+        if elapsed < MIN_CALIBRATION_SECONDS:
+            return False
+        hosts = hosts or TargetSharder.count_hosts(target)
+        probes = hosts * CostEstimator.count_ports(command)
+        if '-Pn' not in command:
+            probes += hosts * DISCOVERY_PROBES_PER_HOST
+        if not probes:
+            return False
+
+        rate = probes / elapsed
+        key = CostEstimator.profile_key(command, scan_type)
+        with _throughput_lock:
+            stats = CostEstimator._load(stats_file)
+            record = stats.get(key) or {'samples': 0}
+            old_rate = record.get('probes_per_second')
+            record['probes_per_second'] = round(rate if old_rate is None else
+                                                old_rate * (1 - THROUGHPUT_EWMA_WEIGHT) + rate * THROUGHPUT_EWMA_WEIGHT, 3)
+            record['samples'] += 1
+            record['updated'] = datetime.now().isoformat()
+            stats[key] = record
+            CostEstimator._save(stats, stats_file)
+        return True
+
+    @staticmethod
+    def count_ports(command: List[str]) -> int:
+        """
+        统计命令扫描的端口数量
+
+        参数:
+            command: nmap命令
+
+        返回:
+            端口数量，主机发现扫描（-sn）为0
+        """
+        if '-sn' in command:
+            return 0
+        if '-p' in command[:-1]:
+            count = 0
+            for token in command[command.index('-p') + 1].replace(' ', '').split(','):
+                if len(token) > 2 and token[1] == ':':
+                    token = token[2:]
+                if not token:
+                    continue
+                if '-' in token:
+                    start, end = token.split('-', 1)
+                    try:
+                        count += (int(end) if end else 65535) - (int(start) if start else 1) + 1
+                    except ValueError:
+                        count += 1  # 服务名称形式的端口
+                else:
+                    count += 1
+            return count
+        top_ports = CostEstimator._option_number(command, '--top-ports')
+        if top_ports:
+            return int(top_ports)
+        return NMAP_FAST_PORTS if '-F' in command else NMAP_DEFAULT_PORTS
+
+    @staticmethod
+    def profile_key(command: List[str], scan_type: str) -> str:
+        """
+        吞吐量统计的分类：扫描类型、是否UDP和时序模板
+
+        参数:
+            command: nmap命令
+            scan_type: 扫描类型
+
+        返回:
+            分类字符串
+        """
+        protocol = 'udp' if '-sU' in command else 'tcp'
+        return f"{scan_type}|{protocol}|T{CostEstimator._timing_level(command)}"
+
+    @staticmethod
+    def format_duration(seconds: float) -> str:
+        """
+        将秒数格式化为便于阅读的时长
+
+        参数:
+            seconds: 秒数
+
+        返回:
+            如 "2天3小时"、"1小时5分钟"、"30秒"
+        """
+        seconds = int(seconds)
+        days, seconds = divmod(seconds, 86400)
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        if days:
+            return f"{days}天{hours}小时"
+        if hours:
+            return f"{hours}小时{minutes}分钟"
+        if minutes:
+            return f"{minutes}分钟{seconds}秒"
+        return f"{seconds}秒"
+
+    @staticmethod
+    def format_estimate(estimate: Dict) -> str:
+        """
+        生成预估结果的文字说明
+
+        参数:
+            estimate: estimate 返回的预估字典
+
+        返回:
+            多行文字说明
+        """
+        source = f"根据 {estimate['samples']} 次同类扫描校准" if estimate['calibrated'] else "无历史数据，按默认速率估计"
+        lines = [
+            f"主机: {estimate['hosts']:,}，端口: {estimate['ports']:,}，探测: {estimate['probes']:,}",
+            f"预计耗时: {CostEstimator.format_duration(estimate['seconds'])}（{estimate['probes_per_second']:g} 探测/秒，{source}）",
+            f"预计流量: {estimate['bytes'] / 1024 / 1024:.1f} MB，约 {estimate['bits_per_second'] / 1000:.0f} kbps"
+        ]
+        lines.extend(f"警告: {warning}" for warning in estimate['warnings'])
+        if estimate['proposed_shards']:
+            speedup = estimate['proposed_shards'] / estimate['shards']
+            lines.append(f"建议: 分 {estimate['proposed_shards']} 片并行扫描，"
+                         f"预计 {CostEstimator.format_duration(estimate['seconds'] / speedup)}")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _timing_level(command: List[str]) -> int:
+        """命令中的时序模板级别，未指定时为3"""
+        for option in command:
+            if len(option) == 3 and option.startswith('-T') and option[2] in '012345':
+                return int(option[2])
+        return 3
+
+    @staticmethod
+    def _option_number(command: List[str], option: str) -> float:
+        """取出带数值参数的选项，未指定或无法解析时返回0"""
+        if option not in command[:-1]:
+            return 0
+        try:
+            return float(command[command.index(option) + 1])
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def _load(stats_file: str) -> Dict:
+        """读取吞吐量统计文件"""
+        if not os.path.exists(stats_file):
+            return {}
+        try:
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save(stats: Dict, stats_file: str):
+        """保存吞吐量统计文件"""
+        stats_dir = os.path.dirname(stats_file)
+        if stats_dir and not os.path.exists(stats_dir):
+            os.makedirs(stats_dir)
+        temp_file = stats_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, stats_file)
@@ -0,0 +1,294 @@
+"""
+外部发现结果导入模块，读取masscan等高速扫描工具的输出，作为nmap深度扫描的第一阶段
+"""
+
+import os
+import json
+import heapq
+import tempfile
+import ipaddress
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.core.xml_tailer import NmapXmlWriter
+
+
+# 逐行解析JSON时，跨行对象的最大缓冲长度（字节），超过后丢弃该对象
+MAX_RECORD_BUFFER = 1024 * 1024
+
+# 视为开放的端口状态
+OPEN_STATES = ('open', '')
+
+# 按地址排序时内存中最多保存的记录数，超过后分段排序写入临时文件再归并
+MAX_SORT_RECORDS = 200000
+
+# 一次归并的最多临时文件数，超过时先分组归并，避免同时打开过多文件
+MAX_MERGE_RUNS = 64
+
+
+class DiscoveryImporter:
+    """
+    外部发现结果导入器
+
+    支持以下格式，可混合出现，逐行流式读取，同一主机的同一端口只保留一次。
+    记录按地址排序后逐台主机输出，内存中最多保存 MAX_SORT_RECORDS 条记录，更多的记录
+    分段排序写入临时文件再归并，临时文件总大小与输入文件相当：
+    - masscan -oL: "open tcp 80 10.0.0.1 1700000000"
+    - masscan -oJ: JSON数组，每行一个主机对象 {"ip": ..., "ports": [{"port", "proto", "status"}]}
+    - masscan -oD 及其他工具的NDJSON: {"ip"/"host": ..., "port": ..., "proto"/"protocol": ...}
+    - 纯文本: "10.0.0.1:80" 或 "10.0.0.1 80"
+    """
+
+    @staticmethod
+    def iter_records(file_path: str) -> Iterator[Tuple[str, str, str, str]]:
+        """
+        逐条读取发现结果
+
+        参数:
+            file_path: 结果文件路径
+
+        返回:
+            (IP, 协议, 端口, 服务名称) 迭代器，服务名称未知时为空字符串
+        """
+        buffer = ''
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            for raw_line in f:
+                line = raw_line.strip().lstrip('[,').strip()
+                record = DiscoveryImporter._parse_json(line.rstrip(',]')) if line.startswith('{') else None
+                if buffer and record is None:
+                    # 跨行的JSON对象，超过缓冲上限仍不完整时丢弃
+                    buffer += line
+                    record = DiscoveryImporter._parse_json(buffer)
+                    if record is None:
+                        if len(buffer) > MAX_RECORD_BUFFER:
+                            buffer = ''
+                        continue
+                buffer = ''
+                if record is not None:
+                    yield from DiscoveryImporter._json_records(record)
+                    continue
+
+                line = line.rstrip(',]').strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('{'):
+                    buffer = raw_line.strip().lstrip('[,').strip()
+                    continue
+                finding = DiscoveryImporter._parse_text(line)
+                if finding:
+                    yield finding
+
+    @staticmethod
+    def iter_hosts(file_path: str, temp_dir: Optional[str] = None) -> Iterator[Dict]:
+        """
+        按地址顺序逐台读取去重后的发现结果
+
+        参数:
+            file_path: 结果文件路径
+            temp_dir: 排序用临时文件的目录，默认使用系统临时目录
+
+        返回:
+            主机信息字典迭代器，格式与资产监控的扫描结果相同
+        """
+        with tempfile.TemporaryDirectory(prefix='import_', dir=temp_dir) as work_dir:
+            yield from DiscoveryImporter._group_hosts(DiscoveryImporter._sorted_records(file_path, work_dir))
+
+    @staticmethod
+    def write_xml(file_path: str, xml_file: str) -> Dict:
+        """
+        将发现结果转换为nmap格式的XML文件，每台主机去重后立即写入
+
+        参数:
+            file_path: 发现结果文件路径
+            xml_file: 输出的XML文件路径
+
+        返回:
+            统计信息字典，包含hosts和ports数量
+        """
+        output_dir = os.path.dirname(os.path.abspath(xml_file))
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        with tempfile.TemporaryDirectory(prefix='.import_', dir=output_dir) as work_dir:
+            # 先读完输入再创建输出文件，输入无法读取时不留下不完整的XML
+            records = DiscoveryImporter._sorted_records(file_path, work_dir)
+            writer = NmapXmlWriter(xml_file, f"import {file_path}")
+            host_count = port_count = 0
+            for host_info in DiscoveryImporter._group_hosts(records):
+                writer.write_host(host_info)
+                host_count += 1
+                port_count += len(host_info['ports'])
+            writer.finish(host_count)
+        return {'hosts': host_count, 'ports': port_count}
+
+    @staticmethod
+    def _sorted_records(file_path: str, work_dir: str) -> Iterator[Tuple]:
+        """
+        读取全部记录并按 (地址, 协议, 端口) 排序
+
+        参数:
+            file_path: 结果文件路径
+            work_dir: 存放分段排序结果的临时目录
+
+        返回:
+            (IP版本, 地址整数, 协议, 端口, IP, 服务名称) 迭代器
+        """
+        runs = []
+        chunk = []
+        for ip, protocol, port, service in DiscoveryImporter.iter_records(file_path):
+            address = ipaddress.ip_address(ip)
+            chunk.append((address.version, int(address), protocol, int(port), ip, service))
+            if len(chunk) >= MAX_SORT_RECORDS:
+                chunk.sort()
+                runs.append(DiscoveryImporter._write_run(chunk, work_dir))
+                chunk = []
+        chunk.sort()
+        if not runs:
+            return iter(chunk)
+        if chunk:
+            runs.append(DiscoveryImporter._write_run(chunk, work_dir))
+        while len(runs) > MAX_MERGE_RUNS:
+            runs = [DiscoveryImporter._merge_runs(runs[i:i + MAX_MERGE_RUNS], work_dir)
+                    for i in range(0, len(runs), MAX_MERGE_RUNS)]
+        return heapq.merge(*[DiscoveryImporter._read_run(run) for run in runs])
+
+    @staticmethod
+    def _write_run(records: Iterable, work_dir: str) -> str:
+        """将已排序的记录写入临时文件，每行一条JSON，返回文件路径"""
+        fd, run_file = tempfile.mkstemp(suffix='.run', dir=work_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return run_file
+
+    @staticmethod
+    def _read_run(run_file: str) -> Iterator[Tuple]:
+        """逐条读取临时文件中的记录"""
+        with open(run_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield tuple(json.loads(line))
+
+    @staticmethod
+    def _merge_runs(run_files: List[str], work_dir: str) -> str:
+        """将多个临时文件归并为一个，删除原文件"""
+        merged = DiscoveryImporter._write_run(
+            heapq.merge(*[DiscoveryImporter._read_run(run) for run in run_files]), work_dir)
+        for run_file in run_files:
+            os.remove(run_file)
+        return merged
+
+    @staticmethod
+    def _group_hosts(records: Iterable[Tuple]) -> Iterator[Dict]:
+        """
+        将排序后的记录按主机分组并去重
+
+        参数:
+            records: _sorted_records 返回的记录
+
+        返回:
+            主机信息字典迭代器，端口按 (协议, 端口) 排列，同一端口有服务名称时保留服务名称
+        """
+        for _, group in groupby(records, key=lambda record: record[:2]):
+            ports = {}
+            for record in group:
+                ip, service = record[4], record[5]
+                if service or (record[2], record[3]) not in ports:
+                    ports[(record[2], record[3])] = service
+            yield {
+                'ip': ip,
+                'status': 'up',
+                'ports': [{
+                    'port': str(port),
+                    'protocol': protocol,
+                    'state': 'open',
+                    'service': service or 'unknown',
+                    'version': ''
+                } for (protocol, port), service in ports.items()]
+            }
+
+    @staticmethod
+    def _parse_json(text: str) -> Optional[Dict]:
+        """解析一个JSON对象，不完整或不是对象时返回None"""
+        try:
+            record = json.loads(text.rstrip(','))
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) else None
+
+    @staticmethod
+    def _json_records(record: Dict) -> Iterator[Tuple[str, str, str, str]]:
+        """
+        从JSON对象中取出开放端口
+
+        参数:
+            record: masscan -oJ 主机对象、-oD 记录或其他工具的单端口记录
+
+        返回:
+            (IP, 协议, 端口, 服务名称) 迭代器
+        """
+        ip = DiscoveryImporter._normalize_ip(record.get('ip') or record.get('host') or '')
+        if not ip:
+            return
+
+        if isinstance(record.get('ports'), list):
+            entries = record['ports']
+        elif 'port' in record:
+            # -oD 格式的状态放在data中，banner记录带有服务名称
+            data = record.get('data') if isinstance(record.get('data'), dict) else {}
+            entry = dict(record)
+            entry.setdefault('status', data.get('status', ''))
+            if record.get('rec_type') == 'banner':
+                entry['service'] = {'name': data.get('service_name', '')}
+            entries = [entry]
+        else:
+            return
+
+        for entry in entries:
+            if not isinstance(entry, dict) or entry.get('port') in (None, ''):
+                continue
+            if str(entry.get('status', '')).lower() not in OPEN_STATES:
+                continue
+            service = entry.get('service')
+            name = service.get('name', '') if isinstance(service, dict) else (service or '')
+            protocol = str(entry.get('proto') or entry.get('protocol') or 'tcp').lower()
+            try:
+                yield ip, protocol, str(int(entry['port'])), str(name)
+            except (TypeError, ValueError):
+                continue
+
+    @staticmethod
+    def _parse_text(line: str) -> Optional[Tuple[str, str, str, str]]:
+        """
+        解析masscan -oL 或 "IP:端口" 格式的一行
+
+        参数:
+            line: 去掉首尾空白的行
+
+        返回:
+            (IP, 协议, 端口, 服务名称)，无法识别或不是开放端口时返回None
+        """
+        fields = line.split()
+        try:
+            if len(fields) >= 4 and fields[0] in ('open', 'banner'):
+                # open tcp 80 10.0.0.1 1700000000；banner tcp 80 10.0.0.1 1700000000 http ...
+                ip = DiscoveryImporter._normalize_ip(fields[3])
+                service = fields[5] if fields[0] == 'banner' and len(fields) > 5 else ''
+                return (ip, fields[1].lower(), str(int(fields[2])), service) if ip else None
+            if len(fields) == 2:
+                ip, port = fields
+            elif len(fields) == 1 and ':' in line:
+                ip, port = line.rsplit(':', 1)
+                ip = ip.strip('[]')
+            else:
+                return None
+            ip = DiscoveryImporter._normalize_ip(ip)
+            return (ip, 'tcp', str(int(port)), '') if ip else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _normalize_ip(value: str) -> str:
+        """规范化IP地址，不是IP地址时返回空字符串"""
+        try:
+            return str(ipaddress.ip_address(str(value).strip()))
+        except ValueError:
+            return ''
@@ -0,0 +1,674 @@
+"""
+分布式扫描模块，协调节点将扫描拆分为分片租给多个工作节点执行，再合并各分片的XML结果
+
+协调节点通过HTTP/JSON接口（与ScanApiServer相同的传输层）提供服务:
+    POST   /api/jobs                        提交分布式扫描，请求体为扫描配置，可含 shard_count
+    GET    /api/jobs                        任务列表
+    GET    /api/jobs/<job_id>               任务详情（含各分片状态）
+    DELETE /api/jobs/<job_id>               取消任务
+    GET    /api/jobs/<job_id>/result        合并后的扫描结果
+    GET    /api/workers                     工作节点列表
+    POST   /api/workers                     注册工作节点
+    POST   /api/workers/<id>/heartbeat      心跳，返回需要取消的分片
+    POST   /api/workers/<id>/lease          租用一个待执行的分片
+    POST   /api/workers/<id>/complete       提交分片的XML结果
+    POST   /api/workers/<id>/fail           报告分片执行失败
+
+工作节点只接收分片目标和白名单内的配置项，按本机规则构建nmap命令，附加参数中白名单以外的选项被拒绝。
+租约在心跳中续期；工作节点超过租约时间没有心跳时视为失效，其分片重新排队，
+由其他工作节点执行。合并后的XML与单机扫描的输出一致，可直接由NmapOutputParser
+和AssetMonitor解析。
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import socket
+import threading
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.core.api_server import ApiError, dispatch_route
+from src.core.callbacks import Signal
+from src.core.command_builder import NmapCommandBuilder
+from src.core.shard_executor import NmapXmlMerger, TargetSharder, get_default_shard_count
+from src.core.xml_tailer import load_hosts
+from src.core.job_queue import PRIORITY_BACKFILL
+from src.core.process_supervisor import DEFAULT_LIMITS
+from src.core.target_source import TargetSource
+
+
+DEFAULT_COORDINATOR_PORT = 8766
+
+# 租约有效期（秒），工作节点超过该时间没有心跳时分片重新排队
+DEFAULT_LEASE_TIMEOUT = 60
+
+# 工作节点心跳间隔（秒）
+DEFAULT_HEARTBEAT_INTERVAL = 10
+
+# 单个分片最多执行次数，超过后整个任务失败
+DEFAULT_MAX_ATTEMPTS = 3
+
+# 分片状态
+SHARD_PENDING = 'pending'
+SHARD_LEASED = 'leased'
+SHARD_DONE = 'done'
+
+# 任务状态（与ScanManager一致）
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+# 工作节点接受的扫描配置项，nmap命令由工作节点按本机规则构建，协调节点无法指定文件路径
+WORKER_CONFIG_KEYS = ('target', 'scan_type', 'port_input', 'params', 'timeout', 'threads_min', 'threads_max',
+                      'fast_mode', 'stats_interval', 'adaptive_timing') + tuple(DEFAULT_LIMITS)
+
+# 附加参数中允许的不带值的长选项
+ALLOWED_FLAG_OPTIONS = frozenset((
+    '--open', '--reason', '--traceroute', '--version-light', '--version-all', '--osscan-limit', '--osscan-guess',
+    '--defeat-rst-ratelimit', '--randomize-hosts', '--system-dns', '--badsum', '--packet-trace'
+))
+
+# 附加参数中允许的带值选项，值为下一个参数或写作 --选项=值
+ALLOWED_VALUE_OPTIONS = frozenset((
+    '-p', '-g', '--top-ports', '--min-rate', '--max-rate', '--min-parallelism', '--max-parallelism',
+    '--max-retries', '--host-timeout', '--scan-delay', '--max-scan-delay', '--min-rtt-timeout',
+    '--max-rtt-timeout', '--initial-rtt-timeout', '--min-hostgroup', '--max-hostgroup', '--version-intensity',
+    '--script', '--script-args', '--script-timeout', '--stats-every', '--exclude-ports', '--data-length',
+    '--ttl', '--source-port', '--mtu'
+))
+
+# 附加参数中允许的短选项，如 -sV、-T4、-PS80,443、-Pn、-vvv
+ALLOWED_SHORT_OPTION_PATTERN = re.compile(r'^-(s[STUAWMNFXVnCYZO]|T[0-5]|P[SAUY][\d,\-]*|P[EPMOn]|v+|d+|[AOFnRr46f])$')
+
+# 选项值允许的字符，不含路径分隔符
+OPTION_VALUE_PATTERN = re.compile(r'^[\w.,:+=\-]+$')
+
+
+def check_params(params: str) -> List[str]:
+    """
+    按白名单检查分布式扫描的附加参数，工作节点不执行白名单以外的nmap选项
+
+    参数:
+        params: 附加参数文本
+
+    返回:
+        不允许的参数列表，全部允许时为空列表
+    """
+    rejected = []
+    tokens = params.split()
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        index += 1
+        option, has_value, value = token.partition('=')
+        if option in ALLOWED_VALUE_OPTIONS:
+            if not has_value:
+                value = tokens[index] if index < len(tokens) else ''
+                index += 1
+            if not OPTION_VALUE_PATTERN.match(value) or (option == '--script' and '.nse' in value):
+                rejected.append(f"{option} {value}".strip())
+        elif token not in ALLOWED_FLAG_OPTIONS and not ALLOWED_SHORT_OPTION_PATTERN.match(token):
+            rejected.append(token)
+    return rejected
+
+
+class ShardCoordinator:
+    """
+    分布式扫描协调节点
+
+    只负责分片的分配和结果合并，自身不运行nmap。所有状态由一把锁保护，
+    过期租约在每次请求时检查，不需要额外的后台线程。
+    """
+
+    # 分片结果以JSON字符串上传，允许较大的请求体
+    max_request_body = 256 * 1024 * 1024
+
+    def __init__(self, base_dir: str = os.path.join('logs', 'distributed'),
+                 lease_timeout: int = DEFAULT_LEASE_TIMEOUT,
+                 heartbeat_interval: int = DEFAULT_HEARTBEAT_INTERVAL,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        初始化协调节点
+
+        参数:
+            base_dir: 任务输出根目录，每个任务在其下创建独立子目录
+            lease_timeout: 租约有效期（秒）
+            heartbeat_interval: 建议工作节点使用的心跳间隔（秒）
+            max_attempts: 单个分片最多执行次数
+        """
+        self.base_dir = base_dir
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = min(heartbeat_interval, max(1, lease_timeout // 3))  # 租约期内至少心跳3次
+        self.max_attempts = max_attempts
+        self.jobs = {}     # job_id -> 任务字典
+        self.workers = {}  # worker_id -> 工作节点字典
+        self._lock = threading.Lock()
+        self._routes = [
+            ('GET', r'/api/health', self.health),
+            ('GET', r'/api/jobs', self.list_jobs),
+            ('POST', r'/api/jobs', self.submit_job),
+            ('GET', r'/api/jobs/([^/]+)', self.get_job),
+            ('DELETE', r'/api/jobs/([^/]+)', self.cancel_job),
+            ('GET', r'/api/jobs/([^/]+)/result', self.get_result),
+            ('GET', r'/api/workers', self.list_workers),
+            ('POST', r'/api/workers', self.register_worker),
+            ('POST', r'/api/workers/([^/]+)/heartbeat', self.heartbeat),
+            ('POST', r'/api/workers/([^/]+)/lease', self.lease_shard),
+            ('POST', r'/api/workers/([^/]+)/complete', self.complete_shard),
+            ('POST', r'/api/workers/([^/]+)/fail', self.fail_shard),
+        ]
+
+    def dispatch(self, method: str, path: str, query: Dict, body: Optional[Dict]):
+        """根据请求方法和路径调用对应的处理函数"""
+        return dispatch_route(self._routes, method, path, query, body)
+
+    def close(self):
+        """协调节点不运行nmap，停止时无需清理"""
+
+    def health(self, query: Dict, body: Optional[Dict]):
+        """服务状态"""
+        with self._lock:
+            self._expire_leases()
+            return 200, {'status': 'ok', 'role': 'coordinator', 'jobs': len(self.jobs),
+                         'workers': len(self.workers)}
+
+    def submit_job(self, query: Dict, body: Optional[Dict]):
+        """
+        提交分布式扫描
+
+        协调节点按本机规则构建一次命令，用于检查配置并按 shard_count 拆分目标；
+        工作节点收到分片目标和白名单内的配置项，按本机规则构建自己的命令。
+        """
+        if not isinstance(body, dict) or not isinstance(body.get('target'), str) or not body['target'].strip():
+            raise ApiError(400, '缺少扫描目标 target')
+
+        config = {key: value for key, value in body.items() if isinstance(value, (str, int, float, bool))}
+        config.setdefault('scan_type', '默认扫描')
+        config['port_checkboxes'] = []
+        config.pop('result_file', None)  # 工作节点上的结果文件无意义，只收集XML
+        rejected = check_params(str(config.get('params', '')))
+        if rejected:
+            raise ApiError(400, f"分布式扫描的 params 中不允许使用: {', '.join(rejected)}")
+        # 无法解析的目标会原样分配给工作节点，以 - 开头的部分会被nmap当作选项
+        options = TargetSource.option_tokens(config['target'])
+        if options:
+            raise ApiError(400, f"target 中不允许使用选项: {', '.join(options)}")
+        try:
+            shard_count = int(config.pop('shard_count', 0) or 0)
+        except (TypeError, ValueError):
+            raise ApiError(400, 'shard_count 必须是整数')
+
+        job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        output_dir = os.path.join(self.base_dir, job_id)
+        config['output_dir'] = output_dir
+        command = NmapCommandBuilder.build_command(config)
+        if not command:
+            raise ApiError(400, '构建扫描命令失败，请检查扫描目标和参数')
+
+        # build_command 固定以 [目标, '-oX', 输出文件] 结尾
+        target, xml_file = command[-3], command[-1]
+        shard_targets = TargetSharder.split_targets(target, shard_count or get_default_shard_count())
+        if not shard_targets:
+            raise ApiError(400, f'无法拆分扫描目标: {target}')
+
+        shards = [{
+            'index': index,
+            'targets': targets,
+            'state': SHARD_PENDING,
+            'worker_id': '',
+            'lease_expires': 0,
+            'attempts': 0,
+            'xml_file': f"{os.path.splitext(xml_file)[0]}.shard{index + 1}.xml",
+            'error': ''
+        } for index, targets in enumerate(shard_targets)]
+
+        job = {
+            'job_id': job_id,
+            'config': config,
+            'scan_type': config['scan_type'],
+            'target': config['target'],
+            'state': JOB_RUNNING,
+            'output_dir': output_dir,
+            'xml_file': xml_file,
+            'shards': shards,
+            'created_time': datetime.now().isoformat(),
+            'finished_time': None,
+            'summary': None,
+            'error': ''
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            return 201, self._job_info(job)
+
+    def list_jobs(self, query: Dict, body: Optional[Dict]):
+        """任务列表"""
+        with self._lock:
+            self._expire_leases()
+            return 200, {'jobs': [self._job_info(job, shards=False) for job in self.jobs.values()]}
+
+    def get_job(self, job_id: str, query: Dict, body: Optional[Dict]):
+        """任务详情"""
+        with self._lock:
+            self._expire_leases()
+            return 200, self._job_info(self._get_job(job_id))
+
+    def cancel_job(self, job_id: str, query: Dict, body: Optional[Dict]):
+        """取消任务，正在执行的分片在工作节点下次心跳时取消"""
+        with self._lock:
+            job = self._get_job(job_id)
+            if job['state'] != JOB_RUNNING:
+                raise ApiError(409, f"任务已结束，无法取消: {job['state']}")
+            self._finish_job(job, JOB_CANCELLED)
+            return 202, {'job_id': job_id, 'cancelling': True}
+
+    def get_result(self, job_id: str, query: Dict, body: Optional[Dict]):
+        """合并后的扫描结果，任务进行中返回已完成分片的主机"""
+        with self._lock:
+            job = self._get_job(job_id)
+            if job['state'] == JOB_COMPLETED:
+                xml_files = [job['xml_file']]
+            else:
+                xml_files = [shard['xml_file'] for shard in job['shards'] if shard['state'] == SHARD_DONE]
+            state = job['state']
+        hosts = []
+        for xml_file in xml_files:
+            hosts.extend(load_hosts(xml_file) or [])
+        return 200, {'job_id': job_id, 'state': state, 'xml_file': job['xml_file'],
+                     'complete': state == JOB_COMPLETED, 'hosts': hosts}
+
+    def list_workers(self, query: Dict, body: Optional[Dict]):
+        """工作节点列表"""
+        with self._lock:
+            self._expire_leases()
+            return 200, {'workers': [dict(worker, leases=sorted(worker['leases']))
+                                     for worker in self.workers.values()]}
+
+    def register_worker(self, query: Dict, body: Optional[Dict]):
+        """注册工作节点"""
+        name = (body or {}).get('name') or 'worker'
+        worker_id = f"{name}-{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            self.workers[worker_id] = {
+                'worker_id': worker_id,
+                'name': name,
+                'registered_time': datetime.now().isoformat(),
+                'last_heartbeat': time.time(),
+                'leases': set(),
+                'completed': 0
+            }
+        return 201, {'worker_id': worker_id, 'heartbeat_interval': self.heartbeat_interval,
+                     'lease_timeout': self.lease_timeout}
+
+    def heartbeat(self, worker_id: str, query: Dict, body: Optional[Dict]):
+        """
+        工作节点心跳，续期其持有的租约
+
+        返回:
+            cancel 为工作节点应停止执行的分片（任务已取消或分片已被其他节点完成）
+        """
+        with self._lock:
+            self._expire_leases()
+            worker = self._touch_worker(worker_id)
+            cancel = []
+            for lease_id in (body or {}).get('leases', []):
+                job, shard = self._find_shard(lease_id)
+                if shard and job['state'] == JOB_RUNNING and shard['state'] == SHARD_LEASED \
+                        and shard['worker_id'] == worker_id:
+                    shard['lease_expires'] = time.time() + self.lease_timeout
+                else:
+                    cancel.append(lease_id)
+                    worker['leases'].discard(lease_id)
+            return 200, {'cancel': cancel}
+
+    def lease_shard(self, worker_id: str, query: Dict, body: Optional[Dict]):
+        """租用一个待执行的分片，按任务提交顺序分配"""
+        with self._lock:
+            self._expire_leases()
+            worker = self._touch_worker(worker_id)
+            for job in self.jobs.values():
+                if job['state'] != JOB_RUNNING:
+                    continue
+                for shard in job['shards']:
+                    if shard['state'] != SHARD_PENDING:
+                        continue
+                    shard['state'] = SHARD_LEASED
+                    shard['worker_id'] = worker_id
+                    shard['attempts'] += 1
+                    shard['lease_expires'] = time.time() + self.lease_timeout
+                    lease_id = self._lease_id(job, shard)
+                    worker['leases'].add(lease_id)
+                    config = {key: value for key, value in job['config'].items() if key in WORKER_CONFIG_KEYS}
+                    config['target'] = ' '.join(shard['targets'])
+                    return 200, {'lease': {
+                        'lease_id': lease_id,
+                        'job_id': job['job_id'],
+                        'shard': shard['index'],
+                        'shard_count': len(job['shards']),
+                        'config': config,
+                        'lease_timeout': self.lease_timeout
+                    }}
+            return 200, {'lease': None}
+
+    def complete_shard(self, worker_id: str, query: Dict, body: Optional[Dict]):
+        """
+        接收分片的XML结果，全部分片完成后合并为任务结果
+
+        分片已被重新租给其他节点时，先到达的有效结果被采用，之后的结果被忽略。
+        """
+        body = body or {}
+        xml_text = body.get('xml')
+        if not isinstance(xml_text, str) or not xml_text:
+            raise ApiError(400, '缺少分片结果 xml')
+
+        with self._lock:
+            worker = self._touch_worker(worker_id)
+            lease_id = body.get('lease_id', '')
+            worker['leases'].discard(lease_id)
+            job, shard = self._find_job_shard(lease_id)
+            if job['state'] != JOB_RUNNING or shard['state'] == SHARD_DONE:
+                return 200, {'accepted': False}
+
+            if not os.path.exists(job['output_dir']):
+                os.makedirs(job['output_dir'])
+            # 只接受完整的结果文档，截断的上传不能算作完成的分片
+            try:
+                root = ET.fromstring(xml_text)
+            except ET.ParseError:
+                root = None
+            if root is None or root.tag != 'nmaprun' or root.find('runstats/finished') is None:
+                raise ApiError(400, '分片结果不是完整的nmap XML')
+            with open(shard['xml_file'], 'w', encoding='utf-8') as f:
+                f.write(xml_text)
+
+            shard['state'] = SHARD_DONE
+            shard['worker_id'] = worker_id
+            shard['error'] = ''
+            worker['completed'] += 1
+            if any(item['state'] != SHARD_DONE for item in job['shards']):
+                return 200, {'accepted': True}
+
+            # 最后一个分片：合并期间其他请求不会修改该任务，状态仍为运行中
+            shard_files = [item['xml_file'] for item in job['shards']]
+
+        summary = NmapXmlMerger.merge(shard_files, job['xml_file'])
+        with self._lock:
+            if job['state'] != JOB_RUNNING:  # 合并期间任务被取消
+                return 200, {'accepted': True}
+            job['summary'] = summary
+            if summary:
+                for shard_file in shard_files:
+                    if os.path.exists(shard_file):
+                        os.remove(shard_file)
+                self._finish_job(job, JOB_COMPLETED)
+            else:
+                job['error'] = '合并分片结果失败'
+                self._finish_job(job, JOB_FAILED)
+        return 200, {'accepted': True}
+
+    def fail_shard(self, worker_id: str, query: Dict, body: Optional[Dict]):
+        """分片执行失败，未超过最大次数时重新排队"""
+        body = body or {}
+        with self._lock:
+            worker = self._touch_worker(worker_id)
+            lease_id = body.get('lease_id', '')
+            worker['leases'].discard(lease_id)
+            job, shard = self._find_job_shard(lease_id)
+            if shard['state'] == SHARD_LEASED and shard['worker_id'] == worker_id:
+                self._release_shard(job, shard, body.get('error') or '工作节点报告执行失败')
+            return 200, {'accepted': True}
+
+    def _expire_leases(self):
+        """回收失效工作节点和过期租约的分片（调用时需持有锁）"""
+        now = time.time()
+        for worker_id, worker in list(self.workers.items()):
+            if now - worker['last_heartbeat'] > self.lease_timeout:
+                del self.workers[worker_id]
+
+        for job in self.jobs.values():
+            if job['state'] != JOB_RUNNING:
+                continue
+            for shard in job['shards']:
+                if shard['state'] == SHARD_LEASED and (shard['lease_expires'] < now
+                                                       or shard['worker_id'] not in self.workers):
+                    self._release_shard(job, shard, f"工作节点 {shard['worker_id']} 租约过期")
+
+    def _release_shard(self, job: Dict, shard: Dict, error: str):
+        """分片重新排队，超过最大执行次数时任务失败（调用时需持有锁）"""
+        worker = self.workers.get(shard['worker_id'])
+        if worker:
+            worker['leases'].discard(self._lease_id(job, shard))
+        shard['state'] = SHARD_PENDING
+        shard['worker_id'] = ''
+        shard['error'] = error
+        if shard['attempts'] >= self.max_attempts:
+            job['error'] = f"分片 {shard['index'] + 1} 执行 {shard['attempts']} 次均失败: {error}"
+            self._finish_job(job, JOB_FAILED)
+
+    def _finish_job(self, job: Dict, state: str):
+        """更新任务结束状态（调用时需持有锁）"""
+        job['state'] = state
+        job['finished_time'] = datetime.now().isoformat()
+        if not os.path.exists(job['output_dir']):
+            os.makedirs(job['output_dir'])
+        with open(os.path.join(job['output_dir'], 'job.json'), 'w', encoding='utf-8') as f:
+            json.dump(self._job_info(job), f, ensure_ascii=False, indent=2)
+
+    def _touch_worker(self, worker_id: str) -> Dict:
+        """更新工作节点心跳时间，未注册或已失效时返回404让工作节点重新注册"""
+        worker = self.workers.get(worker_id)
+        if not worker:
+            raise ApiError(404, f'工作节点未注册或已失效: {worker_id}')
+        worker['last_heartbeat'] = time.time()
+        return worker
+
+    def _get_job(self, job_id: str) -> Dict:
+        """获取任务，不存在时返回404"""
+        job = self.jobs.get(job_id)
+        if not job:
+            raise ApiError(404, f'任务不存在: {job_id}')
+        return job
+
+    def _find_shard(self, lease_id: str):
+        """根据租约ID查找任务和分片，不存在时返回 (None, None)"""
+        job_id, _, index = str(lease_id).rpartition(':')
+        job = self.jobs.get(job_id)
+        if not job or not index.isdigit() or int(index) >= len(job['shards']):
+            return None, None
+        return job, job['shards'][int(index)]
+
+    def _find_job_shard(self, lease_id: str):
+        """根据租约ID查找任务和分片，不存在时返回404"""
+        job, shard = self._find_shard(lease_id)
+        if shard is None:
+            raise ApiError(404, f'分片不存在: {lease_id}')
+        return job, shard
+
+    @staticmethod
+    def _lease_id(job: Dict, shard: Dict) -> str:
+        """租约ID，格式为 任务ID:分片序号"""
+        return f"{job['job_id']}:{shard['index']}"
+
+    @staticmethod
+    def _job_info(job: Dict, shards: bool = True) -> Dict:
+        """任务信息（调用时需持有锁）"""
+        done = sum(1 for shard in job['shards'] if shard['state'] == SHARD_DONE)
+        info = {key: job[key] for key in ('job_id', 'scan_type', 'target', 'state', 'output_dir', 'xml_file',
+                                          'created_time', 'finished_time', 'summary', 'error')}
+        info['shard_count'] = len(job['shards'])
+        info['shards_done'] = done
+        if shards:
+            info['shards'] = [{key: shard[key] for key in ('index', 'targets', 'state', 'worker_id',
+                                                           'attempts', 'error')}
+                              for shard in job['shards']]
+        return info
+
+
+class ShardWorker:
+    """
+    分布式扫描工作节点
+
+    循环向协调节点租用分片，使用本机的ScanManager执行（复用进程监管、停滞检测等），
+    执行期间按心跳间隔续期租约，完成后上传XML结果。
+    """
+
+    def __init__(self, coordinator_url: str, name: str = '', manager=None, token: str = '',
+                 poll_interval: float = 2.0):
+        """
+        初始化工作节点
+
+        参数:
+            coordinator_url: 协调节点地址，如 http://10.0.0.1:8766
+            name: 工作节点名称，默认为主机名
+            manager: 扫描管理器，默认在 logs/worker 下保存分片输出
+            token: 协调节点的访问令牌
+            poll_interval: 没有待执行分片时的轮询间隔（秒）
+        """
+        from src.core.scan_manager import ScanManager
+
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.name = name or socket.gethostname()
+        self.manager = manager or ScanManager(base_dir=os.path.join('logs', 'worker'))
+        self.token = token
+        self.poll_interval = poll_interval
+        self.worker_id = ''
+        self.heartbeat_interval = DEFAULT_HEARTBEAT_INTERVAL
+        self.log_message = Signal()  # 工作节点日志信号 (消息)
+        self.stop_event = threading.Event()
+
+    def run(self):
+        """执行分片直到调用stop"""
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    if not self.worker_id:
+                        self._register()
+                    lease = self._request('POST', f'/api/workers/{self.worker_id}/lease').get('lease')
+                except ApiError as e:
+                    if e.status == 404:
+                        self.worker_id = ''  # 协调节点重启或本节点已失效，重新注册
+                        continue
+                    self._log(f'协调节点返回错误: {e.message}')
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                except OSError as e:
+                    self._log(f'无法连接协调节点: {e}')
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+
+                if lease:
+                    self._run_lease(lease)
+                else:
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            self.manager.shutdown()
+
+    def stop(self):
+        """停止工作节点，正在执行的分片会被取消并由协调节点重新分配"""
+        self.stop_event.set()
+
+    def _register(self):
+        """向协调节点注册"""
+        response = self._request('POST', '/api/workers', {'name': self.name})
+        self.worker_id = response['worker_id']
+        self.heartbeat_interval = response.get('heartbeat_interval', DEFAULT_HEARTBEAT_INTERVAL)
+        self._log(f'已注册到协调节点 {self.coordinator_url}，节点ID: {self.worker_id}')
+
+    def _run_lease(self, lease: Dict):
+        """
+        执行租到的分片并上报结果
+
+        参数:
+            lease: 协调节点返回的租约信息
+        """
+        lease_id = lease['lease_id']
+        self._log(f"开始执行分片 {lease['shard'] + 1}/{lease['shard_count']} ({lease['job_id']})")
+        finished = threading.Event()
+        # 只使用白名单内的配置项，按本机规则构建命令；附加参数中有白名单以外的选项或目标像选项时拒绝执行
+        config = {key: value for key, value in lease['config'].items() if key in WORKER_CONFIG_KEYS}
+        rejected = check_params(str(config.get('params', '')))
+        rejected += TargetSource.option_tokens(str(config.get('target', '')))
+        scan_id = None
+        if not rejected:
+            # 分片扫描是补充性的后台任务，本机有界面或定时扫描时让出运行名额
+            config['priority'] = PRIORITY_BACKFILL
+            scan_id = self.manager.submit(config, on_state=lambda job: job.is_finished and finished.set())
+        if not scan_id:
+            error = f"拒绝执行的参数或目标: {', '.join(rejected)}" if rejected else '构建扫描命令失败'
+            self._log(f'分片失败: {lease_id} {error}')
+            try:
+                self._request('POST', f'/api/workers/{self.worker_id}/fail', {'lease_id': lease_id, 'error': error})
+            except (ApiError, OSError) as e:
+                self._log(f'上报分片结果失败: {e}')
+            return
+
+        cancelled = False
+        while not finished.wait(self.heartbeat_interval):
+            if self.stop_event.is_set():
+                self.manager.cancel(scan_id)
+                continue
+            try:
+                response = self._request('POST', f'/api/workers/{self.worker_id}/heartbeat', {'leases': [lease_id]})
+            except (ApiError, OSError) as e:
+                self._log(f'心跳失败: {e}')
+                continue
+            if lease_id in response.get('cancel', []):
+                cancelled = True
+                self.manager.cancel(scan_id)
+
+        job = self.manager.get_job(scan_id)
+        if cancelled or self.stop_event.is_set():
+            self._log(f'分片已取消: {lease_id}')
+            return
+
+        try:
+            if job.state == 'completed':
+                with open(job.xml_file, 'r', encoding='utf-8') as f:
+                    xml_text = f.read()
+                self._request('POST', f'/api/workers/{self.worker_id}/complete',
+                              {'lease_id': lease_id, 'xml': xml_text})
+                self._log(f'分片完成: {lease_id}')
+            else:
+                self._request('POST', f'/api/workers/{self.worker_id}/fail',
+                              {'lease_id': lease_id, 'error': job.error or job.state})
+                self._log(f'分片失败: {lease_id} {job.error}')
+        except (ApiError, OSError) as e:
+            # 上报失败时租约会过期，由协调节点重新分配
+            self._log(f'上报分片结果失败: {e}')
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None) -> Dict:
+        """
+        向协调节点发送请求
+
+        参数:
+            method: HTTP方法
+            path: 接口路径
+            body: 请求体
+
+        返回:
+            响应字典，HTTP错误时抛出ApiError
+        """
+        data = json.dumps(body or {}, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        request = urllib.request.Request(self.coordinator_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8')).get('error', str(e))
+            except ValueError:
+                message = str(e)
+            raise ApiError(e.code, message)
+
+    def _log(self, message: str):
+        """发送工作节点日志，由调用方决定输出位置"""
+        self.log_message.emit(message)
@@ -0,0 +1,229 @@
+"""
+扫描任务队列模块，按优先级类别和并发上限调度同一进程内的所有扫描，交互式扫描可暂停后台扫描
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+# 优先级类别，从高到低：界面和命令行发起的扫描、资产监控的定时扫描、分布式分片等补充扫描
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_SCHEDULED = 'scheduled'
+PRIORITY_BACKFILL = 'backfill'
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED, PRIORITY_BACKFILL)
+
+# 各类别同时运行（含已暂停）的任务上限
+DEFAULT_CLASS_LIMITS = {PRIORITY_INTERACTIVE: 4, PRIORITY_SCHEDULED: 2, PRIORITY_BACKFILL: 1}
+
+# 所有类别同时运行的任务上限（已暂停的任务不计入）；可通过环境变量 FASTNMAP_MAX_JOBS 设置
+DEFAULT_MAX_RUNNING = 4
+
+# 等待队列时的检查间隔（秒）
+QUEUE_POLL_INTERVAL = 0.5
+
+
+class JobQueue:
+    """
+    全局扫描任务队列
+
+    每个扫描启动nmap前申请一个运行名额，结束后归还。等待的任务按优先级类别、再按申请顺序启动，
+    所在类别达到上限的任务不阻挡其他类别。交互式任务因总数达到上限而等待时，
+    暂停最晚启动的后台任务（nmap进程组收到SIGSTOP），让交互式任务立即启动；
+    没有交互式任务等待且总数低于上限时，按优先级恢复被暂停的任务。
+    """
+
+    def __init__(self, max_running: int = DEFAULT_MAX_RUNNING, class_limits: Optional[Dict[str, int]] = None):
+        """
+        初始化任务队列
+
+        参数:
+            max_running: 所有类别同时运行的任务上限
+            class_limits: 各类别的任务上限，未指定的类别使用默认值
+        """
+        self.max_running = DEFAULT_MAX_RUNNING
+        self.class_limits = dict(DEFAULT_CLASS_LIMITS)
+        self._running = OrderedDict()  # 任务键 -> {'priority', 'pause', 'resume', 'paused'}
+        self._waiting = OrderedDict()  # 任务键 -> 优先级类别
+        self._condition = threading.Condition()
+        self.configure(max_running, class_limits)
+
+    def configure(self, max_running: Optional[int] = None, class_limits: Optional[Dict[str, int]] = None):
+        """
+        设置并发上限，对之后的调度生效
+
+        参数:
+            max_running: 所有类别同时运行的任务上限，None表示不修改
+            class_limits: 各类别的任务上限，None表示不修改
+        """
+        with self._condition:
+            if max_running is not None:
+                self.max_running = max(1, int(max_running))
+            for priority, limit in (class_limits or {}).items():
+                if priority in self.class_limits:
+                    self.class_limits[priority] = max(1, int(limit))
+            self._condition.notify_all()
+
+    def try_acquire(self, key: str, priority: str = PRIORITY_INTERACTIVE,
+                    pause: Optional[Callable[[], bool]] = None, resume: Optional[Callable[[], None]] = None) -> bool:
+        """
+        尝试为任务分配运行名额，不阻塞；未能分配时登记为等待
+
+        参数:
+            key: 任务键（扫描ID、监控目标名称等）
+            priority: 优先级类别
+            pause: 暂停任务的函数，返回是否已暂停；为None时任务不可暂停
+            resume: 恢复被暂停任务的函数
+
+        返回:
+            是否已分配名额
+        """
+        if priority not in PRIORITY_CLASSES:
+            priority = PRIORITY_INTERACTIVE
+        with self._condition:
+            if key in self._running:
+                return True
+            self._waiting.setdefault(key, priority)
+
+            if self._next_waiting() != key and priority == PRIORITY_INTERACTIVE:
+                self._preempt()
+            if self._next_waiting() != key:
+                return False
+
+            del self._waiting[key]
+            self._running[key] = {'priority': priority, 'pause': pause, 'resume': resume, 'paused': False}
+            self._condition.notify_all()
+            return True
+
+    def acquire(self, key: str, priority: str = PRIORITY_INTERACTIVE,
+                pause: Optional[Callable[[], bool]] = None, resume: Optional[Callable[[], None]] = None,
+                cancelled: Optional[Callable[[], bool]] = None, on_wait: Optional[Callable[[], None]] = None) -> bool:
+        """
+        为任务分配运行名额，需要排队时阻塞等待
+
+        参数:
+            key: 任务键
+            priority: 优先级类别
+            pause: 暂停任务的函数
+            resume: 恢复任务的函数
+            cancelled: 返回True时放弃等待
+            on_wait: 开始等待时调用一次（用于输出提示）
+
+        返回:
+            是否已分配名额，等待被取消或被release时返回False
+        """
+        with self._condition:
+            acquired = self.try_acquire(key, priority, pause, resume)
+            if not acquired and on_wait:
+                on_wait()
+            while not acquired:
+                if cancelled and cancelled():
+                    self._waiting.pop(key, None)
+                    return False
+                self._condition.wait(QUEUE_POLL_INTERVAL)
+                if key not in self._waiting:
+                    return False  # 等待期间被release
+                acquired = self.try_acquire(key, priority, pause, resume)
+            return True
+
+    def release(self, key: str):
+        """
+        归还任务的名额或取消等待，并按需恢复被暂停的任务
+
+        参数:
+            key: 任务键
+        """
+        with self._condition:
+            self._running.pop(key, None)
+            self._waiting.pop(key, None)
+            self._resume_paused()
+            self._condition.notify_all()
+
+    def is_paused(self, key: str) -> bool:
+        """任务是否被暂停"""
+        with self._condition:
+            return bool(self._running.get(key, {}).get('paused'))
+
+    def snapshot(self) -> Dict:
+        """
+        获取当前的调度情况
+
+        返回:
+            包含上限、运行中、已暂停和等待中任务的字典
+        """
+        with self._condition:
+            return {
+                'max_running': self.max_running,
+                'class_limits': dict(self.class_limits),
+                'running': {key: job['priority'] for key, job in self._running.items() if not job['paused']},
+                'paused': {key: job['priority'] for key, job in self._running.items() if job['paused']},
+                'waiting': dict(self._waiting)
+            }
+
+    def _active_count(self) -> int:
+        """未暂停的运行中任务数"""
+        return len([job for job in self._running.values() if not job['paused']])
+
+    def _next_waiting(self) -> Optional[str]:
+        """
+        下一个可以启动的等待任务
+
+        返回:
+            任务键，总数已达上限或各类别都已满时返回None
+        """
+        if self._active_count() >= self.max_running:
+            return None
+        counts = {priority: 0 for priority in PRIORITY_CLASSES}
+        for job in self._running.values():
+            counts[job['priority']] += 1
+        for priority in PRIORITY_CLASSES:
+            if counts[priority] >= self.class_limits[priority]:
+                continue
+            for key, waiting_priority in self._waiting.items():
+                if waiting_priority == priority:
+                    return key
+        return None
+
+    def _preempt(self):
+        """总数达到上限时暂停一个最晚启动的后台任务，为等待的交互式任务让出名额"""
+        if self._active_count() < self.max_running:
+            return
+        interactive = [job for job in self._running.values() if job['priority'] == PRIORITY_INTERACTIVE]
+        if len(interactive) >= self.class_limits[PRIORITY_INTERACTIVE]:
+            return  # 交互式类别已满，暂停后台任务也无法启动
+        for priority in reversed(PRIORITY_CLASSES[1:]):
+            for key in reversed(self._running):
+                job = self._running[key]
+                if job['priority'] != priority or job['paused'] or not job['pause']:
+                    continue
+                if job['pause']():
+                    job['paused'] = True
+                    return
+
+    def _resume_paused(self):
+        """没有交互式任务等待时，按优先级恢复被暂停的任务直到总数达到上限"""
+        if PRIORITY_INTERACTIVE in self._waiting.values():
+            return
+        for priority in PRIORITY_CLASSES:
+            for job in self._running.values():
+                if self._active_count() >= self.max_running:
+                    return
+                if job['priority'] == priority and job['paused']:
+                    job['paused'] = False
+                    if job['resume']:
+                        job['resume']()
+
+
+# 进程内共享的任务队列，ScanManager和AssetMonitor的扫描都从这里申请运行名额
+_queue = JobQueue(int(os.environ.get('FASTNMAP_MAX_JOBS', DEFAULT_MAX_RUNNING) or DEFAULT_MAX_RUNNING))
+
+
+def get_job_queue() -> JobQueue:
+    """
+    获取进程内共享的任务队列
+
+    返回:
+        JobQueue实例
+    """
+    return _queue
@@ -0,0 +1,175 @@
+"""
+输出日志模块，将nmap原始输出缓冲写入按大小轮转的日志文件，内存中只保留最近的若干行
+"""
+
+import os
+import time
+import shutil
+from collections import deque
+from typing import List
+
+
+# 单个日志文件的最大字节数，超过后轮转为 <文件名>.1、<文件名>.2 ...
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+# 保留的轮转文件数量，更早的输出被丢弃
+DEFAULT_BACKUPS = 3
+
+# 内存中保留的最近输出行数
+DEFAULT_TAIL_LINES = 200
+
+# 写入缓冲区大小（字节）
+WRITE_BUFFER_SIZE = 64 * 1024
+
+# 缓冲区最长多久写入一次磁盘（秒），扫描进行中读取日志时最多滞后这么久
+FLUSH_INTERVAL = 1.0
+
+
+class LogSpool:
+    """
+    单次扫描的输出日志
+
+    输出行经缓冲写入日志文件，文件超过 max_bytes 时轮转，最多保留 backups 个旧文件，
+    磁盘占用和内存占用都有上限。已有日志文件时接在原有内容之后（继续扫描）。
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, backups: int = DEFAULT_BACKUPS,
+                 tail_lines: int = DEFAULT_TAIL_LINES):
+        """
+        初始化输出日志，首次写入时才创建文件
+
+        参数:
+            path: 日志文件路径
+            max_bytes: 单个日志文件的最大字节数
+            backups: 保留的轮转文件数量
+            tail_lines: 内存中保留的最近输出行数
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._tail = deque(maxlen=tail_lines)
+        self._file = None
+        self._size = 0
+        self._last_flush = 0.0
+
+    def write(self, line: str):
+        """
+        追加一行输出
+
+        参数:
+            line: 输出行（不含换行符）
+        """
+        self._tail.append(line)
+        data = (line + '\n').encode('utf-8', errors='replace')
+        if self._file is None:
+            self._open()
+        elif self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._size += len(data)
+        if time.time() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """将缓冲区写入磁盘"""
+        if self._file:
+            self._file.flush()
+        self._last_flush = time.time()
+
+    def close(self):
+        """写入剩余缓冲并关闭文件"""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def tail(self) -> List[str]:
+        """
+        获取内存中保留的最近输出
+
+        返回:
+            输出行列表，从旧到新
+        """
+        return list(self._tail)
+
+    def _open(self):
+        """打开日志文件，接在已有内容之后"""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = open(self.path, 'ab', buffering=WRITE_BUFFER_SIZE)
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        """将当前文件依次改名为 .1、.2 ...，超出保留数量的旧文件被删除"""
+        self._file.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'wb', buffering=WRITE_BUFFER_SIZE)
+        self._size = 0
+
+    @staticmethod
+    def log_files(path: str) -> List[str]:
+        """
+        日志的全部现存文件
+
+        参数:
+            path: 日志文件路径
+
+        返回:
+            文件路径列表，从最早的轮转文件到当前文件
+        """
+        files = []
+        index = 1
+        while os.path.exists(f"{path}.{index}"):
+            files.insert(0, f"{path}.{index}")
+            index += 1
+        if os.path.exists(path):
+            files.append(path)
+        return files
+
+    @staticmethod
+    def read(path: str, max_lines: int = 0) -> str:
+        """
+        读取日志内容
+
+        参数:
+            path: 日志文件路径
+            max_lines: 只返回最后的行数，0表示全部返回
+
+        返回:
+            日志文本，不存在时返回空字符串
+        """
+        lines = deque(maxlen=max_lines or None)
+        for file_path in LogSpool.log_files(path):
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                lines.extend(f)
+        return ''.join(lines)
+
+    @staticmethod
+    def export(path: str, output_file: str, append: bool = False) -> bool:
+        """
+        按顺序复制日志的全部文件到输出文件，不经过内存中的字符串
+
+        参数:
+            path: 日志文件路径
+            output_file: 输出文件路径
+            append: 是否追加到输出文件末尾
+
+        返回:
+            是否有日志被导出
+        """
+        files = LogSpool.log_files(path)
+        if not files:
+            return False
+        with open(output_file, 'ab' if append else 'wb') as output:
+            for file_path in files:
+                with open(file_path, 'rb') as f:
+                    shutil.copyfileobj(f, output)
+        return True
+
@@ -0,0 +1,342 @@
+"""
+nmap能力探测模块，探测已安装nmap的版本、支持的选项和NSE脚本，结果按可执行文件缓存到磁盘
+"""
+
+import os
+import re
+import sys
+import json
+import fnmatch
+import threading
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+# 能力缓存文件，按nmap路径保存，可执行文件或script.db的修改时间变化后重新探测
+CAPABILITY_CACHE_FILE = os.path.join('logs', 'nmap_capabilities.json')
+
+# 执行 nmap --version / -h 的超时时间（秒）
+PROBE_TIMEOUT = 10
+
+# 需要探测的选项及引入该选项的nmap版本，帮助信息中列出或版本不低于该值时视为支持；
+# 版本为None表示只根据帮助信息判断（nmap本身没有 -oJ，配置了 .json 结果文件时据此提前报错）
+CAPABILITY_OPTIONS = {
+    '--min-rate': '4.76',
+    '--max-rate': '4.76',
+    '--script': '4.50',
+    '--stats-every': '4.50',
+    '--exclude-ports': '7.00',
+    '--disable-arp-ping': '7.00',
+    '--unique': '7.70',
+    '--resolve-all': '7.70',
+    '--discovery-ignore-rst': '7.80',
+    '-oJ': None
+}
+
+# 带参数值的选项，不支持时连同参数值一起去掉
+VALUE_OPTIONS = ('--min-rate', '--max-rate', '--script', '--stats-every', '--exclude-ports', '-oJ')
+
+# NSE脚本数据库中的一条记录: Entry { filename = "xxx.nse", categories = { "a", "b", } }
+SCRIPT_ENTRY_PATTERN = re.compile(r'filename\s*=\s*"([^"]+)"\s*,\s*categories\s*=\s*\{([^}]*)\}')
+
+# --script 中总是有效的名称
+BUILTIN_SCRIPT_NAMES = ('all', 'default')
+
+
+class NmapCapabilities:
+    """
+    nmap能力探测
+
+    每个nmap可执行文件只探测一次：执行 --version 和 -h 取得版本、编译库和选项，
+    解析 script.db 得到已安装的NSE脚本和类别。结果保存在内存和 CAPABILITY_CACHE_FILE 中，
+    以可执行文件的路径、修改时间和大小为键，升级nmap或更新脚本库后自动重新探测。
+    构建命令时据此去掉不支持的自动参数，并在启动nmap前发现缺少的可执行文件和脚本。
+    """
+
+    _cache = {}  # 真实路径 -> 能力字典
+    _lock = threading.Lock()
+
+    @staticmethod
+    def probe(nmap_path: str, refresh: bool = False) -> Dict:
+        """
+        获取nmap的能力信息，优先使用缓存
+
+        参数:
+            nmap_path: nmap可执行文件路径
+            refresh: 是否忽略缓存重新探测
+
+        返回:
+            能力字典: path, found, version, compiled_with, features, script_db, scripts, categories
+        """
+        real_path = os.path.realpath(nmap_path)
+        key = NmapCapabilities._file_key(real_path)
+        with NmapCapabilities._lock:
+            cached = NmapCapabilities._cache.get(real_path)
+            if not refresh and NmapCapabilities._is_current(cached, key):
+                return cached
+
+            disk_cache = NmapCapabilities._load_disk_cache()
+            cached = disk_cache.get(real_path)
+            if refresh or not NmapCapabilities._is_current(cached, key):
+                cached = NmapCapabilities._probe_binary(real_path, key)
+                if cached['found']:
+                    disk_cache[real_path] = cached
+                    NmapCapabilities._save_disk_cache(disk_cache)
+            NmapCapabilities._cache[real_path] = cached
+            return cached
+
+    @staticmethod
+    def _is_current(cached: Optional[Dict], key: Optional[List]) -> bool:
+        """缓存是否仍然有效：可执行文件、脚本数据库和 NMAPDIR 都没有变化"""
+        return bool(cached) and cached.get('key') == key \
+            and cached.get('nmapdir') == os.environ.get('NMAPDIR', '') \
+            and cached.get('script_db_key') == NmapCapabilities._file_key(cached.get('script_db', ''))
+
+    @staticmethod
+    def supports(capabilities: Dict, option: str) -> bool:
+        """
+        判断nmap是否支持某个选项，未探测到版本时视为支持
+
+        参数:
+            capabilities: probe 返回的能力字典
+            option: 选项，如 --min-rate
+
+        返回:
+            是否支持
+        """
+        if not capabilities['found'] or not capabilities['version']:
+            return True
+        return capabilities['features'].get(option, True)
+
+    @staticmethod
+    def adapt(command: List[str], user_params: str, capabilities: Dict) -> Tuple[List[str], List[str]]:
+        """
+        按nmap能力调整命令：去掉程序自动添加但不支持的选项，检查用户指定的选项和NSE脚本
+
+        参数:
+            command: nmap命令列表（第一个元素为可执行文件）
+            user_params: 用户附加参数，其中不支持的选项不会被去掉，而是作为问题报告
+            capabilities: probe 返回的能力字典
+
+        返回:
+            (调整后的命令, 问题列表)，问题列表为空表示可以执行
+        """
+        if not capabilities['found']:
+            return command, [f"未找到nmap可执行文件: {command[0]}"]
+
+        user_options = set(user_params.split())
+        problems = []
+        result = command[:1]
+        index = 1
+        while index < len(command):
+            option = command[index]
+            has_value = option in VALUE_OPTIONS and index + 1 < len(command)
+            if option in CAPABILITY_OPTIONS and not NmapCapabilities.supports(capabilities, option):
+                if option in user_options or option == '-oJ':
+                    problems.append(f"nmap {capabilities['version']} 不支持 {option} 选项")
+                else:
+                    index += 2 if has_value else 1
+                    continue
+            result.append(option)
+            index += 1
+
+        for expression in NmapCapabilities._script_expressions(result):
+            missing = NmapCapabilities.missing_scripts(capabilities, expression)
+            if missing:
+                problems.append(f"未安装的NSE脚本或类别: {', '.join(missing)}")
+        return result, problems
+
+    @staticmethod
+    def missing_scripts(capabilities: Dict, expression: str) -> List[str]:
+        """
+        找出 --script 参数中未安装的脚本和类别
+
+        参数:
+            capabilities: probe 返回的能力字典
+            expression: --script 的参数值，逗号分隔的脚本名、类别或通配符
+
+        返回:
+            未安装的名称列表；没有脚本索引、或参数为路径和布尔表达式时不检查
+        """
+        scripts = capabilities.get('scripts') or {}
+        if not scripts:
+            return []
+        categories = set(capabilities.get('categories') or [])
+        missing = []
+        for name in expression.split(','):
+            name = name.strip().lstrip('+')
+            if not name or name in BUILTIN_SCRIPT_NAMES or name in categories:
+                continue
+            if any(char in name for char in '/\\() ') or os.path.exists(name):
+                continue  # 本地路径或 "default and safe" 形式的表达式交给nmap处理
+            base_name = name[:-4] if name.endswith('.nse') else name
+            if '*' in base_name or '?' in base_name:
+                if fnmatch.filter(scripts, base_name) or fnmatch.filter(categories, base_name):
+                    continue
+            elif base_name in scripts:
+                continue
+            missing.append(name)
+        return missing
+
+    @staticmethod
+    def _script_expressions(command: List[str]) -> List[str]:
+        """取出命令中所有 --script 参数值（支持 --script x 和 --script=x 两种形式）"""
+        expressions = []
+        for index, option in enumerate(command):
+            if option == '--script' and index + 1 < len(command):
+                expressions.append(command[index + 1])
+            elif option.startswith('--script='):
+                expressions.append(option.split('=', 1)[1])
+        return expressions
+
+    @staticmethod
+    def _probe_binary(real_path: str, key: Optional[List]) -> Dict:
+        """
+        执行nmap并解析版本、编译库、选项和脚本数据库
+
+        参数:
+            real_path: nmap可执行文件的真实路径
+            key: 可执行文件的 [修改时间, 大小]，文件不存在时为None
+
+        返回:
+            能力字典
+        """
+        capabilities = {
+            'path': real_path,
+            'key': key,
+            'found': False,
+            'version': '',
+            'compiled_with': [],
+            'features': {},
+            'nmapdir': os.environ.get('NMAPDIR', ''),
+            'script_db': '',
+            'script_db_key': None,
+            'scripts': {},
+            'categories': [],
+            'probed_time': datetime.now().isoformat()
+        }
+        version_text = NmapCapabilities._run(real_path, '--version') if key else None
+        if version_text is None:
+            return capabilities
+        capabilities['found'] = True
+
+        match = re.search(r'Nmap version (\d+(?:\.\d+)*)', version_text)
+        capabilities['version'] = match.group(1) if match else ''
+        match = re.search(r'Compiled with:(.*)', version_text)
+        capabilities['compiled_with'] = match.group(1).split() if match else []
+
+        help_text = NmapCapabilities._run(real_path, '-h') or ''
+        version = NmapCapabilities._version_tuple(capabilities['version'])
+        for option, since in CAPABILITY_OPTIONS.items():
+            listed = re.search(re.escape(option) + r'(?![\w-])', help_text) is not None
+            capabilities['features'][option] = listed or bool(version and since and
+                                                              version >= NmapCapabilities._version_tuple(since))
+
+        script_db = NmapCapabilities._find_script_db(real_path)
+        if script_db:
+            capabilities['script_db'] = script_db
+            capabilities['script_db_key'] = NmapCapabilities._file_key(script_db)
+            capabilities['scripts'] = NmapCapabilities.parse_script_db(script_db)
+            capabilities['categories'] = sorted({category for categories in capabilities['scripts'].values()
+                                                 for category in categories})
+        return capabilities
+
+    @staticmethod
+    def parse_script_db(script_db: str) -> Dict[str, List[str]]:
+        """
+        解析NSE脚本数据库
+
+        参数:
+            script_db: script.db 文件路径
+
+        返回:
+            {脚本名（不含.nse）: [类别]}
+        """
+        scripts = {}
+        try:
+            with open(script_db, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    match = SCRIPT_ENTRY_PATTERN.search(line)
+                    if match:
+                        name = match.group(1)[:-4] if match.group(1).endswith('.nse') else match.group(1)
+                        scripts[name] = re.findall(r'"([^"]+)"', match.group(2))
+        except OSError:
+            return {}
+        return scripts
+
+    @staticmethod
+    def _find_script_db(real_path: str) -> str:
+        """
+        查找nmap的脚本数据库，顺序与nmap查找数据文件的顺序相近
+
+        参数:
+            real_path: nmap可执行文件的真实路径
+
+        返回:
+            script.db 路径，找不到时返回空字符串
+        """
+        binary_dir = os.path.dirname(real_path)
+        candidates = []
+        if os.environ.get('NMAPDIR'):
+            candidates.append(os.environ['NMAPDIR'])
+        candidates.extend([
+            binary_dir,                                              # Windows安装目录和内置nmap目录
+            os.path.join(os.path.dirname(binary_dir), 'share', 'nmap'),  # /usr/bin/nmap -> /usr/share/nmap
+            os.path.join(binary_dir, '..', 'Resources', 'share', 'nmap'),
+        ])
+        if sys.platform != 'win32':
+            candidates.extend(['/usr/local/share/nmap', '/usr/share/nmap', '/opt/homebrew/share/nmap'])
+        for directory in candidates:
+            script_db = os.path.normpath(os.path.join(directory, 'scripts', 'script.db'))
+            if os.path.isfile(script_db):
+                return script_db
+        return ''
+
+    @staticmethod
+    def _run(real_path: str, option: str) -> Optional[str]:
+        """执行nmap并返回标准输出，无法执行时返回None"""
+        try:
+            result = subprocess.run([real_path, option], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    stdin=subprocess.DEVNULL, timeout=PROBE_TIMEOUT)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return result.stdout.decode('utf-8', errors='replace')
+
+    @staticmethod
+    def _version_tuple(version: str) -> Tuple[int, ...]:
+        """将版本号转换为可比较的元组"""
+        return tuple(int(part) for part in re.findall(r'\d+', version))
+
+    @staticmethod
+    def _file_key(path: str) -> Optional[List]:
+        """文件的 [修改时间, 大小]，文件不存在时返回None"""
+        try:
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        return [stat.st_mtime, stat.st_size]
+
+    @staticmethod
+    def _load_disk_cache() -> Dict:
+        """读取能力缓存文件，不存在或损坏时返回空字典"""
+        try:
+            with open(CAPABILITY_CACHE_FILE, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    @staticmethod
+    def _save_disk_cache(cache: Dict):
+        """保存能力缓存文件，写入失败时只使用内存缓存"""
+        try:
+            directory = os.path.dirname(CAPABILITY_CACHE_FILE)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_file = CAPABILITY_CACHE_FILE + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(temp_file, CAPABILITY_CACHE_FILE)
+        except OSError:
+            pass
@@ -4,9 +4,7 @@ Nmap输出解析模块，负责解析Nmap扫描结果
 
 import os
 import xml.etree.ElementTree as ET
-from PyQt5.QtWidgets import QMessageBox
 import re
-from functools import partial
 
 class NmapOutputParser:
     """
@@ -28,12 +26,26 @@ class NmapOutputParser:
         """
         output_filename = f"{scan_type}_ScanCacheLog.xml"
         output_file_path = os.path.join(logs_dir, output_filename)
+        return NmapOutputParser.parse_file(output_file_path, scan_type, html_format)
+    
+    @staticmethod
+    def parse_file(xml_file, scan_type='默认扫描', html_format=True):
+        """
+        解析指定的Nmap XML文件
         
-        if not os.path.exists(output_file_path):
+        参数:
+            xml_file: XML文件路径
+            scan_type: 扫描类型，决定结果的展示方式
+            html_format: 是否返回HTML格式的结果
+            
+        返回:
+            (解析后的结果文本, 错误信息)
+        """
+        if not os.path.exists(xml_file):
             return None, "扫描结果文件不存在"
             
         try:
-            tree = ET.parse(output_file_path)
+            tree = ET.parse(xml_file)
             root = tree.getroot()
             
             # 根据扫描类型选择不同的解析方法
@@ -51,6 +63,8 @@ class NmapOutputParser:
                 result_text = NmapOutputParser._parse_brute_force_scan(root, html_format)
             elif scan_type == '漏洞扫描':
                 result_text = NmapOutputParser._parse_vulnerability_scan(root, html_format)
+            else:
+                result_text = NmapOutputParser._parse_default_scan(root, html_format)
             
             # 确保返回字符串被正确格式化
             result = result_text.strip() if result_text else "没有可用的扫描结果"
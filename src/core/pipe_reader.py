@@ -0,0 +1,108 @@
+"""
+管道读取模块，从nmap标准输出的二进制管道按块读取，增量解码UTF-8并自行拆分为行，按批次交给事件层
+"""
+
+import codecs
+import asyncio
+from typing import AsyncIterator, Iterator, List
+
+
+# 每次从管道读取的最大字节数，读取时只取管道中已有的数据，不等待凑满
+PIPE_CHUNK_SIZE = 64 * 1024
+
+# 单行的最大长度（字符），超过时不等换行直接作为一行输出，避免异常输出占满内存
+MAX_LINE_LENGTH = 64 * 1024
+
+
+class LineSplitter:
+    """
+    增量行拆分器
+
+    按任意边界输入字节块，跨块的多字节UTF-8字符和不完整的行保留到下一块，
+    无法解码的字节替换为U+FFFD（与原先 errors='replace' 的文本模式一致）。
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending = ''  # 尚未遇到换行的部分行
+
+    def feed(self, data: bytes) -> List[str]:
+        """
+        输入一块数据
+
+        参数:
+            data: 从管道读取的字节
+
+        返回:
+            本块中完整的行（不含换行符和行尾的\\r）
+        """
+        text = self._pending + self._decoder.decode(data)
+        lines = text.split('\n')
+        self._pending = lines.pop()
+        if len(self._pending) > MAX_LINE_LENGTH:
+            lines.append(self._pending)
+            self._pending = ''
+        if '\r' in text:
+            return [line[:-1] if line.endswith('\r') else line for line in lines]
+        return lines
+
+    def finish(self) -> List[str]:
+        """
+        管道关闭时输出剩余内容
+
+        返回:
+            最后一行（没有换行结尾时），没有剩余内容时为空列表
+        """
+        text = self._pending + self._decoder.decode(b'', final=True)
+        self._pending = ''
+        return [text.rstrip('\r')] if text else []
+
+
+def iter_line_batches(stream, chunk_size: int = PIPE_CHUNK_SIZE) -> Iterator[List[str]]:
+    """
+    从阻塞的二进制管道（subprocess.Popen的stdout）按块读取行，管道关闭后结束
+
+    参数:
+        stream: 二进制文件对象
+        chunk_size: 每次读取的最大字节数
+
+    返回:
+        行批次迭代器，每个批次是一次读取得到的全部完整行
+    """
+    splitter = LineSplitter()
+    read = getattr(stream, 'read1', stream.read)  # read1只返回已到达的数据，不等待凑满chunk_size
+    while True:
+        data = read(chunk_size)
+        if not data:
+            break
+        lines = splitter.feed(data)
+        if lines:
+            yield lines
+    lines = splitter.finish()
+    if lines:
+        yield lines
+
+
+async def aiter_line_batches(reader: asyncio.StreamReader,
+                             chunk_size: int = PIPE_CHUNK_SIZE) -> AsyncIterator[List[str]]:
+    """
+    从asyncio子进程的输出流按块读取行，流结束后结束
+
+    参数:
+        reader: asyncio.StreamReader
+        chunk_size: 每次读取的最大字节数
+
+    返回:
+        行批次异步迭代器
+    """
+    splitter = LineSplitter()
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        lines = splitter.feed(data)
+        if lines:
+            yield lines
+    lines = splitter.finish()
+    if lines:
+        yield lines
@@ -0,0 +1,318 @@
+"""
+进程监管模块，负责nmap进程组的创建、资源限制、超时/停滞检测和残留进程清理
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import threading
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.core.scan_progress import ScanProgress, DEFAULT_STALL_WINDOW
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块
+    resource = None
+
+
+# 默认资源限制，0表示不限制
+DEFAULT_LIMITS = {
+    'max_runtime': 0,                      # 最长运行时间（秒）
+    'nice': 0,                             # CPU优先级（nice值），大于0时降低nmap的优先级
+    'memory_limit_mb': 0,                  # 虚拟内存上限（MB）
+    'stall_timeout': DEFAULT_STALL_WINDOW  # 无输出多久视为停滞（秒）
+}
+
+# 进程登记文件，记录本程序启动的nmap进程，用于启动时清理残留进程
+DEFAULT_REGISTRY_FILE = os.path.join('logs', 'nmap_processes.json')
+
+# 同一进程内多个监管器共享登记文件
+_registry_lock = threading.Lock()
+
+
+def get_limits(config: Dict) -> Dict:
+    """
+    从扫描配置中读取资源限制
+
+    参数:
+        config: 扫描配置字典，可包含 max_runtime/nice/memory_limit_mb/stall_timeout
+
+    返回:
+        资源限制字典
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for key, default in DEFAULT_LIMITS.items():
+        value = config.get(key)
+        if value not in (None, ''):
+            try:
+                limits[key] = int(value)
+            except (TypeError, ValueError):
+                limits[key] = default
+    return limits
+
+
+class ProcessSupervisor:
+    """
+    nmap进程监管器
+
+    每个nmap进程在独立的进程组中运行，终止时连同其子进程一起结束；
+    进程启动后登记到文件中，程序异常退出后下次启动时可以清理残留进程。
+    """
+
+    def __init__(self, registry_file: str = DEFAULT_REGISTRY_FILE):
+        """
+        初始化进程监管器
+
+        参数:
+            registry_file: 进程登记文件路径
+        """
+        self.registry_file = registry_file
+
+    @staticmethod
+    def popen_kwargs(limits: Optional[Dict] = None) -> Dict:
+        """
+        获取创建独立进程组所需的参数，可用于subprocess.Popen和asyncio.create_subprocess_exec
+
+        参数:
+            limits: 资源限制字典
+
+        返回:
+            关键字参数字典
+        """
+        limits = limits or DEFAULT_LIMITS
+        if sys.platform == 'win32':
+            flags = subprocess.CREATE_NEW_PROCESS_GROUP
+            if limits.get('nice', 0) > 0:
+                flags |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
+            return {'creationflags': flags}
+        return {'start_new_session': True}
+
+    @staticmethod
+    def apply_limits(pid: int, limits: Dict):
+        """
+        对已启动的进程设置CPU优先级和内存上限
+
+        在进程启动后设置而不使用preexec_fn，避免在多线程程序中fork后执行Python代码。
+
+        参数:
+            pid: 进程ID
+            limits: 资源限制字典
+        """
+        if sys.platform == 'win32':
+            return
+
+        nice = limits.get('nice', 0)
+        if nice:
+            try:
+                os.setpriority(os.PRIO_PROCESS, pid, nice)
+            except (OSError, AttributeError):
+                pass
+
+        memory_limit = limits.get('memory_limit_mb', 0)
+        if memory_limit and resource is not None and hasattr(resource, 'prlimit'):
+            size = memory_limit * 1024 * 1024
+            try:
+                resource.prlimit(pid, resource.RLIMIT_AS, (size, size))
+            except (OSError, ValueError):
+                pass
+
+    @staticmethod
+    def check_limits(started: float, progress: Optional[ScanProgress], limits: Dict) -> str:
+        """
+        检查进程是否超出运行时间或已停滞
+
+        参数:
+            started: 启动时间戳
+            progress: 扫描进度模型，用于获取最后一次输出的时间
+            limits: 资源限制字典
+
+        返回:
+            需要终止时返回原因，否则返回空字符串
+        """
+        now = time.time()
+        max_runtime = limits.get('max_runtime', 0)
+        if max_runtime and now - started > max_runtime:
+            return f"扫描超过最长运行时间 {max_runtime} 秒，已终止"
+
+        stall_timeout = limits.get('stall_timeout', 0)
+        if stall_timeout and progress is not None and not progress.finished \
+                and now - progress.last_activity > stall_timeout:
+            return f"扫描超过 {stall_timeout} 秒没有任何输出，判定为停滞并已终止"
+
+        return ''
+
+    @staticmethod
+    def kill_group(pid: int):
+        """
+        终止进程及其所在进程组
+
+        参数:
+            pid: 进程组首进程ID
+        """
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    @staticmethod
+    def suspend_group(pid: int) -> bool:
+        """
+        暂停进程所在进程组（SIGSTOP），用于让出运行名额
+
+        参数:
+            pid: 进程组首进程ID
+
+        返回:
+            是否已暂停，Windows上不支持暂停
+        """
+        return ProcessSupervisor._signal_group(pid, getattr(signal, 'SIGSTOP', None))
+
+    @staticmethod
+    def resume_group(pid: int) -> bool:
+        """
+        恢复被暂停的进程组（SIGCONT）
+
+        参数:
+            pid: 进程组首进程ID
+
+        返回:
+            是否已恢复
+        """
+        return ProcessSupervisor._signal_group(pid, getattr(signal, 'SIGCONT', None))
+
+    @staticmethod
+    def _signal_group(pid: int, signum) -> bool:
+        """向进程组发送信号，进程组不存在时改为发送给进程本身"""
+        if sys.platform == 'win32' or signum is None:
+            return False
+        try:
+            os.killpg(pid, signum)
+            return True
+        except (ProcessLookupError, PermissionError):
+            try:
+                os.kill(pid, signum)
+                return True
+            except (ProcessLookupError, PermissionError):
+                return False
+
+    def register(self, pid: int, scan_id: str, command: List[str]):
+        """
+        登记启动的nmap进程
+
+        参数:
+            pid: 进程ID
+            scan_id: 所属扫描ID或监控目标名称
+            command: 启动命令
+        """
+        with _registry_lock:
+            registry = self._load()
+            registry[str(pid)] = {
+                'owner': os.getpid(),
+                'scan_id': scan_id,
+                'command': ' '.join(command),
+                'started': datetime.now().isoformat()
+            }
+            self._save(registry)
+
+    def unregister(self, pid: int):
+        """
+        取消进程登记
+
+        参数:
+            pid: 进程ID
+        """
+        with _registry_lock:
+            registry = self._load()
+            if registry.pop(str(pid), None) is not None:
+                self._save(registry)
+
+    def reap_orphans(self) -> List[int]:
+        """
+        清理登记文件中启动它们的程序已经退出、但仍在运行的nmap进程
+
+        返回:
+            被终止的进程ID列表
+        """
+        killed = []
+        with _registry_lock:
+            registry = self._load()
+            remaining = {}
+            for pid_text, info in registry.items():
+                pid = int(pid_text)
+                if self._is_alive(info.get('owner', 0)):
+                    # 仍由运行中的程序管理，不属于残留进程
+                    remaining[pid_text] = info
+                    continue
+                if self._is_nmap_process(pid):
+                    self.kill_group(pid)
+                    killed.append(pid)
+            if remaining != registry:
+                self._save(remaining)
+        return killed
+
+    def _load(self) -> Dict:
+        """读取进程登记文件"""
+        if not os.path.exists(self.registry_file):
+            return {}
+        try:
+            with open(self.registry_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, registry: Dict):
+        """保存进程登记文件"""
+        registry_dir = os.path.dirname(self.registry_file)
+        if registry_dir and not os.path.exists(registry_dir):
+            os.makedirs(registry_dir)
+        with open(self.registry_file, 'w', encoding='utf-8') as f:
+            json.dump(registry, f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        """判断进程是否存在"""
+        if not pid:
+            return False
+        if sys.platform == 'win32':
+            output = subprocess.run(['tasklist', '/FI', f'PID eq {pid}', '/NH'],
+                                    capture_output=True, text=True).stdout
+            return str(pid) in output
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _is_nmap_process(pid: int) -> bool:
+        """判断进程是否仍是nmap，避免误杀复用了相同PID的其他进程"""
+        if sys.platform == 'win32':
+            output = subprocess.run(['tasklist', '/FI', f'PID eq {pid}', '/NH'],
+                                    capture_output=True, text=True).stdout
+            return 'nmap' in output.lower()
+
+        cmdline_file = f'/proc/{pid}/cmdline'
+        if os.path.exists(cmdline_file):
+            try:
+                with open(cmdline_file, 'rb') as f:
+                    return b'nmap' in f.read()
+            except OSError:
+                return False
+
+        output = subprocess.run(['ps', '-p', str(pid), '-o', 'command='],
+                                capture_output=True, text=True).stdout
+        return 'nmap' in output
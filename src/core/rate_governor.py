@@ -0,0 +1,218 @@
+"""
+发包速率控制模块，在同一进程内所有并发扫描和资产监控之间分配全局的发包速率预算
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+# 全局发包速率预算（包/秒），0表示不限制；可通过环境变量 FASTNMAP_RATE_BUDGET 设置
+DEFAULT_RATE_BUDGET = 0
+
+# 预留的并发扫描份数：单个扫描最多获得 预算/份数，为随后启动的扫描留出余量
+DEFAULT_RATE_SLOTS = 4
+
+# 单个nmap进程的最低速率（包/秒），剩余预算低于该值时新扫描等待
+MIN_RATE_SHARE = 50
+
+# 等待预算时的检查间隔（秒）
+ACQUIRE_POLL_INTERVAL = 0.5
+
+
+class RateGovernor:
+    """
+    全局发包速率分配器
+
+    每个nmap进程启动前申请一份速率，按 --max-rate 写入命令，进程结束后归还。
+    nmap运行中无法调整速率，因此"重新分配"发生在进程启动和结束时：
+    每份速率为 预算/max(运行中的进程数+1, 预留份数)，且不超过剩余预算；
+    剩余预算不足 MIN_RATE_SHARE 时按申请顺序排队，有进程结束后依次启动。
+    """
+
+    def __init__(self, budget: int = DEFAULT_RATE_BUDGET, slots: int = DEFAULT_RATE_SLOTS):
+        """
+        初始化速率分配器
+
+        参数:
+            budget: 全局发包速率预算（包/秒），0表示不限制
+            slots: 预留的并发扫描份数
+        """
+        self.budget = 0
+        self.slots = DEFAULT_RATE_SLOTS
+        self._active = OrderedDict()   # 进程键 -> 已分配速率
+        self._waiting = OrderedDict()  # 进程键 -> 开始等待的时间
+        self._condition = threading.Condition()
+        self.configure(budget, slots)
+
+    def configure(self, budget: int, slots: Optional[int] = None):
+        """
+        设置预算，新的预算对之后启动的进程生效
+
+        参数:
+            budget: 全局发包速率预算（包/秒），0表示不限制
+            slots: 预留的并发扫描份数，None表示不修改
+        """
+        with self._condition:
+            self.budget = max(0, int(budget or 0))
+            if slots is not None:
+                self.slots = max(1, int(slots))
+            self._condition.notify_all()
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用了速率预算"""
+        return self.budget > 0
+
+    def try_acquire(self, key: str) -> Optional[int]:
+        """
+        尝试为进程分配速率，不阻塞；未能分配时登记为等待，之后按登记顺序分配
+
+        参数:
+            key: 进程键（扫描ID加分片序号、监控目标名称等）
+
+        返回:
+            分配的速率（包/秒），未启用预算时返回0，需要等待时返回None
+        """
+        with self._condition:
+            if not self.enabled:
+                self._waiting.pop(key, None)
+                return 0
+            if key in self._active:
+                return self._active[key]
+
+            self._waiting.setdefault(key, time.time())
+            if next(iter(self._waiting)) != key:
+                return None  # 更早的申请优先
+
+            used = sum(self._active.values())
+            share = max(1, self.budget // max(len(self._active) + 1, self.slots))
+            rate = min(share, self.budget - used)
+            # 预算本身很小时最低速率按每份预算计算
+            if rate < max(1, min(MIN_RATE_SHARE, self.budget // self.slots)):
+                return None
+
+            del self._waiting[key]
+            self._active[key] = rate
+            self._condition.notify_all()
+            return rate
+
+    def acquire(self, key: str, cancelled: Optional[Callable[[], bool]] = None,
+                on_wait: Optional[Callable[[], None]] = None) -> Optional[int]:
+        """
+        为进程分配速率，预算不足时阻塞等待
+
+        参数:
+            key: 进程键
+            cancelled: 返回True时放弃等待
+            on_wait: 开始等待时调用一次（用于输出提示）
+
+        返回:
+            分配的速率，未启用预算时返回0，等待被取消或被release时返回None
+        """
+        with self._condition:
+            rate = self.try_acquire(key)
+            if rate is None and on_wait:
+                on_wait()
+            while rate is None:
+                if cancelled and cancelled():
+                    self._waiting.pop(key, None)
+                    return None
+                self._condition.wait(ACQUIRE_POLL_INTERVAL)
+                if key not in self._waiting:
+                    return None  # 等待期间被release
+                rate = self.try_acquire(key)
+            return rate
+
+    def release(self, key: str):
+        """
+        归还进程的速率或取消等待，唤醒等待中的进程
+
+        参数:
+            key: 进程键
+        """
+        with self._condition:
+            self._active.pop(key, None)
+            self._waiting.pop(key, None)
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict:
+        """
+        获取当前的分配情况
+
+        返回:
+            包含预算、已分配速率和等待队列的字典
+        """
+        with self._condition:
+            return {
+                'budget': self.budget,
+                'slots': self.slots,
+                'used': sum(self._active.values()),
+                'active': dict(self._active),
+                'waiting': list(self._waiting)
+            }
+
+    @staticmethod
+    def apply_rate(command: List[str], rate: int) -> List[str]:
+        """
+        将分配的速率写入nmap命令
+
+        用户参数中更低的 --max-rate 保留；--min-rate 和 --min-parallelism 不超过分配的速率，
+        避免nmap因最低速率高于最高速率而报错。
+
+        参数:
+            command: nmap命令
+            rate: 分配的速率，0表示不修改
+
+        返回:
+            新的命令列表
+        """
+        if not rate:
+            return list(command)
+
+        max_rate = rate
+        for index, option in enumerate(command[:-1]):
+            if option == '--max-rate':
+                max_rate = min(max_rate, RateGovernor._parse_number(command[index + 1], max_rate))
+
+        result = [command[0]]
+        index = 1
+        while index < len(command):
+            option = command[index]
+            if option == '--max-rate' and index + 1 < len(command):
+                index += 2
+                continue
+            if option in ('--min-rate', '--min-parallelism') and index + 1 < len(command):
+                value = RateGovernor._parse_number(command[index + 1], max_rate)
+                result.extend([option, str(min(value, max_rate))])
+                index += 2
+                continue
+            result.append(option)
+            index += 1
+
+        # 速率参数放在nmap路径之后，不影响末尾的目标和输出文件
+        return result[:1] + ['--max-rate', str(max_rate)] + result[1:]
+
+    @staticmethod
+    def _parse_number(value: str, default: int) -> int:
+        """解析速率参数，无法解析时返回默认值"""
+        try:
+            return int(float(value))
+        except ValueError:
+            return default
+
+
+# 进程内共享的速率分配器，ScanManager和AssetMonitor启动的nmap进程都从这里申请速率
+_governor = RateGovernor(int(os.environ.get('FASTNMAP_RATE_BUDGET', DEFAULT_RATE_BUDGET) or 0))
+
+
+def get_rate_governor() -> RateGovernor:
+    """
+    获取进程内共享的速率分配器
+
+    返回:
+        RateGovernor实例
+    """
+    return _governor
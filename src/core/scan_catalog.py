@@ -0,0 +1,353 @@
+"""
+扫描目录模块，为每次扫描的独立输出目录保存原始输出、统计和结果缓存，并维护全部扫描的索引
+"""
+
+import os
+import csv
+import json
+import threading
+from typing import Dict, List, Optional
+
+from src.core.xml_tailer import load_hosts
+from src.core.log_spool import LogSpool
+
+
+# 扫描输出根目录下的索引文件名
+CATALOG_FILENAME = 'catalog.json'
+
+# 每次扫描输出目录中的文件名
+RAW_LOG_FILENAME = 'output.log'     # nmap原始输出
+STATS_FILENAME = 'stats.json'       # 进度和耗时统计
+RESULT_FILENAME = 'result.json'     # 解析后的主机结果缓存
+
+# 索引中保存的任务字段
+CATALOG_FIELDS = ('scan_id', 'scan_type', 'target', 'state', 'output_dir', 'xml_file',
+                  'created_time', 'started_time', 'finished_time', 'error', 'partial')
+
+
+def compare_host_ports(ip: str, current_host: Dict, previous_host: Dict, differences: Dict):
+    """
+    比较同一主机两次扫描的开放端口和服务，结果追加到差异字典
+
+    参数:
+        ip: 主机IP
+        current_host: 当前主机信息
+        previous_host: 上次主机信息
+        differences: 差异字典
+    """
+    # 构建端口集合
+    current_ports = {f"{port['port']}/{port['protocol']}": port
+                     for port in current_host['ports'] if port['state'] == 'open'}
+    previous_ports = {f"{port['port']}/{port['protocol']}": port
+                      for port in previous_host['ports'] if port['state'] == 'open'}
+
+    current_port_keys = set(current_ports.keys())
+    previous_port_keys = set(previous_ports.keys())
+
+    # 新增端口
+    for port_key in current_port_keys - previous_port_keys:
+        differences['new_ports'].append(f"{ip}:{port_key}")
+
+    # 消失端口
+    for port_key in previous_port_keys - current_port_keys:
+        differences['disappeared_ports'].append(f"{ip}:{port_key}")
+
+    # 服务变化
+    for port_key in current_port_keys & previous_port_keys:
+        current_port = current_ports[port_key]
+        previous_port = previous_ports[port_key]
+
+        if current_port['service'] != previous_port['service'] or \
+           current_port['version'] != previous_port['version']:
+            differences['changed_services'].append({
+                'host': ip,
+                'port': port_key,
+                'old_service': f"{previous_port['service']} {previous_port['version']}".strip(),
+                'new_service': f"{current_port['service']} {current_port['version']}".strip()
+            })
+
+
+def compare_hosts(previous: List[Dict], current: List[Dict]) -> Dict:
+    """
+    比较两次扫描的主机列表
+
+    参数:
+        previous: 上次扫描的主机信息列表
+        current: 本次扫描的主机信息列表
+
+    返回:
+        差异字典，格式与资产监控的差异相同
+    """
+    differences = {
+        'new_hosts': [],
+        'disappeared_hosts': [],
+        'new_ports': [],
+        'disappeared_ports': [],
+        'changed_services': []
+    }
+
+    current_hosts = {host['ip']: host for host in current}
+    previous_hosts = {host['ip']: host for host in previous}
+    differences['new_hosts'] = list(set(current_hosts) - set(previous_hosts))
+    differences['disappeared_hosts'] = list(set(previous_hosts) - set(current_hosts))
+    for ip in set(current_hosts) & set(previous_hosts):
+        compare_host_ports(ip, current_hosts[ip], previous_hosts[ip], differences)
+    return differences
+
+
+class ScanCatalog:
+    """
+    扫描目录
+
+    每次扫描在 base_dir/<扫描ID>/ 下拥有独立的工作目录，保存XML结果、原始输出、统计和结果缓存；
+    base_dir/catalog.json 记录所有扫描，用于打开、重新导出和对比历史扫描，无需重新扫描。
+    同一进程内的写入由锁保护，索引以原子替换的方式保存。
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, base_dir: str = os.path.join('logs', 'scans')):
+        """
+        初始化扫描目录
+
+        参数:
+            base_dir: 扫描输出根目录
+        """
+        self.base_dir = base_dir
+        self.catalog_file = os.path.join(base_dir, CATALOG_FILENAME)
+
+    def record(self, job):
+        """
+        更新扫描任务在索引中的记录，任务结束时同时保存统计信息
+
+        参数:
+            job: ScanJob扫描任务
+        """
+        entry = {field: getattr(job, field, None) for field in CATALOG_FIELDS}
+        if job.result_counts:
+            entry.update(job.result_counts)
+        if job.is_finished:
+            self._write_json(os.path.join(job.output_dir, STATS_FILENAME), {
+                'scan_id': job.scan_id,
+                'state': job.state,
+                'return_code': job.return_code,
+                'resume_count': job.resume_count,
+                'started_time': job.started_time,
+                'finished_time': job.finished_time,
+                'commands': job.commands,
+                'summary': job.summary,
+                'results': job.result_counts,
+                'progress': job.progress.to_dict()
+            })
+
+        with self._lock:
+            catalog = self._load_catalog()
+            catalog[job.scan_id] = dict(catalog.get(job.scan_id, {}), **entry)
+            self._write_json(self.catalog_file, catalog)
+
+    def save_results(self, job) -> Optional[Dict]:
+        """
+        解析扫描结果XML并写入结果缓存，之后打开、导出和对比时无需再解析XML
+
+        参数:
+            job: ScanJob扫描任务
+
+        返回:
+            结果统计字典，包含hosts_up和open_ports，没有结果时返回None
+        """
+        hosts = self._write_result_cache(job.output_dir, job.xml_file)
+        if hosts is None:
+            return None
+        return {
+            'hosts_up': len([host for host in hosts if host['status'] == 'up']),
+            'open_ports': sum(len([port for port in host['ports'] if port['state'] == 'open']) for host in hosts)
+        }
+
+    def list(self, limit: int = 0, scan_type: str = '', target: str = '') -> List[Dict]:
+        """
+        列出历史扫描，最新的在前
+
+        参数:
+            limit: 返回的最大数量，0表示全部
+            scan_type: 只返回该扫描类型
+            target: 只返回目标中包含该字符串的扫描
+
+        返回:
+            索引记录列表
+        """
+        with self._lock:
+            entries = list(self._load_catalog().values())
+        entries = [entry for entry in entries
+                   if (not scan_type or entry.get('scan_type') == scan_type)
+                   and (not target or target in (entry.get('target') or ''))]
+        entries.sort(key=lambda entry: entry.get('created_time') or '', reverse=True)
+        return entries[:limit] if limit else entries
+
+    def get(self, scan_id: str) -> Optional[Dict]:
+        """
+        获取扫描的索引记录
+
+        参数:
+            scan_id: 扫描ID
+
+        返回:
+            索引记录，不存在时返回None
+        """
+        with self._lock:
+            return self._load_catalog().get(scan_id)
+
+    def load_hosts(self, scan_id: str) -> Optional[List[Dict]]:
+        """
+        读取扫描结果，优先使用结果缓存，XML比缓存新时重新解析
+
+        参数:
+            scan_id: 扫描ID
+
+        返回:
+            主机信息字典列表，扫描不存在或没有结果时返回None
+        """
+        entry = self.get(scan_id)
+        if not entry or not entry.get('xml_file'):
+            return None
+        cache_file = os.path.join(entry['output_dir'], RESULT_FILENAME)
+        if os.path.exists(cache_file) and (not os.path.exists(entry['xml_file'])
+                                           or os.path.getmtime(cache_file) >= os.path.getmtime(entry['xml_file'])):
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return self._write_result_cache(entry['output_dir'], entry['xml_file'])
+
+    def log_path(self, scan_id: str) -> str:
+        """
+        扫描的原始输出文件路径（轮转的旧文件为 <路径>.1、<路径>.2 ...）
+
+        参数:
+            scan_id: 扫描ID
+
+        返回:
+            文件路径，扫描不存在时返回空字符串
+        """
+        entry = self.get(scan_id)
+        return os.path.join(entry['output_dir'], RAW_LOG_FILENAME) if entry else ''
+
+    def read_log(self, scan_id: str, max_lines: int = 0) -> str:
+        """
+        读取扫描的原始输出
+
+        参数:
+            scan_id: 扫描ID
+            max_lines: 只返回最后的行数，0表示全部返回
+
+        返回:
+            原始输出文本，不存在时返回空字符串
+        """
+        log_path = self.log_path(scan_id)
+        return LogSpool.read(log_path, max_lines) if log_path else ''
+
+    def diff(self, previous_id: str, current_id: str) -> Optional[Dict]:
+        """
+        对比两次扫描的结果
+
+        参数:
+            previous_id: 较早的扫描ID
+            current_id: 较新的扫描ID
+
+        返回:
+            差异字典，任一扫描没有结果时返回None
+        """
+        previous = self.load_hosts(previous_id)
+        current = self.load_hosts(current_id)
+        if previous is None or current is None:
+            return None
+        return compare_hosts(previous, current)
+
+    def export_csv(self, scan_id: str, output_file: str) -> int:
+        """
+        将扫描结果导出为CSV，每个端口一行，没有开放端口的主机单独一行
+
+        参数:
+            scan_id: 扫描ID
+            output_file: CSV文件路径
+
+        返回:
+            写入的数据行数，扫描没有结果时返回-1
+        """
+        hosts = self.load_hosts(scan_id)
+        if hosts is None:
+            return -1
+        rows = 0
+        # utf-8-sig 便于Excel正确识别中文
+        with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['IP', '主机状态', '端口', '协议', '端口状态', '服务', '版本'])
+            for host in hosts:
+                if not host['ports']:
+                    writer.writerow([host['ip'], host['status'], '', '', '', '', ''])
+                    rows += 1
+                for port in host['ports']:
+                    writer.writerow([host['ip'], host['status'], port['port'], port['protocol'], port['state'],
+                                     port['service'], port['version']])
+                    rows += 1
+        return rows
+
+    def rebuild(self) -> int:
+        """
+        根据各扫描目录中的检查点重建索引，用于索引丢失或从其他机器复制了扫描目录
+
+        返回:
+            索引中的扫描数量
+        """
+        from src.core.scan_checkpoint import ScanCheckpoint
+
+        catalog = {}
+        if os.path.isdir(self.base_dir):
+            for scan_id in sorted(os.listdir(self.base_dir)):
+                output_dir = os.path.join(self.base_dir, scan_id)
+                checkpoint = ScanCheckpoint.load(output_dir)
+                if not checkpoint:
+                    continue
+                config = checkpoint.get('config', {})
+                catalog[scan_id] = {
+                    'scan_id': scan_id,
+                    'scan_type': config.get('scan_type', ''),
+                    'target': config.get('target', ''),
+                    'state': checkpoint.get('state', ''),
+                    'output_dir': output_dir,
+                    'xml_file': checkpoint.get('xml_file', ''),
+                    'created_time': checkpoint.get('created_time'),
+                    'error': checkpoint.get('error', '')
+                }
+        with self._lock:
+            self._write_json(self.catalog_file, catalog)
+        return len(catalog)
+
+    def _load_catalog(self) -> Dict:
+        """读取索引文件，不存在或损坏时返回空字典"""
+        if not os.path.exists(self.catalog_file):
+            return {}
+        try:
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return catalog if isinstance(catalog, dict) else {}
+
+    def _write_result_cache(self, output_dir: str, xml_file: str) -> Optional[List[Dict]]:
+        """解析XML结果并写入结果缓存"""
+        hosts = load_hosts(xml_file) if xml_file else None
+        if hosts is not None:
+            self._write_json(os.path.join(output_dir, RESULT_FILENAME), hosts)
+        return hosts
+
+    @staticmethod
+    def _write_json(path: str, data):
+        """以原子替换的方式写入JSON文件"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, path)
@@ -0,0 +1,180 @@
+"""
+扫描检查点模块，记录扫描各部分的完成情况，用于中断后继续扫描
+"""
+
+import os
+import json
+from typing import Dict, List, Optional, Tuple
+
+from src.core.shard_executor import NmapXmlMerger
+
+
+# 检查点文件名，保存在每次扫描的输出目录中
+CHECKPOINT_FILENAME = 'checkpoint.json'
+
+
+class ScanCheckpoint:
+    """
+    扫描检查点的保存、读取和恢复计划
+
+    nmap自带的 --resume 不支持XML输出，因此按"部分"记录进度：普通扫描只有一个部分，
+    分片扫描每个分片是一个部分，两阶段扫描的存活探测和每个深度扫描批次各是一个部分。恢复时已完成的部分直接复用，未完成的部分从已写入的
+    XML中取出完成的主机，通过 --excludefile 跳过这些主机后重新执行，最后与已有结果合并。
+    """
+
+    @staticmethod
+    def save(job):
+        """
+        保存扫描任务的检查点
+
+        参数:
+            job: ScanJob扫描任务
+        """
+        # 只保存可序列化的配置项（端口复选框等界面对象不保存，命令中已包含其效果）
+        config = {key: value for key, value in job.config.items()
+                  if isinstance(value, (str, int, float, bool, type(None)))}
+        checkpoint = {
+            'scan_id': job.scan_id,
+            'state': job.state,
+            'config': config,
+            'xml_file': job.xml_file,
+            'parts': job.parts,
+            'merge_files': job.merge_files,
+            'pipeline': job.pipeline,
+            'resume_count': job.resume_count,
+            'created_time': job.created_time,
+            'error': job.error
+        }
+
+        if not os.path.exists(job.output_dir):
+            os.makedirs(job.output_dir)
+        checkpoint_file = os.path.join(job.output_dir, CHECKPOINT_FILENAME)
+        temp_file = checkpoint_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, checkpoint_file)  # 原子替换，避免中断时写出不完整的检查点
+
+    @staticmethod
+    def load(output_dir: str) -> Optional[Dict]:
+        """
+        读取检查点
+
+        参数:
+            output_dir: 扫描输出目录
+
+        返回:
+            检查点字典，不存在或损坏时返回None
+        """
+        checkpoint_file = os.path.join(output_dir, CHECKPOINT_FILENAME)
+        if not os.path.exists(checkpoint_file):
+            return None
+        try:
+            with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def plan_resume(checkpoint: Dict) -> Tuple[List[Dict], List[str]]:
+        """
+        根据检查点生成恢复扫描的计划
+
+        参数:
+            checkpoint: 检查点字典
+
+        返回:
+            (部分列表, 需要合并的XML文件列表)，未完成部分的命令已改为跳过已完成主机
+        """
+        attempt = checkpoint.get('resume_count', 0) + 1
+        merged_base, _ = os.path.splitext(checkpoint['xml_file'])
+        merge_files = list(checkpoint.get('merge_files', []))
+        parts = []
+
+        for index, part in enumerate(checkpoint['parts']):
+            part = dict(part)
+            if part.get('done'):
+                parts.append(part)
+                continue
+
+            # 保留本次中断前写入的XML，最终输出文件本身需要改名以免被新结果覆盖
+            partial_file = part['xml_file']
+            if os.path.exists(partial_file):
+                if partial_file == checkpoint['xml_file']:
+                    renamed = f"{merged_base}.r{attempt}.partial.xml"
+                    os.replace(partial_file, renamed)
+                    partial_file = renamed
+                history = part.get('history', []) + [partial_file]
+            else:
+                history = part.get('history', [])
+            part['history'] = history
+
+            new_file = f"{merged_base}.part{index + 1}.r{attempt}.xml"
+            command = ScanCheckpoint._replace_option(part['command'], '-oX', new_file)
+            command = ScanCheckpoint._replace_option(command, '--excludefile', None)
+
+            done_hosts = ScanCheckpoint.completed_hosts(history)
+            if done_hosts:
+                exclude_file = f"{merged_base}.part{index + 1}.r{attempt}.exclude"
+                with open(exclude_file, 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(sorted(done_hosts)) + '\n')
+                command = command[:-2] + ['--excludefile', exclude_file] + command[-2:]
+                part['exclude_file'] = exclude_file
+            if '--append-output' not in command:
+                # 用户指定的 -oN 等结果文件在原内容后追加
+                command = command[:-2] + ['--append-output'] + command[-2:]
+
+            part['command'] = command
+            part['xml_file'] = new_file
+            parts.append(part)
+
+            if part.get('stage') == 'sweep':
+                continue  # 两阶段扫描的存活探测结果不参与合并
+            for xml_file in history + [new_file]:
+                if xml_file not in merge_files:
+                    merge_files.append(xml_file)
+
+        return parts, merge_files
+
+    @staticmethod
+    def completed_hosts(xml_files: List[str]) -> set:
+        """
+        获取XML文件中已经完整写入的主机地址
+
+        参数:
+            xml_files: XML文件路径列表
+
+        返回:
+            IP地址集合
+        """
+        hosts = set()
+        for xml_file in xml_files:
+            root = NmapXmlMerger.load_root(xml_file)
+            if root is None:
+                continue
+            for host in root.findall('host'):
+                address = host.find('address')
+                if address is not None and address.get('addr'):
+                    hosts.add(address.get('addr'))
+        return hosts
+
+    @staticmethod
+    def _replace_option(command: List[str], option: str, value: Optional[str]) -> List[str]:
+        """
+        替换或删除命令中的选项
+
+        参数:
+            command: 命令列表
+            option: 选项名称
+            value: 新的选项值，为None时删除该选项
+
+        返回:
+            新的命令列表
+        """
+        command = list(command)
+        if option in command:
+            index = command.index(option)
+            if value is None:
+                del command[index:index + 2]
+            else:
+                command[index + 1] = value
+        return command
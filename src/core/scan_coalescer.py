@@ -0,0 +1,297 @@
+"""
+扫描合并模块，识别与正在执行或刚完成的扫描重叠的请求，共享其结果并只扫描未覆盖的部分
+"""
+
+import time
+import threading
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from src.core.shard_executor import TargetSharder
+from src.core.xml_tailer import NmapXmlWriter, load_hosts
+
+
+# 扫描完成后仍可被新请求共享的时间（秒）
+COALESCE_WINDOW_SECONDS = 60
+
+# 等待共享扫描完成时检查取消标记的间隔（秒）
+WAIT_POLL_INTERVAL = 0.5
+
+# 端口参数中的协议前缀，未加前缀的端口协议记为空字符串（与扫描方式一致）
+PORT_PROTOCOL_PREFIXES = {'T': 'tcp', 'U': 'udp', 'S': 'sctp'}
+
+# 不参与比较的带值选项：发包速率由全局预算分配，时序参数由历史统计调整，统计输出间隔只影响进度显示，
+# 都只影响扫描速度而不影响扫描的目标和端口
+IGNORED_VALUE_OPTIONS = ('--max-rate', '--min-hostgroup', '--min-parallelism', '--max-retries',
+                         '--initial-rtt-timeout', '--max-rtt-timeout', '--stats-every')
+
+
+class ScanCoalescer:
+    """
+    扫描合并器
+
+    每次扫描按"除目标、端口和输出文件外的全部nmap参数"分类。同类扫描中，若已有扫描（正在执行或在
+    COALESCE_WINDOW_SECONDS 内完成）的目标覆盖新请求的全部目标且端口有重叠，新请求共享这些扫描的结果，
+    只对剩余端口启动自己的扫描；端口全部被覆盖时不启动扫描。各订阅者等待共享的扫描结束后，
+    把属于自己目标和端口的结果写入自己的XML文件，再按各自的流程保存和比较。
+    """
+
+    def __init__(self, window: float = COALESCE_WINDOW_SECONDS):
+        """
+        初始化扫描合并器
+
+        参数:
+            window: 扫描完成后仍可共享的时间（秒）
+        """
+        self.window = window
+        self._entries = []  # 正在执行和刚完成的扫描
+        self._lock = threading.Lock()
+
+    def claim(self, owner: str, command: List[str]) -> Dict:
+        """
+        登记扫描请求，找出可以共享的扫描并计算需要自己扫描的端口
+
+        参数:
+            owner: 请求者名称（如监控目标名称）
+            command: 请求的nmap命令（build_command 的结果，以 [目标, '-oX', 输出文件] 结尾）
+
+        返回:
+            合并计划字典:
+            shared: 共享的扫描列表；
+            ports: 需要自己扫描的端口参数，为None时不需要扫描，为空字符串时按原命令扫描；
+            entry: 自己的扫描登记，扫描结束后传给 finish；
+            targets, named, requested: 请求的目标、是否含域名和端口集合，用于筛选共享的结果
+        """
+        signature = self.signature(command)
+        target = command[-3]
+        port_spec = command[command.index('-p') + 1] if '-p' in command[:-1] else ''
+        requested = self.parse_ports(port_spec) if port_spec else None
+        if port_spec and requested is None:
+            signature += ('-p', port_spec)  # 无法展开的端口参数只与完全相同的参数合并
+        targets = TargetSharder._parse_blocks(target)
+        # 含域名的目标无法按地址筛选结果，只与目标完全相同的扫描合并
+        named = any(isinstance(block, str) for block in targets)
+
+        with self._lock:
+            self._prune()
+            shared = []
+            covered = set()
+            for entry in self._entries:
+                if entry['signature'] != signature or entry['failed']:
+                    continue
+                if not self._covers(entry['targets'], targets) or (named and entry['target'] != target):
+                    continue
+                if requested is None or entry['ports'] is None:
+                    # 未指定端口（nmap默认端口）时只与同样未指定端口的扫描合并
+                    if requested is None and entry['ports'] is None:
+                        shared = [entry]
+                        covered = None
+                        break
+                    continue
+                overlap = entry['ports'] & (requested - covered)
+                if overlap:
+                    shared.append(entry)
+                    covered |= overlap
+
+            if covered is None or (requested is not None and shared and not requested - covered):
+                ports = None
+            elif shared:
+                ports = self.format_ports(requested - covered)
+            else:
+                ports = ''
+            entry = None
+            if ports is not None:
+                own_ports = requested - covered if shared else requested
+                entry = {
+                    'owner': owner,
+                    'signature': signature,
+                    'target': target,
+                    'targets': targets,
+                    'ports': frozenset(own_ports) if own_ports is not None else None,
+                    'xml_file': None,
+                    'failed': False,
+                    'finished': None,
+                    'done': threading.Event()
+                }
+                self._entries.append(entry)
+
+        return {'shared': shared, 'ports': ports, 'entry': entry, 'targets': targets, 'named': named,
+                'requested': requested}
+
+    def finish(self, entry: Dict, xml_file: Optional[str]):
+        """
+        登记扫描结束并通知等待的订阅者
+
+        参数:
+            entry: claim 返回的扫描登记
+            xml_file: 结果XML文件路径，扫描失败或取消时为None
+        """
+        with self._lock:
+            entry['xml_file'] = xml_file
+            entry['failed'] = xml_file is None
+            entry['finished'] = time.time()
+            if entry['failed']:
+                self._entries.remove(entry)
+        entry['done'].set()
+
+    def collect(self, plan: Dict, own_xml: Optional[str], output_file: str,
+                cancelled: Optional[Callable[[], bool]] = None) -> Optional[Dict]:
+        """
+        等待共享的扫描结束，把自己的结果与共享结果中属于本请求的目标和端口写入输出文件
+
+        参数:
+            plan: claim 返回的合并计划
+            own_xml: 自己扫描的结果文件，没有自己的扫描时为None
+            output_file: 合并结果的XML文件路径
+            cancelled: 返回是否已取消的函数，等待期间定期检查
+
+        返回:
+            统计字典: hosts_up, hosts_down, sources；共享的扫描失败或请求被取消时返回None
+        """
+        for entry in plan['shared']:
+            while not entry['done'].wait(WAIT_POLL_INTERVAL):
+                if cancelled and cancelled():
+                    return None
+            if entry['failed']:
+                return None
+
+        merged = {}
+        sources = [entry['xml_file'] for entry in plan['shared']] + ([own_xml] if own_xml else [])
+        for xml_file in sources:
+            for host_info in load_hosts(xml_file) or []:
+                if not host_info['ip'] or (not plan['named'] and not self._covers(plan['targets'], [host_info['ip']])):
+                    continue
+                ports = [port for port in host_info['ports'] if self._port_requested(port, plan['requested'])]
+                host = merged.setdefault(host_info['ip'], {'ip': host_info['ip'], 'status': host_info['status'],
+                                                           'ports': []})
+                if host_info['status'] == 'up':
+                    host['status'] = 'up'
+                known = {(port['protocol'], port['port']) for port in host['ports']}
+                host['ports'].extend(port for port in ports if (port['protocol'], port['port']) not in known)
+
+        writer = NmapXmlWriter(output_file, f"coalesced {' '.join(sources)}")
+        hosts_up = 0
+        for host_info in merged.values():
+            host_info['ports'].sort(key=lambda port: (port['protocol'], int(port['port'])))
+            writer.write_host(host_info)
+            hosts_up += host_info['status'] == 'up'
+        writer.finish(hosts_up, len(merged) - hosts_up)
+        return {'hosts_up': hosts_up, 'hosts_down': len(merged) - hosts_up, 'sources': len(sources)}
+
+    @staticmethod
+    def signature(command: List[str]) -> Tuple[str, ...]:
+        """
+        扫描的分类：去掉目标、端口、输出文件和只影响速度的选项后的nmap参数
+
+        参数:
+            command: nmap命令
+
+        返回:
+            参数元组
+        """
+        options = command[:-3]
+        signature = []
+        index = 0
+        while index < len(options):
+            if options[index] == '-p' or options[index] in IGNORED_VALUE_OPTIONS:
+                index += 2
+                continue
+            signature.append(options[index])
+            index += 1
+        return tuple(signature)
+
+    @staticmethod
+    def parse_ports(port_spec: str) -> Optional[FrozenSet[Tuple[str, int]]]:
+        """
+        将nmap端口参数展开为 (协议, 端口) 集合
+
+        参数:
+            port_spec: 端口参数，如 22,80-90,U:53
+
+        返回:
+            端口集合，含服务名称等无法展开的写法时返回None
+        """
+        ports = set()
+        protocol = ''
+        for token in port_spec.replace(' ', '').split(','):
+            if len(token) > 2 and token[1] == ':':
+                protocol = PORT_PROTOCOL_PREFIXES.get(token[0].upper())
+                if protocol is None:
+                    return None
+                token = token[2:]
+            if not token:
+                continue
+            try:
+                if '-' in token:
+                    start, end = token.split('-', 1)
+                    ports.update((protocol, port) for port in range(int(start or 1), int(end or 65535) + 1))
+                else:
+                    ports.add((protocol, int(token)))
+            except ValueError:
+                return None
+        return frozenset(ports)
+
+    @staticmethod
+    def format_ports(ports) -> str:
+        """
+        将 (协议, 端口) 集合转换为nmap端口参数，连续端口合并为范围
+
+        参数:
+            ports: 端口集合
+
+        返回:
+            端口参数，未加前缀的端口排在最前
+        """
+        groups = {}
+        for protocol, port in ports:
+            groups.setdefault(protocol, []).append(port)
+        prefixes = {protocol: f"{prefix}:" for prefix, protocol in PORT_PROTOCOL_PREFIXES.items()}
+        parts = []
+        for protocol in sorted(groups, key=lambda item: (item != '', item)):
+            ranges = []
+            for port in sorted(groups[protocol]):
+                if ranges and port == ranges[-1][1] + 1:
+                    ranges[-1][1] = port
+                else:
+                    ranges.append([port, port])
+            spec = ','.join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+            parts.append(prefixes.get(protocol, '') + spec)
+        return ','.join(parts)
+
+    def _prune(self):
+        """移除超过共享时间的已完成扫描"""
+        now = time.time()
+        self._entries = [entry for entry in self._entries
+                         if entry['finished'] is None or now - entry['finished'] <= self.window]
+
+    @staticmethod
+    def _covers(blocks: list, targets: list) -> bool:
+        """
+        判断一组网段块是否覆盖另一组目标
+
+        参数:
+            blocks: 已有扫描的网段块
+            targets: 新请求的网段块或地址字符串
+
+        返回:
+            是否全部覆盖
+        """
+        networks = [block for block in blocks if not isinstance(block, str)]
+        names = {block for block in blocks if isinstance(block, str)}
+        for target in TargetSharder._parse_blocks(' '.join(str(target) for target in targets)):
+            if isinstance(target, str):
+                if target not in names:
+                    return False
+            elif not any(network.version == target.version and target.subnet_of(network) for network in networks):
+                return False
+        return True
+
+    @staticmethod
+    def _port_requested(port: Dict, requested) -> bool:
+        """结果中的端口是否属于请求的端口，未指定端口时全部保留"""
+        if requested is None:
+            return True
+        try:
+            number = int(port['port'])
+        except ValueError:
+            return False
+        return ('', number) in requested or (port['protocol'], number) in requested
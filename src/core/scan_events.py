@@ -0,0 +1,211 @@
+"""
+扫描事件模块，负责将nmap标准输出解析为结构化事件并按批次合并发送
+"""
+
+import re
+import threading
+from collections import namedtuple
+from typing import Callable, List, Optional
+
+
+# 事件类型
+EVENT_OUTPUT = 'output'      # 未识别的普通输出行
+EVENT_START = 'start'        # nmap启动
+EVENT_HOST_UP = 'host_up'    # 主机存活
+EVENT_PORT = 'port'          # 发现端口
+EVENT_STATS = 'stats'        # 统计/进度更新
+EVENT_WARNING = 'warning'    # 警告或错误
+EVENT_DONE = 'done'          # 扫描结束
+EVENT_HOST_RESULT = 'host_result'  # XML中已完成的主机结果（来自增量解析而非标准输出）
+
+# 每个事件携带原始输出行，便于界面按类型渲染
+ScanEvent = namedtuple('ScanEvent', ['type', 'data', 'line'])
+
+
+class NmapEventParser:
+    """
+    将nmap输出逐行解析为ScanEvent，每个nmap进程使用一个实例以保存主机上下文
+    """
+
+    _START_PATTERN = re.compile(r'^Starting Nmap (\S+)')
+    _REPORT_PATTERN = re.compile(r'^Nmap scan report for (?:(\S+) \(([^)]+)\)|(\S+))(\s+\[host down\])?')
+    _HOST_UP_PATTERN = re.compile(r'^Host is up(?:.*?\(([\d.]+)s latency\))?')
+    _DISCOVERED_PATTERN = re.compile(r'^Discovered open port (\d+)/(\w+) on (\S+)')
+    _PORT_ROW_PATTERN = re.compile(r'^(\d+)/(tcp|udp|sctp)\s+(\S+)\s+(\S+)')
+    _STATS_PATTERN = re.compile(r'^Stats: (\d+:\d+:\d+) elapsed; (\d+) hosts completed \((\d+) up\), (\d+) undergoing (.+)$')
+    _TIMING_PATTERN = re.compile(r'^(.+?) Timing: About ([\d.]+)% done(?:; ETC: (\d+:\d+) \((\d+:\d+:\d+) remaining\))?')
+    _INITIATING_PATTERN = re.compile(r'^Initiating (.+?) at (\d+:\d+)')
+    _COMPLETED_PATTERN = re.compile(r'^Completed (.+?) at (\d+:\d+), ([\d.]+)s elapsed')
+    _DONE_PATTERN = re.compile(r'^Nmap done:? (\d+) IP address(?:es)? \((\d+) hosts? up\) scanned in ([\d.]+) seconds')
+    _WARNING_PATTERN = re.compile(r'^(?:\[WARNING\]|WARNING|Warning)\b', re.IGNORECASE)
+    _ERROR_PATTERN = re.compile(r'QUITTING|^\[ERROR\]|^Failed to|^Error|^错误|^未预见的错误', re.IGNORECASE)
+
+    def __init__(self):
+        self.current_host = ''  # 最近一条"Nmap scan report"对应的主机
+
+    def parse_line(self, line: str) -> ScanEvent:
+        """
+        解析一行nmap输出
+
+        参数:
+            line: 去除首尾空白的输出行
+
+        返回:
+            对应的ScanEvent，无法识别的行返回EVENT_OUTPUT事件
+        """
+        match = self._DISCOVERED_PATTERN.match(line)
+        if match:
+            port, protocol, host = match.groups()
+            return ScanEvent(EVENT_PORT, {
+                'host': host, 'port': port, 'protocol': protocol, 'state': 'open', 'service': ''
+            }, line)
+
+        match = self._TIMING_PATTERN.match(line)
+        if match:
+            phase, percent, etc, remaining = match.groups()
+            return ScanEvent(EVENT_STATS, {
+                'phase': phase, 'percent': float(percent), 'etc': etc or '', 'remaining': remaining or ''
+            }, line)
+
+        match = self._STATS_PATTERN.match(line)
+        if match:
+            elapsed, completed, up, undergoing, phase = match.groups()
+            return ScanEvent(EVENT_STATS, {
+                'elapsed': elapsed, 'hosts_completed': int(completed), 'hosts_up': int(up),
+                'hosts_undergoing': int(undergoing), 'phase': phase.strip()
+            }, line)
+
+        match = self._REPORT_PATTERN.match(line)
+        if match:
+            hostname, paren_ip, plain = match.group(1), match.group(2), match.group(3)
+            self.current_host = paren_ip or plain
+            return ScanEvent(EVENT_OUTPUT, {
+                'host': self.current_host, 'hostname': hostname or '', 'down': bool(match.group(4))
+            }, line)
+
+        match = self._HOST_UP_PATTERN.match(line)
+        if match:
+            latency = match.group(1)
+            return ScanEvent(EVENT_HOST_UP, {
+                'host': self.current_host, 'latency': float(latency) if latency else None
+            }, line)
+
+        match = self._PORT_ROW_PATTERN.match(line)
+        if match and self.current_host:
+            port, protocol, state, service = match.groups()
+            return ScanEvent(EVENT_PORT, {
+                'host': self.current_host, 'port': port, 'protocol': protocol, 'state': state, 'service': service
+            }, line)
+
+        match = self._INITIATING_PATTERN.match(line)
+        if match:
+            return ScanEvent(EVENT_STATS, {'phase': match.group(1), 'status': 'started'}, line)
+
+        match = self._COMPLETED_PATTERN.match(line)
+        if match:
+            return ScanEvent(EVENT_STATS, {
+                'phase': match.group(1), 'status': 'completed', 'percent': 100.0, 'phase_elapsed': float(match.group(3))
+            }, line)
+
+        match = self._DONE_PATTERN.match(line)
+        if match:
+            total, up, elapsed = match.groups()
+            return ScanEvent(EVENT_DONE, {'total': int(total), 'up': int(up), 'elapsed': float(elapsed)}, line)
+
+        match = self._START_PATTERN.match(line)
+        if match:
+            return ScanEvent(EVENT_START, {'version': match.group(1)}, line)
+
+        if self._ERROR_PATTERN.search(line):
+            return ScanEvent(EVENT_WARNING, {'severity': 'error', 'message': line}, line)
+        if self._WARNING_PATTERN.match(line):
+            return ScanEvent(EVENT_WARNING, {'severity': 'warning', 'message': line}, line)
+
+        return ScanEvent(EVENT_OUTPUT, {}, line)
+
+
+class EventBatcher:
+    """
+    将事件按数量或时间合并为批次，减少跨线程信号数量
+    """
+
+    def __init__(self, flush_callback: Callable[[List[ScanEvent]], None], max_size: int = 256,
+                 max_interval: float = 0.1,
+                 schedule: Optional[Callable[[float, Callable[[], None]], object]] = None):
+        """
+        初始化事件批处理器
+
+        参数:
+            flush_callback: 批次回调，接收事件列表
+            max_size: 单个批次的最大事件数，达到后立即发送
+            max_interval: 批次中第一个事件的最长等待时间（秒）
+            schedule: 延迟调用函数 schedule(delay, callback)，
+                      默认使用threading.Timer，asyncio中可传入loop.call_later
+        """
+        self.flush_callback = flush_callback
+        self.max_size = max_size
+        self.max_interval = max_interval
+        self.schedule = schedule or self._schedule_timer
+        self._events = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # 保证多个线程触发发送时批次顺序不变
+        self._flush_pending = False
+
+    def add(self, event: ScanEvent):
+        """
+        添加事件
+
+        参数:
+            event: 扫描事件
+        """
+        with self._lock:
+            self._events.append(event)
+            full = len(self._events) >= self.max_size
+            schedule_flush = not full and not self._flush_pending
+            if schedule_flush:
+                self._flush_pending = True
+
+        if full or event.type == EVENT_DONE:
+            self.flush()
+        elif schedule_flush:
+            self.schedule(self.max_interval, self.flush)
+
+    def extend(self, events: List[ScanEvent]):
+        """
+        添加一批事件，只加锁一次
+
+        参数:
+            events: 扫描事件列表
+        """
+        if not events:
+            return
+        with self._lock:
+            self._events.extend(events)
+            full = len(self._events) >= self.max_size
+            schedule_flush = not full and not self._flush_pending
+            if schedule_flush:
+                self._flush_pending = True
+
+        if full or any(event.type == EVENT_DONE for event in events):
+            self.flush()
+        elif schedule_flush:
+            self.schedule(self.max_interval, self.flush)
+
+    def flush(self):
+        """立即发送当前批次"""
+        with self._flush_lock:
+            with self._lock:
+                events = self._events
+                self._events = []
+                self._flush_pending = False
+            if events:
+                self.flush_callback(events)
+
+    @staticmethod
+    def _schedule_timer(delay: float, callback: Callable[[], None]):
+        """使用守护线程定时器延迟调用"""
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
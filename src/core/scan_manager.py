@@ -0,0 +1,955 @@
+"""
+扫描管理模块，基于asyncio子进程同时管理多个Nmap扫描任务
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.core.command_builder import NmapCommandBuilder, nmap_not_found_message, find_nmap_path, PIPELINE_SCAN_TYPES
+from src.core.shard_executor import NmapXmlMerger, TargetSharder, get_default_shard_count
+from src.core.scan_events import NmapEventParser, EventBatcher, ScanEvent
+from src.core.scan_progress import ScanProgress
+from src.core.xml_tailer import NmapXmlTailer, host_result_event
+from src.core.process_supervisor import ProcessSupervisor, get_limits
+from src.core.scan_checkpoint import ScanCheckpoint
+from src.core.rate_governor import RateGovernor, get_rate_governor, ACQUIRE_POLL_INTERVAL
+from src.core.timing_tuner import TimingObserver, TimingTuner
+from src.core.connect_scanner import ConnectScanner
+from src.core.discovery_import import DiscoveryImporter
+from src.core.scan_catalog import ScanCatalog, RAW_LOG_FILENAME
+from src.core.nmap_capabilities import NmapCapabilities
+from src.core.cost_estimator import CostEstimator
+from src.core.target_source import TargetSource
+from src.core.log_spool import LogSpool
+from src.core.pipe_reader import aiter_line_batches
+from src.core.job_queue import get_job_queue, PRIORITY_INTERACTIVE, QUEUE_POLL_INTERVAL
+
+
+# 扫描任务生命周期状态
+STATE_PENDING = 'pending'
+STATE_RUNNING = 'running'
+STATE_COMPLETED = 'completed'
+STATE_FAILED = 'failed'
+STATE_CANCELLED = 'cancelled'
+
+FINISHED_STATES = (STATE_COMPLETED, STATE_FAILED, STATE_CANCELLED)
+
+# 扫描过程中读取XML结果文件的间隔（秒）
+RESULT_POLL_INTERVAL = 1.0
+
+
+class ScanJob:
+    """
+    单个扫描任务，保存任务的配置、输出目录、状态和结果
+    """
+
+    def __init__(self, scan_id: str, config: Dict, output_dir: str):
+        """
+        初始化扫描任务
+
+        参数:
+            scan_id: 扫描ID
+            config: 扫描配置字典（与NmapCommandBuilder.build_command相同）
+            output_dir: 本次扫描的独立输出目录
+        """
+        self.scan_id = scan_id
+        self.config = config
+        self.scan_type = config.get('scan_type', '')
+        self.target = config.get('target') or config.get('target_file', '')
+        self.output_dir = output_dir
+        self.xml_file = ''
+        self.commands = []
+        self.shard_files = []
+        self.parts = []        # 每个nmap进程一个部分: {'command', 'xml_file', 'done'}
+        self.merge_files = []  # 结束时需要合并为xml_file的XML文件
+        self.pipeline = None   # 两阶段扫描: {'deep_options', 'connect', 'import'}，第一个部分为存活和端口探测
+        self.resume_count = 0
+        self.state = STATE_PENDING
+        self.created_time = datetime.now().isoformat()
+        self.started_time = None
+        self.finished_time = None
+        self.return_code = None
+        self.error = ''
+        self.problems = []         # 构建命令时发现的问题（缺少nmap、选项或脚本），非空时不启动nmap
+        self.summary = None
+        self.result_counts = None  # 结果统计: {'hosts_up', 'open_ports'}
+        self.partial = False       # 扫描被取消或失败，结果文件只包含中断前已完成的主机
+        self.log = LogSpool(os.path.join(output_dir, RAW_LOG_FILENAME))  # 原始输出，内存中只保留最近的若干行
+        self.processes = []
+        self.priority = config.get('priority') or PRIORITY_INTERACTIVE
+        self.paused = False        # 被更高优先级的任务暂停，nmap进程组处于SIGSTOP状态
+        self.task = None
+        self.batcher = None
+        self.limits = get_limits(config)
+        # 分块扫描（目标文件或过长的目标文本）的主机数在写入分块文件时统计并填入进度，这里不解析目标
+        if config.get('target_hosts'):
+            total_hosts = config['target_hosts']
+        elif config.get('target_file') or TargetSource.is_large(config.get('target', '')):
+            total_hosts = 0
+        else:
+            total_hosts = TargetSharder.count_hosts(self.target)
+        self.progress = ScanProgress(total_hosts, self.limits['stall_timeout'])
+        self.timing = TimingObserver()  # 从输出中统计丢包和重传，扫描结束后计入时序统计
+
+    @property
+    def is_finished(self) -> bool:
+        """任务是否已结束"""
+        return self.state in FINISHED_STATES
+
+    def to_dict(self) -> Dict:
+        """
+        转换为可序列化的字典
+
+        返回:
+            任务信息字典
+        """
+        return {
+            'scan_id': self.scan_id,
+            'scan_type': self.scan_type,
+            'target': self.target,
+            'state': self.state,
+            'priority': self.priority,
+            'paused': self.paused,
+            'output_dir': self.output_dir,
+            'xml_file': self.xml_file,
+            'created_time': self.created_time,
+            'started_time': self.started_time,
+            'finished_time': self.finished_time,
+            'return_code': self.return_code,
+            'error': self.error,
+            'summary': self.summary,
+            'partial': self.partial,
+            'progress': self.progress.to_dict()
+        }
+
+
+class ScanManager:
+    """
+    扫描管理器，在后台事件循环中以asyncio子进程并发执行多个扫描
+    """
+
+    def __init__(self, base_dir: str = os.path.join('logs', 'scans'), max_concurrent: Optional[int] = None):
+        """
+        初始化扫描管理器
+
+        参数:
+            base_dir: 扫描输出根目录，每次扫描在其下创建独立子目录
+            max_concurrent: 同时运行的扫描数量上限，None表示不限制
+        """
+        self.base_dir = base_dir
+        self.max_concurrent = max_concurrent
+        self.jobs = {}  # scan_id -> ScanJob
+        self._callbacks = {}  # scan_id -> (on_events, on_state)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_thread = None
+        self._semaphore = None
+        self.supervisor = ProcessSupervisor()
+        self.catalog = ScanCatalog(base_dir)
+
+    def start(self):
+        """启动后台事件循环线程，清理上次运行残留的nmap进程，并在后台探测nmap能力"""
+        if self._loop_thread and self._loop_thread.is_alive():
+            return
+
+        self.supervisor.reap_orphans()
+        # 能力信息有缓存时立即返回，首次运行时探测不阻塞界面和第一次扫描的提交
+        threading.Thread(target=NmapCapabilities.probe, args=(find_nmap_path(),), name='NmapProbe', daemon=True).start()
+
+        ready = threading.Event()
+
+        def run_loop():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            if self.max_concurrent:
+                self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            ready.set()
+            self._loop.run_forever()
+
+        self._loop_thread = threading.Thread(target=run_loop, name='ScanManagerLoop', daemon=True)
+        self._loop_thread.start()
+        ready.wait()
+
+    def shutdown(self):
+        """取消所有任务并停止事件循环"""
+        if not self._loop:
+            return
+        for job in self.list_jobs():
+            if not job.is_finished:
+                self.cancel(job.scan_id)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
+        self._loop = None
+
+    def submit(self, config: Dict,
+               on_events: Optional[Callable[[str, List[ScanEvent]], None]] = None,
+               on_state: Optional[Callable[[ScanJob], None]] = None) -> Optional[str]:
+        """
+        提交扫描任务
+
+        参数:
+            config: 扫描配置字典；shard_mode/shard_count 用于开启分片扫描；
+                    target_file 或过长的目标文本按 chunk_hosts 写入分块文件，每个分块一个nmap进程
+            on_events: 事件回调，参数为 (scan_id, 事件批次)，在后台线程中调用
+            on_state: 状态回调，参数为ScanJob，在后台线程中调用
+
+        返回:
+            扫描ID，构建命令失败时返回None
+        """
+        self.start()
+        job = self._new_job(config)
+        job_config = job.config
+
+        discovery_file = job_config.get('discovery_file', '')
+        if not discovery_file and (job_config.get('target_file') or TargetSource.is_large(job_config.get('target', ''))):
+            # 目标列表写入分块文件，分块本身即为并行的部分，不再使用分片和两阶段扫描
+            chunk_commands = NmapCommandBuilder.build_chunk_commands(job_config, job_config.get('chunk_hosts'))
+            if not chunk_commands:
+                return None
+            job.commands, job.merge_files, chunk_files, job.xml_file, stats = chunk_commands
+            job_config['target_hosts'] = stats['hosts']
+            job_config['target_duplicates'] = stats['duplicates']
+            job.progress.total_hosts = stats['hosts']
+            job.progress.source_count = len(job.commands)
+            job.parts = [{'command': command, 'xml_file': xml_file, 'done': False, 'target_file': chunk_file}
+                         for command, xml_file, chunk_file in zip(job.commands, job.merge_files, chunk_files)]
+            job.shard_files = list(job.merge_files)
+            if TargetSource.is_large(job.target):
+                # 目标已写入分块文件，检查点和扫描索引中只保留开头部分
+                job.target = job_config['target'] = f"{job.target[:200]}...（共 {stats['targets']} 个目标）"
+            return self._launch(job, on_events, on_state)
+
+        if discovery_file or (job_config.get('pipeline_mode') and job_config.get('scan_type') in PIPELINE_SCAN_TYPES):
+            if discovery_file and (job_config.get('scan_type') == '存活扫描' or not os.path.isfile(discovery_file)):
+                return None
+            pipeline_commands = NmapCommandBuilder.build_pipeline_commands(job_config)
+            if not pipeline_commands:
+                return None
+            sweep_command, deep_options, job.xml_file = pipeline_commands
+            job.pipeline = {'deep_options': deep_options, 'connect': None, 'import': None}
+            sweep_ports = sweep_command[sweep_command.index('-p') + 1] if '-p' in sweep_command else ''
+            if discovery_file:
+                # 第一阶段直接使用masscan等外部工具的发现结果
+                job.pipeline['import'] = {'file': os.path.abspath(discovery_file)}
+            elif ConnectScanner.is_suitable(dict(job_config, scan_type='默认扫描', port_input=sweep_ports,
+                                                 target=sweep_command[-3])):
+                # 探测范围较小时第一阶段用TCP连接扫描代替nmap
+                job.pipeline['connect'] = {'target': sweep_command[-3], 'ports': sweep_ports}
+            job.commands = [sweep_command]
+            job.parts = [{'command': sweep_command, 'xml_file': sweep_command[-1], 'done': False, 'stage': 'sweep'}]
+            return self._launch(job, on_events, on_state)
+
+        if job_config.get('shard_mode'):
+            shard_commands = NmapCommandBuilder.build_shard_commands(job_config, job_config.get('shard_count'))
+            if not shard_commands:
+                return None
+            job.commands, job.shard_files, job.xml_file = shard_commands
+            job.progress.source_count = len(job.commands)
+        else:
+            command = NmapCommandBuilder.build_command(job_config)
+            if not command:
+                return None
+            job.commands = [command]
+            job.xml_file = command[command.index('-oX') + 1]
+
+        job.parts = [{'command': command, 'xml_file': command[command.index('-oX') + 1], 'done': False}
+                     for command in job.commands]
+        job.merge_files = list(job.shard_files)
+        return self._launch(job, on_events, on_state)
+
+    def _new_job(self, config: Dict) -> ScanJob:
+        """
+        创建扫描任务并分配扫描ID和独立输出目录
+
+        参数:
+            config: 扫描配置字典
+
+        返回:
+            扫描任务
+        """
+        scan_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        output_dir = os.path.join(self.base_dir, scan_id)
+        job_config = dict(config)
+        job_config['output_dir'] = output_dir
+        return ScanJob(scan_id, job_config, output_dir)
+
+    def resume(self, scan_id: str,
+               on_events: Optional[Callable[[str, List[ScanEvent]], None]] = None,
+               on_state: Optional[Callable[[ScanJob], None]] = None) -> Optional[str]:
+        """
+        从检查点继续未完成的扫描，新结果与已有的部分结果合并
+
+        参数:
+            scan_id: 扫描ID
+            on_events: 事件回调
+            on_state: 状态回调
+
+        返回:
+            扫描ID，没有可恢复的检查点或扫描仍在运行时返回None
+        """
+        existing = self.get_job(scan_id)
+        if existing and not existing.is_finished:
+            return None
+
+        output_dir = os.path.join(self.base_dir, scan_id)
+        checkpoint = ScanCheckpoint.load(output_dir)
+        if not checkpoint or checkpoint['state'] == STATE_COMPLETED:
+            return None
+
+        self.start()
+        job = ScanJob(scan_id, checkpoint['config'], output_dir)
+        job.created_time = checkpoint.get('created_time', job.created_time)
+        job.xml_file = checkpoint['xml_file']
+        job.parts, job.merge_files = ScanCheckpoint.plan_resume(checkpoint)
+        job.pipeline = checkpoint.get('pipeline')
+        job.resume_count = checkpoint.get('resume_count', 0) + 1
+        job.commands = [part['command'] for part in job.parts]
+        job.progress.source_count = len([part for part in job.parts if not part['done']])
+
+        # 进度只统计剩余的主机
+        done_hosts = ScanCheckpoint.completed_hosts([xml_file for part in job.parts for xml_file in part.get('history', [])])
+        job.progress.total_hosts = max(0, job.progress.total_hosts - len(done_hosts))
+        return self._launch(job, on_events, on_state)
+
+    def list_resumable(self) -> List[Dict]:
+        """
+        列出输出目录中可以继续的扫描（中断、失败或取消且有检查点）
+
+        返回:
+            检查点字典列表，按扫描ID排序
+        """
+        if not os.path.exists(self.base_dir):
+            return []
+        checkpoints = []
+        for scan_id in sorted(os.listdir(self.base_dir)):
+            job = self.get_job(scan_id)
+            if job and not job.is_finished:
+                continue
+            checkpoint = ScanCheckpoint.load(os.path.join(self.base_dir, scan_id))
+            if checkpoint and checkpoint['state'] != STATE_COMPLETED \
+                    and not all(part.get('done') for part in checkpoint.get('parts', [])):
+                checkpoints.append(checkpoint)
+        return checkpoints
+
+    def _launch(self, job: ScanJob,
+                on_events: Optional[Callable[[str, List[ScanEvent]], None]],
+                on_state: Optional[Callable[[ScanJob], None]]) -> str:
+        """
+        登记任务并在事件循环中启动
+
+        参数:
+            job: 扫描任务
+            on_events: 事件回调
+            on_state: 状态回调
+
+        返回:
+            扫描ID
+        """
+        scan_id = job.scan_id
+        job.problems = job.config.pop('command_problems', [])
+
+        # 事件按时间或数量合并为批次后再回调，批处理器只在事件循环线程中使用
+        job.batcher = EventBatcher(lambda events: self._notify_events(job, events),
+                                   schedule=lambda delay, callback: self._loop.call_later(delay, callback))
+
+        with self._lock:
+            self.jobs[scan_id] = job
+            self._callbacks[scan_id] = (on_events, on_state)
+
+        self._notify_state(job)
+        future = asyncio.run_coroutine_threadsafe(self._start_job(job), self._loop)
+        future.result()
+        return scan_id
+
+    def cancel(self, scan_id: str) -> bool:
+        """
+        取消扫描任务
+
+        参数:
+            scan_id: 扫描ID
+
+        返回:
+            是否成功发出取消请求
+        """
+        job = self.get_job(scan_id)
+        if not job or job.is_finished or not job.task:
+            return False
+        self._loop.call_soon_threadsafe(job.task.cancel)
+        return True
+
+    def get_job(self, scan_id: str) -> Optional[ScanJob]:
+        """获取扫描任务"""
+        with self._lock:
+            return self.jobs.get(scan_id)
+
+    def list_jobs(self) -> List[ScanJob]:
+        """获取所有扫描任务"""
+        with self._lock:
+            return list(self.jobs.values())
+
+    def running_jobs(self) -> List[ScanJob]:
+        """获取未结束的扫描任务"""
+        return [job for job in self.list_jobs() if not job.is_finished]
+
+    async def _start_job(self, job: ScanJob):
+        """在事件循环中创建任务"""
+        job.task = asyncio.ensure_future(self._run_job(job))
+
+    async def _run_job(self, job: ScanJob):
+        """
+        执行扫描任务
+
+        参数:
+            job: 扫描任务
+        """
+        try:
+            if self._semaphore:
+                async with self._semaphore:
+                    await self._execute(job)
+            else:
+                await self._execute(job)
+        except asyncio.CancelledError:
+            await self._kill_processes(job)
+            await self._salvage(job)
+            self._finish(job, STATE_CANCELLED)
+        except FileNotFoundError:
+            await self._kill_processes(job)
+            job.error = nmap_not_found_message()
+            self._emit_line(job, job.error)
+            self._finish(job, STATE_FAILED)
+        except Exception as e:
+            await self._kill_processes(job)
+            job.error = f"未预见的错误：{str(e)}"
+            self._emit_line(job, job.error)
+            self._finish(job, STATE_FAILED)
+
+    async def _execute(self, job: ScanJob):
+        """
+        运行扫描任务的所有nmap进程并生成结果
+
+        参数:
+            job: 扫描任务
+        """
+        if not job.problems:
+            await self._acquire_slot(job)
+        job.state = STATE_RUNNING
+        job.started_time = datetime.now().isoformat()
+        job.progress.last_activity = time.time()  # 排队等待的时间不计入停滞检测
+        self._notify_state(job)
+        if job.problems:
+            for problem in job.problems:
+                self._emit_line(job, problem)
+            job.error = job.problems[0]
+            self._finish(job, STATE_FAILED)
+            return
+        watchdog = asyncio.ensure_future(self._watch_limits(job, time.time()))
+
+        # 扫描进行中增量读取XML文件，已完成的主机结果随事件批次提前发送
+        pending = [index for index, part in enumerate(job.parts) if not part['done']]
+        tailers = [NmapXmlTailer(job.parts[index]['xml_file']) for index in pending
+                   if job.parts[index].get('stage') != 'sweep']  # 存活探测的结果只用于生成第二阶段命令
+        tail_task = asyncio.ensure_future(self._tail_results(job, tailers))
+        try:
+            if job.pipeline:
+                job.return_code = await self._run_pipeline(job, tailers)
+            elif len(job.parts) == 1:
+                job.return_code = await self._run_part(job, 0)
+            else:
+                total = len(job.parts)
+                limit = asyncio.Semaphore(get_default_shard_count())
+                label = '分块' if job.parts[0].get('target_file') else '分片'
+                message = f"{label}扫描: 共 {total} 个{label}，最多 {min(len(pending), get_default_shard_count())} 个nmap进程并行"
+                if label == '分块':
+                    message += f"，{job.config.get('target_hosts', 0)} 台主机（去除重复目标 {job.config.get('target_duplicates', 0)} 个）"
+                if len(pending) < total:
+                    message += f"，继续未完成的 {len(pending)} 个{label}"
+                self._emit_line(job, message)
+
+                async def run_shard(index):
+                    async with limit:
+                        if job.error:  # 任务已被监管器终止，不再启动剩余分片
+                            return -1
+                        return await self._run_part(job, index, f"[{label} {index + 1}/{total}] ")
+
+                return_codes = await asyncio.gather(*(run_shard(index) for index in pending))
+                # 被终止的进程返回负数，任一部分失败即整体失败
+                job.return_code = next((code for code in return_codes if code), 0)
+        finally:
+            tail_task.cancel()
+            watchdog.cancel()
+        self._poll_results(job, tailers)
+
+        # 全部完成后才合并；失败时保留各部分的XML，用于继续扫描
+        if job.return_code == 0 and job.merge_files:
+            loop = asyncio.get_event_loop()
+            job.summary = await loop.run_in_executor(None, NmapXmlMerger.merge, job.merge_files, job.xml_file)
+            for part_file in job.merge_files + [part.get(key, '') for part in job.parts
+                                                for key in ('exclude_file', 'target_file')]:
+                if part_file and part_file != job.xml_file and os.path.exists(part_file):
+                    os.remove(part_file)
+            if job.summary:
+                self._emit_line(job, f"{job.summary['summary']} ({len(job.merge_files)} 个部分结果合并)")
+
+        if job.return_code == 0 and os.path.exists(job.xml_file):
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._record_timing, job)
+            job.result_counts = await loop.run_in_executor(None, self.catalog.save_results, job)
+            self._finish(job, STATE_COMPLETED)
+        else:
+            job.error = job.error or f"nmap返回码: {job.return_code}"
+            await self._salvage(job)
+            self._finish(job, STATE_FAILED)
+
+    async def _salvage(self, job: ScanJob):
+        """
+        扫描被取消、超时或失败时，修复中断的XML并合并已完成的主机，作为部分结果保存
+
+        各部分的XML文件保持不变，之后仍可继续扫描，全部完成时结果文件会被完整结果覆盖。
+
+        参数:
+            job: 扫描任务
+        """
+        xml_files = list(job.merge_files) or [xml_file for part in job.parts
+                                              for xml_file in part.get('history', []) + [part['xml_file']]]
+        if not job.xml_file or not xml_files:
+            return
+        loop = asyncio.get_event_loop()
+        try:
+            summary = await loop.run_in_executor(None, NmapXmlMerger.merge, xml_files, job.xml_file, True)
+            if not summary or not summary['total']:
+                return
+            job.summary = summary
+            job.partial = True
+            job.result_counts = await loop.run_in_executor(None, self.catalog.save_results, job)
+        except (OSError, ValueError):
+            return  # 部分结果无法保存时不影响任务结束
+        self._emit_line(job, f"已保存中断前完成的 {summary['total']} 台主机的结果（{summary['hosts_up']} 台存活），"
+                             f"结果不完整，可继续扫描")
+
+    async def _run_pipeline(self, job: ScanJob, tailers: List[NmapXmlTailer]) -> int:
+        """
+        运行两阶段扫描：存活和端口探测进行中，每完成一批主机就立即启动对这些主机的深度扫描
+
+        开放端口相同的主机合并为一个nmap进程，只扫描这些端口；恢复扫描时已生成过深度扫描的主机不再重复。
+
+        参数:
+            job: 扫描任务
+            tailers: 结果增量解析器列表，新的深度扫描输出文件会加入其中
+
+        返回:
+            第一个非0的进程返回码，全部成功时为0
+        """
+        sweep = job.parts[0]
+        sweep_tailers = [NmapXmlTailer(xml_file) for xml_file in sweep.get('history', []) + [sweep['xml_file']]]
+        queued = {host for part in job.parts[1:] for host in part.get('hosts', [])}
+        limit = asyncio.Semaphore(get_default_shard_count())
+        tasks = []
+
+        async def run_deep(index):
+            async with limit:
+                if job.error:  # 任务已被监管器终止，不再启动剩余批次
+                    return -1
+                return await self._run_part(job, index, f"[深度扫描 {index}] ")
+
+        def dispatch():
+            # 按开放端口分组，每组生成一个深度扫描部分
+            groups = {}
+            for tailer in sweep_tailers:
+                for host_info in tailer.poll():
+                    ports = tuple(sorted({(port['protocol'], port['port']) for port in host_info['ports']
+                                          if port['state'] == 'open'}, key=lambda item: (item[0], int(item[1]))))
+                    if ports and host_info['ip'] and host_info['ip'] not in queued:
+                        queued.add(host_info['ip'])
+                        groups.setdefault(ports, []).append(host_info['ip'])
+
+            for ports, hosts in groups.items():
+                index = len(job.parts)
+                merged_base, _ = os.path.splitext(job.xml_file)
+                xml_file = f"{merged_base}.deep{index}.xml"
+                command = NmapCommandBuilder.build_deep_command(job.pipeline['deep_options'], hosts, ports,
+                                                                xml_file, index)
+                job.parts.append({'command': command, 'xml_file': xml_file, 'done': False,
+                                  'stage': 'deep', 'hosts': hosts})
+                job.merge_files.append(xml_file)
+                job.commands.append(command)
+                tailers.append(NmapXmlTailer(xml_file))
+                job.progress.total_hosts += len(hosts)
+                job.progress.source_count += 1
+                tasks.append(asyncio.ensure_future(run_deep(index)))
+            if groups:
+                ScanCheckpoint.save(job)
+                self._emit_line(job, f"深度扫描: 已为 {len(queued)} 台存活主机生成 {len(job.parts) - 1} 个批次")
+
+        # 恢复扫描时未完成的深度扫描批次继续执行
+        tasks.extend(asyncio.ensure_future(run_deep(index)) for index, part in enumerate(job.parts)
+                     if index > 0 and not part['done'])
+        sweep_task = None
+        try:
+            sweep_code = 0
+            if not sweep['done']:
+                if job.pipeline.get('import'):
+                    sweep_task = asyncio.ensure_future(self._run_import_part(job, 0, "[导入发现结果] "))
+                elif job.pipeline.get('connect'):
+                    sweep_task = asyncio.ensure_future(self._run_connect_part(job, 0, "[存活探测] "))
+                else:
+                    sweep_task = asyncio.ensure_future(self._run_part(job, 0, "[存活探测] "))
+                while not sweep_task.done():
+                    await asyncio.wait([sweep_task], timeout=RESULT_POLL_INTERVAL)
+                    dispatch()
+                sweep_code = sweep_task.result()
+            dispatch()
+
+            return_codes = await asyncio.gather(*tasks) if tasks else []
+            if not job.merge_files:
+                # 没有发现开放端口时以存活探测结果作为最终结果
+                job.merge_files = [xml_file for xml_file in sweep.get('history', []) + [sweep['xml_file']]
+                                   if os.path.exists(xml_file)]
+            return next((code for code in [sweep_code] + list(return_codes) if code), 0)
+        finally:
+            # 任务取消时同时取消尚未启动的批次
+            for task in tasks + ([sweep_task] if sweep_task else []):
+                task.cancel()
+
+    @staticmethod
+    def _record_timing(job: ScanJob):
+        """将扫描结果计入子网时序统计和吞吐量统计，供之后的扫描调优和开销预估"""
+        try:
+            elapsed = (datetime.now() - datetime.fromisoformat(job.started_time)).total_seconds()
+            TimingTuner.record(job.xml_file, job.timing, elapsed, job.config.get('timing_tuned', False),
+                               TimingTuner.profile(job.commands[0], job.scan_type))
+            if not job.pipeline and not job.resume_count:
+                # 两阶段扫描和继续的扫描耗时与目标规模不成比例，不用于校准开销预估
+                CostEstimator.record(job.commands[0], job.scan_type, job.target, elapsed,
+                                     hosts=job.config.get('target_hosts', 0))
+        except (OSError, ValueError):
+            pass  # 统计失败不影响扫描结果
+
+    async def _run_part(self, job: ScanJob, index: int, prefix: str = '') -> int:
+        """
+        运行扫描的一个部分，成功后更新检查点
+
+        参数:
+            job: 扫描任务
+            index: 部分序号
+            prefix: 输出行前缀（分片模式使用）
+
+        返回:
+            进程返回码
+        """
+        part = job.parts[index]
+        return_code = await self._run_process(job, part['command'], prefix, index)
+        if return_code == 0:
+            part['done'] = True
+            ScanCheckpoint.save(job)
+        return return_code
+
+    async def _run_connect_part(self, job: ScanJob, index: int, prefix: str = '') -> int:
+        """
+        用TCP连接扫描执行两阶段扫描的存活和端口探测，结果写入该部分的XML文件
+
+        参数:
+            job: 扫描任务
+            index: 部分序号
+            prefix: 输出行前缀
+
+        返回:
+            0表示完成
+        """
+        part = job.parts[index]
+        target = job.pipeline['connect']['target']
+        ports = ConnectScanner.parse_ports(job.pipeline['connect']['ports'])
+
+        def on_host(host_info):
+            # 与nmap相同格式的输出行，用于显示和统计进度
+            for port in host_info['ports']:
+                self._emit_line(job, f"Discovered open port {port['port']}/tcp on {host_info['ip']}",
+                                prefix=prefix, source=index)
+
+        governor = get_rate_governor()
+        rate_key = f"{job.scan_id}:{index}"
+        try:
+            rate = await self._acquire_rate(job, rate_key, prefix)
+            self._emit_line(job, f"{prefix}TCP连接扫描: {TargetSharder.count_hosts(target)} 台主机，{len(ports)} 个端口")
+            hosts = await ConnectScanner(rate=rate).scan(target, ports, part['xml_file'], on_host)
+        finally:
+            governor.release(rate_key)
+
+        self._emit_line(job, f"{prefix}连接扫描完成: {len(hosts)} 台主机存活")
+        part['done'] = True
+        ScanCheckpoint.save(job)
+        return 0
+
+    async def _run_import_part(self, job: ScanJob, index: int, prefix: str = '') -> int:
+        """
+        将外部工具的发现结果转换为该部分的XML文件，作为两阶段扫描的第一阶段
+
+        参数:
+            job: 扫描任务
+            index: 部分序号
+            prefix: 输出行前缀
+
+        返回:
+            0表示完成
+        """
+        part = job.parts[index]
+        discovery_file = job.pipeline['import']['file']
+        self._emit_line(job, f"{prefix}读取 {discovery_file}")
+        loop = asyncio.get_event_loop()
+        stats = await loop.run_in_executor(None, DiscoveryImporter.write_xml, discovery_file, part['xml_file'])
+        self._emit_line(job, f"{prefix}导入 {stats['hosts']} 台主机的 {stats['ports']} 个开放端口")
+        part['done'] = True
+        ScanCheckpoint.save(job)
+        return 0
+
+    async def _acquire_slot(self, job: ScanJob):
+        """
+        从全局任务队列申请运行名额，按优先级排队等待
+
+        参数:
+            job: 扫描任务
+        """
+        queue = get_job_queue()
+        if queue.try_acquire(job.scan_id, job.priority, lambda: self._pause_job(job), lambda: self._resume_job(job)):
+            return
+        self._emit_line(job, f"任务队列已满（最多同时运行 {queue.max_running} 个扫描），按优先级排队等待")
+        while not queue.try_acquire(job.scan_id, job.priority,
+                                    lambda: self._pause_job(job), lambda: self._resume_job(job)):
+            await asyncio.sleep(QUEUE_POLL_INTERVAL)
+
+    def _pause_job(self, job: ScanJob) -> bool:
+        """
+        暂停任务的nmap进程，为更高优先级的任务让出名额（可能在其他线程中调用）
+
+        参数:
+            job: 扫描任务
+
+        返回:
+            是否已暂停，进程组无法暂停时返回False
+        """
+        running = [process for process in job.processes if process.returncode is None]
+        if job.is_finished or not all(self.supervisor.suspend_group(process.pid) for process in running):
+            for process in running:
+                self.supervisor.resume_group(process.pid)
+            return False
+        job.paused = True
+        self._loop.call_soon_threadsafe(self._emit_line, job, "高优先级扫描正在运行，本扫描已暂停")
+        return True
+
+    def _resume_job(self, job: ScanJob):
+        """
+        恢复被暂停的任务（可能在其他线程中调用）
+
+        参数:
+            job: 扫描任务
+        """
+        job.paused = False
+        for process in job.processes:
+            if process.returncode is None:
+                self.supervisor.resume_group(process.pid)
+        self._loop.call_soon_threadsafe(self._emit_line, job, "已恢复扫描")
+
+    async def _acquire_rate(self, job: ScanJob, rate_key: str, prefix: str = '') -> int:
+        """
+        从全局发包速率预算中申请一份速率，预算不足时等待
+
+        参数:
+            job: 扫描任务
+            rate_key: 进程键
+            prefix: 输出行前缀
+
+        返回:
+            分配的速率，未启用预算时为0
+        """
+        governor = get_rate_governor()
+        rate = governor.try_acquire(rate_key)
+        if rate is None:
+            self._emit_line(job, f"{prefix}等待发包速率配额（全局预算 {governor.budget} 包/秒）")
+            while rate is None:
+                await asyncio.sleep(ACQUIRE_POLL_INTERVAL)
+                job.progress.last_activity = time.time()  # 等待配额不计入停滞检测
+                rate = governor.try_acquire(rate_key)
+        if rate:
+            self._emit_line(job, f"{prefix}分配发包速率: {rate} 包/秒")
+        return rate
+
+    async def _run_process(self, job: ScanJob, command: List[str], prefix: str = '', source: int = 0) -> int:
+        """
+        运行单个nmap子进程并转发输出
+
+        参数:
+            job: 扫描任务
+            command: nmap命令
+            prefix: 输出行前缀（分片模式使用）
+            source: 分片序号，用于分别统计各进程的进度
+
+        返回:
+            进程返回码
+        """
+        # 从全局发包速率预算中申请一份速率，进程结束后归还
+        governor = get_rate_governor()
+        rate_key = f"{job.scan_id}:{source}"
+        try:
+            rate = await self._acquire_rate(job, rate_key, prefix)
+            return await self._run_nmap(job, RateGovernor.apply_rate(command, rate), prefix, source)
+        finally:
+            governor.release(rate_key)
+
+    async def _run_nmap(self, job: ScanJob, command: List[str], prefix: str, source: int) -> int:
+        """
+        启动nmap子进程并逐行转发输出
+
+        参数:
+            job: 扫描任务
+            command: nmap命令
+            prefix: 输出行前缀
+            source: 分片序号
+
+        返回:
+            进程返回码
+        """
+        # nmap在独立进程组中运行，取消或超时时连同子进程一起终止
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            **self.supervisor.popen_kwargs(job.limits))
+        job.processes.append(process)
+        self.supervisor.apply_limits(process.pid, job.limits)
+        self.supervisor.register(process.pid, job.scan_id, command)
+        if job.paused:
+            self.supervisor.suspend_group(process.pid)  # 任务暂停期间启动的进程（如下一个分片）同样暂停
+        parser = NmapEventParser()  # 每个进程单独保存主机上下文
+
+        try:
+            # 按块读取输出，每次读取得到的所有行作为一批解析
+            async for batch in aiter_line_batches(process.stdout):
+                lines = [line.strip() for line in batch]
+                lines = [line for line in lines if line]
+                # 分片模式下避免单个分片的完成信息被误认为整个扫描结束
+                if prefix:
+                    lines = [line.replace('Nmap done', '分片完成', 1) if line.startswith('Nmap done') else line
+                             for line in lines]
+                self._emit_lines(job, lines, parser, prefix, source)
+
+            return await process.wait()
+        finally:
+            self.supervisor.unregister(process.pid)
+
+    async def _watch_limits(self, job: ScanJob, started: float):
+        """
+        监控任务的运行时间和输出，超限或停滞时终止所有nmap进程
+
+        参数:
+            job: 扫描任务
+            started: 开始运行的时间戳
+        """
+        while True:
+            await asyncio.sleep(1)
+            if job.paused:
+                # 暂停的时间不计入运行时间和停滞检测
+                started += 1
+                job.progress.last_activity = time.time()
+                continue
+            reason = self.supervisor.check_limits(started, job.progress, job.limits)
+            if reason:
+                job.error = f"错误：{reason}"
+                self._emit_line(job, job.error)
+                await self._kill_processes(job)
+                return
+
+    async def _tail_results(self, job: ScanJob, tailers: List[NmapXmlTailer]):
+        """
+        定期读取XML结果文件直到任务被取消
+
+        参数:
+            job: 扫描任务
+            tailers: 各输出文件的增量解析器
+        """
+        while True:
+            await asyncio.sleep(RESULT_POLL_INTERVAL)
+            self._poll_results(job, tailers)
+
+    def _poll_results(self, job: ScanJob, tailers: List[NmapXmlTailer]):
+        """将新完成的主机结果加入事件批次"""
+        for tailer in tailers:
+            for host_info in tailer.poll():
+                job.batcher.add(host_result_event(host_info))
+
+    async def _kill_processes(self, job: ScanJob):
+        """终止任务的所有子进程"""
+        for process in job.processes:
+            if process.returncode is None:
+                self.supervisor.kill_group(process.pid)
+                await process.wait()
+
+    def _finish(self, job: ScanJob, state: str):
+        """更新任务结束状态"""
+        get_job_queue().release(job.scan_id)
+        job.paused = False
+        job.batcher.flush()  # 先发送剩余事件，保证事件先于结束状态到达
+        job.state = state
+        job.finished_time = datetime.now().isoformat()
+        job.log.close()
+        self._notify_state(job)
+
+    def _emit_line(self, job: ScanJob, line: str, parser: Optional[NmapEventParser] = None, prefix: str = '',
+                   source: int = 0):
+        """
+        将输出行解析为事件，更新进度并加入批次
+
+        参数:
+            job: 扫描任务
+            line: 输出行
+            parser: 所属进程的事件解析器，管理器自身的提示信息可不传
+            prefix: 显示用的行前缀（分片模式使用），不参与解析
+            source: 分片序号
+        """
+        self._emit_lines(job, [line], parser or NmapEventParser(), prefix, source)
+
+    def _emit_lines(self, job: ScanJob, lines: List[str], parser: NmapEventParser, prefix: str = '',
+                    source: int = 0):
+        """
+        将一批输出行解析为事件，更新进度后整批加入批次
+
+        参数:
+            job: 扫描任务
+            lines: 输出行列表
+            parser: 所属进程的事件解析器
+            prefix: 显示用的行前缀（分片模式使用），不参与解析
+            source: 分片序号
+        """
+        events = []
+        for line in lines:
+            event = parser.parse_line(line)
+            job.progress.update(event, source)
+            job.timing.observe(line)
+            if prefix:
+                event = event._replace(line=prefix + line)
+            self._write_log(job, event.line)
+            events.append(event)
+        job.batcher.extend(events)
+
+    @staticmethod
+    def _write_log(job: ScanJob, line: str):
+        """将输出行追加到扫描目录的原始输出文件，继续扫描时接在原有输出之后"""
+        try:
+            job.log.write(line)
+        except OSError:
+            pass  # 原始输出只用于回看，写入失败不影响扫描
+
+    def _notify_events(self, job: ScanJob, events: List[ScanEvent]):
+        """发送事件批次"""
+        on_events, _ = self._callbacks.get(job.scan_id, (None, None))
+        if on_events:
+            on_events(job.scan_id, events)
+
+    def _notify_state(self, job: ScanJob):
+        """保存检查点、更新扫描索引并发送状态变化"""
+        ScanCheckpoint.save(job)
+        self.catalog.record(job)
+        _, on_state = self._callbacks.get(job.scan_id, (None, None))
+        if on_state:
+            on_state(job)
@@ -0,0 +1,212 @@
+"""
+扫描进度模块，根据nmap的 --stats-every 输出计算真实的扫描进度
+"""
+
+import time
+import threading
+from typing import Dict, Optional
+
+from src.core.scan_events import ScanEvent, EVENT_STATS, EVENT_DONE, EVENT_HOST_UP, EVENT_PORT
+
+
+# 默认的nmap统计输出间隔
+DEFAULT_STATS_INTERVAL = '10s'
+
+# 超过该时间（秒）没有任何输出时视为扫描停滞
+DEFAULT_STALL_WINDOW = 300
+
+
+def parse_clock(text: str) -> int:
+    """
+    将 h:mm:ss 或 mm:ss 格式的时间转换为秒数
+
+    参数:
+        text: 时间字符串
+
+    返回:
+        秒数，格式错误时返回0
+    """
+    try:
+        seconds = 0
+        for part in text.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except ValueError:
+        return 0
+
+
+class ScanProgress:
+    """
+    扫描进度模型，记录总体进度、各阶段进度和主机吞吐量
+
+    分片扫描时每个nmap进程作为一个来源(source)分别统计，再汇总为整体进度。
+    """
+
+    def __init__(self, total_hosts: int = 0, stall_window: int = DEFAULT_STALL_WINDOW, source_count: int = 1):
+        """
+        初始化进度模型
+
+        参数:
+            total_hosts: 目标主机总数，未知时为0
+            stall_window: 判定停滞的无输出时长（秒）
+            source_count: 输出进度的nmap进程数（分片数）
+        """
+        self.total_hosts = total_hosts
+        self.source_count = source_count
+        self.stall_window = stall_window
+        self.started_time = time.time()
+        self.last_activity = self.started_time
+        self.current_phase = ''
+        self.eta = ''
+        self.remaining = ''
+        self.finished = False
+        self._phase_percent = {}  # 阶段 -> {来源: 百分比}
+        self._sources = {}        # 来源 -> 主机统计
+        self._lock = threading.Lock()
+
+    def update(self, event: ScanEvent, source: int = 0) -> bool:
+        """
+        根据扫描事件更新进度
+
+        参数:
+            event: 扫描事件
+            source: 事件来源（分片序号）
+
+        返回:
+            进度是否发生变化
+        """
+        with self._lock:
+            self.last_activity = time.time()
+
+            if event.type == EVENT_DONE:
+                self.finished = True
+                return True
+
+            if event.type != EVENT_STATS:
+                return event.type in (EVENT_HOST_UP, EVENT_PORT)
+
+            data = event.data
+            stats = self._sources.setdefault(source, {
+                'hosts_completed': 0, 'hosts_up': 0, 'hosts_undergoing': 0, 'percent': 0.0, 'elapsed': 0,
+                'host_stats': False
+            })
+            phase = data.get('phase', '')
+            if phase:
+                self.current_phase = phase
+
+            if 'hosts_completed' in data:
+                stats['hosts_completed'] = data['hosts_completed']
+                stats['hosts_up'] = data['hosts_up']
+                stats['hosts_undergoing'] = data['hosts_undergoing']
+                stats['elapsed'] = parse_clock(data.get('elapsed', ''))
+                stats['host_stats'] = True
+
+            if 'percent' in data:
+                stats['percent'] = data['percent']
+                self._phase_percent.setdefault(phase, {})[source] = data['percent']
+                if data.get('etc'):
+                    self.eta = data['etc']
+                    self.remaining = data.get('remaining', '')
+            elif data.get('status') == 'started':
+                stats['percent'] = 0.0
+                self._phase_percent.setdefault(phase, {})[source] = 0.0
+
+            return True
+
+    @property
+    def hosts_completed(self) -> int:
+        """已完成的主机数"""
+        with self._lock:
+            return sum(stats['hosts_completed'] for stats in self._sources.values())
+
+    @property
+    def hosts_up(self) -> int:
+        """已发现的存活主机数"""
+        with self._lock:
+            return sum(stats['hosts_up'] for stats in self._sources.values())
+
+    def overall_percent(self) -> float:
+        """
+        计算总体进度
+
+        已知主机总数且各来源都输出过主机统计时按"已完成主机 + 正在扫描主机 × 当前阶段进度"估算，
+        否则使用当前阶段的平均进度。结束前最高为99%。
+
+        返回:
+            0-100 之间的百分比
+        """
+        with self._lock:
+            if self.finished:
+                return 100.0
+            if not self._sources:
+                return 0.0
+
+            if self.total_hosts and all(stats['host_stats'] for stats in self._sources.values()):
+                done = sum(stats['hosts_completed'] + stats['hosts_undergoing'] * stats['percent'] / 100
+                           for stats in self._sources.values())
+                percent = 100.0 * done / self.total_hosts
+            else:
+                # 尚未输出进度的分片按0%计算，避免进度回退
+                sources = max(self.source_count, len(self._sources))
+                percent = sum(stats['percent'] for stats in self._sources.values()) / sources
+            return min(percent, 99.0)
+
+    def phase_progress(self) -> Dict[str, float]:
+        """
+        获取各阶段进度
+
+        返回:
+            {阶段名称: 百分比} 字典
+        """
+        with self._lock:
+            return {phase: sum(values.values()) / len(values)
+                    for phase, values in self._phase_percent.items() if values}
+
+    def hosts_per_second(self) -> float:
+        """
+        计算主机吞吐量
+
+        返回:
+            每秒完成的主机数
+        """
+        with self._lock:
+            elapsed = max((stats['elapsed'] for stats in self._sources.values()), default=0)
+            completed = sum(stats['hosts_completed'] for stats in self._sources.values())
+        if not elapsed:
+            elapsed = time.time() - self.started_time
+        return completed / elapsed if elapsed > 0 else 0.0
+
+    def is_stalled(self, now: Optional[float] = None) -> bool:
+        """
+        判断扫描是否停滞
+
+        参数:
+            now: 当前时间戳，默认为time.time()
+
+        返回:
+            超过停滞窗口没有任何输出时返回True
+        """
+        if self.finished or not self.stall_window:
+            return False
+        return (now or time.time()) - self.last_activity > self.stall_window
+
+    def to_dict(self) -> Dict:
+        """
+        转换为可序列化的字典
+
+        返回:
+            进度信息字典
+        """
+        return {
+            'percent': round(self.overall_percent(), 2),
+            'phase': self.current_phase,
+            'phases': self.phase_progress(),
+            'eta': self.eta,
+            'remaining': self.remaining,
+            'hosts_total': self.total_hosts,
+            'hosts_completed': self.hosts_completed,
+            'hosts_up': self.hosts_up,
+            'hosts_per_second': round(self.hosts_per_second(), 3),
+            'stalled': self.is_stalled(),
+            'finished': self.finished
+        }
@@ -0,0 +1,316 @@
+"""
+分片扫描模块，负责将大范围目标拆分为多个分片，并合并各分片的XML输出
+"""
+
+import os
+import re
+import ipaddress
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import Dict, List, Optional
+
+
+# 修复中断的XML文件时每次读取的字节数
+XML_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def get_default_shard_count() -> int:
+    """
+    获取默认分片数量（CPU核心数）
+
+    返回:
+        默认分片数量
+    """
+    return os.cpu_count() or 1
+
+
+class TargetSharder:
+    """
+    用于将目标表达式拆分为多个分片的类
+    """
+
+    # 形如 192.168.1.1-254 的末段范围
+    _OCTET_RANGE_PATTERN = re.compile(r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.)(\d{1,3})-(\d{1,3})$')
+
+    @staticmethod
+    def split_targets(target: str, shard_count: int) -> List[List[str]]:
+        """
+        按CIDR块和主机数量将目标拆分为分片
+
+        参数:
+            target: 目标表达式，支持CIDR、单个IP、末段范围（如 10.0.0.1-100）
+                    以及逗号或空格分隔的多个目标，无法识别的目标（如域名）作为不可拆分的整体
+            shard_count: 期望的分片数量
+
+        返回:
+            分片列表，每个分片是一组可直接作为nmap参数的目标字符串
+        """
+        blocks = TargetSharder._parse_blocks(target)
+        if not blocks:
+            return []
+
+        shard_count = max(1, int(shard_count or 1))
+        total = sum(TargetSharder._block_size(block) for block in blocks)
+        per_shard = max(1, -(-total // shard_count))  # 向上取整
+
+        shards = []
+        current = []
+        current_size = 0
+        queue = deque(blocks)
+        while queue:
+            block = queue.popleft()
+            size = TargetSharder._block_size(block)
+            room = per_shard - current_size
+
+            # 网段超出当前分片剩余容量时对半拆分
+            if size > room and not isinstance(block, str) and block.num_addresses > 1:
+                queue.extendleft(reversed(list(block.subnets(prefixlen_diff=1))))
+                continue
+
+            current.append(block)
+            current_size += size
+            if current_size >= per_shard:
+                shards.append(current)
+                current = []
+                current_size = 0
+
+        if current:
+            shards.append(current)
+
+        return [TargetSharder._format_blocks(shard) for shard in shards]
+
+    @staticmethod
+    def count_hosts(target: str) -> int:
+        """
+        统计目标表达式包含的主机数
+
+        参数:
+            target: 目标表达式
+
+        返回:
+            主机数，无法识别的目标按1个计算
+        """
+        return sum(TargetSharder._block_size(block) for block in TargetSharder._parse_blocks(target))
+
+    @staticmethod
+    def _parse_blocks(target: str) -> list:
+        """
+        将目标表达式解析为网段块列表
+
+        参数:
+            target: 目标表达式
+
+        返回:
+            由ip_network对象和不可拆分字符串组成的列表
+        """
+        blocks = []
+        for token in re.split(r'[,\s]+', target.strip()):
+            if not token:
+                continue
+
+            match = TargetSharder._OCTET_RANGE_PATTERN.match(token)
+            if match:
+                prefix, start, end = match.groups()
+                try:
+                    first = ipaddress.ip_address(f"{prefix}{start}")
+                    last = ipaddress.ip_address(f"{prefix}{end}")
+                    if first <= last:
+                        blocks.extend(ipaddress.summarize_address_range(first, last))
+                        continue
+                except ValueError:
+                    pass
+                blocks.append(token)
+                continue
+
+            try:
+                blocks.append(ipaddress.ip_network(token, strict=False))
+            except ValueError:
+                # 域名或其他nmap语法，保持原样
+                blocks.append(token)
+
+        return blocks
+
+    @staticmethod
+    def _block_size(block) -> int:
+        """获取网段块包含的地址数"""
+        if isinstance(block, str):
+            return 1
+        return block.num_addresses
+
+    @staticmethod
+    def _format_blocks(blocks: list) -> List[str]:
+        """
+        将分片内的网段块合并并转换为目标字符串
+
+        参数:
+            blocks: 网段块列表
+
+        返回:
+            目标字符串列表
+        """
+        networks = {4: [], 6: []}
+        others = []
+        for block in blocks:
+            if isinstance(block, str):
+                others.append(block)
+            else:
+                networks[block.version].append(block)
+
+        targets = []
+        for version_networks in networks.values():
+            for network in ipaddress.collapse_addresses(version_networks):
+                if network.num_addresses == 1:
+                    targets.append(str(network.network_address))
+                else:
+                    targets.append(str(network))
+        return targets + others
+
+
+class NmapXmlMerger:
+    """
+    用于合并多个nmap XML输出文件的类
+    """
+
+    @staticmethod
+    def merge(xml_files: List[str], output_file: str, partial: bool = False) -> Optional[Dict]:
+        """
+        合并多个分片的XML结果为一个标准的nmaprun文档
+
+        合并后的文件结构与单次nmap扫描一致，可直接由NmapOutputParser和
+        AssetMonitor解析。缺失的分片文件会被跳过，未写完的文件只保留已完成的主机。
+        输出文件可以是输入文件之一（先读取全部输入再写出），用于修复单个中断的XML文件。
+
+        参数:
+            xml_files: 分片XML文件路径列表
+            output_file: 合并后的输出文件路径
+            partial: 扫描是否被中断，为True时结束信息标记为错误退出，表示结果不完整
+
+        返回:
+            合并统计信息字典，没有可用分片时返回None
+        """
+        merged_root = None
+        hosts_up = 0
+        hosts_down = 0
+        finished_time = 0
+        elapsed = 0.0
+        merged_count = 0
+
+        for xml_file in xml_files:
+            root = NmapXmlMerger.load_root(xml_file)
+            if root is None:
+                continue
+
+            merged_count += 1
+            if merged_root is None:
+                # 以第一个分片为基础，保留scaninfo、verbose等头部元素
+                merged_root = ET.Element(root.tag, dict(root.attrib))
+                for child in root:
+                    if child.tag not in ('host', 'runstats', 'taskbegin', 'taskend', 'taskprogress'):
+                        merged_root.append(child)
+
+            for host in root.findall('host'):
+                merged_root.append(host)
+
+            runstats = root.find('runstats')
+            if runstats is not None:
+                hosts = runstats.find('hosts')
+                if hosts is not None:
+                    hosts_up += int(hosts.get('up', 0))
+                    hosts_down += int(hosts.get('down', 0))
+                finished = runstats.find('finished')
+                if finished is not None:
+                    finished_time = max(finished_time, int(finished.get('time', 0) or 0))
+                    elapsed = max(elapsed, float(finished.get('elapsed', 0) or 0))
+            else:
+                # 分片未正常结束时按host元素统计
+                for host in root.findall('host'):
+                    status = host.find('status')
+                    if status is not None and status.get('state') == 'up':
+                        hosts_up += 1
+                    else:
+                        hosts_down += 1
+
+        if merged_root is None:
+            return None
+
+        total = hosts_up + hosts_down
+        summary = f"Nmap done: {total} IP addresses ({hosts_up} hosts up) scanned in {elapsed:.2f} seconds"
+        runstats = ET.SubElement(merged_root, 'runstats')
+        finished = {
+            'time': str(finished_time),
+            'elapsed': f"{elapsed:.2f}",
+            'summary': summary,
+            'exit': 'success'
+        }
+        if partial:
+            finished.update({'exit': 'error', 'errormsg': '扫描被中断，结果只包含已完成的主机'})
+        ET.SubElement(runstats, 'finished', finished)
+        ET.SubElement(runstats, 'hosts', {
+            'up': str(hosts_up),
+            'down': str(hosts_down),
+            'total': str(total)
+        })
+
+        output_dir = os.path.dirname(output_file)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        ET.ElementTree(merged_root).write(output_file, encoding='utf-8', xml_declaration=True)
+
+        return {
+            'shards': merged_count,
+            'hosts_up': hosts_up,
+            'hosts_down': hosts_down,
+            'total': total,
+            'elapsed': elapsed,
+            'summary': summary,
+            'partial': partial
+        }
+
+    @staticmethod
+    def load_root(xml_file: str) -> Optional[ET.Element]:
+        """
+        读取nmap XML文件的根元素
+
+        nmap被中断时XML文件没有结束标签，此时只保留已经完整写入的子元素。
+
+        参数:
+            xml_file: XML文件路径
+
+        返回:
+            nmaprun根元素，文件不存在或没有可用内容时返回None
+        """
+        if not os.path.exists(xml_file):
+            return None
+        try:
+            return ET.parse(xml_file).getroot()
+        except ET.ParseError:
+            pass
+
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        root = None
+        completed = set()
+        depth = 0
+        try:
+            with open(xml_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(XML_READ_CHUNK_SIZE), b''):
+                    parser.feed(chunk)
+                    # 遇到损坏的内容时，之前的事件仍会先返回，随后才抛出ParseError
+                    for event, element in parser.read_events():
+                        if event == 'start':
+                            depth += 1
+                            if root is None:
+                                root = element
+                        else:
+                            if depth == 2:
+                                completed.add(id(element))
+                            depth -= 1
+        except (OSError, ET.ParseError):
+            pass
+
+        if root is None:
+            return None
+        # 移除写到一半的子元素
+        for child in list(root):
+            if id(child) not in completed:
+                root.remove(child)
+        return root
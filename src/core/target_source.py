@@ -0,0 +1,222 @@
+"""
+目标来源模块，从文本、文件或生成器中流式读取扫描目标，在有限内存内去重后写入分块的 -iL 目标文件
+"""
+
+import os
+import re
+import math
+import hashlib
+import ipaddress
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.core.shard_executor import TargetSharder
+
+
+# 每个分块文件包含的最大主机数，每个分块由一个nmap进程通过 -iL 读取
+DEFAULT_CHUNK_HOSTS = 4096
+
+# 去重时最多记住的目标数量（每个目标约占用60字节），超过后新目标只与已记住的目标比较
+MAX_DEDUP_ENTRIES = 1000000
+
+# 目标文本超过该长度（字符）时也写入分块文件，避免超出命令行长度限制
+INLINE_TARGET_LIMIT = 4096
+
+# 单个网段最多拆分的分块数，超过时整个网段作为一个分块（如IPv6大网段）
+MAX_BLOCK_SPLITS = 65536
+
+# 目标之间的分隔符，与nmap -iL 相同：空白，另外接受逗号和分号
+TARGET_SEPARATOR_PATTERN = re.compile(r'[,;\s]+')
+
+# 已是规范写法的IPv4地址（无前导零），无需经过ipaddress解析
+CANONICAL_IPV4_PATTERN = re.compile(r'^(?:(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)$')
+
+# 分块目标文件名，序号从1开始
+CHUNK_FILENAME = 'targets.chunk{index}.txt'
+
+
+class TargetSource:
+    """
+    扫描目标来源
+
+    按顺序读取目标文本、目标文件（每行一个或多个目标，# 之后为注释）和生成器，
+    规范化后去重：IP地址和网段统一写法，域名转为小写，其他nmap语法（如 10.0.0.1-100）保持原样。
+    去重只保存目标的8字节摘要，记住的目标数量有上限，目标列表不需要完整放入内存。
+    """
+
+    def __init__(self, text: str = '', files: Optional[List[str]] = None, items: Optional[Iterable[str]] = None,
+                 max_dedup_entries: int = MAX_DEDUP_ENTRIES):
+        """
+        初始化目标来源
+
+        参数:
+            text: 目标表达式文本，多个目标用空白或逗号分隔
+            files: 目标文件路径列表
+            items: 目标的可迭代对象（如生成器），只能读取一次
+            max_dedup_entries: 去重时最多记住的目标数量
+        """
+        self.text = text or ''
+        self.files = list(files or [])
+        self.items = items
+        self.max_dedup_entries = max_dedup_entries
+        self.duplicates = 0
+
+    @staticmethod
+    def is_large(text: str) -> bool:
+        """
+        目标文本是否过长，需要写入分块文件而不是作为命令行参数
+
+        参数:
+            text: 目标表达式文本
+
+        返回:
+            是否过长
+        """
+        return len(text or '') > INLINE_TARGET_LIMIT
+
+    @staticmethod
+    def option_tokens(text: str) -> List[str]:
+        """
+        找出目标文本中以 - 开头的部分，这些部分放在nmap命令行上会被当作选项解析
+
+        参数:
+            text: 目标表达式文本
+
+        返回:
+            以 - 开头的目标列表
+        """
+        return [token for token in TARGET_SEPARATOR_PATTERN.split(text or '') if token.startswith('-')]
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        """
+        逐个读取去重后的目标
+
+        返回:
+            (目标, 主机数) 迭代器
+        """
+        seen = set()
+        self.duplicates = 0
+        for token in self._iter_tokens():
+            target, hosts = self._normalize(token)
+            digest = hashlib.blake2b(target.encode('utf-8'), digest_size=8).digest()
+            if digest in seen:
+                self.duplicates += 1
+                continue
+            if len(seen) < self.max_dedup_entries:
+                seen.add(digest)
+            yield target, hosts
+
+    def count(self) -> Dict:
+        """
+        统计去重后的目标数和主机数，不写入文件
+
+        返回:
+            统计字典: targets, hosts, duplicates
+        """
+        targets = 0
+        hosts = 0
+        for _, size in self:
+            targets += 1
+            hosts += size
+        return {'targets': targets, 'hosts': hosts, 'duplicates': self.duplicates}
+
+    def write_chunks(self, output_dir: str, chunk_hosts: int = DEFAULT_CHUNK_HOSTS) -> Dict:
+        """
+        将目标写入分块文件，每个分块最多包含 chunk_hosts 台主机，超过的网段拆分到多个分块
+
+        参数:
+            output_dir: 分块文件所在目录
+            chunk_hosts: 每个分块的最大主机数
+
+        返回:
+            统计字典: files（分块文件路径列表）, targets, hosts, duplicates
+        """
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        chunk_hosts = max(1, int(chunk_hosts or DEFAULT_CHUNK_HOSTS))
+        files = []
+        targets = 0
+        total_hosts = 0
+        current = None
+        current_hosts = 0
+
+        try:
+            for target, hosts in self:
+                targets += 1
+                total_hosts += hosts
+                for piece, piece_hosts in self._split(target, hosts, chunk_hosts):
+                    if current is None or (current_hosts and current_hosts + piece_hosts > chunk_hosts):
+                        if current is not None:
+                            current.close()
+                        files.append(os.path.join(output_dir, CHUNK_FILENAME.format(index=len(files) + 1)))
+                        current = open(files[-1], 'w', encoding='utf-8')
+                        current_hosts = 0
+                    current.write('\n'.join(piece) + '\n')
+                    current_hosts += piece_hosts
+        finally:
+            if current is not None:
+                current.close()
+
+        return {'files': files, 'targets': targets, 'hosts': total_hosts, 'duplicates': self.duplicates}
+
+    def _iter_tokens(self) -> Iterator[str]:
+        """按顺序读取文本、文件和生成器中的原始目标"""
+        for token in TARGET_SEPARATOR_PATTERN.split(self.text.strip()):
+            if token:
+                yield token
+
+        for file_path in self.files:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    line = line.split('#', 1)[0]
+                    for token in TARGET_SEPARATOR_PATTERN.split(line.strip()):
+                        if token:
+                            yield token
+
+        if self.items is not None:
+            for item in self.items:
+                token = str(item).strip()
+                if token:
+                    yield token
+
+    @staticmethod
+    def _normalize(token: str) -> Tuple[str, int]:
+        """
+        规范化单个目标并计算主机数
+
+        参数:
+            token: 原始目标
+
+        返回:
+            (规范化的目标, 主机数)
+        """
+        if CANONICAL_IPV4_PATTERN.match(token):
+            return token, 1  # 目标列表中绝大多数是单个IPv4地址
+        try:
+            network = ipaddress.ip_network(token, strict=False)
+        except ValueError:
+            if '/' not in token and '-' not in token and not token[0].isdigit():
+                return token.lower(), 1  # 域名不区分大小写
+            return token, TargetSharder.count_hosts(token)
+        if network.num_addresses == 1:
+            return str(network.network_address), 1
+        return str(network), network.num_addresses
+
+    @staticmethod
+    def _split(target: str, hosts: int, chunk_hosts: int) -> Iterator[Tuple[List[str], int]]:
+        """
+        将超过分块容量的网段拆分为多个部分
+
+        参数:
+            target: 规范化的目标
+            hosts: 目标的主机数
+            chunk_hosts: 每个分块的最大主机数
+
+        返回:
+            (目标列表, 主机数) 迭代器
+        """
+        pieces = math.ceil(hosts / chunk_hosts)
+        if pieces <= 1 or pieces > MAX_BLOCK_SPLITS:
+            yield [target], hosts
+            return
+        for shard in TargetSharder.split_targets(target, pieces):
+            yield shard, TargetSharder.count_hosts(' '.join(shard))
@@ -0,0 +1,190 @@
+"""
+限时扫描模块，资产监控的每次扫描只运行一段时间，按历史价值排列主机和端口，未完成的主机留到下一次扫描继续
+"""
+
+import os
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from src.core.shard_executor import TargetSharder
+from src.core.connect_scanner import ConnectScanner
+
+
+# 限时扫描最多展开的主机数，目标更大时不排序、不分批，只在时间预算用完时停止
+MAX_TIME_BOX_HOSTS = 65536
+
+
+class TimeBoxPlanner:
+    """
+    限时扫描计划
+
+    一轮扫描覆盖监控目标的全部主机，可以由多次限时扫描完成。每轮开始时排列主机：
+    历史结果中有开放端口的主机在前（开放端口出现次数多的更靠前），其余主机保持目标中的顺序；
+    每次扫描从本轮剩余的主机开始，时间预算用完时停止，已完成的主机从剩余列表中去掉，
+    剩余列表保存在状态文件中，为空时下一次扫描开始新的一轮。端口按历史上开放的次数排列。
+    """
+
+    def __init__(self, state_file: str):
+        """
+        初始化限时扫描计划
+
+        参数:
+            state_file: 保存本轮剩余主机的状态文件路径
+        """
+        self.state_file = state_file
+
+    def plan(self, target: str, port_spec: str, history: List[Dict]) -> Optional[Dict]:
+        """
+        生成本次扫描的主机和端口顺序
+
+        参数:
+            target: 监控目标表达式
+            port_spec: nmap格式的端口参数
+            history: 监控目标的历史扫描结果，从旧到新
+
+        返回:
+            计划字典: hosts（本次按顺序扫描的主机）, total（本轮主机总数）, new_cycle（是否新的一轮）,
+            ports（排序后的端口参数）, port_order（排序后的TCP端口列表，无法解析时为None）；
+            目标超过 MAX_TIME_BOX_HOSTS 台主机时返回None
+        """
+        if TargetSharder.count_hosts(target) > MAX_TIME_BOX_HOSTS:
+            return None
+
+        state = self._load()
+        if state.get('target') == target and state.get('ports') == port_spec and state.get('pending'):
+            hosts = state['pending']
+            total = state.get('total', len(hosts))
+            new_cycle = False
+        else:
+            hosts = self.order_hosts(ConnectScanner.expand_targets(target), history)
+            total = len(hosts)
+            new_cycle = True
+            self._save({'target': target, 'ports': port_spec, 'total': total,
+                        'cycle_started': datetime.now().isoformat(), 'pending': hosts})
+
+        port_order = self.order_ports(port_spec, history)
+        return {
+            'hosts': hosts,
+            'total': total,
+            'new_cycle': new_cycle,
+            'ports': self.format_ports(port_order) if port_order else port_spec,
+            'port_order': port_order
+        }
+
+    def advance(self, plan: Dict, scanned: Iterable[str], completed: bool) -> List[str]:
+        """
+        扫描结束后从本轮剩余主机中去掉已完成的主机
+
+        nmap按 -iL 中的顺序分组扫描主机，最后一台出现在结果中的主机之前的主机视为已扫描
+        （没有出现在结果中的是未存活的主机）；与它同组但尚未写入结果的少数主机会推迟到下一轮。
+
+        参数:
+            plan: plan 返回的计划
+            scanned: 结果中的主机地址
+            completed: 扫描是否正常完成
+
+        返回:
+            本次覆盖的主机列表
+        """
+        hosts = plan['hosts']
+        if completed:
+            covered = len(hosts)
+        else:
+            scanned = set(scanned)
+            covered = 0
+            for index, host in enumerate(hosts):
+                if host in scanned:
+                    covered = index + 1
+
+        state = self._load()
+        if state.get('pending') == hosts:
+            state['pending'] = hosts[covered:]
+            self._save(state)
+        return hosts[:covered]
+
+    @staticmethod
+    def order_hosts(hosts: List[str], history: List[Dict]) -> List[str]:
+        """
+        按历史价值排列主机
+
+        参数:
+            hosts: 目标展开后的主机列表
+            history: 历史扫描结果
+
+        返回:
+            有开放端口的主机在前（开放端口出现次数多的更靠前），其余保持原顺序
+        """
+        scores = Counter()
+        for result in history:
+            for host in result.get('hosts', []):
+                scores[host['ip']] += sum(1 for port in host.get('ports', []) if port.get('state') == 'open')
+        return sorted(hosts, key=lambda host: -scores[host])  # sorted是稳定排序
+
+    @staticmethod
+    def order_ports(port_spec: str, history: List[Dict]) -> Optional[List[int]]:
+        """
+        按历史上开放的次数排列TCP端口
+
+        参数:
+            port_spec: nmap格式的端口参数
+            history: 历史扫描结果
+
+        返回:
+            排序后的端口列表，端口参数无法解析或包含UDP端口时返回None
+        """
+        if not port_spec or 'U:' in port_spec.upper():
+            return None
+        ports = ConnectScanner.parse_ports(port_spec)
+        if not ports:
+            return None
+        counts = Counter()
+        for result in history:
+            for host in result.get('hosts', []):
+                for port in host.get('ports', []):
+                    if port.get('state') == 'open' and port.get('protocol', 'tcp') == 'tcp':
+                        counts[int(port['port'])] += 1
+        return sorted(ports, key=lambda port: -counts[port])
+
+    @staticmethod
+    def format_ports(ports: List[int]) -> str:
+        """
+        将端口列表转换为nmap端口参数，保持顺序，相邻的连续端口合并为范围
+
+        参数:
+            ports: 端口列表
+
+        返回:
+            端口参数，如 443,22,1-21,23-442
+        """
+        parts = []
+        start = previous = None
+        for port in ports:
+            if previous is not None and port == previous + 1:
+                previous = port
+                continue
+            if start is not None:
+                parts.append(str(start) if start == previous else f"{start}-{previous}")
+            start = previous = port
+        if start is not None:
+            parts.append(str(start) if start == previous else f"{start}-{previous}")
+        return ','.join(parts)
+
+    def _load(self) -> Dict:
+        """读取状态文件"""
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state: Dict):
+        """保存状态文件"""
+        directory = os.path.dirname(self.state_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
@@ -0,0 +1,398 @@
+"""
+自适应时序调优模块，按子网记录历次扫描的RTT、丢包和重传情况，为之后的扫描选择时序参数
+"""
+
+import os
+import re
+import json
+import ipaddress
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.core.shard_executor import NmapXmlMerger, TargetSharder
+
+
+# 统计数据文件
+DEFAULT_TIMING_STATS_FILE = os.path.join('logs', 'timing_stats.json')
+
+# IPv4按/24、IPv6按/64汇总统计
+IPV4_STATS_PREFIX = 24
+IPV6_STATS_PREFIX = 64
+
+# 新样本在滑动平均中的权重
+EWMA_WEIGHT = 0.3
+
+# 激进程度范围：正数表示更大的并行度和更少的重试，负数相反
+MIN_AGGRESSION = -3
+MAX_AGGRESSION = 3
+
+# 开放端口数量比基线少超过该比例时视为漏报，降低激进程度
+MISSED_PORT_TOLERANCE = 0.1
+
+# 同一进程内多个扫描共享统计文件
+_stats_lock = threading.Lock()
+
+
+class TimingObserver:
+    """
+    从nmap详细输出（-v）中统计丢包和重传信息
+
+    相关输出:
+        Increasing send delay for 10.0.0.5 from 0 to 5 due to 11 out of 34 dropped probes since last increase.
+        Warning: 10.0.0.5 giving up on port because retransmission cap hit (10).
+    """
+
+    _DROP_PATTERN = re.compile(r'^Increasing send delay for (\S+) from \d+ to \d+ due to (\d+) out of (\d+) dropped probes')
+    _RETRANSMISSION_PATTERN = re.compile(r'^Warning: (\S+) giving up on port because retransmission cap hit')
+
+    def __init__(self):
+        self.drops = {}             # IP -> (丢弃的探测包数, 探测包总数)
+        self.retransmission_caps = {}  # IP -> 达到重传上限的次数
+
+    def observe(self, line: str):
+        """
+        处理一行nmap输出
+
+        参数:
+            line: 去除首尾空白的输出行
+        """
+        match = self._DROP_PATTERN.match(line)
+        if match:
+            ip, dropped, total = match.group(1), int(match.group(2)), int(match.group(3))
+            old_dropped, old_total = self.drops.get(ip, (0, 0))
+            self.drops[ip] = (old_dropped + dropped, old_total + total)
+            return
+
+        match = self._RETRANSMISSION_PATTERN.match(line)
+        if match:
+            ip = match.group(1)
+            self.retransmission_caps[ip] = self.retransmission_caps.get(ip, 0) + 1
+
+
+class TimingTuner:
+    """
+    时序参数调优器
+
+    扫描结束后按子网记录主机的srtt/rttvar（XML中的<times>元素）、丢包率、重传上限次数、
+    每秒完成的主机数以及每台存活主机的开放端口数。每秒完成的主机数按子网计算（XML中主机的
+    starttime/endtime），并按扫描配置分别保存最好成绩。再次扫描同一子网时：
+      - RTT超时参数按 srtt + 4*rttvar 计算（与nmap自身的超时估计方式一致）
+      - 主机组大小、并行度和重试次数由网络质量和"激进程度"共同决定
+      - 激进程度按爬山法调整：速度提高且开放端口没有减少时提高，开放端口减少（漏报）或
+        速度下降时降低，保证提速不以漏掉端口为代价
+    """
+
+    @staticmethod
+    def recommend(target: str, stats_file: str = DEFAULT_TIMING_STATS_FILE) -> Dict[str, str]:
+        """
+        根据历史统计为目标推荐时序参数
+
+        目标覆盖多个有统计的子网时按最差的网络情况取保守值。
+
+        参数:
+            target: 扫描目标表达式
+            stats_file: 统计数据文件
+
+        返回:
+            选项到取值的字典，没有历史统计时返回空字典
+        """
+        records = TimingTuner._matching_records(target, TimingTuner._load(stats_file))
+        if not records:
+            return {}
+
+        srtt = max(record['srtt_ms'] for record in records)
+        rttvar = max(record['rttvar_ms'] for record in records)
+        max_rtt = max(record['max_rtt_ms'] for record in records)
+        drop_rate = max(record['drop_rate'] for record in records)
+        retransmission_rate = max(record['retransmission_rate'] for record in records)
+        aggression = min(record['aggression'] for record in records)
+        lossy = drop_rate > 0.05 or retransmission_rate > 0.05
+
+        # 并行度和主机组按RTT估计：延迟越高需要越多并发探测才能填满带宽
+        if srtt < 5:
+            parallelism = 64
+        elif srtt < 50:
+            parallelism = 128
+        else:
+            parallelism = 256
+        hostgroup = 256
+        if lossy:
+            parallelism //= 4
+            hostgroup //= 4
+        factor = 2 ** (aggression / 2)
+        parallelism = int(min(max(parallelism * factor, 10), 1024))
+        hostgroup = int(min(max(hostgroup * factor, 16), 4096))
+
+        # 重试次数按丢包情况决定，漏报时激进程度降低会增加重试
+        if drop_rate < 0.01 and retransmission_rate == 0:
+            retries = 2
+        elif not lossy:
+            retries = 4
+        else:
+            retries = 6
+        retries = min(max(retries - aggression, 1), 10)
+
+        # RTT超时：激进程度为负时放宽
+        slack = 1.5 ** max(-aggression, 0)
+        initial_rtt = int(min(max((srtt + 4 * rttvar) * slack, 50), 1000))
+        max_rtt = int(min(max(2 * (max_rtt + 4 * rttvar) * slack, initial_rtt, 100), 5000))
+
+        return {
+            '--min-hostgroup': str(hostgroup),
+            '--min-parallelism': str(parallelism),
+            '--max-retries': str(retries),
+            '--initial-rtt-timeout': f'{initial_rtt}ms',
+            '--max-rtt-timeout': f'{max_rtt}ms'
+        }
+
+    @staticmethod
+    def apply(command: List[str], options: Dict[str, str], protected: Iterable[str] = ()) -> List[str]:
+        """
+        将推荐的时序参数写入nmap命令，替换模板中的固定值（如快速模式的 --min-hostgroup 512）
+
+        用户明确指定的选项（protected）不会被替换，也不会被推荐值覆盖。
+
+        参数:
+            command: nmap命令
+            options: recommend返回的参数
+            protected: 用户明确指定的选项名，见 user_options
+
+        返回:
+            新的命令列表
+        """
+        protected = set(protected)
+        options = {option: value for option, value in options.items() if option not in protected}
+        if not options:
+            return list(command)
+
+        result = [command[0]]
+        index = 1
+        while index < len(command):
+            if command[index] in options and index + 1 < len(command):
+                index += 2
+                continue
+            result.append(command[index])
+            index += 1
+
+        tuned = []
+        for option, value in options.items():
+            tuned.extend([option, value])
+        return result[:1] + tuned + result[1:]
+
+    @staticmethod
+    def user_options(params: str) -> Set[str]:
+        """
+        获取用户附加参数中指定的选项名
+
+        参数:
+            params: 用户附加参数字符串
+
+        返回:
+            选项名集合，--max-retries=3 的写法按 --max-retries 计
+        """
+        return {param.split('=', 1)[0] for param in params.split() if param.startswith('-')}
+
+    @staticmethod
+    def record(xml_file: str, observer: Optional[TimingObserver] = None, elapsed: float = 0,
+               tuned: bool = False, profile: str = '',
+               stats_file: str = DEFAULT_TIMING_STATS_FILE) -> int:
+        """
+        将一次扫描的结果计入子网统计
+
+        参数:
+            xml_file: 扫描的XML结果
+            observer: 扫描输出的丢包统计
+            elapsed: 扫描耗时（秒），为0时使用XML中的耗时
+            tuned: 本次扫描是否使用了推荐参数
+            profile: 扫描配置标识（扫描类型和端口），只有相同配置的开放端口数才可比较
+            stats_file: 统计数据文件
+
+        返回:
+            更新的子网数量
+        """
+        root = NmapXmlMerger.load_root(xml_file)
+        if root is None:
+            return 0
+
+        if not elapsed:
+            finished = root.find('runstats/finished')
+            elapsed = float(finished.get('elapsed', 0) or 0) if finished is not None else 0
+
+        observer = observer or TimingObserver()
+        samples = {}
+        total_hosts = 0
+        for host in root.findall('host'):
+            address = host.find('address')
+            if address is None or not address.get('addr'):
+                continue
+            ip = address.get('addr')
+            subnet = TimingTuner._subnet_key(ip)
+            if not subnet:
+                continue
+            total_hosts += 1
+            sample = samples.setdefault(subnet, {'srtt': [], 'rttvar': [], 'up': 0, 'hosts': 0, 'open_ports': 0,
+                                                 'dropped': 0, 'probes': 0, 'retransmission_caps': 0,
+                                                 'started': None, 'ended': None})
+            sample['hosts'] += 1
+            if host.get('starttime') and host.get('endtime'):
+                started, ended = int(host.get('starttime')), int(host.get('endtime'))
+                sample['started'] = started if sample['started'] is None else min(sample['started'], started)
+                sample['ended'] = ended if sample['ended'] is None else max(sample['ended'], ended)
+            status = host.find('status')
+            if status is not None and status.get('state') == 'up':
+                sample['up'] += 1
+                sample['open_ports'] += len([port for port in host.findall('ports/port')
+                                             if port.find('state') is not None
+                                             and port.find('state').get('state') == 'open'])
+            times = host.find('times')
+            if times is not None and times.get('srtt') and int(times.get('srtt')) > 0:
+                # XML中的时间单位为微秒
+                sample['srtt'].append(int(times.get('srtt')) / 1000)
+                sample['rttvar'].append(int(times.get('rttvar', 0)) / 1000)
+            dropped, probes = observer.drops.get(ip, (0, 0))
+            sample['dropped'] += dropped
+            sample['probes'] += probes
+            sample['retransmission_caps'] += observer.retransmission_caps.get(ip, 0)
+
+        if not samples:
+            return 0
+
+        with _stats_lock:
+            stats = TimingTuner._load(stats_file)
+            for subnet, sample in samples.items():
+                if sample['started'] is not None:
+                    # 该子网从第一台主机开始到最后一台主机结束的时间，XML中的时间精度为秒
+                    hosts_per_second = sample['hosts'] / max(sample['ended'] - sample['started'], 1)
+                elif len(samples) == 1 and elapsed > 0:
+                    hosts_per_second = total_hosts / elapsed
+                else:
+                    hosts_per_second = 0  # 无法区分各子网的耗时，本次不按速度调整
+                stats[subnet] = TimingTuner._update_record(stats.get(subnet), sample, hosts_per_second, tuned, profile)
+            TimingTuner._save(stats, stats_file)
+        return len(samples)
+
+    @staticmethod
+    def profile(command: List[str], scan_type: str = '') -> str:
+        """
+        根据扫描类型和端口参数生成扫描配置标识
+
+        参数:
+            command: nmap命令
+            scan_type: 扫描类型
+
+        返回:
+            配置标识字符串
+        """
+        ports = command[command.index('-p') + 1] if '-p' in command[:-1] else ''
+        return f"{scan_type}|{ports}"
+
+    @staticmethod
+    def _update_record(record: Optional[Dict], sample: Dict, hosts_per_second: float, tuned: bool,
+                       profile: str) -> Dict:
+        """
+        用一次扫描的样本更新子网记录
+
+        参数:
+            record: 原有记录
+            sample: 本次扫描中该子网的统计
+            hosts_per_second: 本次扫描该子网每秒完成的主机数，0表示未知
+            tuned: 本次扫描是否使用了推荐参数
+            profile: 扫描配置标识
+
+        返回:
+            更新后的记录
+        """
+        def ewma(old, new):
+            return new if old is None else old * (1 - EWMA_WEIGHT) + new * EWMA_WEIGHT
+
+        record = dict(record or {'samples': 0, 'aggression': 0, 'baselines': {}})
+        record.setdefault('best_rates', {})
+        srtt = sum(sample['srtt']) / len(sample['srtt']) if sample['srtt'] else None
+        rttvar = sum(sample['rttvar']) / len(sample['rttvar']) if sample['rttvar'] else None
+        if srtt is not None:
+            record['srtt_ms'] = round(ewma(record.get('srtt_ms'), srtt), 3)
+            record['rttvar_ms'] = round(ewma(record.get('rttvar_ms'), rttvar), 3)
+            record['max_rtt_ms'] = round(ewma(record.get('max_rtt_ms'), max(sample['srtt'])), 3)
+        record.setdefault('srtt_ms', 0)
+        record.setdefault('rttvar_ms', 0)
+        record.setdefault('max_rtt_ms', 0)
+
+        drop_rate = sample['dropped'] / sample['probes'] if sample['probes'] else 0
+        retransmission_rate = sample['retransmission_caps'] / sample['up'] if sample['up'] else 0
+        record['drop_rate'] = round(ewma(record.get('drop_rate'), drop_rate), 4)
+        record['retransmission_rate'] = round(ewma(record.get('retransmission_rate'), retransmission_rate), 4)
+        record['hosts_per_second'] = round(hosts_per_second, 3)
+
+        # 漏报检测：与相同扫描配置的开放端口基线比较
+        open_per_host = sample['open_ports'] / sample['up'] if sample['up'] else 0
+        baseline = record['baselines'].get(profile)
+        missed_ports = baseline is not None and open_per_host < baseline * (1 - MISSED_PORT_TOLERANCE)
+        # 速度只与相同扫描配置的最好成绩比较，不同端口范围的扫描速度不可比
+        best = record['best_rates'].get(profile, 0)
+        if tuned and baseline is not None:
+            if missed_ports or (hosts_per_second and best and hosts_per_second < best * 0.9):
+                record['aggression'] = max(record['aggression'] - 1, MIN_AGGRESSION)
+            elif hosts_per_second and hosts_per_second >= best * 0.95:
+                record['aggression'] = min(record['aggression'] + 1, MAX_AGGRESSION)
+        if not missed_ports:
+            # 基线取较大值，网络变化导致端口真实减少时缓慢下降
+            record['baselines'][profile] = round(max(open_per_host, ewma(baseline, open_per_host)), 3)
+            record['best_rates'][profile] = max(best, record['hosts_per_second'])
+        record['missed_ports'] = missed_ports
+        record['samples'] += 1
+        record['updated'] = datetime.now().isoformat()
+        return record
+
+    @staticmethod
+    def _matching_records(target: str, stats: Dict) -> List[Dict]:
+        """获取与目标重叠的子网记录"""
+        if not stats:
+            return []
+        networks = []
+        for block in TargetSharder._parse_blocks(target):
+            if isinstance(block, str):
+                continue
+            networks.append(block)
+
+        records = []
+        for subnet, record in stats.items():
+            try:
+                network = ipaddress.ip_network(subnet)
+            except ValueError:
+                continue
+            if any(network.version == block.version and network.overlaps(block) for block in networks):
+                records.append(record)
+        return records
+
+    @staticmethod
+    def _subnet_key(ip: str) -> str:
+        """IP所属的统计子网"""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return ''
+        prefix = IPV4_STATS_PREFIX if address.version == 4 else IPV6_STATS_PREFIX
+        return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+    @staticmethod
+    def _load(stats_file: str) -> Dict:
+        """读取统计数据文件"""
+        if not os.path.exists(stats_file):
+            return {}
+        try:
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save(stats: Dict, stats_file: str):
+        """保存统计数据文件"""
+        stats_dir = os.path.dirname(stats_file)
+        if stats_dir and not os.path.exists(stats_dir):
+            os.makedirs(stats_dir)
+        temp_file = stats_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, stats_file)
@@ -0,0 +1,234 @@
+"""
+XML增量解析模块，在扫描进行中读取nmap持续写入的 -oX 文件，提取已完成的主机
+"""
+
+import os
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.core.scan_events import ScanEvent, EVENT_HOST_RESULT
+from src.core.shard_executor import NmapXmlMerger
+
+
+def parse_host_element(host: ET.Element) -> Dict:
+    """
+    将nmap XML中的host元素转换为主机信息字典
+
+    参数:
+        host: host元素
+
+    返回:
+        主机信息字典，包含ip、status和ports
+    """
+    host_info = {'ip': '', 'ports': [], 'status': 'unknown'}
+
+    # 获取IP地址
+    address = host.find('address')
+    if address is not None:
+        host_info['ip'] = address.get('addr', '')
+
+    # 获取主机状态
+    status = host.find('status')
+    if status is not None:
+        host_info['status'] = status.get('state', 'unknown')
+
+    # 获取端口信息
+    for port in host.findall('.//port'):
+        port_info = {
+            'port': port.get('portid', ''),
+            'protocol': port.get('protocol', 'tcp'),
+            'state': 'unknown',
+            'service': 'unknown',
+            'version': ''
+        }
+
+        # 端口状态
+        port_state = port.find('state')
+        if port_state is not None:
+            port_info['state'] = port_state.get('state', 'unknown')
+
+        # 服务信息
+        service = port.find('service')
+        if service is not None:
+            port_info['service'] = service.attrib.get('name', 'unknown')
+            port_info['version'] = service.attrib.get('version', '')
+
+        host_info['ports'].append(port_info)
+
+    return host_info
+
+
+def load_hosts(xml_file: str) -> Optional[List[Dict]]:
+    """
+    读取XML结果文件中的全部主机，文件被截断时返回已完整写入的主机
+
+    参数:
+        xml_file: XML结果文件路径
+
+    返回:
+        主机信息字典列表，文件不存在或无法解析时返回None
+    """
+    root = NmapXmlMerger.load_root(xml_file)
+    if root is None:
+        return None
+    return [parse_host_element(host) for host in root.findall('host')]
+
+
+class NmapXmlTailer:
+    """
+    增量读取正在写入的nmap XML文件
+
+    nmap每完成一个主机就会把完整的<host>元素写入XML文件，
+    每次poll只读取文件新增的部分并返回其中新完成的主机。
+    """
+
+    def __init__(self, xml_file: str):
+        """
+        初始化XML增量解析器
+
+        参数:
+            xml_file: nmap -oX 输出文件路径
+        """
+        self.xml_file = xml_file
+        self.host_count = 0
+        self._offset = 0
+        self._parser = ET.XMLPullParser(events=('end',))
+        self._failed = False
+
+    def poll(self) -> List[Dict]:
+        """
+        读取文件新增内容
+
+        返回:
+            自上次调用以来新完成的主机信息列表
+        """
+        if self._failed or not os.path.exists(self.xml_file):
+            return []
+
+        try:
+            with open(self.xml_file, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return []
+        if not data:
+            return []
+        self._offset += len(data)
+
+        hosts = []
+        try:
+            self._parser.feed(data)
+            for _, element in self._parser.read_events():
+                if element.tag == 'host':
+                    hosts.append(parse_host_element(element))
+                    element.clear()  # 已处理的主机不再保留在内存中
+        except ET.ParseError:
+            # 文件内容损坏时停止增量解析，扫描结束后仍会完整解析
+            self._failed = True
+
+        self.host_count += len(hosts)
+        return hosts
+
+
+class NmapXmlWriter:
+    """
+    按nmap -oX 的格式逐台写入主机结果
+
+    连接扫描和外部发现工具的结果通过它写成nmap格式的XML，之后与nmap的输出一样
+    由NmapXmlTailer增量读取、由NmapXmlMerger合并或由资产监控解析。
+    """
+
+    def __init__(self, xml_file: str, args: str, scan_type: str = 'syn', services: str = ''):
+        """
+        创建XML文件并写入nmaprun头部
+
+        参数:
+            xml_file: 输出文件路径
+            args: 写入nmaprun的命令描述
+            scan_type: scaninfo中的扫描方式
+            services: scaninfo中的端口列表
+        """
+        output_dir = os.path.dirname(xml_file)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        self.started = time.time()
+        self._file = open(xml_file, 'w', encoding='utf-8')
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._file.write(ET.tostring(ET.Element('nmaprun', {
+            'scanner': 'fastnmap',
+            'args': args,
+            'start': str(int(self.started)),
+            'startstr': datetime.fromtimestamp(self.started).strftime('%a %b %d %H:%M:%S %Y'),
+            'xmloutputversion': '1.05'
+        }), encoding='unicode').replace(' />', '>') + '\n')
+        self._file.write(ET.tostring(ET.Element('scaninfo', {
+            'type': scan_type, 'protocol': 'tcp', 'numservices': str(len(services.split(',')) if services else 0),
+            'services': services
+        }), encoding='unicode') + '\n')
+        self._file.flush()
+
+    def write_host(self, host_info: Dict):
+        """
+        写入一台主机并立即刷新，供增量读取
+
+        参数:
+            host_info: 主机信息字典（与parse_host_element的结果相同）
+        """
+        host = ET.Element('host')
+        ET.SubElement(host, 'status', {'state': host_info['status'], 'reason': 'user-set'})
+        address_type = 'ipv6' if ':' in host_info['ip'] else 'ipv4'
+        ET.SubElement(host, 'address', {'addr': host_info['ip'], 'addrtype': address_type})
+        ports = ET.SubElement(host, 'ports')
+        for port_info in host_info['ports']:
+            port = ET.SubElement(ports, 'port', {'protocol': port_info['protocol'], 'portid': str(port_info['port'])})
+            ET.SubElement(port, 'state', {'state': port_info['state'], 'reason': 'syn-ack'})
+            service = {'name': port_info.get('service') or 'unknown', 'method': 'table', 'conf': '3'}
+            if port_info.get('version'):
+                service['version'] = port_info['version']
+            ET.SubElement(port, 'service', service)
+        self._file.write(ET.tostring(host, encoding='unicode') + '\n')
+        self._file.flush()
+
+    def finish(self, hosts_up: int, hosts_down: int = 0):
+        """
+        写入runstats并关闭文件
+
+        参数:
+            hosts_up: 存活主机数
+            hosts_down: 未存活主机数
+        """
+        finished = time.time()
+        elapsed = finished - self.started
+        total = hosts_up + hosts_down
+        summary = f"Nmap done: {total} IP addresses ({hosts_up} hosts up) scanned in {elapsed:.2f} seconds"
+        runstats = ET.Element('runstats')
+        ET.SubElement(runstats, 'finished', {
+            'time': str(int(finished)),
+            'elapsed': f"{elapsed:.2f}",
+            'summary': summary,
+            'exit': 'success'
+        })
+        ET.SubElement(runstats, 'hosts', {'up': str(hosts_up), 'down': str(hosts_down), 'total': str(total)})
+        self._file.write(ET.tostring(runstats, encoding='unicode') + '\n</nmaprun>\n')
+        self._file.close()
+
+    def close(self):
+        """不写runstats直接关闭文件，与被终止的nmap一样保留未写完的结果"""
+        self._file.close()
+
+
+def host_result_event(host_info: Dict) -> ScanEvent:
+    """
+    将主机信息包装为扫描事件，与标准输出事件一起按批次发送
+
+    参数:
+        host_info: 主机信息字典
+
+    返回:
+        EVENT_HOST_RESULT 类型的扫描事件
+    """
+    open_ports = [port for port in host_info['ports'] if port['state'] == 'open']
+    line = f"主机结果: {host_info['ip']} ({host_info['status']})，{len(open_ports)} 个开放端口"
+    return ScanEvent(EVENT_HOST_RESULT, host_info, line)
@@ -21,14 +21,17 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import pyqtSignal, Qt, QTimer, QDateTime
 from datetime import datetime
-from PyQt5.QtGui import QIntValidator, QIcon, QPixmap, QFont, QColor, QPalette
+from PyQt5.QtGui import QIntValidator, QIcon, QPixmap, QFont, QColor, QPalette, QTextCursor
 
-from src.utils.constants import ico_base64, SCAN_TYPES
-from src.core.nmap_executor import NmapThread
-from src.core.command_builder import NmapCommandBuilder
+from src.utils.constants import ico_base64, SCAN_TYPES, MAX_CONSOLE_LINES
+from src.gui.qt_adapters import ScanManagerSignals, QtAssetMonitor
+from src.core.scan_manager import ScanManager, ScanJob, STATE_COMPLETED, STATE_FAILED, STATE_CANCELLED, FINISHED_STATES
+from src.core.scan_events import EVENT_START, EVENT_HOST_UP, EVENT_PORT, EVENT_STATS, EVENT_WARNING, EVENT_DONE, EVENT_HOST_RESULT
+from src.core.shard_executor import get_default_shard_count
 from src.core.nmap_parser import NmapOutputParser
-from src.core.asset_monitor import AssetMonitor
+from src.core.cost_estimator import CostEstimator
 from src.core.html_report import HTMLReportGenerator
+from src.core.log_spool import LogSpool
 from src.gui.widgets.monitor_widgets import AssetMonitorTabWidget
 from src.gui.tabs.asset_comparison import AssetComparisonWidget
 
@@ -50,9 +53,15 @@ class NmapScannerGUI(QWidget):
         super().__init__()
         # 存储文本编辑框的字典，用于在不同标签页中显示扫描过程和结果
         self.text_edits = {'扫描过程': None, '扫描结果': None}
-        self.current_output = ""  # 用于缓存当前输出的字符串
+        self.console_scan_ids = []  # 扫描过程标签页中显示了输出的扫描，完整输出保存在各自的日志文件中
         self.scan_type = ""  # 用于缓存用户选择的扫描类型
-        self.thread = None  # 存储NmapThread实例，用于执行扫描任务
+        self.scan_manager = ScanManager()  # 管理所有扫描任务，支持同时运行多个扫描
+        self.scan_manager.start()  # 启动时清理残留的nmap进程，并在后台探测nmap版本和已安装的脚本
+        self.scan_signals = ScanManagerSignals()  # 将扫描回调转为主线程中的Qt信号
+        self.scan_signals.events_signal.connect(self.on_scan_events)
+        self.scan_signals.state_signal.connect(self.on_scan_state)
+        self.active_scan_ids = []  # 本界面启动且尚未结束的扫描ID
+        self.result_job = None  # 最近一次完成解析的扫描任务，用于导出结果
         self.is_scanning = False  # 扫描状态标志
         # 使用深色模式作为唯一主题
         self.scan_progress = 0  # 扫描进度
@@ -60,13 +69,15 @@ class NmapScannerGUI(QWidget):
         self.scan_history = []  # 扫描历史记录
         
         # 初始化资产监控组件
-        self.asset_monitor = AssetMonitor()
+        self.asset_monitor = QtAssetMonitor()
         self.html_generator = HTMLReportGenerator()
         
         # 连接资产监控信号
         self.asset_monitor.scan_completed.connect(self.on_monitor_scan_completed)
         self.asset_monitor.scan_progress.connect(self.on_monitor_progress)
         self.asset_monitor.scan_error.connect(self.on_monitor_error)
+        self.asset_monitor.scan_events.connect(self.on_monitor_events)
+        self.asset_monitor.host_differences.connect(self.on_monitor_host_differences)
         
         # 设置窗口图标 - 从base64编码的字符串加载
         logo = QPixmap()
@@ -216,6 +227,8 @@ class NmapScannerGUI(QWidget):
         actions = [
             ('开始', '#1e293b', '#334155', True),   # 深蓝灰，特殊光效
             ('停止', '#1e293b', '#334155', False),  # 深蓝灰
+            ('恢复', '#1e293b', '#334155', False),  # 深蓝灰
+            ('历史', '#1e293b', '#334155', False),  # 深蓝灰
             ('导出', '#1e293b', '#334155', False),  # 深蓝灰
             ('结果', '#1e293b', '#334155', False),  # 深蓝灰
             ('清空', '#1e293b', '#334155', False)   # 深蓝灰
@@ -300,6 +313,10 @@ class NmapScannerGUI(QWidget):
                 btn.clicked.connect(self.start_scan)
             elif action == '停止':
                 btn.clicked.connect(self.stop_scan)
+            elif action == '恢复':
+                btn.clicked.connect(self.resume_scan)
+            elif action == '历史':
+                btn.clicked.connect(self.open_scan_history)
             elif action == '导出':
                 btn.clicked.connect(lambda: self.export_scan_process())
             elif action == '结果':
@@ -544,6 +561,23 @@ class NmapScannerGUI(QWidget):
         """)
         fast_mode_layout.addWidget(self.fast_mode_checkbox)
         
+        # 分片并行扫描：将大范围目标拆分为多个nmap进程并行执行
+        self.shard_mode_checkbox = QCheckBox('分片并行')
+        self.shard_mode_checkbox.setToolTip("将目标按网段拆分为多个分片，每个分片由独立的nmap进程并行扫描")
+        self.shard_count_spin = QSpinBox()
+        self.shard_count_spin.setRange(1, 256)
+        self.shard_count_spin.setValue(get_default_shard_count())  # 默认为CPU核心数
+        self.shard_count_spin.setMinimumHeight(30)
+        self.shard_count_spin.setToolTip("分片数量")
+        fast_mode_layout.addWidget(self.shard_mode_checkbox)
+        fast_mode_layout.addWidget(self.shard_count_spin)
+
+        # 两阶段扫描：先探测存活主机和开放端口，再只对开放端口执行服务识别和脚本
+        self.pipeline_mode_checkbox = QCheckBox('两阶段扫描')
+        self.pipeline_mode_checkbox.setToolTip("服务识别、端口识别、漏洞扫描、暴力破解时先用SYN扫描探测存活主机和开放端口，"
+                                               "再按主机只对开放端口执行耗时的识别和脚本")
+        fast_mode_layout.addWidget(self.pipeline_mode_checkbox)
+        
         # 添加到主布局
         layout.addLayout(fast_mode_layout)
         
@@ -601,6 +635,8 @@ class NmapScannerGUI(QWidget):
                 
             tab_edit = QTextEdit()
             tab_edit.setObjectName(tab)  # 设置对象名称
+            if tab == '扫描过程':
+                tab_edit.document().setMaximumBlockCount(MAX_CONSOLE_LINES)  # 只显示最近的输出，避免内存无限增长
             
             # 对扫描结果标签页启用HTML支持
             if tab == '扫描结果':
@@ -970,7 +1006,7 @@ class NmapScannerGUI(QWidget):
         加载文件功能
         
         打开文件选择对话框，允许用户选择包含扫描目标的文件。
-        选择文件后，文件路径将被设置到目标输入框中。
+        选择文件后，文件路径将被设置到目标输入框中，扫描时按 -iL 分块读取文件中的目标。
         """
         # 打开文件选择对话框
         filename, _ = QFileDialog.getOpenFileName(
@@ -1071,23 +1107,31 @@ class NmapScannerGUI(QWidget):
         current_time = QDateTime.currentDateTime().toString("yyyy-MM-dd hh:mm:ss")
         
         if self.is_scanning and hasattr(self, "scan_active") and self.scan_active:
-            # 只在实际扫描执行中才更新进度
-            if self.scan_progress < 95:  # 最高只显示到95%，留出5%给最终完成时使用
-                self.scan_progress += 1
+            # 进度来自nmap的 --stats-every 统计输出，多个扫描同时运行时取平均值
+            jobs = [self.scan_manager.get_job(scan_id) for scan_id in self.active_scan_ids]
+            progresses = [job.progress for job in jobs if job]
+            if progresses:
+                self.scan_progress = int(sum(p.overall_percent() for p in progresses) / len(progresses))
                 self.progress_bar.setValue(self.scan_progress)
             
             # 更新状态标签 - 每5秒完整更新一次，减少UI更新频率
-            if hasattr(self, "last_status_update"):
-                if (QDateTime.currentDateTime().toMSecsSinceEpoch() - self.last_status_update) > 5000:
-                    scan_type = self.scan_type_group.checkedButton().text() if self.scan_type_group.checkedButton() else "未知"
-                    target = self.url_line_edit.text()
-                    self.status_label.setText(f"扫描中 | 类型: {scan_type} | 目标: {target} | 进度: {self.scan_progress}% | {current_time}")
-                    self.last_status_update = QDateTime.currentDateTime().toMSecsSinceEpoch()
-            else:
-                self.last_status_update = QDateTime.currentDateTime().toMSecsSinceEpoch()
+            now = QDateTime.currentDateTime().toMSecsSinceEpoch()
+            if not hasattr(self, "last_status_update") or now - self.last_status_update > 5000:
+                self.last_status_update = now
                 scan_type = self.scan_type_group.checkedButton().text() if self.scan_type_group.checkedButton() else "未知"
                 target = self.url_line_edit.text()
-                self.status_label.setText(f"扫描中 | 类型: {scan_type} | 目标: {target} | 进度: {self.scan_progress}% | {current_time}")
+                status = f"扫描中 | 类型: {scan_type} | 目标: {target} | 进度: {self.scan_progress}%"
+                if len(progresses) == 1:
+                    progress = progresses[0]
+                    if progress.current_phase:
+                        status += f" | 阶段: {progress.current_phase}"
+                    if progress.remaining:
+                        status += f" | 剩余: {progress.remaining}"
+                    if progress.hosts_completed:
+                        status += f" | {progress.hosts_per_second():.2f} 主机/秒"
+                if any(p.is_stalled() for p in progresses):
+                    status += " | 警告: 长时间无输出，扫描可能已停滞"
+                self.status_label.setText(f"{status} | {current_time}")
         else:
             # 非扫描状态，只更新时间
             self.status_label.setText(f"就绪 | {current_time}")
@@ -1107,6 +1151,9 @@ class NmapScannerGUI(QWidget):
                 'threads': self.threads_input.text(),
                 'scan_type_index': self.scan_type_group.checkedId(),
                 'fast_mode': self.fast_mode_checkbox.isChecked(),
+                'shard_mode': self.shard_mode_checkbox.isChecked(),
+                'shard_count': self.shard_count_spin.value(),
+                'pipeline_mode': self.pipeline_mode_checkbox.isChecked(),
                 'port_input': self.port_input.text(),
                 'port_checkboxes': [cb.isChecked() for cb in self.port_checkboxes],
                 'params': self.params_input.text(),
@@ -1145,6 +1192,11 @@ class NmapScannerGUI(QWidget):
             # 设置极速模式
             self.fast_mode_checkbox.setChecked(config['fast_mode'])
             
+            # 设置分片模式
+            self.shard_mode_checkbox.setChecked(config.get('shard_mode', False))
+            self.shard_count_spin.setValue(config.get('shard_count', get_default_shard_count()))
+            self.pipeline_mode_checkbox.setChecked(config.get('pipeline_mode', False))
+            
             # 设置端口
             self.port_input.setText(config['port_input'])
             
@@ -1244,9 +1296,14 @@ class NmapScannerGUI(QWidget):
                 QMessageBox.warning(self, "警告", "请输入端口或勾选端口选项")
                 return
                 
+        # 目标为文件路径时去重后写入分块文件，每块由一个nmap进程通过 -iL 读取
+        target = self.url_line_edit.text()
+        target_file = target if os.path.isfile(target) else ''
+        
         # 构建命令
         config = {
-            'target': self.url_line_edit.text(),
+            'target': '' if target_file else target,
+            'target_file': target_file,
             'timeout': self.timeout_input.text(),
             'threads_min': self.threads_input.text(),
             'threads_max': self.threads_input.text(),
@@ -1254,12 +1311,20 @@ class NmapScannerGUI(QWidget):
             'result_file': self.result_file_edit.text(),
             'scan_type': selected_scan_type,
             'fast_mode': self.fast_mode_checkbox.isChecked(),
+            'shard_mode': self.shard_mode_checkbox.isChecked(),
+            'shard_count': self.shard_count_spin.value(),
+            'pipeline_mode': self.pipeline_mode_checkbox.isChecked(),
             'port_input': self.port_input.text(),
             'port_checkboxes': self.port_checkboxes
         }
         
-        command = NmapCommandBuilder.build_command(config)
-        if command:
+        # 启动前预估开销，耗时或探测量过大时提示并建议分片
+        if not self.confirm_scan_cost(config):
+            return
+        
+        # 提交到扫描管理器，每次扫描拥有独立的ID和输出目录
+        scan_id = self.scan_manager.submit(config, self.scan_signals.on_events, self.scan_signals.on_state)
+        if scan_id:
             # 重置扫描状态
             self.is_scanning = True
             self.scan_active = False  # 初始化为非活动状态，等待第一个输出后才置为True
@@ -1267,12 +1332,41 @@ class NmapScannerGUI(QWidget):
             self.progress_bar.setValue(0)
             self.status_label.setText(f"开始扫描 | 类型: {selected_scan_type} | 目标: {self.url_line_edit.text()}")
             
-            # 启动扫描线程
-            self.thread = NmapThread(command)
-            self.thread.output_signal.connect(self.live_output)
-            self.thread.error_signal.connect(self.handle_error)
-            self.thread.start()
-            self.clear_current_output()  # 清空缓存变量
+            if not self.active_scan_ids:
+                self.text_edits['扫描结果'].clear()  # 扫描过程中显示实时结果，结束后替换为完整结果
+            self.active_scan_ids.append(scan_id)
+            self.console_scan_ids.append(scan_id)
+
+    def confirm_scan_cost(self, config):
+        """
+        预估扫描开销，超过阈值时让用户选择按建议分片、继续或取消
+        
+        参数:
+            config: 扫描配置字典，选择分片时直接修改其中的分片设置
+            
+        返回:
+            是否继续扫描
+        """
+        estimate = CostEstimator.estimate_config(config)
+        if not estimate or not estimate['warnings']:
+            return True
+        
+        box = QMessageBox(QMessageBox.Warning, '扫描开销预估', CostEstimator.format_estimate(estimate), parent=self)
+        shard_button = None
+        if estimate['proposed_shards']:
+            shard_button = box.addButton(f"分{estimate['proposed_shards']}片扫描", QMessageBox.AcceptRole)
+        continue_button = box.addButton('继续扫描', QMessageBox.AcceptRole)
+        box.addButton('取消', QMessageBox.RejectRole)
+        box.exec_()
+        
+        clicked = box.clickedButton()
+        if shard_button is not None and clicked == shard_button:
+            config['shard_mode'] = True
+            config['shard_count'] = estimate['proposed_shards']
+            self.shard_mode_checkbox.setChecked(True)
+            self.shard_count_spin.setValue(estimate['proposed_shards'])
+            return True
+        return clicked == continue_button
 
     def process_web_scan_input(self, input_text):
         """处理Web扫描输入"""
@@ -1288,13 +1382,17 @@ class NmapScannerGUI(QWidget):
                 return None
         return target_list
 
-    def update_output_text(self, output):
-        """以现代化网络安全风格更新扫描输出文本"""
-        output_text_edit = self.text_edits.get('扫描过程')
-        if not output_text_edit:
-            return
+    def format_event_html(self, event, output):
+        """
+        以现代化网络安全风格格式化一个扫描事件
+        
+        参数:
+            event: 扫描事件，按事件类型选择显示样式
+            output: 要显示的文本（多个扫描同时运行时带有扫描ID前缀）
             
-        # 输出类型正则表达式
+        返回:
+            格式化后的HTML
+        """
         import re
         # 命令和参数
         cmd_pattern = re.compile(r'(nmap\s+[\w\-\./\s]+)')
@@ -1304,24 +1402,13 @@ class NmapScannerGUI(QWidget):
         port_pattern = re.compile(r'(\d+\/\w+)\s+(\w+)\s+(\w+)')
         # IP地址
         ip_pattern = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
-        # 文件路径
-        file_pattern = re.compile(r'(/[\w\-\./]+)')
-        # 扫描完成
-        scan_done_pattern = re.compile(r'(Nmap\s+done:.*)')
-        # 错误信息
-        error_pattern = re.compile(r'(\[(ERROR|\!)\].*|\berror\b|\bfailed\b|\bQUITTING\b)', re.IGNORECASE)
-        # 警告信息
-        warning_pattern = re.compile(r'(\[WARNING\].*|\bwarning\b)', re.IGNORECASE)
         
         # 添加时间戳
         from datetime import datetime
         timestamp = datetime.now().strftime("%H:%M:%S")
         
-        # 格式化输出
-        formatted_output = output
-        
         # 处理Nmap启动信息
-        if "Starting Nmap" in output:
+        if event.type == EVENT_START:
             formatted_output = f'<div class="output-container"><span class="nmap-header">[扫描开始]</span> <span class="nmap-timestamp">{timestamp}</span><br>'
             # 提取并高亮显示命令
             cmd_match = cmd_pattern.search(output)
@@ -1331,34 +1418,35 @@ class NmapScannerGUI(QWidget):
             formatted_output += output + "</div>"
         
         # 处理扫描完成信息
-        elif scan_done_pattern.search(output):
+        elif event.type == EVENT_DONE:
             formatted_output = f'<div class="nmap-done">[扫描完成] <span class="nmap-timestamp">{timestamp}</span><br>'
-            formatted_output += re.sub(scan_done_pattern, r'<span class="nmap-done">\1</span>', output)
+            formatted_output += f'<span class="nmap-done">{output}</span>'
             formatted_output += "</div>"
             # 添加分隔线
             formatted_output += '<div class="scan-divider"></div>'
             
         # 处理错误信息
-        elif error_pattern.search(output):
+        elif event.type == EVENT_WARNING and event.data.get('severity') == 'error':
             formatted_output = f'<div class="nmap-error">[错误] <span class="nmap-timestamp">{timestamp}</span><br>'
-            formatted_output += re.sub(error_pattern, r'<span class="nmap-error">\1</span>', output)
+            formatted_output += f'<span class="nmap-error">{output}</span>'
             formatted_output += "</div>"
         
         # 处理警告信息
-        elif warning_pattern.search(output):
+        elif event.type == EVENT_WARNING:
             formatted_output = f'<div class="nmap-warning">[警告] <span class="nmap-timestamp">{timestamp}</span><br>'
-            formatted_output += re.sub(warning_pattern, r'<span class="nmap-warning">\1</span>', output)
+            formatted_output += f'<span class="nmap-warning">{output}</span>'
             formatted_output += "</div>"
         
         # 处理端口信息
-        elif port_pattern.search(output):
+        elif event.type == EVENT_PORT:
             formatted_output = '<div class="output-container">'
             # 高亮显示端口信息
             formatted_output += re.sub(port_pattern, r'<span class="nmap-port">\1</span> <span class="nmap-state">\2</span> <span class="nmap-service">\3</span>', output)
+            formatted_output = re.sub(r'(\d+/\w+)(?= on )', r'<span class="nmap-port">\1</span>', formatted_output)
             formatted_output += "</div>"
         
         # 处理扫描进度
-        elif progress_pattern.search(output):
+        elif event.type == EVENT_STATS:
             formatted_output = '<div class="nmap-progress">'
             formatted_output += re.sub(progress_pattern, r'<span class="matrix-effect">\1</span>', output)
             formatted_output += "</div>"
@@ -1373,18 +1461,16 @@ class NmapScannerGUI(QWidget):
         else:
             formatted_output = f'<div class="output-container">{output}</div>'
         
-        # 将格式化输出添加到文本编辑器
-        output_text_edit.insertHtml(formatted_output + "<br>")
+        return formatted_output + "<br>"
 
     def stop_scan(self):
         """
         停止扫描
         
-        终止正在运行的扫描线程，并更新UI状态。
+        终止本界面启动的所有正在运行的扫描，并更新UI状态。
         """
-        if self.thread and self.thread.isRunning():
-            self.thread.terminate()
-            
+        cancelled = [scan_id for scan_id in self.active_scan_ids if self.scan_manager.cancel(scan_id)]
+        if cancelled:
             # 更新扫描状态
             self.is_scanning = False
             self.status_label.setText("已停止 | 扫描被用户终止")
@@ -1404,6 +1490,105 @@ class NmapScannerGUI(QWidget):
                 '''
                 output_text_edit.insertHtml(stop_html)
 
+    def resume_scan(self):
+        """
+        继续中断的扫描
+        
+        列出有检查点但未完成的扫描，从选中扫描的检查点继续执行，
+        新结果与已有的部分结果合并。
+        """
+        checkpoints = self.scan_manager.list_resumable()
+        if not checkpoints:
+            QMessageBox.information(self, "提示", "没有可以继续的扫描")
+            return
+        
+        items = []
+        for checkpoint in reversed(checkpoints):
+            parts = checkpoint.get('parts', [])
+            done = len([part for part in parts if part.get('done')])
+            config = checkpoint.get('config', {})
+            items.append(f"{checkpoint['scan_id']} | {config.get('scan_type', '')} | {config.get('target', '')} | 已完成 {done}/{len(parts)}")
+        
+        item, ok = QInputDialog.getItem(self, '恢复扫描', '选择要继续的扫描:', items, 0, False)
+        if not ok or not item:
+            return
+        
+        scan_id = item.split(' | ')[0]
+        if self.scan_manager.resume(scan_id, self.scan_signals.on_events, self.scan_signals.on_state):
+            self.is_scanning = True
+            self.scan_active = False
+            self.scan_progress = 0
+            self.progress_bar.setValue(0)
+            self.status_label.setText(f"恢复扫描 | {item}")
+            if not self.active_scan_ids:
+                self.text_edits['扫描结果'].clear()
+            self.active_scan_ids.append(scan_id)
+            if scan_id not in self.console_scan_ids:
+                self.console_scan_ids.append(scan_id)
+        else:
+            QMessageBox.warning(self, "错误", f"无法继续扫描: {scan_id}")
+
+    def open_scan_history(self):
+        """
+        打开历史扫描
+        
+        从扫描索引中选择一次扫描，显示其结果和原始输出（之后可导出结果），
+        或与另一次扫描对比，均直接读取扫描目录中的文件，无需重新扫描。
+        """
+        catalog = self.scan_manager.catalog
+        entries = [entry for entry in catalog.list() if entry.get('xml_file')]
+        if not entries:
+            QMessageBox.information(self, "提示", "没有历史扫描")
+            return
+        
+        items = [f"{entry['scan_id']} | {entry.get('scan_type', '')} | {entry.get('target', '')} | {entry.get('state', '')}"
+                 for entry in entries]
+        item, ok = QInputDialog.getItem(self, '历史扫描', '选择扫描:', items, 0, False)
+        if not ok or not item:
+            return
+        entry = entries[items.index(item)]
+        
+        operation, ok = QInputDialog.getItem(self, '历史扫描', f"{entry['scan_id']}:", ['打开结果', '与其他扫描对比'], 0, False)
+        if not ok:
+            return
+        
+        if operation == '打开结果':
+            job = ScanJob(entry['scan_id'], {'scan_type': entry.get('scan_type', ''), 'target': entry.get('target', '')},
+                          entry['output_dir'])
+            job.xml_file = entry['xml_file']
+            self.parse_nmap_output(job)
+            log_text = catalog.read_log(entry['scan_id'], MAX_CONSOLE_LINES)
+            if log_text:
+                self.text_edits['扫描过程'].setPlainText(log_text)
+                self.console_scan_ids = [entry['scan_id']]
+            return
+        
+        others = [other for other in items if other != item]
+        if not others:
+            QMessageBox.information(self, "提示", "没有可以对比的扫描")
+            return
+        other, ok = QInputDialog.getItem(self, '对比扫描', '选择较早的扫描:', others, 0, False)
+        if not ok or not other:
+            return
+        previous_id = other.split(' | ')[0]
+        differences = catalog.diff(previous_id, entry['scan_id'])
+        if differences is None:
+            QMessageBox.warning(self, "错误", "扫描结果文件不存在或无法解析")
+            return
+        
+        lines = [f"对比 {previous_id} -> {entry['scan_id']}", '']
+        titles = [('new_hosts', '新增主机'), ('disappeared_hosts', '消失主机'),
+                  ('new_ports', '新增端口'), ('disappeared_ports', '消失端口')]
+        for key, title in titles:
+            lines.append(f"{title} ({len(differences[key])}):")
+            lines.extend(f"  {value}" for value in sorted(differences[key]))
+        lines.append(f"服务变化 ({len(differences['changed_services'])}):")
+        lines.extend(f"  {change['host']}:{change['port']} {change['old_service']} -> {change['new_service']}"
+                     for change in differences['changed_services'])
+        self.text_edits['扫描结果'].setPlainText('\n'.join(lines))
+        self.tab_widget.setCurrentWidget(self.text_edits['扫描结果'])
+        self.status_label.setText(f"对比 | {previous_id} -> {entry['scan_id']}")
+
     def handle_error(self, has_error):
         """
         处理错误信号
@@ -1424,25 +1609,26 @@ class NmapScannerGUI(QWidget):
         output_text_edit = self.text_edits.get('扫描过程')
         if output_text_edit:
             output_text_edit.clear()
+        self.console_scan_ids = []
 
     def export_data(self):
-        """导出扫描过程文本数据"""
-        # 获取扫描过程的QTextEdit控件
-        text_edit_to_export = self.text_edits.get('扫描过程')
-        
-        if text_edit_to_export is None:
-            QMessageBox.warning(self, '错误', '未找到对应的文本编辑框。')
+        """导出扫描过程文本数据，直接复制各扫描的完整日志文件，不受界面显示行数的限制"""
+        log_paths = []
+        for scan_id in self.console_scan_ids:
+            job = self.scan_manager.get_job(scan_id)
+            log_paths.append(job.log.path if job else self.scan_manager.catalog.log_path(scan_id))
+        log_paths = [path for path in log_paths if path and LogSpool.log_files(path)]
+        if not log_paths:
+            QMessageBox.warning(self, '错误', '没有可导出的扫描过程，请先进行扫描。')
             return
         
-        # 获取要导出的文本框内容
-        text_to_export = text_edit_to_export.toPlainText()
         filename, _ = QFileDialog.getSaveFileName(self, '导出扫描过程', '', 'Text Files (*.txt);;All Files (*)')
 
         # 如果用户选择了文件路径，则保存文件
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as file:
-                    file.write(text_to_export)
+                for index, log_path in enumerate(log_paths):
+                    LogSpool.export(log_path, filename, append=index > 0)
                 QMessageBox.information(self, '成功', '扫描过程已成功导出到文件。')
             except Exception as e:
                 QMessageBox.warning(self, '错误', f'导出数据时发生错误：{str(e)}')
@@ -1456,13 +1642,16 @@ class NmapScannerGUI(QWidget):
             QMessageBox.warning(self, '错误', '未找到扫描结果编辑框。')
             return
         
-        # 获取当前选中的扫描类型
-        selected_scan_type = self.scan_type_group.checkedButton().text() if self.scan_type_group.checkedButton() else "未知"
+        if self.result_job is None:
+            QMessageBox.warning(self, '错误', '扫描结果文件不存在，请先进行扫描。')
+            return
+        
+        # 使用最近一次显示结果的扫描任务，而不是当前选中的扫描类型
+        selected_scan_type = self.result_job.scan_type
         
         try:
-            # 获取当前XML结果文件
-            output_filename = f"{selected_scan_type}_ScanCacheLog.xml"
-            output_file_path = os.path.join('logs', output_filename)
+            # 获取该扫描任务的XML结果文件
+            output_file_path = self.result_job.xml_file
             
             if not os.path.exists(output_file_path):
                 QMessageBox.warning(self, '错误', '扫描结果文件不存在，请先进行扫描。')
@@ -1625,54 +1814,116 @@ class NmapScannerGUI(QWidget):
         except Exception as e:
             QMessageBox.warning(self, '错误', f'导出CSV数据时发生错误：{str(e)}')
 
-    def clear_current_output(self):
-        """清空当前输出缓存"""
-        self.current_output = ""
+    def on_scan_events(self, scan_id, events):
+        """
+        处理扫描管理器转发的事件批次
+        
+        参数:
+            scan_id: 扫描ID
+            events: 扫描事件列表
+        """
+        if scan_id not in self.active_scan_ids:
+            return
+        # 同时运行多个扫描时标注输出所属的扫描
+        prefix = f"[{scan_id}] " if len(self.active_scan_ids) > 1 else ""
+        host_results = [event.data for event in events if event.type == EVENT_HOST_RESULT]
+        if host_results:
+            self.show_live_hosts(host_results, prefix)
+            events = [event for event in events if event.type != EVENT_HOST_RESULT]
+        if events:
+            self.live_output(events, prefix)
+
+    def show_live_hosts(self, hosts, prefix=""):
+        """
+        在结果标签页中追加扫描过程中已完成的主机
+        
+        参数:
+            hosts: 主机信息列表
+            prefix: 显示前缀
+        """
+        html = ""
+        for host in hosts:
+            if host['status'] != 'up':
+                continue
+            open_ports = [f"{port['port']}/{port['protocol']} {port['service']}"
+                          for port in host['ports'] if port['state'] == 'open']
+            ports_text = "，".join(open_ports) if open_ports else "没有发现开放的端口"
+            html += f'{prefix}主机：<span style="color:#00ff9d;">{host["ip"]}</span>  {ports_text}<br>'
+        
+        if html:
+            result_text_edit = self.text_edits['扫描结果']
+            result_text_edit.moveCursor(QTextCursor.End)
+            result_text_edit.insertHtml(html)
+
+    def on_scan_state(self, scan_id, state):
+        """
+        处理扫描任务状态变化
+        
+        参数:
+            scan_id: 扫描ID
+            state: 新状态
+        """
+        if scan_id not in self.active_scan_ids or state not in FINISHED_STATES:
+            return
+        
+        self.active_scan_ids.remove(scan_id)
+        job = self.scan_manager.get_job(scan_id)
+        if state == STATE_COMPLETED:
+            self.parse_nmap_output(job)
+        else:
+            if job.partial:
+                self.parse_nmap_output(job)  # 取消或失败的扫描仍显示中断前已完成的主机
+            if state == STATE_FAILED:
+                self.handle_error(True)
+                if job.error:
+                    self.status_label.setText(f"错误 | {job.error.splitlines()[0]}")
+            if job.partial:
+                reason = '扫描已停止' if state == STATE_CANCELLED else '扫描失败'
+                self.status_label.setText(f"部分结果 | {reason}，已保存完成的 {job.summary['total']} 台主机，可恢复扫描继续")
+        
+        if not self.active_scan_ids:
+            self.is_scanning = False
+            self.scan_active = False  # 扫描结束，重置标志
+
+    def closeEvent(self, event):
+        """关闭窗口时终止所有扫描进程"""
+        self.scan_manager.shutdown()
+        for target_name in list(self.asset_monitor.active_processes):
+            self.asset_monitor.cancel_scan(target_name)
+        super().closeEvent(event)
 
-    def live_output(self, process_output):
-        """处理实时输出"""
-        full_output = "".join(process_output).strip()
-        self.update_output_text(full_output)  # 实时显示输出
-        self.current_output += full_output + "\n"  # 将实时输出添加到缓存变量
+    def live_output(self, events, prefix=""):
+        """
+        处理实时输出
         
-        # 如果收到有效输出且没有错误消息，则认为扫描已经实际启动
+        参数:
+            events: 扫描事件列表
+            prefix: 显示前缀
+        """
+        # 整批事件一次性插入，避免逐行刷新界面
+        html = "".join(self.format_event_html(event, prefix + event.line) for event in events)
+        output_text_edit = self.text_edits.get('扫描过程')
+        if output_text_edit:
+            output_text_edit.insertHtml(html)
+        
+        # 收到nmap实际运行的事件后，认为扫描已经实际启动
         if not hasattr(self, "scan_active") or not self.scan_active:
-            # 检查是否收到nmap实际运行的输出
-            valid_nmap_outputs = [
-                "Starting Nmap", 
-                "Scanning",
-                "Initiating", 
-                "PORT"
-            ]
-            
-            # 检查是否是错误消息
-            error_indicators = [
-                "错误", 
-                "error",
-                "QUITTING",
-                "failed", 
-                "Sorry"
-            ]
-            
-            if any(indicator in full_output for indicator in valid_nmap_outputs) and \
-               not any(error in full_output.lower() for error in error_indicators):
+            if any(event.type in (EVENT_START, EVENT_STATS, EVENT_HOST_UP, EVENT_PORT) for event in events):
                 self.scan_active = True
 
-        # 检查是否完成扫描
-        if "Nmap done" in full_output:
-            self.parse_nmap_output()  # 解析输出
-            self.current_output = ""  # 清空缓存变量
-            self.scan_active = False  # 扫描结束，重置标志
 
-    def parse_nmap_output(self):
+    def parse_nmap_output(self, job):
         """
         解析Nmap输出
         
         解析Nmap扫描完成后的XML输出文件，并将结果显示在结果标签页中。
         同时更新扫描状态和进度。
+        
+        参数:
+            job: 已完成的扫描任务
         """
-        selected_scan_type = self.scan_type_group.checkedButton().text()
-        result_text, error = NmapOutputParser.parse_nmap_output(selected_scan_type, logs_dir='logs', html_format=True)
+        selected_scan_type = job.scan_type
+        result_text, error = NmapOutputParser.parse_file(job.xml_file, selected_scan_type, html_format=True)
         
         if error:
             QMessageBox.warning(self, "错误", error)
@@ -1693,14 +1944,15 @@ class NmapScannerGUI(QWidget):
             # 添加到扫描历史
             scan_info = {
                 'timestamp': QDateTime.currentDateTime().toString('yyyy-MM-dd hh:mm:ss'),
-                'target': self.url_line_edit.text(),
+                'scan_id': job.scan_id,
+                'target': job.target,
                 'scan_type': selected_scan_type,
                 'result': plain_text[:100] + '...' if len(plain_text) > 100 else plain_text
             }
             self.scan_history.append(scan_info)
+            self.result_job = job
             
             # 更新状态
-            self.is_scanning = False
             self.status_label.setText(f"完成 | 扫描完成: {selected_scan_type}")
             self.progress_bar.setValue(100)
 
@@ -1726,6 +1978,7 @@ class NmapScannerGUI(QWidget):
             'target': target,
             'scan_type': config_widget.scan_type_combo.currentText(),
             'interval_minutes': config_widget.interval_spin.value(),
+            'time_budget_minutes': config_widget.time_budget_spin.value(),
             'ports': config_widget.ports_combo.currentText().strip(),
             'params': config_widget.params_input.text().strip()
         }
@@ -1883,6 +2136,50 @@ class NmapScannerGUI(QWidget):
         results_widget = self.monitor_tab_widget.get_results_widget()
         results_widget.append_message(f"[{timestamp}] {message}")
 
+    def on_monitor_host_differences(self, target_name, differences):
+        """
+        处理监控扫描过程中单个主机的差异，无需等待扫描结束
+        
+        参数:
+            target_name: 监控目标名称
+            differences: 差异字典
+        """
+        timestamp = datetime.now().strftime('%H:%M:%S')
+        messages = []
+        for host in differences['new_hosts']:
+            messages.append(f"[{timestamp}] {target_name} 新增主机: {host}")
+        for port in differences['new_ports']:
+            messages.append(f"[{timestamp}] {target_name} 新增端口: {port}")
+        for port in differences['disappeared_ports']:
+            messages.append(f"[{timestamp}] {target_name} 端口关闭: {port}")
+        for change in differences['changed_services']:
+            messages.append(f"[{timestamp}] {target_name} 服务变化: {change['host']}:{change['port']} "
+                            f"{change['old_service']} -> {change['new_service']}")
+        
+        if messages:
+            results_widget = self.monitor_tab_widget.get_results_widget()
+            results_widget.append_message("\n".join(messages))
+
+    def on_monitor_events(self, target_name, events):
+        """
+        处理监控扫描的事件批次，实时显示发现的开放端口和错误
+        
+        参数:
+            target_name: 监控目标名称
+            events: 扫描事件列表
+        """
+        timestamp = datetime.now().strftime('%H:%M:%S')
+        messages = []
+        for event in events:
+            if event.type == EVENT_PORT and event.data.get('state') == 'open':
+                messages.append(f"[{timestamp}] {target_name} 发现开放端口: {event.data['host']}:{event.data['port']}/{event.data['protocol']}")
+            elif event.type == EVENT_WARNING and event.data.get('severity') == 'error':
+                messages.append(f"[{timestamp}] {target_name} 错误: {event.line}")
+        
+        if messages:
+            results_widget = self.monitor_tab_widget.get_results_widget()
+            results_widget.append_message("\n".join(messages))
+
     def on_monitor_error(self, error_message):
         """处理监控错误消息"""
         timestamp = datetime.now().strftime('%H:%M:%S')
@@ -0,0 +1,57 @@
+"""
+Qt适配模块，将核心模块在后台线程中的回调转换为Qt信号，供GUI在主线程中处理
+"""
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from src.core.asset_monitor import AssetMonitor
+
+
+class ScanManagerSignals(QObject):
+    """
+    将ScanManager后台线程中的回调转换为Qt信号
+    """
+    events_signal = pyqtSignal(str, list)  # (scan_id, 事件批次)
+    state_signal = pyqtSignal(str, str)    # (scan_id, 状态)
+
+    def on_events(self, scan_id, events):
+        """ScanManager事件批次回调"""
+        self.events_signal.emit(scan_id, events)
+
+    def on_state(self, job):
+        """ScanManager状态回调"""
+        self.state_signal.emit(job.scan_id, job.state)
+
+
+class QtAssetMonitor(QObject):
+    """
+    AssetMonitor的Qt适配器
+
+    信号名称与AssetMonitor一致，其余属性和方法直接转发给内部的AssetMonitor。
+    """
+    scan_completed = pyqtSignal(dict)  # 扫描完成信号
+    scan_progress = pyqtSignal(str)    # 扫描进度信号
+    scan_error = pyqtSignal(str)       # 扫描错误信号
+    scan_events = pyqtSignal(str, list)  # 扫描事件批次信号 (目标名称, 事件列表)
+    host_differences = pyqtSignal(str, dict)  # 扫描过程中单个主机的差异信号 (目标名称, 差异字典)
+
+    def __init__(self, monitor=None):
+        """
+        初始化适配器
+
+        参数:
+            monitor: 要适配的AssetMonitor，默认新建
+        """
+        super().__init__()
+        self.monitor = monitor or AssetMonitor()
+        self.monitor.scan_completed.connect(self.scan_completed.emit)
+        self.monitor.scan_progress.connect(self.scan_progress.emit)
+        self.monitor.scan_error.connect(self.scan_error.emit)
+        self.monitor.scan_events.connect(self.scan_events.emit)
+        self.monitor.host_differences.connect(self.host_differences.emit)
+
+    def __getattr__(self, name):
+        """转发未定义的属性到AssetMonitor"""
+        if name == 'monitor':
+            raise AttributeError(name)
+        return getattr(self.monitor, name)
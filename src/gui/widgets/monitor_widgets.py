@@ -95,6 +95,17 @@ class MonitorConfigWidget(QWidget):
         self.ports_combo.setCurrentText("22,80,443")
         config_layout.addWidget(self.ports_combo, 3, 1, 1, 2)
         
+        # 限时扫描：每次扫描的时间预算，未完成的主机下次继续
+        self.time_budget_spin = QSpinBox()
+        self.time_budget_spin.setMinimum(0)
+        self.time_budget_spin.setMaximum(1440)
+        self.time_budget_spin.setValue(0)
+        self.time_budget_spin.setPrefix("限时 ")
+        self.time_budget_spin.setSuffix(" 分钟")
+        self.time_budget_spin.setSpecialValueText("不限时")
+        self.time_budget_spin.setToolTip("每次扫描最多运行的时间，有开放端口的主机优先，未扫描的主机下次继续")
+        config_layout.addWidget(self.time_budget_spin, 3, 3)
+        
         # 自定义参数
         config_layout.addWidget(QLabel("扫描参数:"), 4, 0)
         self.params_input = QLineEdit()
@@ -348,7 +359,7 @@ class MonitorTargetsWidget(QWidget):
         
         target_name = self.targets_table.item(current_row, 0).text()
         if self.parent_window and hasattr(self.parent_window, 'asset_monitor'):
-            self.parent_window.asset_monitor.stop_monitoring(target_name)
+            self.parent_window.asset_monitor.stop_monitoring(target_name, cancel_running=True)
             QMessageBox.information(self, "成功", f"监控 '{target_name}' 已停止")
             self.refresh_targets()
     
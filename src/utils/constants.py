@@ -29,3 +29,6 @@ OUTPUT_FORMAT_MAP = {
 
 # 扫描类型列表
 SCAN_TYPES = ['默认扫描', '存活扫描', '服务识别', '系统识别', '端口识别', '暴力破解', '漏洞扫描']
+
+# 扫描过程标签页最多显示的行数，更早的输出只保留在扫描目录的日志文件中
+MAX_CONSOLE_LINES = 5000
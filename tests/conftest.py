@@ -0,0 +1,49 @@
+"""
+测试公共配置：在临时目录中运行（程序的统计和日志文件使用相对路径），并提供nmap替身
+"""
+
+import os
+import sys
+import stat
+import time
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import src.core.command_builder as command_builder  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """每个测试在独立的临时目录中运行，logs/ 等相对路径不会写入仓库"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def stub_nmap(tmp_path, monkeypatch):
+    """将 tests/stub_nmap.py 安装为PATH中的nmap，返回其路径"""
+    if sys.platform == 'win32':
+        pytest.skip('nmap替身需要可执行的脚本')
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    nmap_path = bin_dir / 'nmap'
+    with open(os.path.join(ROOT_DIR, 'tests', 'stub_nmap.py'), 'r', encoding='utf-8') as f:
+        nmap_path.write_text(f'#!{sys.executable}\n' + f.read(), encoding='utf-8')
+    nmap_path.chmod(nmap_path.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    monkeypatch.setattr(command_builder, '_resolved_nmap_path', None)
+    return str(nmap_path)
+
+
+def wait_until(predicate, timeout=30.0, interval=0.1):
+    """等待条件成立，超时返回False"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
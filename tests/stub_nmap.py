@@ -0,0 +1,90 @@
+"""
+测试用的nmap替身，按命令行中的目标逐台写入 -oX 结果，每台主机开放22端口
+
+环境变量:
+    STUB_FAIL_ON: 扫描到该主机时进程自行终止（SIGKILL），模拟nmap崩溃
+    STUB_DELAY: 每台主机的耗时（秒）
+"""
+
+import os
+import sys
+import time
+import signal
+import ipaddress
+
+
+# 带参数值的选项，其参数值不是扫描目标
+VALUE_OPTIONS = ('-oX', '-oN', '-oG', '-p', '-iL', '--excludefile', '--min-parallelism', '--max-parallelism',
+                 '--stats-every', '--host-timeout', '--min-hostgroup', '--max-hostgroup', '--script-timeout',
+                 '--min-rate', '--max-rate', '--exclude-ports', '--max-retries', '--script',
+                 '--initial-rtt-timeout', '--max-rtt-timeout', '--min-rtt-timeout')
+
+HELP_TEXT = '\n'.join(['  -oX/-oN/-oG <file>', '  -iL <inputfilename>', '  --excludefile <exclude_file>',
+                       '  --append-output', '  --resume <filename>', '  --min-rate <number>', '  --max-rate <number>',
+                       '  --min-parallelism', '  --stats-every <time>', '  --min-hostgroup', '  --max-retries',
+                       '  --host-timeout', '  --script-timeout', '  --exclude-ports', '  --unique',
+                       '  --disable-arp-ping'])
+
+
+def read_list(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read().split()
+
+
+def expand(targets):
+    hosts = []
+    for target in targets:
+        try:
+            hosts.extend(str(host) for host in ipaddress.ip_network(target, strict=False))
+        except ValueError:
+            hosts.append(target)
+    return hosts
+
+
+def main(args):
+    if '--version' in args:
+        print('Nmap version 7.94 ( https://nmap.org )')
+        return 0
+    if '-h' in args:
+        print(HELP_TEXT)
+        return 0
+
+    targets = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in VALUE_OPTIONS:
+            skip = True
+        elif not arg.startswith('-'):
+            targets.append(arg)
+    if '-iL' in args:
+        targets.extend(read_list(args[args.index('-iL') + 1]))
+    excluded = set(read_list(args[args.index('--excludefile') + 1])) if '--excludefile' in args else set()
+    hosts = [host for host in expand(targets) if host not in excluded]
+
+    xml_file = args[args.index('-oX') + 1]
+    ports = args[args.index('-p') + 1] if '-p' in args else '22'
+    delay = float(os.environ.get('STUB_DELAY', '0'))
+    with open(xml_file, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0"?>\n<nmaprun scanner="nmap" args="nmap" start="1" version="7.94">\n')
+        f.write(f'<scaninfo type="syn" protocol="tcp" numservices="1" services="{ports}"/>\n')
+        f.flush()
+        print('Starting Nmap 7.94 ( https://nmap.org )', flush=True)
+        for count, host in enumerate(hosts, 1):
+            time.sleep(delay)
+            if host == os.environ.get('STUB_FAIL_ON'):
+                os.kill(os.getpid(), signal.SIGKILL)
+            print(f'Discovered open port 22/tcp on {host}', flush=True)
+            f.write(f'<host starttime="1" endtime="2"><status state="up" reason="syn-ack"/>'
+                    f'<address addr="{host}" addrtype="ipv4"/><ports><port protocol="tcp" portid="22">'
+                    f'<state state="open" reason="syn-ack"/><service name="ssh"/></port></ports></host>\n')
+            f.flush()
+        f.write(f'<runstats><finished time="2" elapsed="1.00" exit="success"/>'
+                f'<hosts up="{len(hosts)}" down="0" total="{len(hosts)}"/></runstats>\n</nmaprun>\n')
+    print(f'Nmap done: {len(hosts)} IP addresses ({len(hosts)} hosts up) scanned in 1.00 seconds', flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,109 @@
+"""
+扫描接口的请求校验测试：内容类型、Host/Origin、令牌和附加参数
+"""
+
+import json
+import threading
+import http.client
+
+import pytest
+
+from src.core.api_server import ScanApiServer, ScanApiService, ApiError
+from src.core.scan_manager import ScanManager
+
+
+@pytest.fixture
+def service(workdir):
+    service = ScanApiService(ScanManager(base_dir=str(workdir / 'scans')))
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def server(service):
+    server = ScanApiServer(service, '127.0.0.1', 0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=5)
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    send_headers = {'Content-Type': 'application/json'} if data is not None else {}
+    send_headers.update(headers or {})
+    try:
+        connection.request(method, path, body=data, headers=send_headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode('utf-8'))
+    finally:
+        connection.close()
+
+
+def test_health(server):
+    status, payload = request(server, 'GET', '/api/health')
+    assert status == 200
+    assert payload['status'] == 'ok'
+
+
+def test_rejects_non_json_content_type(server):
+    status, _ = request(server, 'POST', '/api/scans', {'target': '10.0.0.1'},
+                        {'Content-Type': 'text/plain'})
+    assert status == 415
+
+
+def test_rejects_cross_origin_request(server):
+    status, _ = request(server, 'GET', '/api/health', headers={'Origin': 'http://evil.example'})
+    assert status == 403
+
+
+def test_rejects_foreign_host_without_token(server):
+    status, _ = request(server, 'GET', '/api/health', headers={'Host': 'evil.example:8765'})
+    assert status == 403
+
+
+@pytest.mark.parametrize('params', ['-oN /tmp/out.txt', '-oA/tmp/out', '-iL /etc/hosts', '--resume x.log',
+                                    '--datadir /tmp', '--script /tmp/evil.nse'])
+def test_rejects_file_params(server, params):
+    status, payload = request(server, 'POST', '/api/scans', {'target': '10.0.0.1', 'params': params})
+    assert status == 400
+    assert 'params' in payload['error']
+
+
+@pytest.mark.parametrize('target', ['-oN/tmp/pwned 10.0.0.1', '10.0.0.1,--script=/tmp/evil.nse', '-iL/etc/hosts'])
+def test_rejects_option_like_targets(server, target):
+    status, payload = request(server, 'POST', '/api/scans', {'target': target})
+    assert status == 400
+    assert 'target' in payload['error']
+
+
+def test_forbidden_params_allows_timing_options():
+    assert ScanApiService.forbidden_params('-T4 --open --max-retries 2 --script vuln -Pn') == []
+    assert ScanApiService.forbidden_params('--script=http-title,/tmp/x') == ['--script http-title,/tmp/x']
+
+
+def test_validate_config_drops_server_paths(service):
+    config = service._validate_config({'target': '10.0.0.1', 'result_file': '/etc/cron.d/x.txt',
+                                       'output_dir': '/tmp', 'discovery_file': '/etc/passwd',
+                                       'target_file': '/etc/hosts'})
+    for key in ('result_file', 'output_dir', 'discovery_file', 'target_file'):
+        assert key not in config
+
+
+def test_validate_config_requires_target(service):
+    with pytest.raises(ApiError) as error:
+        service._validate_config({'params': '-T4'})
+    assert error.value.status == 400
+
+
+def test_validate_config_ignores_non_scalar_params(service):
+    config = service._validate_config({'target': '10.0.0.1', 'params': ['-oN', '/tmp/x']})
+    assert 'params' not in config
+
+
+def test_non_loopback_bind_requires_token(service):
+    with pytest.raises(ValueError):
+        ScanApiServer(service, '0.0.0.0', 0, quiet=True)
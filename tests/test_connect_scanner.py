@@ -0,0 +1,79 @@
+"""
+TCP连接扫描的测试：对本机监听端口扫描，并检查写出的nmap格式XML
+"""
+
+import socket
+
+import pytest
+
+from src.core.connect_scanner import ConnectScanner, MAX_CONNECT_PROBES
+from src.core.xml_tailer import load_hosts
+
+
+@pytest.fixture
+def listener():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(16)
+    yield server.getsockname()[1]
+    server.close()
+
+
+@pytest.fixture
+def closed_port():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def test_scan_localhost(listener, closed_port, workdir):
+    xml_file = str(workdir / 'connect.xml')
+    found = []
+    hosts = ConnectScanner(timeout=2).run('127.0.0.1', [listener, closed_port], xml_file, on_host=found.append)
+
+    assert len(hosts) == 1 and hosts == found
+    host = hosts[0]
+    assert host['ip'] == '127.0.0.1'
+    assert host['status'] == 'up'
+    assert [port['port'] for port in host['ports']] == [str(listener)]
+    assert host['ports'][0]['state'] == 'open'
+
+    written = load_hosts(xml_file)
+    assert [item['ip'] for item in written] == ['127.0.0.1']
+    assert [port['port'] for port in written[0]['ports']] == [str(listener)]
+
+
+def test_closed_ports_still_mark_host_up(closed_port):
+    hosts = ConnectScanner(timeout=2).run('127.0.0.1', [closed_port])
+    assert len(hosts) == 1
+    assert hosts[0]['status'] == 'up'
+    assert hosts[0]['ports'] == []
+
+
+def test_rate_limit(listener, closed_port):
+    scanner = ConnectScanner(timeout=2, rate=20)
+    hosts = scanner.run('127.0.0.1', [listener, closed_port])
+    assert [port['port'] for port in hosts[0]['ports']] == [str(listener)]
+
+
+def test_parse_ports():
+    assert ConnectScanner.parse_ports('80,443,8000-8002') == [80, 443, 8000, 8001, 8002]
+    assert ConnectScanner.parse_ports('T:22,U:53,161') == [22]
+    assert ConnectScanner.parse_ports('http') is None
+    assert ConnectScanner.parse_ports('0-10') is None
+
+
+def test_expand_targets():
+    assert ConnectScanner.expand_targets('10.0.0.0/30') == ['10.0.0.0', '10.0.0.1', '10.0.0.2', '10.0.0.3']
+    assert ConnectScanner.expand_targets('10.0.0.1') == ['10.0.0.1']
+
+
+def test_is_suitable():
+    config = {'scan_type': '默认扫描', 'target': '10.0.0.0/28', 'port_input': '22,80', 'params': '-T4 --open'}
+    assert ConnectScanner.is_suitable(config)
+    assert not ConnectScanner.is_suitable(dict(config, scan_type='服务识别'))
+    assert not ConnectScanner.is_suitable(dict(config, params='--script vuln'))
+    assert not ConnectScanner.is_suitable(dict(config, connect_scan=False))
+    assert not ConnectScanner.is_suitable(dict(config, port_input=f'1-{MAX_CONNECT_PROBES}'))
@@ -0,0 +1,89 @@
+"""
+外部发现结果导入的测试：masscan -oL/-oJ 输出的解析、去重、排序和XML写出
+"""
+
+import src.core.discovery_import as discovery_import
+from src.core.discovery_import import DiscoveryImporter
+from src.core.xml_tailer import load_hosts
+
+
+MASSCAN_LIST = """#masscan
+open tcp 80 10.0.0.5 1700000000
+open tcp 22 10.0.0.1 1700000000
+open tcp 22 10.0.0.1 1700000001
+banner tcp 22 10.0.0.1 1700000002 ssh SSH-2.0-OpenSSH_8.9
+closed tcp 23 10.0.0.1 1700000003
+open udp 53 10.0.0.10 1700000004
+# end
+"""
+
+MASSCAN_JSON = """[
+{   "ip": "10.0.0.5",   "timestamp": "1700000000", "ports": [ {"port": 443, "proto": "tcp", "status": "open", "reason": "syn-ack", "ttl": 64} ] }
+,
+{   "ip": "10.0.0.1",   "timestamp": "1700000000", "ports": [ {"port": 22, "proto": "tcp", "status": "open", "reason": "syn-ack", "ttl": 64} ] }
+,
+{   "ip": "10.0.0.2",
+    "timestamp": "1700000000",
+    "ports": [ {"port": 8080, "proto": "tcp", "status": "open", "reason": "syn-ack", "ttl": 64} ] }
+,
+{   "ip": "10.0.0.3",   "timestamp": "1700000000", "ports": [ {"port": 25, "proto": "tcp", "status": "closed", "reason": "rst", "ttl": 64} ] }
+]
+"""
+
+
+def ports_of(hosts):
+    return {host['ip']: [(port['protocol'], port['port'], port['service']) for port in host['ports']]
+            for host in hosts}
+
+
+def test_masscan_list(workdir):
+    sample = workdir / 'found.txt'
+    sample.write_text(MASSCAN_LIST, encoding='utf-8')
+    hosts = list(DiscoveryImporter.iter_hosts(str(sample)))
+
+    assert [host['ip'] for host in hosts] == ['10.0.0.1', '10.0.0.5', '10.0.0.10']  # 按地址排序
+    assert ports_of(hosts) == {
+        '10.0.0.1': [('tcp', '22', 'ssh')],  # 重复的端口只保留一次，保留banner中的服务名称
+        '10.0.0.5': [('tcp', '80', 'unknown')],
+        '10.0.0.10': [('udp', '53', 'unknown')]
+    }
+
+
+def test_masscan_json(workdir):
+    sample = workdir / 'found.json'
+    sample.write_text(MASSCAN_JSON, encoding='utf-8')
+    hosts = list(DiscoveryImporter.iter_hosts(str(sample)))
+
+    assert ports_of(hosts) == {
+        '10.0.0.1': [('tcp', '22', 'unknown')],
+        '10.0.0.2': [('tcp', '8080', 'unknown')],  # 跨行的JSON对象
+        '10.0.0.5': [('tcp', '443', 'unknown')]
+    }
+
+
+def test_write_xml(workdir):
+    sample = workdir / 'found.txt'
+    sample.write_text(MASSCAN_LIST + '10.0.0.5:443\n2001:db8::1 80\n', encoding='utf-8')
+    xml_file = workdir / 'out' / 'import.xml'
+    stats = DiscoveryImporter.write_xml(str(sample), str(xml_file))
+
+    assert stats == {'hosts': 4, 'ports': 5}
+    hosts = load_hosts(str(xml_file))
+    assert [host['ip'] for host in hosts] == ['10.0.0.1', '10.0.0.5', '10.0.0.10', '2001:db8::1']
+    assert [port['port'] for port in hosts[1]['ports']] == ['80', '443']
+    assert sorted(path.name for path in (workdir / 'out').iterdir()) == ['import.xml']  # 临时文件已删除
+
+
+def test_sorted_runs_match_in_memory_result(workdir, monkeypatch):
+    lines = [f"open tcp {port} 10.0.{index % 3}.{index % 7} 1700000000"
+             for index, port in enumerate(range(1, 200))]
+    sample = workdir / 'found.txt'
+    sample.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    expected = list(DiscoveryImporter.iter_hosts(str(sample)))
+
+    # 分段排序并多级归并，结果与内存中排序一致
+    monkeypatch.setattr(discovery_import, 'MAX_SORT_RECORDS', 5)
+    monkeypatch.setattr(discovery_import, 'MAX_MERGE_RUNS', 3)
+    assert list(DiscoveryImporter.iter_hosts(str(sample), temp_dir=str(workdir))) == expected
+    assert sum(len(host['ports']) for host in expected) == len(lines)
+    assert sorted(path.name for path in workdir.iterdir()) == ['found.txt']
@@ -0,0 +1,177 @@
+"""
+分布式扫描协调节点的测试：提交校验、分片租约、结果上传和合并
+"""
+
+import time
+import ipaddress
+
+import pytest
+
+from src.core.api_server import ApiError
+from src.core.distributed import ShardCoordinator, ShardWorker, check_params, WORKER_CONFIG_KEYS, JOB_COMPLETED
+from src.core.xml_tailer import load_hosts
+
+
+def shard_xml(hosts, finished=True):
+    lines = ['<?xml version="1.0"?>', '<nmaprun scanner="nmap" args="nmap" start="1">']
+    for host in hosts:
+        lines.append(f'<host><status state="up"/><address addr="{host}" addrtype="ipv4"/><ports>'
+                     f'<port protocol="tcp" portid="22"><state state="open"/><service name="ssh"/></port>'
+                     f'</ports></host>')
+    if finished:
+        lines.append(f'<runstats><finished time="2" elapsed="1.00" exit="success"/>'
+                     f'<hosts up="{len(hosts)}" down="0" total="{len(hosts)}"/></runstats>')
+        lines.append('</nmaprun>')
+    return '\n'.join(lines)
+
+
+def shard_hosts(shard):
+    return [str(host) for target in shard['config']['target'].split()
+            for host in ipaddress.ip_network(target, strict=False)]
+
+
+@pytest.fixture
+def coordinator(workdir, stub_nmap):
+    return ShardCoordinator(base_dir=str(workdir / 'distributed'), lease_timeout=60)
+
+
+def submit(coordinator, **config):
+    body = dict({'target': '10.0.0.0/30', 'scan_type': '默认扫描', 'port_input': '22', 'shard_count': 2,
+                 'adaptive_timing': False}, **config)
+    status, job = coordinator.dispatch('POST', '/api/jobs', {}, body)
+    assert status == 201
+    return job
+
+
+def register(coordinator, name='w1'):
+    status, payload = coordinator.dispatch('POST', '/api/workers', {}, {'name': name})
+    assert status == 201
+    return payload['worker_id']
+
+
+def lease(coordinator, worker_id):
+    status, payload = coordinator.dispatch('POST', f'/api/workers/{worker_id}/lease', {}, {})
+    assert status == 200
+    return payload['lease']
+
+
+def complete(coordinator, worker_id, lease_id, xml):
+    return coordinator.dispatch('POST', f'/api/workers/{worker_id}/complete', {}, {'lease_id': lease_id, 'xml': xml})
+
+
+def test_check_params():
+    assert check_params('-T4 -sS --open --max-retries 2 --min-rate=100 -Pn') == []
+    assert check_params('-oN /tmp/x --datadir /tmp -iL hosts.txt')
+    assert check_params('--script /tmp/evil.nse')
+
+
+@pytest.mark.parametrize('params', ['-oS /tmp/x', '--datadir /tmp', '--resume scan.log', '-iL hosts.txt'])
+def test_submit_rejects_params(coordinator, params):
+    with pytest.raises(ApiError) as error:
+        submit(coordinator, params=params)
+    assert error.value.status == 400
+
+
+@pytest.mark.parametrize('target', ['-iL/etc/shadow 10.0.0.0/30', '10.0.0.0/30,--script=/tmp/x.nse'])
+def test_submit_rejects_option_like_targets(coordinator, target):
+    with pytest.raises(ApiError) as error:
+        submit(coordinator, target=target)
+    assert error.value.status == 400
+
+
+class RecordingManager:
+    """只记录提交的配置，不执行扫描"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, config, on_events=None, on_state=None):
+        self.submitted.append(config)
+        return None
+
+
+def test_worker_rejects_option_like_lease_target(monkeypatch):
+    manager = RecordingManager()
+    worker = ShardWorker('http://127.0.0.1:1', 'w1', manager=manager)
+    worker.worker_id = 'w1-test'
+    requests = []
+    monkeypatch.setattr(worker, '_request', lambda method, path, body=None: requests.append((path, body)) or {})
+
+    messages = []
+    worker.log_message.connect(messages.append)
+    # 工作节点不信任租约内容，即使协调节点没有检查也拒绝执行
+    worker._run_lease({'lease_id': 'job:0:1', 'job_id': 'job', 'shard': 0, 'shard_count': 1,
+                       'config': {'target': '10.0.0.0/31 --script=/tmp/x.nse', 'scan_type': '默认扫描'}})
+
+    assert manager.submitted == []
+    assert [path for path, _ in requests] == ['/api/workers/w1-test/fail']
+    assert '--script=/tmp/x.nse' in requests[0][1]['error']
+    assert any('分片失败' in message for message in messages)  # 日志通过信号发送，不直接输出
+
+
+def test_lease_sends_whitelisted_config(coordinator):
+    submit(coordinator, params='-T4', result_file='/tmp/out.txt', custom='x')
+    worker_id = register(coordinator)
+    shard = lease(coordinator, worker_id)
+
+    assert shard['shard_count'] == 2
+    assert set(shard['config']) <= set(WORKER_CONFIG_KEYS)
+    assert shard['config']['params'] == '-T4'
+    assert 'arguments' not in shard
+    assert lease(coordinator, worker_id)['lease_id'] != shard['lease_id']
+    assert lease(coordinator, worker_id) is None
+
+
+def test_truncated_result_is_rejected(coordinator):
+    job = submit(coordinator)
+    worker_id = register(coordinator)
+    shard = lease(coordinator, worker_id)
+
+    for xml in (shard_xml(['10.0.0.0'], finished=False), '<html></html>', 'not xml'):
+        with pytest.raises(ApiError) as error:
+            complete(coordinator, worker_id, shard['lease_id'], xml)
+        assert error.value.status == 400
+    _, info = coordinator.dispatch('GET', f"/api/jobs/{job['job_id']}", {}, None)
+    assert info['state'] == 'running'
+    assert all(item['state'] != 'done' for item in info['shards'])
+
+
+def test_complete_all_shards_merges_result(coordinator):
+    job = submit(coordinator)
+    worker_id = register(coordinator)
+    for _ in range(2):
+        shard = lease(coordinator, worker_id)
+        status, payload = complete(coordinator, worker_id, shard['lease_id'],
+                                   shard_xml(shard_hosts(shard)))
+        assert status == 200 and payload['accepted']
+
+    _, info = coordinator.dispatch('GET', f"/api/jobs/{job['job_id']}", {}, None)
+    assert info['state'] == JOB_COMPLETED
+    _, result = coordinator.dispatch('GET', f"/api/jobs/{job['job_id']}/result", {}, None)
+    assert result['complete']
+    assert sorted(host['ip'] for host in result['hosts']) == [f'10.0.0.{i}' for i in range(4)]
+    assert sorted(host['ip'] for host in load_hosts(info['xml_file'])) == [f'10.0.0.{i}' for i in range(4)]
+
+
+def test_expired_lease_is_reassigned(workdir, stub_nmap):
+    coordinator = ShardCoordinator(base_dir=str(workdir / 'distributed'), lease_timeout=1)
+    job = submit(coordinator, shard_count=1)
+    first = register(coordinator, 'w1')
+    second = register(coordinator, 'w2')
+    shard = lease(coordinator, first)
+    assert lease(coordinator, second) is None
+
+    # 第一个节点停止心跳，租约过期后分片分配给仍在心跳的节点
+    for _ in range(3):
+        time.sleep(0.5)
+        coordinator.dispatch('POST', f'/api/workers/{second}/heartbeat', {}, {'leases': []})
+    retry = lease(coordinator, second)
+    assert retry is not None and retry['shard'] == shard['shard']
+
+    with pytest.raises(ApiError) as error:
+        complete(coordinator, first, shard['lease_id'], shard_xml(shard_hosts(shard)))
+    assert error.value.status == 404
+    status, payload = complete(coordinator, second, retry['lease_id'], shard_xml(shard_hosts(retry)))
+    assert status == 200 and payload['accepted']
+    _, info = coordinator.dispatch('GET', f"/api/jobs/{job['job_id']}", {}, None)
+    assert info['state'] == JOB_COMPLETED
@@ -0,0 +1,121 @@
+"""
+任务队列的测试：优先级顺序、类别上限以及交互式任务暂停和恢复后台任务
+"""
+
+import sys
+import time
+import subprocess
+
+import pytest
+
+from src.core.job_queue import (JobQueue, get_job_queue, PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED,
+                                PRIORITY_BACKFILL)
+from src.core.process_supervisor import ProcessSupervisor
+
+
+class PausableJob:
+    """记录暂停和恢复调用的任务"""
+
+    def __init__(self, can_pause=True):
+        self.can_pause = can_pause
+        self.paused = 0
+        self.resumed = 0
+
+    def pause(self):
+        self.paused += 1
+        return self.can_pause
+
+    def resume(self):
+        self.resumed += 1
+
+
+def test_waiting_jobs_start_by_priority():
+    queue = JobQueue(max_running=1)
+    assert queue.try_acquire('running', PRIORITY_INTERACTIVE)
+    assert not queue.try_acquire('backfill', PRIORITY_BACKFILL)
+    assert not queue.try_acquire('scheduled', PRIORITY_SCHEDULED)
+
+    queue.release('running')
+    assert not queue.try_acquire('backfill', PRIORITY_BACKFILL)
+    assert queue.try_acquire('scheduled', PRIORITY_SCHEDULED)
+    queue.release('scheduled')
+    assert queue.try_acquire('backfill', PRIORITY_BACKFILL)
+
+
+def test_class_limit_does_not_block_other_classes():
+    queue = JobQueue(max_running=3, class_limits={PRIORITY_BACKFILL: 1})
+    assert queue.try_acquire('b1', PRIORITY_BACKFILL)
+    assert not queue.try_acquire('b2', PRIORITY_BACKFILL)
+    assert queue.try_acquire('s1', PRIORITY_SCHEDULED)
+
+    snapshot = queue.snapshot()
+    assert snapshot['running'] == {'b1': PRIORITY_BACKFILL, 's1': PRIORITY_SCHEDULED}
+    assert snapshot['waiting'] == {'b2': PRIORITY_BACKFILL}
+
+    queue.release('b1')
+    assert queue.try_acquire('b2', PRIORITY_BACKFILL)
+
+
+def test_interactive_job_preempts_latest_background_job():
+    queue = JobQueue(max_running=2)
+    scheduled, backfill = PausableJob(), PausableJob()
+    assert queue.try_acquire('scheduled', PRIORITY_SCHEDULED, scheduled.pause, scheduled.resume)
+    assert queue.try_acquire('backfill', PRIORITY_BACKFILL, backfill.pause, backfill.resume)
+
+    assert queue.try_acquire('interactive', PRIORITY_INTERACTIVE)
+    assert (scheduled.paused, backfill.paused) == (0, 1)  # 先暂停优先级最低的任务
+    assert queue.is_paused('backfill')
+    assert queue.snapshot()['paused'] == {'backfill': PRIORITY_BACKFILL}
+
+    queue.release('interactive')
+    assert backfill.resumed == 1
+    assert not queue.is_paused('backfill')
+
+
+def test_job_that_cannot_pause_is_not_preempted():
+    queue = JobQueue(max_running=1)
+    job = PausableJob(can_pause=False)
+    assert queue.try_acquire('scheduled', PRIORITY_SCHEDULED, job.pause, job.resume)
+    assert not queue.try_acquire('interactive', PRIORITY_INTERACTIVE)
+    assert job.paused == 1 and not queue.is_paused('scheduled')
+
+    queue.release('scheduled')
+    assert queue.try_acquire('interactive', PRIORITY_INTERACTIVE)
+
+
+def test_acquire_can_be_cancelled():
+    queue = JobQueue(max_running=1)
+    assert queue.try_acquire('running')
+    waited = []
+    assert not queue.acquire('waiting', cancelled=lambda: True, on_wait=lambda: waited.append(True))
+    assert waited == [True]
+    assert queue.snapshot()['waiting'] == {}
+
+
+def test_shared_queue():
+    assert get_job_queue() is get_job_queue()
+
+
+def process_state(pid):
+    with open(f'/proc/{pid}/stat', 'r') as f:
+        return f.read().rsplit(')', 1)[1].split()[0]
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='通过 /proc 检查进程状态')
+def test_preemption_stops_and_continues_process_group():
+    process = subprocess.Popen(['sleep', '30'], **ProcessSupervisor.popen_kwargs())
+    try:
+        queue = JobQueue(max_running=1)
+        assert queue.try_acquire('backfill', PRIORITY_BACKFILL,
+                                 lambda: ProcessSupervisor.suspend_group(process.pid),
+                                 lambda: ProcessSupervisor.resume_group(process.pid))
+        assert queue.try_acquire('interactive', PRIORITY_INTERACTIVE)
+        time.sleep(0.2)
+        assert process_state(process.pid) == 'T'  # SIGSTOP
+
+        queue.release('interactive')
+        time.sleep(0.2)
+        assert process_state(process.pid) != 'T'  # SIGCONT后继续运行
+    finally:
+        process.kill()
+        process.wait()
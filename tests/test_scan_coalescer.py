@@ -0,0 +1,95 @@
+"""
+扫描合并的测试：共享条件、剩余端口的计算以及按目标和端口筛选共享结果
+"""
+
+from src.core.scan_coalescer import ScanCoalescer
+from src.core.xml_tailer import NmapXmlWriter, load_hosts
+
+
+def command(target, ports, *options, xml_file='out.xml'):
+    return ['nmap', '-sS', '--open', *options, '-p', ports, target, '-oX', xml_file]
+
+
+def write_result(xml_file, hosts):
+    writer = NmapXmlWriter(xml_file, 'test')
+    for ip, ports in hosts.items():
+        writer.write_host({'ip': ip, 'status': 'up', 'ports': [
+            {'port': str(port), 'protocol': 'tcp', 'state': 'open', 'service': 'unknown', 'version': ''}
+            for port in ports]})
+    writer.finish(len(hosts))
+
+
+def test_claim_scans_only_uncovered_ports():
+    coalescer = ScanCoalescer()
+    first = coalescer.claim('a', command('10.0.0.0/24', '22,80'))
+    assert first['shared'] == [] and first['ports'] == ''
+
+    second = coalescer.claim('b', command('10.0.0.0/28', '80,443-445'))
+    assert second['shared'] == [first['entry']]
+    assert second['ports'] == '443-445'
+    assert second['entry']['ports'] == {('', 443), ('', 444), ('', 445)}
+
+    # 端口已被前两个扫描全部覆盖，不需要自己扫描
+    third = coalescer.claim('c', command('10.0.0.1', '22,444'))
+    assert third['ports'] is None and third['entry'] is None
+    assert third['shared'] == [first['entry'], second['entry']]
+
+
+def test_claim_requires_same_options_and_covered_targets():
+    coalescer = ScanCoalescer()
+    coalescer.claim('a', command('10.0.0.0/24', '22,80'))
+
+    assert coalescer.claim('b', command('10.0.0.0/28', '22', '-sV'))['shared'] == []
+    assert coalescer.claim('c', command('10.0.1.0/28', '22'))['shared'] == []
+    # 只影响速度的选项不参与比较
+    assert coalescer.claim('d', command('10.0.0.0/28', '22', '--max-rate', '100'))['ports'] is None
+
+
+def test_failed_scan_is_not_shared():
+    coalescer = ScanCoalescer()
+    first = coalescer.claim('a', command('10.0.0.0/24', '22'))
+    coalescer.finish(first['entry'], None)
+    assert coalescer.claim('b', command('10.0.0.0/24', '22'))['shared'] == []
+
+
+def test_finished_scan_expires_after_window():
+    coalescer = ScanCoalescer(window=0)
+    first = coalescer.claim('a', command('10.0.0.0/24', '22'))
+    coalescer.finish(first['entry'], 'a.xml')
+    first['entry']['finished'] -= 1
+    assert coalescer.claim('b', command('10.0.0.0/24', '22'))['shared'] == []
+
+
+def test_collect_filters_shared_results(workdir):
+    coalescer = ScanCoalescer()
+    first = coalescer.claim('a', command('10.0.0.0/24', '22,80'))
+    plan = coalescer.claim('b', command('10.0.0.0/30', '80,443'))
+
+    shared_xml = str(workdir / 'a.xml')
+    own_xml = str(workdir / 'b.xml')
+    write_result(shared_xml, {'10.0.0.1': [22, 80], '10.0.0.9': [80]})
+    write_result(own_xml, {'10.0.0.1': [443], '10.0.0.2': [443]})
+    coalescer.finish(first['entry'], shared_xml)
+
+    output = str(workdir / 'merged.xml')
+    stats = coalescer.collect(plan, own_xml, output)
+
+    assert stats == {'hosts_up': 2, 'hosts_down': 0, 'sources': 2}
+    hosts = {host['ip']: [port['port'] for port in host['ports']] for host in load_hosts(output)}
+    # 10.0.0.9 不在请求的目标中，22端口不在请求的端口中
+    assert hosts == {'10.0.0.1': ['80', '443'], '10.0.0.2': ['443']}
+
+
+def test_collect_returns_none_when_shared_scan_fails(workdir):
+    coalescer = ScanCoalescer()
+    first = coalescer.claim('a', command('10.0.0.0/24', '22,80'))
+    plan = coalescer.claim('b', command('10.0.0.0/30', '80'))
+    coalescer.finish(first['entry'], None)
+    assert coalescer.collect(plan, None, str(workdir / 'merged.xml')) is None
+
+
+def test_port_parsing_and_formatting():
+    ports = ScanCoalescer.parse_ports('22,80-82,U:53,T:443')
+    assert ports == {('', 22), ('', 80), ('', 81), ('', 82), ('udp', 53), ('tcp', 443)}
+    assert ScanCoalescer.format_ports(ports) == '22,80-82,T:443,U:53'
+    assert ScanCoalescer.parse_ports('http') is None
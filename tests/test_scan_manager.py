@@ -0,0 +1,94 @@
+"""
+ScanManager 分片失败、部分结果保存和继续扫描的测试（使用nmap替身）
+"""
+
+import pytest
+
+from conftest import wait_until
+from src.core.scan_manager import ScanManager, STATE_COMPLETED, STATE_FAILED
+from src.core.xml_tailer import load_hosts
+
+
+SHARD_CONFIG = {
+    'target': '10.0.0.0/29',
+    'scan_type': '默认扫描',
+    'port_input': '22',
+    'shard_mode': True,
+    'shard_count': 2,
+    'adaptive_timing': False
+}
+
+
+@pytest.fixture
+def manager(workdir):
+    manager = ScanManager(base_dir=str(workdir / 'scans'))
+    yield manager
+    manager.shutdown()
+
+
+def run_to_end(manager, scan_id):
+    job = manager.get_job(scan_id)
+    assert wait_until(lambda: job.is_finished), '扫描未在限定时间内结束'
+    return job
+
+
+def result_ips(job):
+    return sorted(host['ip'] for host in load_hosts(job.xml_file))
+
+
+def test_shard_scan_completes(stub_nmap, manager):
+    job = run_to_end(manager, manager.submit(dict(SHARD_CONFIG)))
+
+    assert job.state == STATE_COMPLETED
+    assert job.return_code == 0
+    assert not job.partial
+    assert result_ips(job) == [f'10.0.0.{i}' for i in range(8)]
+
+
+def test_killed_shard_fails_job_and_salvages_hosts(stub_nmap, manager, monkeypatch):
+    monkeypatch.setenv('STUB_FAIL_ON', '10.0.0.2')
+    job = run_to_end(manager, manager.submit(dict(SHARD_CONFIG)))
+
+    # 被信号终止的进程返回码为负数，同样视为失败
+    assert job.state == STATE_FAILED
+    assert job.return_code != 0
+    assert job.partial
+    ips = result_ips(job)
+    assert '10.0.0.2' not in ips
+    assert {'10.0.0.0', '10.0.0.1'} <= set(ips)
+
+
+def test_resume_scans_only_remaining_hosts(stub_nmap, manager, monkeypatch):
+    monkeypatch.setenv('STUB_FAIL_ON', '10.0.0.2')
+    scan_id = manager.submit(dict(SHARD_CONFIG))
+    assert run_to_end(manager, scan_id).state == STATE_FAILED
+    assert scan_id in [checkpoint['scan_id'] for checkpoint in manager.list_resumable()]
+
+    monkeypatch.delenv('STUB_FAIL_ON')
+    assert manager.resume(scan_id) == scan_id
+    job = run_to_end(manager, scan_id)
+
+    assert job.state == STATE_COMPLETED
+    assert not job.partial
+    ips = result_ips(job)
+    assert ips == [f'10.0.0.{i}' for i in range(8)]  # 已完成的主机没有重复
+    resumed = [part for part in job.parts if part.get('exclude_file')]
+    assert resumed and all('--excludefile' in part['command'] for part in resumed)
+
+
+def test_large_target_is_not_parsed_in_memory(stub_nmap, manager, monkeypatch):
+    from src.core.shard_executor import TargetSharder
+
+    def fail(target):
+        raise AssertionError('过长的目标文本不应整体解析')
+
+    monkeypatch.setattr(TargetSharder, 'count_hosts', staticmethod(fail))
+    target = ' '.join(f'10.{i // 250}.{i % 250}.1' for i in range(600)) + ' 10.0.0.1'
+    config = dict(SHARD_CONFIG, target=target, shard_mode=False, chunk_hosts=256)
+    job = run_to_end(manager, manager.submit(config))
+
+    assert job.state == STATE_COMPLETED
+    assert job.progress.total_hosts == 600  # 来自分块文件的统计，重复目标只计一次
+    assert job.config['target_duplicates'] == 1
+    assert len(job.parts) == 3
+    assert len(result_ips(job)) == 600
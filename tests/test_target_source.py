@@ -0,0 +1,54 @@
+"""
+目标来源的测试：文本和文件目标的规范化、去重以及分块 -iL 文件的拆分
+"""
+
+from src.core.target_source import TargetSource, INLINE_TARGET_LIMIT
+
+
+def read_chunk(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read().split()
+
+
+def test_write_chunks_splits_and_dedups(workdir):
+    target_file = workdir / 'targets.txt'
+    target_file.write_text('# 注释行\n10.0.0.1\n10.0.0.1/32  # 同一地址\nExample.COM\n10.0.1.0/28,10.0.0.2\n',
+                           encoding='utf-8')
+    source = TargetSource('example.com 10.0.2.0/30', files=[str(target_file)])
+    stats = source.write_chunks(str(workdir / 'chunks'), chunk_hosts=8)
+
+    assert stats['targets'] == 5
+    assert stats['hosts'] == 23
+    assert stats['duplicates'] == 2
+    chunks = [read_chunk(file_path) for file_path in stats['files']]
+    # /28 超过分块容量，拆分为两个 /29
+    assert chunks == [['example.com', '10.0.2.0/30', '10.0.0.1'], ['10.0.1.0/29'], ['10.0.1.8/29'], ['10.0.0.2']]
+
+
+def test_chunks_respect_host_limit(workdir):
+    targets = ' '.join(f'10.0.{i // 256}.{i % 256}' for i in range(1000))
+    stats = TargetSource(targets).write_chunks(str(workdir / 'chunks'), chunk_hosts=256)
+
+    assert stats['hosts'] == 1000
+    sizes = [len(read_chunk(file_path)) for file_path in stats['files']]
+    assert sizes == [256, 256, 256, 232]
+    assert [host for file_path in stats['files'] for host in read_chunk(file_path)] == targets.split()
+
+
+def test_dedup_memory_limit():
+    # 记住的目标达到上限后，新目标只与已记住的目标比较
+    source = TargetSource('10.0.0.1 10.0.0.2 10.0.0.3 10.0.0.1 10.0.0.3', max_dedup_entries=2)
+    assert [target for target, _ in source] == ['10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.3']
+    assert source.duplicates == 1
+
+
+def test_generator_items_and_count():
+    source = TargetSource(items=(f'10.0.0.{i % 4}' for i in range(10)))
+    assert source.count() == {'targets': 4, 'hosts': 4, 'duplicates': 6}
+
+
+def test_is_large_and_option_tokens():
+    assert not TargetSource.is_large('10.0.0.0/24')
+    assert TargetSource.is_large('1' * (INLINE_TARGET_LIMIT + 1))
+    assert TargetSource.option_tokens('10.0.0.1,-iL/etc/hosts --script=x 10.0.0.2') == ['-iL/etc/hosts', '--script=x']
+    assert TargetSource.option_tokens('10.0.0.1-100 example.com') == []
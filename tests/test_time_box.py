@@ -0,0 +1,72 @@
+"""
+限时扫描计划的测试：按历史价值排列主机和端口，以及本轮剩余主机的保存和推进
+"""
+
+import src.core.time_box as time_box
+from src.core.time_box import TimeBoxPlanner
+
+
+HISTORY = [
+    {'hosts': [{'ip': '10.0.0.3', 'ports': [{'port': '443', 'protocol': 'tcp', 'state': 'open'},
+                                            {'port': '8443', 'protocol': 'tcp', 'state': 'open'}]}]},
+    {'hosts': [{'ip': '10.0.0.2', 'ports': [{'port': '22', 'protocol': 'tcp', 'state': 'open'},
+                                            {'port': '443', 'protocol': 'tcp', 'state': 'open'}]},
+               {'ip': '10.0.0.3', 'ports': [{'port': '443', 'protocol': 'tcp', 'state': 'open'},
+                                            {'port': '80', 'protocol': 'tcp', 'state': 'closed'}]}]}
+]
+
+
+def test_order_hosts_by_open_ports():
+    hosts = [f'10.0.0.{i}' for i in range(6)]
+    assert TimeBoxPlanner.order_hosts(hosts, HISTORY) == ['10.0.0.3', '10.0.0.2', '10.0.0.0', '10.0.0.1',
+                                                          '10.0.0.4', '10.0.0.5']
+
+
+def test_order_and_format_ports():
+    ports = TimeBoxPlanner.order_ports('20-25,80,443', HISTORY)
+    assert ports[:2] == [443, 22]
+    assert TimeBoxPlanner.format_ports(ports) == '443,22,20-21,23-25,80'
+    assert TimeBoxPlanner.order_ports('U:53,T:80', HISTORY) is None
+    assert TimeBoxPlanner.order_ports('', HISTORY) is None
+
+
+def test_plan_and_advance_through_a_cycle(workdir):
+    planner = TimeBoxPlanner(str(workdir / 'state' / 'timebox.json'))
+    plan = planner.plan('10.0.0.0/29', '22,443', HISTORY)
+    assert plan['new_cycle'] and plan['total'] == 8
+    assert plan['hosts'][:2] == ['10.0.0.3', '10.0.0.2']
+    assert plan['ports'] == '443,22'
+
+    # 时间预算用完：最后一台出现在结果中的主机之前的主机视为已扫描
+    covered = planner.advance(plan, ['10.0.0.3', '10.0.0.1'], completed=False)
+    assert covered == ['10.0.0.3', '10.0.0.2', '10.0.0.0', '10.0.0.1']
+
+    plan = planner.plan('10.0.0.0/29', '22,443', HISTORY)
+    assert not plan['new_cycle']
+    assert plan['hosts'] == ['10.0.0.4', '10.0.0.5', '10.0.0.6', '10.0.0.7']
+    assert plan['total'] == 8
+
+    assert planner.advance(plan, [], completed=True) == plan['hosts']
+    assert planner.plan('10.0.0.0/29', '22,443', HISTORY)['new_cycle']
+
+
+def test_nothing_scanned_keeps_pending_hosts(workdir):
+    planner = TimeBoxPlanner(str(workdir / 'timebox.json'))
+    plan = planner.plan('10.0.0.0/30', '22', [])
+    assert planner.advance(plan, [], completed=False) == []
+    assert planner.plan('10.0.0.0/30', '22', [])['hosts'] == plan['hosts']
+
+
+def test_changed_target_starts_new_cycle(workdir):
+    planner = TimeBoxPlanner(str(workdir / 'timebox.json'))
+    plan = planner.plan('10.0.0.0/30', '22', [])
+    planner.advance(plan, ['10.0.0.0'], completed=False)
+    assert planner.plan('10.0.0.0/30', '22,80', [])['new_cycle']
+    assert planner.plan('10.0.1.0/30', '22,80', [])['new_cycle']
+
+
+def test_large_target_is_not_planned(workdir, monkeypatch):
+    monkeypatch.setattr(time_box, 'MAX_TIME_BOX_HOSTS', 4)
+    planner = TimeBoxPlanner(str(workdir / 'timebox.json'))
+    assert planner.plan('10.0.0.0/29', '22', []) is None
+    assert planner.plan('10.0.0.0/30', '22', []) is not None